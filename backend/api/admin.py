@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Producto, UserProfile, Pedido, DetallePedido, Notificacion, AuditLog, TokenBlacklist, Cart, CartItem
+from .models import Producto, UserProfile, Pedido, DetallePedido, Notificacion, AuditLog, TokenBlacklist, Cart, CartItem, StockShard
 
 
 @admin.register(UserProfile)
@@ -18,6 +18,13 @@ class ProductoAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(StockShard)
+class StockShardAdmin(admin.ModelAdmin):
+    list_display = ['producto', 'indice', 'reservado', 'capacidad']
+    search_fields = ['producto__nombre']
+    readonly_fields = ['producto', 'indice', 'reservado', 'capacidad']
+
+
 class DetallePedidoInline(admin.TabularInline):
     model = DetallePedido
     extra = 0
@@ -11,5 +11,13 @@ class ApiConfig(AppConfig):
         
         Los signals se importan aquí para evitar circular imports
         y asegurar que se registren correctamente.
+        
+        Con INSTRUMENTACION_ACTIVA se mide también el tiempo de los
+        serializers de DRF (ver api/utils/instrumentacion.py).
         """
         import api.signals  # noqa: F401
+        
+        from django.conf import settings
+        if settings.INSTRUMENTACION_ACTIVA:
+            from .utils import instrumentacion
+            instrumentacion.instalar()
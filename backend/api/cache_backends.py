@@ -0,0 +1,57 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🧮 BACKENDS DE CACHÉ - Aciertos y fallos por petición
+═══════════════════════════════════════════════════════════════════════════════
+
+Mismos backends que antes (django_redis y LocMemCache) con get/get_many
+contando aciertos y fallos en la medición de la petición en curso (ver
+api/utils/instrumentacion.py). Fuera de una petición instrumentada solo
+cuesta leer un ContextVar.
+
+settings.py:
+    CACHES = {'default': {'BACKEND': 'api.cache_backends.RedisCache', ...}}
+"""
+
+from contextvars import ContextVar
+
+from django.core.cache.backends.locmem import LocMemCache as _LocMemCache
+from django_redis.cache import RedisCache as _RedisCache
+
+from .utils import instrumentacion
+
+_AUSENTE = object()
+_en_get_many = ContextVar('cache_en_get_many', default=False)  # BaseCache.get_many llama a get()
+
+
+class ContadorCacheMixin:
+    """Cuenta aciertos/fallos de get y get_many"""
+    
+    def get(self, key, default=None, *args, **kwargs):
+        if not instrumentacion.midiendo() or _en_get_many.get():
+            return super().get(key, default, *args, **kwargs)
+        
+        valor = super().get(key, _AUSENTE, *args, **kwargs)  # Redis caído (IGNORE_EXCEPTIONS) → _AUSENTE
+        acierto = valor is not _AUSENTE
+        instrumentacion.contar_cache(int(acierto), int(not acierto))
+        return valor if acierto else default
+    
+    def get_many(self, keys, *args, **kwargs):
+        if not instrumentacion.midiendo():
+            return super().get_many(keys, *args, **kwargs)
+        
+        keys = list(keys)
+        marca = _en_get_many.set(True)
+        try:
+            valores = super().get_many(keys, *args, **kwargs)
+        finally:
+            _en_get_many.reset(marca)
+        instrumentacion.contar_cache(len(valores), len(keys) - len(valores))
+        return valores
+
+
+class RedisCache(ContadorCacheMixin, _RedisCache):
+    pass
+
+
+class LocMemCache(ContadorCacheMixin, _LocMemCache):
+    pass
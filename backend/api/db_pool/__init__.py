@@ -0,0 +1,31 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🏊 POOL DE CONEXIONES - Backend PostgreSQL con pool entre hilos
+═══════════════════════════════════════════════════════════════════════════════
+
+Backend opt-in (DB_POOL=True → ENGINE 'api.db_pool', ver settings.py).
+
+Con CONN_MAX_AGE cada hilo mantiene su propia conexión persistente: con
+muchos hilos hay muchas conexiones ociosas y, con CONN_MAX_AGE=0, cada
+petición paga el handshake (TCP + auth + arranque del backend).
+Con este backend las conexiones físicas son del proceso:
+- Django "abre" la conexión al empezar a usarla y la "cierra" al acabar la
+  petición (CONN_MAX_AGE=0); ambas operaciones toman/devuelven del pool
+- Tamaño acotado por OPTIONS['pool'] (minimo, maximo, timeout, vida_maxima,
+  inactividad_maxima, comprobar_tras)
+- Health check (SELECT 1) de las conexiones que llevan tiempo sin usarse
+- Métricas por pool: metricas() y GET /api/admin/bd/pool/
+
+Las sentencias preparadas de api/utils/sentencias.py viven en las
+conexiones del pool (sobreviven entre peticiones).
+"""
+
+from .pool import PoolAgotado, PoolConexiones, cerrar_pools, metricas, obtener_pool
+
+__all__ = [
+    'PoolAgotado',
+    'PoolConexiones',
+    'cerrar_pools',
+    'metricas',
+    'obtener_pool',
+]
@@ -0,0 +1,49 @@
+"""
+Backend de Django: PostgreSQL cuyas conexiones físicas salen de un
+PoolConexiones (ver __init__.py).
+"""
+
+from django.db.backends.postgresql import base as postgresql
+from django.db.backends.postgresql.creation import DatabaseCreation as PostgresCreation
+from django.db.backends.postgresql.psycopg_any import IsolationLevel
+from django.utils.asyncio import async_unsafe
+
+from .pool import cerrar_pools, obtener_pool
+
+
+class DatabaseCreation(PostgresCreation):
+    def _destroy_test_db(self, test_database_name, verbosity):
+        # DROP DATABASE falla mientras el pool tenga conexiones a la BD de test
+        cerrar_pools(test_database_name)
+        super()._destroy_test_db(test_database_name, verbosity)
+
+
+class DatabaseWrapper(postgresql.DatabaseWrapper):
+    creation_class = DatabaseCreation
+    
+    pool = None  # Pool de la conexión actual
+    
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        conn_params.pop('pool', None)
+        return conn_params
+    
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        # Un pool por destino: los tests cambian NAME sobre el mismo alias
+        base = conn_params.get('dbname', '')
+        clave = (self.alias, base, conn_params.get('host'), conn_params.get('port'), conn_params.get('user'))
+        self.pool = obtener_pool(clave, self.alias, base, self.settings_dict['OPTIONS'].get('pool', {}))
+        
+        conexion = self.pool.obtener(lambda: super(DatabaseWrapper, self).get_new_connection(conn_params))
+        # super() solo fija el nivel de aislamiento al crear; también en las reutilizadas
+        self.isolation_level = IsolationLevel(
+            self.settings_dict['OPTIONS'].get('isolation_level', IsolationLevel.READ_COMMITTED)
+        )
+        return conexion
+    
+    @async_unsafe
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.devolver(self.connection)
@@ -0,0 +1,294 @@
+"""
+Pool de conexiones físicas compartido entre los hilos de un proceso.
+
+Independiente del driver: solo usa cursor(), rollback(), close() y el
+atributo `closed` de la conexión DB-API (ver base.py para la integración
+con el backend de Django).
+"""
+
+from collections import deque
+from dataclasses import dataclass, field
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class PoolAgotado(Exception):
+    """Ninguna conexión quedó libre dentro del timeout del pool"""
+
+
+@dataclass
+class _Entrada:
+    """Estado de una conexión física del pool"""
+    creada: float
+    devuelta: float
+    preparadas: set = field(default_factory=set)  # Sentencias PREPARE de esta sesión
+
+
+class PoolConexiones:
+    """
+    Pool acotado [minimo, maximo] de conexiones a una base de datos.
+    
+    - obtener(): reutiliza la libre más reciente (LIFO: la más caliente) o
+      crea una nueva si no se llegó a `maximo`; si no, espera hasta
+      `timeout` segundos y lanza PoolAgotado
+    - Health check: SELECT 1 antes de entregar una conexión que lleva más
+      de `comprobar_tras` segundos sin usarse; las rotas se descartan
+    - Reciclado: se cierran las conexiones con más de `vida_maxima` segundos
+      y las libres con más de `inactividad_maxima` (sin bajar de `minimo`)
+    """
+    
+    def __init__(self, alias, base='', minimo=1, maximo=10, timeout=5.0,
+                 vida_maxima=1800, inactividad_maxima=300, comprobar_tras=30):
+        if not 0 <= minimo <= maximo or maximo < 1:
+            raise ValueError(f'Pool {alias}: se requiere 0 <= minimo <= maximo y maximo >= 1')
+        self.alias = alias
+        self.base = base
+        self.minimo = minimo
+        self.maximo = maximo
+        self.timeout = timeout
+        self.vida_maxima = vida_maxima
+        self.inactividad_maxima = inactividad_maxima
+        self.comprobar_tras = comprobar_tras
+        
+        self._cond = threading.Condition()
+        self._libres = deque()  # Conexiones libres; la derecha es la más reciente
+        self._entradas = {}  # id(conexion) → _Entrada (libres y en uso)
+        self._reservadas = 0  # Huecos tomados por hilos que están conectando
+        self._cerrado = False
+        self._contadores = dict.fromkeys(
+            ('creadas', 'reutilizadas', 'descartadas', 'fallos_health_check', 'esperas', 'agotado'), 0
+        )
+        self._espera_total = 0.0
+    
+    @property
+    def total(self):
+        return len(self._entradas) + self._reservadas
+    
+    def obtener(self, crear):
+        """
+        Conexión lista para usar.
+        
+        Args:
+            crear: Callable sin argumentos que abre una conexión nueva
+        
+        Raises:
+            PoolAgotado: Si no hay conexión libre en `timeout` segundos
+        """
+        limite = time.monotonic() + self.timeout
+        while True:
+            conexion = self._tomar(limite)
+            if conexion is None:
+                return self._crear(crear)
+            if self._sana(conexion):
+                with self._cond:
+                    self._contadores['reutilizadas'] += 1
+                return conexion
+            self._descartar(conexion)
+    
+    def devolver(self, conexion):
+        """Devuelve una conexión al pool (o la cierra si no es reutilizable)"""
+        try:
+            # Deshacer la transacción abierta; sin ella no hay viaje al servidor
+            if not getattr(conexion, 'closed', False):
+                conexion.rollback()
+        except Exception as e:
+            logger.warning(f'[POOL_BD] {self.alias}: conexión rota al devolverla: {str(e)}')
+        
+        ahora = time.monotonic()
+        entrada = self._entradas.get(id(conexion))
+        if (
+            entrada is None or self._cerrado or getattr(conexion, 'closed', False)
+            or ahora - entrada.creada > self.vida_maxima
+        ):
+            self._descartar(conexion)
+            return
+        
+        with self._cond:
+            entrada.devuelta = ahora
+            self._libres.append(conexion)
+            sobrantes = self._inactivas(ahora)
+            self._cond.notify()
+        for sobrante in sobrantes:
+            self._cerrar(sobrante)
+    
+    def preparadas(self, conexion):
+        """Sentencias preparadas en la conexión (None si no es del pool)"""
+        entrada = self._entradas.get(id(conexion))
+        return entrada.preparadas if entrada is not None else None
+    
+    def calentar(self, crear):
+        """Abre conexiones hasta tener `minimo` (p. ej. al arrancar el worker)"""
+        conexiones = []
+        try:
+            while self.total < self.minimo:
+                conexiones.append(self.obtener(crear))
+        finally:
+            for conexion in conexiones:
+                self.devolver(conexion)
+    
+    def cerrar(self):
+        """Cierra las libres; las que están en uso se cierran al devolverlas"""
+        with self._cond:
+            self._cerrado = True
+            libres = list(self._libres)
+            self._libres.clear()
+            for conexion in libres:
+                self._entradas.pop(id(conexion), None)
+            self._cond.notify_all()
+        for conexion in libres:
+            self._cerrar(conexion)
+    
+    def metricas(self):
+        with self._cond:
+            esperas = self._contadores['esperas']
+            return {
+                'alias': self.alias,
+                'base': self.base,
+                'minimo': self.minimo,
+                'maximo': self.maximo,
+                'total': self.total,
+                'libres': len(self._libres),
+                'en_uso': self.total - len(self._libres),
+                **self._contadores,
+                'espera_media_ms': round(self._espera_total / esperas * 1000, 2) if esperas else 0.0,
+            }
+    
+    def _tomar(self, limite):
+        """Conexión libre, o None si el hilo debe crear una (hueco reservado)"""
+        inicio = None
+        with self._cond:
+            try:
+                while True:
+                    if self._cerrado:
+                        raise PoolAgotado(f'Pool {self.alias} cerrado')
+                    if self._libres:
+                        return self._libres.pop()
+                    if self.total < self.maximo:
+                        self._reservadas += 1
+                        return None
+                    
+                    restante = limite - time.monotonic()
+                    if restante <= 0:
+                        self._contadores['agotado'] += 1
+                        raise PoolAgotado(
+                            f'Pool {self.alias}: {self.maximo} conexiones en uso tras {self.timeout}s de espera'
+                        )
+                    if inicio is None:
+                        inicio = time.monotonic()
+                        self._contadores['esperas'] += 1
+                    self._cond.wait(restante)
+            finally:
+                if inicio is not None:
+                    self._espera_total += time.monotonic() - inicio
+    
+    def _crear(self, crear):
+        try:
+            conexion = crear()
+        except Exception:
+            with self._cond:
+                self._reservadas -= 1
+                self._cond.notify()
+            raise
+        
+        ahora = time.monotonic()
+        with self._cond:
+            self._reservadas -= 1
+            self._entradas[id(conexion)] = _Entrada(creada=ahora, devuelta=ahora)
+            self._contadores['creadas'] += 1
+        return conexion
+    
+    def _sana(self, conexion):
+        """Fuera del lock: el SELECT 1 no bloquea a los demás hilos"""
+        entrada = self._entradas[id(conexion)]
+        ahora = time.monotonic()
+        if getattr(conexion, 'closed', False) or ahora - entrada.creada > self.vida_maxima:
+            return False
+        if ahora - entrada.devuelta <= self.comprobar_tras:
+            return True
+        
+        try:
+            with conexion.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            conexion.rollback()
+            return True
+        except Exception as e:
+            logger.warning(f'[POOL_BD] {self.alias}: health check fallido: {str(e)}')
+            with self._cond:
+                self._contadores['fallos_health_check'] += 1
+            return False
+    
+    def _inactivas(self, ahora):
+        """Saca (con el lock tomado) las libres inactivas que sobran del mínimo"""
+        sobrantes = []
+        # La izquierda es la libre más antigua (LIFO por la derecha)
+        while (
+            self._libres and len(self._entradas) > self.minimo
+            and ahora - self._entradas[id(self._libres[0])].devuelta > self.inactividad_maxima
+        ):
+            sobrante = self._libres.popleft()
+            self._entradas.pop(id(sobrante))
+            self._contadores['descartadas'] += 1
+            sobrantes.append(sobrante)
+        return sobrantes
+    
+    def _descartar(self, conexion):
+        with self._cond:
+            if self._entradas.pop(id(conexion), None) is not None:
+                self._contadores['descartadas'] += 1
+            self._cond.notify()
+        self._cerrar(conexion)
+    
+    def _cerrar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🗂️ REGISTRO DE POOLS DEL PROCESO
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_pools = {}
+_lock_pools = threading.Lock()
+
+
+def obtener_pool(clave, alias, base, config):
+    """Pool del proceso para `clave` (alias + destino), creándolo la primera vez"""
+    pool = _pools.get(clave)
+    if pool is None:
+        with _lock_pools:
+            pool = _pools.get(clave)
+            if pool is None:
+                pool = _pools[clave] = PoolConexiones(alias, base, **config)
+    return pool
+
+
+def cerrar_pools(base=None):
+    """Cierra los pools (de una base concreta o todos) y los olvida"""
+    with _lock_pools:
+        cerrados = [clave for clave, pool in _pools.items() if base is None or pool.base == base]
+        pools = [_pools.pop(clave) for clave in cerrados]
+    for pool in pools:
+        pool.cerrar()
+
+
+def metricas():
+    """Métricas de todos los pools del proceso"""
+    return [pool.metricas() for pool in list(_pools.values())]
+
+
+def _olvidar_pools():
+    # Tras un fork (prefork de Celery, gunicorn --preload) las conexiones
+    # heredadas pertenecen al padre: el hijo empieza con pools vacíos
+    global _lock_pools
+    _pools.clear()
+    _lock_pools = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_olvidar_pools)
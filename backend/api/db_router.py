@@ -0,0 +1,176 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🗄️ DB ROUTER - Réplicas de Lectura
+═══════════════════════════════════════════════════════════════════════════════
+
+Las vistas y tareas de solo lectura pesadas (estadísticas, dashboard,
+catálogo, exportaciones) leen de una réplica y dejan la primaria para el
+checkout y demás escrituras.
+
+- Las réplicas son los alias de settings.DB_REPLICAS (DATABASES['replica_N'],
+  ver DB_REPLICAS en settings.py)
+- Solo se lee de réplica dentro de un ámbito marcado: @solo_lectura en la
+  vista o `with lectura_replica():` en una tarea. Fuera de él todo va a la
+  primaria, como antes
+- La réplica se elige una vez por ámbito (toda la petición ve el mismo
+  snapshot):
+  - round_robin: turno entre las réplicas sanas
+  - menor_lag: la de menor retraso medido por medir_lag_replicas()
+  Las réplicas con más de DB_REPLICA_LAG_MAXIMO segundos de retraso (o que
+  no responden) se descartan; sin ninguna sana se lee de la primaria
+- Read-your-writes: tras una escritura el cliente queda fijado a la primaria
+  DB_PRIMARIA_TRAS_ESCRIBIR segundos (LecturaPrimariaMiddleware)
+- Dentro de transaction.atomic() las lecturas van siempre a la primaria
+"""
+
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+import logging
+import math
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+logger = logging.getLogger(__name__)
+
+CLAVE_LAG = 'db:replicas:lag'
+
+# Alias de réplica del ámbito de solo lectura actual (None = primaria)
+_replica = ContextVar('db_replica', default=None)
+# Cliente fijado a la primaria (escribió hace poco)
+primaria_fijada = ContextVar('db_primaria_fijada', default=False)
+
+_turno = count()
+
+
+def replicas_sanas():
+    """Réplicas configuradas con su lag (None si aún no se ha medido)"""
+    lags = cache.get(CLAVE_LAG) or {}
+    maximo = settings.DB_REPLICA_LAG_MAXIMO
+    return [
+        (alias, lags.get(alias))
+        for alias in settings.DB_REPLICAS
+        if lags.get(alias, 0) <= maximo
+    ]
+
+
+def elegir_replica():
+    """
+    Alias de réplica para un ámbito de lectura, o None para la primaria.
+    """
+    if not settings.DB_REPLICAS or primaria_fijada.get():
+        return None
+    
+    sanas = replicas_sanas()
+    if not sanas:
+        return None
+    
+    if settings.DB_REPLICA_SELECCION == 'menor_lag':
+        return min(sanas, key=lambda sana: math.inf if sana[1] is None else sana[1])[0]
+    return sanas[next(_turno) % len(sanas)][0]
+
+
+@contextmanager
+def lectura_replica():
+    """Las lecturas del bloque van a una réplica (si hay alguna sana)"""
+    token = _replica.set(elegir_replica())
+    try:
+        yield _replica.get()
+    finally:
+        _replica.reset(token)
+
+
+def solo_lectura(vista):
+    """
+    Marca una vista (función o método de ViewSet) como de solo lectura.
+    
+    También con vistas async: el ámbito viaja en el contexto hasta el hilo
+    donde sync_to_async ejecuta el ORM.
+    
+    Uso:
+        @api_view(['GET'])
+        @permission_classes([IsAdminOrStaff])
+        @solo_lectura
+        def estadisticas_ventas(request): ...
+    """
+    if asyncio.iscoroutinefunction(vista):
+        @wraps(vista)
+        async def aenvoltura(*args, **kwargs):
+            with lectura_replica():
+                return await vista(*args, **kwargs)
+        return aenvoltura
+    
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        with lectura_replica():
+            return vista(*args, **kwargs)
+    return envoltura
+
+
+class ReplicaRouter:
+    """Router de DATABASE_ROUTERS: lecturas del ámbito a la réplica elegida"""
+    
+    def db_for_read(self, model, **hints):
+        alias = _replica.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return alias
+    
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+    
+    def allow_relation(self, obj1, obj2, **hints):
+        # Réplicas y primaria tienen los mismos datos
+        bases = {DEFAULT_DB_ALIAS, *settings.DB_REPLICAS}
+        if obj1._state.db in bases and obj2._state.db in bases:
+            return True
+        return None
+    
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Las réplicas reciben el esquema por replicación
+        if db in settings.DB_REPLICAS:
+            return False
+        return None
+
+
+# Retraso de la réplica en segundos; 0 si ya reprodujo todo lo recibido
+# (pg_last_xact_replay_timestamp envejece cuando la primaria no escribe)
+_SQL_LAG_POSTGRES = """
+SELECT CASE
+    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+END
+"""
+
+
+def medir_lag_replicas():
+    """
+    Mide el retraso de cada réplica y lo deja en caché para elegir_replica().
+    Una réplica que no responde queda con lag infinito (descartada).
+    
+    Returns:
+        dict: alias → segundos de retraso
+    """
+    lags = {}
+    for alias in settings.DB_REPLICAS:
+        conexion = connections[alias]
+        try:
+            if conexion.vendor == 'postgresql':
+                with conexion.cursor() as cursor:
+                    cursor.execute(_SQL_LAG_POSTGRES)
+                    lags[alias] = float(cursor.fetchone()[0] or 0)
+            else:
+                # Sin replicación nativa (SQLite en local): solo comprobar que responde
+                conexion.ensure_connection()
+                lags[alias] = 0.0
+        except Exception as e:
+            logger.warning(f'[REPLICA_ERROR] {alias}: {str(e)}')
+            lags[alias] = math.inf
+    
+    # Caduca pronto: si la medición se detiene, volver a round robin sin datos
+    cache.set(CLAVE_LAG, lags, 60)
+    return lags
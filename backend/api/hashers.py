@@ -0,0 +1,118 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔒 HASHERS - Política de Coste de Contraseñas Configurable
+═══════════════════════════════════════════════════════════════════════════════
+
+Hashers de Django cuyos parámetros de coste salen de
+settings.PASSWORD_HASH_POLITICA en lugar de estar fijos en la clase.
+
+- El algoritmo preferido es el primero de PASSWORD_HASHERS
+  (settings.PASSWORD_HASH_ALGORITMO: pbkdf2 | argon2 | bcrypt)
+- Rehash transparente: al hacer login, User.check_password detecta con
+  must_update() que el hash guardado usa otro algoritmo o parámetros y lo
+  vuelve a calcular con la política actual (un UPDATE de la columna password)
+- Se conservan los nombres de algoritmo de Django: los hashes existentes
+  siguen verificando sin migración
+
+Métricas: cada encode/verify suma su duración al acumulador de la petición
+en curso (MetricasHashMiddleware → cabecera Server-Timing `hash`).
+
+Calibración: `python manage.py benchmark_hashers --objetivo-ms 250`
+Argon2 y bcrypt requieren `argon2-cffi` / `bcrypt` instalados.
+"""
+
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+)
+
+POLITICA_POR_DEFECTO = {
+    'pbkdf2_iteraciones': PBKDF2PasswordHasher.iterations,
+    'argon2_time_cost': Argon2PasswordHasher.time_cost,
+    'argon2_memory_cost': Argon2PasswordHasher.memory_cost,
+    'argon2_parallelism': Argon2PasswordHasher.parallelism,
+    'bcrypt_rounds': BCryptSHA256PasswordHasher.rounds,
+}
+
+# Acumulador de la petición en curso: {'ms': float, 'operaciones': int}
+metricas_peticion = ContextVar('metricas_hash', default=None)
+_midiendo = ContextVar('midiendo_hash', default=False)
+
+
+def politica(parametro):
+    """Valor de un parámetro de coste (settings o valor por defecto de Django)"""
+    valores = getattr(settings, 'PASSWORD_HASH_POLITICA', {})
+    return valores.get(parametro, POLITICA_POR_DEFECTO[parametro])
+
+
+@contextmanager
+def cronometro():
+    """
+    Suma la duración del bloque a las métricas de la petición.
+    
+    Reentrante: verify() de PBKDF2/bcrypt llama a encode() y solo se cuenta
+    la operación externa.
+    """
+    metricas = metricas_peticion.get()
+    if metricas is None or _midiendo.get():
+        yield
+        return
+    
+    marca = _midiendo.set(True)
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        metricas['ms'] += (time.perf_counter() - inicio) * 1000
+        metricas['operaciones'] += 1
+        _midiendo.reset(marca)
+
+
+class MedicionHashMixin:
+    """Mide encode/verify en el acumulador de la petición"""
+    
+    def encode(self, *args, **kwargs):
+        with cronometro():
+            return super().encode(*args, **kwargs)
+    
+    def verify(self, password, encoded):
+        with cronometro():
+            return super().verify(password, encoded)
+
+
+class PoliticaPBKDF2PasswordHasher(MedicionHashMixin, PBKDF2PasswordHasher):
+    """PBKDF2-SHA256 con iteraciones de la política"""
+    
+    @property
+    def iterations(self):
+        return politica('pbkdf2_iteraciones')
+
+
+class PoliticaArgon2PasswordHasher(MedicionHashMixin, Argon2PasswordHasher):
+    """Argon2id con time/memory cost y paralelismo de la política"""
+    
+    @property
+    def time_cost(self):
+        return politica('argon2_time_cost')
+    
+    @property
+    def memory_cost(self):
+        return politica('argon2_memory_cost')
+    
+    @property
+    def parallelism(self):
+        return politica('argon2_parallelism')
+
+
+class PoliticaBCryptSHA256PasswordHasher(MedicionHashMixin, BCryptSHA256PasswordHasher):
+    """bcrypt(SHA256) con rondas de la política"""
+    
+    @property
+    def rounds(self):
+        return politica('bcrypt_rounds')
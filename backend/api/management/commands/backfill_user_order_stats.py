@@ -0,0 +1,37 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Backfill de Estadísticas de Pedidos por Usuario
+═══════════════════════════════════════════════════════════════════════════════
+
+Recalcula la tabla user_order_stats desde `pedidos` (un GROUP BY y upserts
+por lotes). Idempotente: sirve para la carga inicial y para corregir la
+deriva tras escrituras masivas que no pasan por Pedido.save().
+
+USO:
+    python manage.py backfill_user_order_stats
+    python manage.py backfill_user_order_stats --usuarios 12 15 --lote 2000
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from api.models import UserOrderStats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula user_order_stats (pedidos, valor, primer/último pedido) desde la tabla de pedidos'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--usuarios', type=int, nargs='+', help='Solo estos IDs de usuario')
+        parser.add_argument('--lote', type=int, default=5000, help='Filas por upsert')
+    
+    def handle(self, *args, **options):
+        inicio = time.perf_counter()
+        escritas = UserOrderStats.recalcular(options['usuarios'], lote=options['lote'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] Usuarios actualizados: {escritas}, '
+                f'tiempo: {time.perf_counter() - inicio:.2f}s'
+            )
+        )
@@ -0,0 +1,65 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Analítica de Embudo y Cohortes
+═══════════════════════════════════════════════════════════════════════════════
+
+Mide los informes vectorizados (embudo, cohortes, abandono) sobre eventos
+sintéticos en memoria, sin tocar la BD.
+
+USO:
+    python manage.py benchmark_analitica --eventos 20000000 --usuarios 1000000
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from api.utils import analitica
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de embudo, cohortes y abandono sobre eventos sintéticos'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--eventos', type=int, default=5000000, help='Eventos de carrito')
+        parser.add_argument('--usuarios', type=int, default=200000, help='Usuarios distintos')
+        parser.add_argument('--dias', type=int, default=365, help='Ventana en días')
+    
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        n = options['eventos']
+        usuarios = options['usuarios']
+        fin = int(time.time())
+        inicio = fin - options['dias'] * 86400
+        
+        def tabla(filas, codigos, probabilidades):
+            return {
+                'usuario': rng.integers(1, usuarios + 1, filas, dtype=np.int32),
+                'estado': rng.choice(codigos, filas, p=probabilidades).astype(np.int8),
+                't': rng.integers(inicio, fin, filas, dtype=np.int64),
+            }
+        
+        carrito = tabla(n, [1, 2, 3, 4, 5], [0.5, 0.25, 0.15, 0.05, 0.05])
+        carrito['accion'] = carrito.pop('estado')
+        eventos = {
+            'carrito': carrito,
+            'reservas': tabla(n // 5, [1, 2, 3, 4], [0.05, 0.6, 0.1, 0.25]),
+            'pedidos': tabla(n // 8, [1, 2, 5, 6], [0.1, 0.2, 0.6, 0.1]),
+        }
+        memoria = sum(c.nbytes for t in eventos.values() for c in t.values())
+        
+        tiempos = {}
+        for nombre, informe in (
+            ('embudo', analitica.embudo),
+            ('cohortes', analitica.cohortes),
+            ('abandono', analitica.abandono),
+        ):
+            t0 = time.perf_counter()
+            informe(eventos)
+            tiempos[nombre] = time.perf_counter() - t0
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {n} eventos de carrito, {usuarios} usuarios, '
+            f'columnas: {memoria / 1e6:.1f} MB\n'
+            + '\n'.join(f'   - {nombre}: {segundos:.2f}s' for nombre, segundos in tiempos.items())
+        ))
@@ -0,0 +1,116 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark WSGI frente a ASGI (lecturas públicas)
+═══════════════════════════════════════════════════════════════════════════════
+
+Lanza las mismas peticiones con alta concurrencia contra:
+- WSGI: vistas DRF síncronas con el MIDDLEWARE completo, N hilos (como
+  gunicorn --threads N)
+- ASGI: vistas de api/views_async.py con MIDDLEWARE_LECTURAS, N peticiones
+  concurrentes en un event loop (como un worker de uvicorn)
+y compara peticiones/segundo y latencias p50 / p95 / p99 / máxima por ruta.
+
+Mide los handlers de Django en proceso (sin red ni servidor). Para medir los
+servidores reales desplegados (gunicorn :8000, uvicorn :8001):
+    wrk -t4 -c256 -d30s --latency http://127.0.0.1:8000/api/productos/stock/?ids=1,2,3
+    wrk -t4 -c256 -d30s --latency http://127.0.0.1:8001/api/productos/stock/?ids=1,2,3
+
+USO:
+    python manage.py benchmark_asgi --concurrencia 128 --peticiones 2000
+    python manage.py benchmark_asgi --ruta /api/carrusel/
+"""
+
+import asyncio
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import AsyncClient, Client, override_settings
+from api.models import Producto
+
+
+class Command(BaseCommand):
+    help = 'Compara peticiones/s y latencia de cola de las lecturas públicas en WSGI y ASGI'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrencia', type=int, default=64, help='Hilos (WSGI) / peticiones en vuelo (ASGI)')
+        parser.add_argument('--peticiones', type=int, default=1000, help='Peticiones por ruta y modo')
+        parser.add_argument('--ruta', action='append', help='Ruta a medir (repetible); por defecto las públicas')
+    
+    def handle(self, *args, **options):
+        rutas = options['ruta'] or self._rutas()
+        
+        for ruta in rutas:
+            self.stdout.write(f'\n{ruta}')
+            for nombre, medir in (('WSGI', self._wsgi), ('ASGI', self._asgi)):
+                latencias, segundos = medir(ruta, options['concurrencia'], options['peticiones'])
+                self._informe(nombre, latencias, segundos)
+    
+    def _rutas(self):
+        ids = list(Producto.objects.filter(activo=True).order_by('id').values_list('id', flat=True)[:20])
+        if not ids:
+            raise CommandError('No hay productos activos')
+        return [
+            f'/api/productos/stock/?ids={",".join(map(str, ids))}',
+            f'/api/productos/{ids[0]}/',
+            '/api/carrusel/',
+            '/api/catalogo/productos/',
+        ]
+    
+    @staticmethod
+    def _wsgi(ruta, concurrencia, peticiones):
+        local = threading.local()
+        
+        def peticion(_):
+            if not hasattr(local, 'cliente'):
+                local.cliente = Client()
+            inicio = time.perf_counter()
+            respuesta = local.cliente.get(ruta)
+            if respuesta.status_code != 200:
+                raise CommandError(f'WSGI {ruta}: HTTP {respuesta.status_code}')
+            return time.perf_counter() - inicio
+        
+        def cerrar_conexion(_):
+            connection.close()
+        
+        with ThreadPoolExecutor(concurrencia) as pool:
+            list(pool.map(peticion, range(concurrencia)))  # Calentamiento: conexiones por hilo
+            inicio = time.perf_counter()
+            latencias = list(pool.map(peticion, range(peticiones)))
+            segundos = time.perf_counter() - inicio
+            list(pool.map(cerrar_conexion, range(concurrencia)))
+        return latencias, segundos
+    
+    @staticmethod
+    def _asgi(ruta, concurrencia, peticiones):
+        async def medir():
+            cliente = AsyncClient()
+            semaforo = asyncio.Semaphore(concurrencia)
+            
+            async def peticion():
+                async with semaforo:
+                    inicio = time.perf_counter()
+                    respuesta = await cliente.get(ruta)
+                    if respuesta.status_code != 200:
+                        raise CommandError(f'ASGI {ruta}: HTTP {respuesta.status_code}')
+                    return time.perf_counter() - inicio
+            
+            await asyncio.gather(*(peticion() for _ in range(concurrencia)))  # Calentamiento
+            inicio = time.perf_counter()
+            latencias = await asyncio.gather(*(peticion() for _ in range(peticiones)))
+            return latencias, time.perf_counter() - inicio
+        
+        with override_settings(ROOT_URLCONF='config.urls_async', MIDDLEWARE=settings.MIDDLEWARE_LECTURAS):
+            return asyncio.run(medir())
+    
+    def _informe(self, nombre, latencias, segundos):
+        ms = sorted(latencia * 1000 for latencia in latencias)
+        percentiles = statistics.quantiles(ms, n=100)
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {nombre}: {len(ms) / segundos:8.0f} req/s | p50 {percentiles[49]:7.1f} ms | '
+            f'p95 {percentiles[94]:7.1f} ms | p99 {percentiles[98]:7.1f} ms | máx {ms[-1]:7.1f} ms'
+        ))
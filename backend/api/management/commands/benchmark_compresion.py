@@ -0,0 +1,65 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Compresión de Respuestas
+═══════════════════════════════════════════════════════════════════════════════
+
+Sirve N veces la respuesta real de GET /api/catalogo/productos/ y compara
+el coste por petición y el tamaño enviado:
+- GZipMiddleware de Django (antes): gzip nivel 6 en cada petición
+- CompresionMiddleware (después): variante precomprimida en caché, por
+  cada codificación disponible (br / zstd si están instalados, gzip)
+
+USO:
+    python manage.py benchmark_compresion --peticiones 500
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.http import HttpResponse
+from django.middleware.gzip import GZipMiddleware
+from django.test import RequestFactory, override_settings
+from api.middleware import CompresionMiddleware
+from api.utils import compresion
+from api.views_catalogo import productos_catalogo_completo
+
+
+class Command(BaseCommand):
+    help = 'Compara GZipMiddleware por petición frente a variantes precomprimidas'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones por modo')
+    
+    def handle(self, *args, **options):
+        factory = RequestFactory()
+        with override_settings(JSON_STREAMING_MINIMO=float('inf')):
+            catalogo = productos_catalogo_completo(factory.get('/api/catalogo/productos/'))
+        contenido = catalogo.render().content
+        if catalogo.status_code != 200 or not catalogo.data.get('count'):
+            raise CommandError('No hay productos en el catálogo')
+        
+        self.stdout.write(f'Catálogo: {len(contenido) / 1024:.0f} KB sin comprimir')
+        
+        def vista(request):
+            return HttpResponse(contenido, content_type='application/json')
+        
+        modos = [('GZipMiddleware', GZipMiddleware(vista), 'gzip')]
+        modos += [(f'Precomprimido {codificacion}', CompresionMiddleware(vista), codificacion)
+                  for codificacion in compresion.disponibles()]
+        
+        for nombre, middleware, codificacion in modos:
+            request = factory.get('/api/catalogo/productos/', HTTP_ACCEPT_ENCODING=codificacion)
+            compresion.limpiar_local()
+            primera = time.perf_counter()
+            respuesta = middleware(request)  # Primera petición: comprime y guarda la variante
+            ms_primera = (time.perf_counter() - primera) * 1000
+            
+            inicio = time.perf_counter()
+            for _ in range(options['peticiones']):
+                respuesta = middleware(request)
+            us = (time.perf_counter() - inicio) / options['peticiones'] * 1e6
+            
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {nombre:<24} {us:9.1f} µs/petición | {len(respuesta.content) / 1024:6.1f} KB | '
+                f'primera {ms_primera:.1f} ms'
+            ))
@@ -0,0 +1,81 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark del Pipeline de Correo
+═══════════════════════════════════════════════════════════════════════════════
+
+Envía N emails de verificación contra el sumidero SMTP local y compara:
+- Antes:   render_to_string + una conexión SMTP nueva por mensaje
+- Después: plantilla en caché + conexión persistente (api/utils/correo.py)
+
+`--latencia-conexion` simula el coste de abrir conexión con el proveedor
+real (TCP + STARTTLS + AUTH); con Gmail suele rondar 150-400 ms.
+
+USO:
+    python manage.py benchmark_correo --mensajes 200 --latencia-conexion 0.15
+"""
+
+import time
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.management.base import BaseCommand
+from django.template.loader import render_to_string
+from django.test import override_settings
+from api.utils import correo
+from api.utils.smtp_sumidero import SumideroSMTP
+
+PLANTILLA = 'emails/verificacion_email.html'
+
+
+class Command(BaseCommand):
+    help = 'Compara emails/s: conexión por mensaje vs conexión persistente por lotes'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--mensajes', type=int, default=200)
+        parser.add_argument('--latencia-conexion', type=float, default=0.15)
+    
+    def handle(self, *args, **options):
+        total = options['mensajes']
+        contextos = [
+            {'nombre': f'Usuario {i}', 'codigo': f'{i:06d}', 'username': f'usuario{i}'}
+            for i in range(total)
+        ]
+        
+        with SumideroSMTP(latencia_conexion=options['latencia_conexion']) as sumidero:
+            configuracion = sumidero.configuracion()
+            
+            # Antes: plantilla desde el loader y conexión nueva por mensaje
+            inicio = time.perf_counter()
+            for i, contexto in enumerate(contextos):
+                mensaje = EmailMultiAlternatives(
+                    'Verifica tu cuenta', 'Tu código', settings.DEFAULT_FROM_EMAIL,
+                    [f'usuario{i}@example.com'],
+                    connection=get_connection(fail_silently=False, **configuracion)
+                )
+                mensaje.attach_alternative(render_to_string(PLANTILLA, contexto), 'text/html')
+                mensaje.send()
+            self._reportar('por mensaje', total, time.perf_counter() - inicio, sumidero)
+            
+            # Después: plantilla compilada + conexión persistente en lotes
+            sumidero.mensajes.clear()
+            sumidero.conexiones = 0
+            with override_settings(CORREO_PROVEEDORES={'sumidero': configuracion}):
+                inicio = time.perf_counter()
+                for desde in range(0, total, settings.CORREO_LOTE):
+                    lote = [
+                        correo.construir_desde_plantilla(
+                            'Verifica tu cuenta', 'Tu código', [f'usuario{i}@example.com'],
+                            PLANTILLA, contextos[i]
+                        )
+                        for i in range(desde, min(desde + settings.CORREO_LOTE, total))
+                    ]
+                    correo.enviar(lote, 'sumidero')
+                segundos = time.perf_counter() - inicio
+                correo.descartar('sumidero')
+            self._reportar('persistente', total, segundos, sumidero)
+    
+    def _reportar(self, modo, total, segundos, sumidero):
+        self.stdout.write(self.style.SUCCESS(
+            f'[{modo}] {total / segundos:.0f} emails/s | {segundos:.2f}s | '
+            f'recibidos: {len(sumidero.mensajes)} | conexiones: {sumidero.conexiones}'
+        ))
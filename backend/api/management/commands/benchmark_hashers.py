@@ -0,0 +1,147 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Hashers de Contraseñas
+═══════════════════════════════════════════════════════════════════════════════
+
+Mide en ESTE host el coste de cada hasher disponible y recomienda los
+parámetros más altos que cumplen la latencia objetivo por hash:
+
+- PBKDF2-SHA256 → iteraciones (coste lineal: se calibra y se verifica)
+- Argon2id      → time_cost con la memoria/paralelismo de la política
+- bcrypt        → rondas (cada ronda duplica el coste)
+
+También estima hashes/segundo con todos los núcleos (techo de logins/s en
+una ráfaga, que está limitada por CPU).
+
+USO:
+    python manage.py benchmark_hashers
+    python manage.py benchmark_hashers --objetivo-ms 150 --muestras 5
+
+Argon2 y bcrypt se omiten si `argon2-cffi` / `bcrypt` no están instalados.
+"""
+
+import os
+import time
+import statistics
+
+from django.contrib.auth.hashers import (
+    PBKDF2PasswordHasher,
+    Argon2PasswordHasher,
+    BCryptSHA256PasswordHasher,
+)
+from django.core.management.base import BaseCommand
+from api.hashers import politica
+
+PASSWORD = 'Benchmark-Contraseña-123'
+
+
+class Command(BaseCommand):
+    help = 'Mide los hashers disponibles y recomienda parámetros para una latencia objetivo'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--objetivo-ms', type=float, default=250.0, help='Latencia objetivo por hash (ms)')
+        parser.add_argument('--muestras', type=int, default=3, help='Mediciones por configuración (mediana)')
+    
+    def handle(self, *args, **options):
+        self.objetivo = options['objetivo_ms']
+        self.muestras = options['muestras']
+        self.nucleos = os.cpu_count() or 1
+        
+        self.stdout.write(f'🎯 Objetivo: {self.objetivo:.0f} ms por hash | {self.nucleos} núcleos\n')
+        
+        recomendaciones = {}
+        for nombre, medir in (
+            ('pbkdf2', self._pbkdf2),
+            ('argon2', self._argon2),
+            ('bcrypt', self._bcrypt),
+        ):
+            try:
+                recomendaciones[nombre] = medir()
+            except ValueError as e:
+                # _load_library de Django lanza ValueError si falta la librería
+                self.stdout.write(self.style.WARNING(f'[{nombre}] Omitido: {e}'))
+        
+        if recomendaciones:
+            self.stdout.write('\n📋 Variables de entorno recomendadas:')
+            for variables in recomendaciones.values():
+                for clave, valor in variables.items():
+                    self.stdout.write(f'    {clave}={valor}')
+    
+    def _medir(self, hasher):
+        """Mediana en ms de encode() con la configuración actual del hasher"""
+        salt = hasher.salt()
+        tiempos = []
+        for _ in range(self.muestras):
+            inicio = time.perf_counter()
+            hasher.encode(PASSWORD, salt)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        return statistics.median(tiempos)
+    
+    def _reportar(self, nombre, parametros, ms, actual=False):
+        marca = ' ← política actual' if actual else ''
+        self.stdout.write(
+            f'[{nombre}] {parametros:<32} {ms:8.1f} ms | '
+            f'~{1000 / ms * self.nucleos:7.0f} hashes/s ({self.nucleos} núcleos){marca}'
+        )
+    
+    def _pbkdf2(self):
+        hasher = PBKDF2PasswordHasher()
+        actuales = politica('pbkdf2_iteraciones')
+        
+        hasher.iterations = actuales
+        self._reportar('pbkdf2', f'iteraciones={actuales}', self._medir(hasher), actual=True)
+        
+        # Coste lineal: calibrar con 100k y redondear a decenas de miles
+        hasher.iterations = 100_000
+        ms_por_iteracion = self._medir(hasher) / hasher.iterations
+        iteraciones = max(10_000, int(self.objetivo / ms_por_iteracion) // 10_000 * 10_000)
+        
+        hasher.iterations = iteraciones
+        ms = self._medir(hasher)
+        while ms > self.objetivo and hasher.iterations > 10_000:
+            hasher.iterations -= 10_000
+            ms = self._medir(hasher)
+        iteraciones = hasher.iterations
+        self._reportar('pbkdf2', f'iteraciones={iteraciones}', ms)
+        return {'PASSWORD_PBKDF2_ITERACIONES': iteraciones}
+    
+    def _argon2(self):
+        hasher = Argon2PasswordHasher()
+        hasher._load_library()
+        hasher.memory_cost = politica('argon2_memory_cost')
+        hasher.parallelism = politica('argon2_parallelism')
+        actual = politica('argon2_time_cost')
+        
+        mejor = None
+        for time_cost in range(1, 11):
+            hasher.time_cost = time_cost
+            ms = self._medir(hasher)
+            self._reportar(
+                'argon2', f't={time_cost} m={hasher.memory_cost}KiB p={hasher.parallelism}', ms,
+                actual=time_cost == actual
+            )
+            if ms > self.objetivo:
+                break
+            mejor = time_cost
+        
+        if mejor is None:
+            self.stdout.write(self.style.WARNING(
+                '[argon2] Ni time_cost=1 cumple el objetivo: reduce PASSWORD_ARGON2_MEMORY_COST'
+            ))
+            mejor = 1
+        return {'PASSWORD_ARGON2_TIME_COST': mejor}
+    
+    def _bcrypt(self):
+        hasher = BCryptSHA256PasswordHasher()
+        hasher._load_library()
+        actual = politica('bcrypt_rounds')
+        
+        mejor = None
+        for rounds in range(10, 17):
+            hasher.rounds = rounds
+            ms = self._medir(hasher)
+            self._reportar('bcrypt', f'rounds={rounds}', ms, actual=rounds == actual)
+            if ms > self.objetivo:
+                break
+            mejor = rounds
+        return {'PASSWORD_BCRYPT_ROUNDS': mejor or 10}
@@ -0,0 +1,99 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Renderers JSON
+═══════════════════════════════════════════════════════════════════════════════
+
+Compara JSONRenderer/JSONParser de DRF (stdlib) con los de orjson
+(api/renderers.py) sobre los payloads reales de:
+- GET /api/catalogo/productos/ (productos_catalogo_completo)
+- GET /api/pedidos/ (una página de PedidoViewSet.list)
+y comprueba que ambos producen el mismo JSON.
+
+USO:
+    python manage.py benchmark_json --repeticiones 200
+    python manage.py benchmark_json --minimo 1000   # Repite elementos hasta 1000 por lista
+"""
+
+import json
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+from api import renderers
+from api.serializers_admin import PedidoSerializer
+from api.views_catalogo import productos_catalogo_completo
+from api.views_pedidos import PedidoViewSet, StandardPagination
+
+
+class Command(BaseCommand):
+    help = 'Compara render/parse JSON de DRF (stdlib) frente a orjson en payloads reales'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=100, help='Renders/parses por payload')
+        parser.add_argument('--minimo', type=int, default=0,
+                            help='Repite elementos hasta este tamaño de lista (BD con pocos datos)')
+    
+    def handle(self, *args, **options):
+        if renderers.orjson is None:
+            raise CommandError('orjson no está instalado (pip install orjson)')
+        
+        for nombre, payload in self._payloads(options['minimo']):
+            self._medir(nombre, payload, options['repeticiones'])
+    
+    def _payloads(self, minimo):
+        request = APIRequestFactory().get('/api/catalogo/productos/')
+        with override_settings(JSON_STREAMING_MINIMO=float('inf')):
+            catalogo = productos_catalogo_completo(request).data
+        if not catalogo.get('data'):
+            raise CommandError('No hay productos en el catálogo')
+        catalogo['data'] = self._repetir(catalogo['data'], minimo)
+        catalogo['count'] = len(catalogo['data'])
+        yield 'Catálogo completo', catalogo
+        
+        pedidos = PedidoViewSet.queryset.order_by('-created_at')[:StandardPagination.page_size]
+        resultados = PedidoSerializer(pedidos, many=True).data
+        if resultados:
+            resultados = self._repetir(resultados, minimo)
+            yield 'Pedidos (página)', {'count': len(resultados), 'next': None, 'previous': None, 'results': resultados}
+        else:
+            self.stdout.write(self.style.WARNING('[PEDIDOS] No hay pedidos, se omite'))
+    
+    @staticmethod
+    def _repetir(elementos, minimo):
+        elementos = list(elementos)
+        while len(elementos) < minimo:
+            elementos.extend(elementos[:minimo - len(elementos)])
+        return elementos
+    
+    def _medir(self, nombre, payload, repeticiones):
+        stdlib, rapido = JSONRenderer(), renderers.ORJSONRenderer()
+        
+        us_render_stdlib, salida_stdlib = self._cronometrar(lambda: stdlib.render(payload), repeticiones)
+        us_render_orjson, salida_orjson = self._cronometrar(lambda: rapido.render(payload), repeticiones)
+        us_parse_stdlib, _ = self._cronometrar(lambda: JSONParser().parse(BytesIO(salida_stdlib)), repeticiones)
+        us_parse_orjson, _ = self._cronometrar(
+            lambda: renderers.ORJSONParser().parse(BytesIO(salida_stdlib)), repeticiones
+        )
+        
+        if json.loads(salida_stdlib) != json.loads(salida_orjson):
+            raise CommandError(f'{nombre}: el JSON de orjson difiere del de DRF')
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {nombre} ({len(salida_stdlib) / 1024:.0f} KB, mismo JSON): '
+            f'render {us_render_stdlib:,.0f} → {us_render_orjson:,.0f} µs '
+            f'(x{us_render_stdlib / us_render_orjson:.1f}) | '
+            f'parse {us_parse_stdlib:,.0f} → {us_parse_orjson:,.0f} µs '
+            f'(x{us_parse_stdlib / us_parse_orjson:.1f})'
+        ))
+    
+    @staticmethod
+    def _cronometrar(funcion, repeticiones):
+        """µs por llamada y último resultado"""
+        inicio = time.perf_counter()
+        for _ in range(repeticiones):
+            resultado = funcion()
+        return (time.perf_counter() - inicio) / repeticiones * 1e6, resultado
@@ -0,0 +1,101 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Login Concurrente
+═══════════════════════════════════════════════════════════════════════════════
+
+Lanza logins concurrentes contra POST /api/auth/login/ (mezcla de éxitos y
+fallos con usuarios inexistentes, cada uno desde una IP distinta del rango
+de benchmarking 198.18.0.0/15 para no activar el bloqueo) y reporta
+p50/p95/p99 de latencia con el registro de intentos en línea (antes) y en
+la cola de Celery (después).
+
+USO:
+    python manage.py benchmark_login --logins 400 --hilos 16 --fallos 30
+
+⚠️ El modo "cola" necesita el broker de Celery accesible (no un worker).
+⚠️ Crea un usuario temporal y lo elimina al terminar (con sus tokens e intentos).
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from api.models import LoginAttempt, RefreshToken
+from api.views import login
+
+
+class Command(BaseCommand):
+    help = 'Mide p50/p95/p99 del login concurrente: registro de intentos en línea vs en cola'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=400, help='Logins por modo')
+        parser.add_argument('--hilos', type=int, default=16, help='Peticiones concurrentes')
+        parser.add_argument('--fallos', type=int, default=30, help='Porcentaje de contraseñas incorrectas')
+    
+    def handle(self, *args, **options):
+        password = User.objects.make_random_password()
+        usuario = User.objects.create_user(
+            username='benchmark_login',
+            email='benchmark_login@example.com',
+            password=password
+        )
+        try:
+            for asincrono in (False, True):
+                with override_settings(LOGIN_INTENTOS_ASINCRONOS=asincrono):
+                    self._medir(usuario, password, options, 'cola' if asincrono else 'en línea')
+        finally:
+            LoginAttempt.objects.filter(ip_address__startswith='198.18.').delete()
+            RefreshToken.revocar_todos_usuario(usuario)
+            usuario.delete()
+    
+    def _medir(self, usuario, password, options, modo):
+        factory = RequestFactory()
+        cada_fallo = max(1, round(100 / options['fallos'])) if options['fallos'] else 0
+        
+        def un_login(i):
+            fallo = cada_fallo and i % cada_fallo == 0
+            if fallo:
+                # Usuario inexistente distinto en cada fallo: no acumula bloqueo
+                credenciales = {'username': f'noexiste_{i}@example.com', 'password': 'incorrecta'}
+            else:
+                credenciales = {'username': usuario.email if i % 2 else usuario.username, 'password': password}
+            request = factory.post(
+                '/api/auth/login/',
+                credenciales,
+                content_type='application/json',
+                REMOTE_ADDR=f'198.18.{(i >> 8) & 255}.{i & 255}'
+            )
+            inicio = time.perf_counter()
+            response = login(request)
+            latencia = time.perf_counter() - inicio
+            return latencia, response.status_code == (401 if fallo else 200)
+        
+        def en_hilo(i):
+            try:
+                return un_login(i)
+            finally:
+                connection.close()
+        
+        # Calentamiento (conexiones, caches de Django)
+        with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+            list(pool.map(en_hilo, range(1, options['hilos'] + 1)))
+        
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['hilos']) as pool:
+            resultados = list(pool.map(en_hilo, range(options['hilos'] + 1, options['hilos'] + 1 + options['logins'])))
+        segundos = time.perf_counter() - inicio
+        
+        latencias = np.array([r[0] for r in resultados]) * 1000
+        incorrectos = sum(1 for r in resultados if not r[1])
+        p50, p95, p99 = np.percentile(latencias, [50, 95, 99])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'[{modo}] {options["logins"] / segundos:.0f} logins/s | '
+            f'p50 {p50:.1f} ms | p95 {p95:.1f} ms | p99 {p99:.1f} ms'
+        ))
+        if incorrectos:
+            self.stdout.write(self.style.WARNING(f'[{modo}] {incorrectos} respuestas inesperadas'))
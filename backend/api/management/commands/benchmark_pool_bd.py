@@ -0,0 +1,118 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark del pool de conexiones
+═══════════════════════════════════════════════════════════════════════════════
+
+Simula peticiones concurrentes (un hilo por worker) que hacen las consultas
+calientes (token en blacklist + producto por id) y cierran la conexión al
+terminar, contra la base de DATABASES['default']:
+- Conexión por petición: backend PostgreSQL de Django con CONN_MAX_AGE=0
+- Pool: api.db_pool (las conexiones se reutilizan entre peticiones e hilos)
+- Pool + preparadas: además PREPARE/EXECUTE (api/utils/sentencias.py)
+
+Requiere PostgreSQL y al menos un producto.
+
+USO:
+    python manage.py benchmark_pool_bd --hilos 16 --peticiones 200
+"""
+
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+from django.test import override_settings
+from api import db_pool
+from api.models import Producto
+from api.utils.sentencias import PRODUCTO_POR_ID, TOKEN_EN_BLACKLIST
+
+
+class Command(BaseCommand):
+    help = 'Compara conexión por petición frente al pool (y sentencias preparadas) con carga en hilos'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--peticiones', type=int, default=200, help='Peticiones por hilo')
+    
+    def handle(self, *args, **options):
+        principal = connections[DEFAULT_DB_ALIAS]
+        if principal.vendor != 'postgresql':
+            raise CommandError('El benchmark requiere PostgreSQL en DATABASES["default"]')
+        
+        ids = list(Producto.objects.values_list('id', flat=True)[:100])
+        if not ids:
+            raise CommandError('No hay productos en la base de datos')
+        
+        hilos, peticiones = options['hilos'], options['peticiones']
+        base = {**principal.settings_dict, 'CONN_MAX_AGE': 0, 'CONN_HEALTH_CHECKS': False}
+        opciones = {clave: valor for clave, valor in base['OPTIONS'].items() if clave != 'pool'}
+        con_pool = {
+            **base,
+            'ENGINE': 'api.db_pool',
+            'OPTIONS': {**opciones, 'pool': {'minimo': 0, 'maximo': hilos, 'timeout': 30}},
+        }
+        escenarios = [
+            ('Conexión por petición', {**base, 'ENGINE': 'django.db.backends.postgresql', 'OPTIONS': opciones}, False),
+            ('Pool', con_pool, False),
+            ('Pool + preparadas', con_pool, True),
+        ]
+        
+        self.stdout.write(f'{hilos} hilos × {peticiones} peticiones')
+        for i, (nombre, settings_dict, preparadas) in enumerate(escenarios):
+            alias = f'benchmark_pool_{i}'
+            with override_settings(DB_SENTENCIAS_PREPARADAS=preparadas):
+                segundos, latencias = self._medir(settings_dict, alias, ids, hilos, peticiones)
+            
+            pool = next((m for m in db_pool.metricas() if m['alias'] == alias), None)
+            abiertas = pool['creadas'] if pool else hilos * peticiones
+            cuantiles = statistics.quantiles(latencias, n=20)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {nombre:<22} {hilos * peticiones / segundos:8.0f} peticiones/s | '
+                f'p50 {cuantiles[9] * 1000:6.2f} ms | p95 {cuantiles[18] * 1000:6.2f} ms | '
+                f'{abiertas} conexiones abiertas'
+            ))
+        
+        db_pool.cerrar_pools(base['NAME'])
+    
+    def _medir(self, settings_dict, alias, ids, hilos, peticiones):
+        """Segundos totales y latencias por petición"""
+        backend = load_backend(settings_dict['ENGINE'])
+        barrera = threading.Barrier(hilos + 1)
+        lock = threading.Lock()
+        latencias = []
+        errores = []
+        
+        def trabajador(n):
+            # Las conexiones de Django son por hilo: cada hilo registra la suya
+            conexion = backend.DatabaseWrapper(settings_dict, alias)
+            connections[alias] = conexion
+            propias = []
+            barrera.wait()
+            try:
+                for i in range(peticiones):
+                    inicio = time.perf_counter()
+                    TOKEN_EN_BLACKLIST.filas('benchmark', using=alias)
+                    PRODUCTO_POR_ID.filas(ids[(n * peticiones + i) % len(ids)], using=alias)
+                    conexion.close()  # Fin de la petición (CONN_MAX_AGE=0)
+                    propias.append(time.perf_counter() - inicio)
+            except Exception as e:
+                errores.append(e)
+            finally:
+                del connections[alias]
+            with lock:
+                latencias.extend(propias)
+        
+        trabajadores = [threading.Thread(target=trabajador, args=(n,)) for n in range(hilos)]
+        for hilo in trabajadores:
+            hilo.start()
+        barrera.wait()
+        inicio = time.perf_counter()
+        for hilo in trabajadores:
+            hilo.join()
+        segundos = time.perf_counter() - inicio
+        
+        if errores:
+            raise CommandError(f'{alias}: {errores[0]}')
+        return segundos, latencias
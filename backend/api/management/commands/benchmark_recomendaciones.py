@@ -0,0 +1,50 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark del Índice de Co-compra
+═══════════════════════════════════════════════════════════════════════════════
+
+Mide la matemática del índice (Xᵀ·X + top-K coseno) sobre líneas de pedido
+sintéticas, sin tocar la BD.
+
+USO:
+    python manage.py benchmark_recomendaciones --lineas 500000 --productos 5000
+"""
+
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from api.utils.recomendaciones import matriz_coocurrencia, top_k_similares
+
+
+class Command(BaseCommand):
+    help = 'Benchmark de construcción de la matriz de co-compra y top-K'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--lineas', type=int, default=300000, help='Líneas de pedido')
+        parser.add_argument('--productos', type=int, default=5000, help='Productos distintos')
+        parser.add_argument('--lineas-por-pedido', type=int, default=3, help='Promedio de líneas por pedido')
+    
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(42)
+        lineas = options['lineas']
+        productos = options['productos']
+        
+        pedidos = np.sort(rng.integers(0, max(1, lineas // options['lineas_por_pedido']), lineas))
+        # Popularidad tipo Zipf: pocos productos concentran la mayoría de ventas
+        items = np.minimum(rng.zipf(1.3, lineas), productos) - 1
+        
+        inicio = time.perf_counter()
+        C = matriz_coocurrencia(pedidos, items, productos)
+        t_matriz = time.perf_counter() - inicio
+        
+        inicio = time.perf_counter()
+        similares = top_k_similares(C, np.flatnonzero(C.diagonal()))
+        t_topk = time.perf_counter() - inicio
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'[OK] {lineas} líneas, {productos} productos, nnz={C.nnz}\n'
+            f'   - Matriz Xᵀ·X: {t_matriz:.2f}s\n'
+            f'   - Top-K ({len(similares)} filas): {t_topk:.2f}s\n'
+            f'   - Memoria matriz: {(C.data.nbytes + C.indices.nbytes + C.indptr.nbytes) / 1e6:.1f} MB'
+        ))
@@ -0,0 +1,77 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Refresh de Tokens
+═══════════════════════════════════════════════════════════════════════════════
+
+Mide refresh/segundo y consultas SQL por refresh del endpoint
+POST /api/auth/refresh/ con las familias en BD (antes) y en Redis (después).
+
+USO:
+    python manage.py benchmark_refresh --refrescos 2000
+
+⚠️ Crea un usuario temporal y lo elimina al terminar (con sus tokens).
+"""
+
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
+from api.models import RefreshToken
+from api.utils import sesiones
+from api.views import refresh_token
+
+
+class Command(BaseCommand):
+    help = 'Compara refresh/s y escrituras en BD: familias en BD vs Redis'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--refrescos', type=int, default=1000, help='Refrescos por modo')
+    
+    def handle(self, *args, **options):
+        usuario = User.objects.create_user(
+            username='benchmark_refresh',
+            email='benchmark_refresh@example.com',
+            password=User.objects.make_random_password()
+        )
+        try:
+            for en_redis in (False, True):
+                with override_settings(REFRESH_TOKENS_EN_REDIS=en_redis):
+                    if en_redis and not sesiones.activo():
+                        self.stdout.write(self.style.WARNING('[REDIS] No disponible, se omite'))
+                        continue
+                    self._medir(usuario, options['refrescos'], 'Redis' if en_redis else 'BD')
+        finally:
+            RefreshToken.revocar_todos_usuario(usuario)
+            usuario.delete()
+    
+    def _medir(self, usuario, refrescos, modo):
+        factory = RequestFactory()
+        token, _ = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        filas_antes = RefreshToken.objects.filter(usuario=usuario).count()
+        
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            for _ in range(refrescos):
+                request = factory.post('/api/auth/refresh/')
+                request.COOKIES['refreshToken'] = token
+                response = refresh_token(request)
+                if response.status_code != 200:
+                    self.stdout.write(self.style.ERROR(f'[{modo}] Refresh falló: {response.data}'))
+                    return
+                token = response.cookies['refreshToken'].value
+            segundos = time.perf_counter() - inicio
+        
+        escrituras = sum(
+            1 for q in consultas.captured_queries
+            if q['sql'].lstrip().upper().startswith(('INSERT', 'UPDATE', 'DELETE'))
+        )
+        filas_nuevas = RefreshToken.objects.filter(usuario=usuario).count() - filas_antes
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'[{modo}] {refrescos / segundos:.0f} refresh/s | '
+            f'SQL por refresh: {len(consultas.captured_queries) / refrescos:.1f} '
+            f'(escrituras: {escrituras / refrescos:.1f}) | filas nuevas: {filas_nuevas}'
+        ))
@@ -0,0 +1,91 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Reservas Concurrentes (Shards)
+═══════════════════════════════════════════════════════════════════════════════
+
+Simula una flash sale: N hilos reservan el mismo producto a la vez y se mide
+el throughput (reservas/segundo) en modo fila única vs modo shards.
+
+USO:
+    python manage.py benchmark_stock_shards --hilos 32 --reservas 50 --shards 8
+
+⚠️ Crea un producto temporal y lo elimina al terminar. Ejecutar contra
+PostgreSQL: en SQLite las escrituras se serializan igualmente y no hay
+diferencia medible.
+"""
+
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from api.models import Producto, StockShard
+
+
+class Command(BaseCommand):
+    help = 'Compara throughput de reservas concurrentes: fila única vs shards'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=16, help='Hilos concurrentes')
+        parser.add_argument('--reservas', type=int, default=50, help='Reservas por hilo')
+        parser.add_argument('--shards', type=int, default=8, help='Shards para el modo repartido')
+    
+    def handle(self, *args, **options):
+        hilos = options['hilos']
+        reservas = options['reservas']
+        total = hilos * reservas
+        
+        admin = User.objects.filter(is_superuser=True).first() or User.objects.first()
+        if admin is None:
+            self.stdout.write(self.style.ERROR('[ERROR] Se necesita al menos un usuario'))
+            return
+        
+        for num_shards in (0, options['shards']):
+            producto = Producto.objects.create(
+                nombre=f'BENCHMARK SHARDS {num_shards}',
+                descripcion='Producto temporal de benchmark',
+                precio=1,
+                stock_total=total,
+                activo=False,
+                creado_por=admin,
+            )
+            try:
+                if num_shards:
+                    StockShard.configurar(producto, num_shards)
+                
+                segundos, fallidas = self._ejecutar(producto.pk, hilos, reservas)
+                producto.refresh_from_db()
+                
+                modo = f'{num_shards} shards' if num_shards else 'fila única'
+                self.stdout.write(self.style.SUCCESS(
+                    f'[{modo}] {total - fallidas} reservas en {segundos:.2f}s '
+                    f'({(total - fallidas) / segundos:.0f} reservas/s), '
+                    f'fallidas={fallidas}, reservado={producto.stock_reservado_real}'
+                ))
+            finally:
+                producto.delete()
+    
+    def _ejecutar(self, producto_id, hilos, reservas):
+        fallidas = []
+        barrera = threading.Barrier(hilos)
+        
+        def trabajador():
+            try:
+                producto = Producto.objects.get(pk=producto_id)
+                barrera.wait()
+                fallos = 0
+                for _ in range(reservas):
+                    if not producto.reservar_stock(1):
+                        fallos += 1
+                fallidas.append(fallos)
+            finally:
+                connection.close()
+        
+        threads = [threading.Thread(target=trabajador) for _ in range(hilos)]
+        inicio = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - inicio, sum(fallidas)
@@ -0,0 +1,74 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Benchmark de Throttles
+═══════════════════════════════════════════════════════════════════════════════
+
+Mide el coste por petición del throttle con la ventana ya llena hasta un
+nivel dado: historial de SimpleRateThrottle en la caché configurada (antes)
+frente a GCRA en Redis (después), y el tamaño del estado por clave.
+
+USO:
+    python manage.py benchmark_throttle --niveles 100 1000 5000 --peticiones 2000
+"""
+
+import pickle
+import time
+from types import SimpleNamespace
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.throttling import UserRateThrottle
+from api.throttles import GCRARedisMixin, PREFIJO_GCRA
+from api.utils.redis_client import get_redis
+
+
+class Command(BaseCommand):
+    help = 'Compara el coste por petición: historial de DRF vs GCRA en Redis'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--niveles', type=int, nargs='+', default=[100, 1000, 5000],
+                            help='Peticiones ya registradas en la ventana')
+        parser.add_argument('--peticiones', type=int, default=2000, help='Peticiones medidas por nivel')
+    
+    def handle(self, *args, **options):
+        r = get_redis()
+        if r is None:
+            self.stdout.write(self.style.WARNING('[REDIS] No disponible: solo se mide el historial de DRF'))
+        
+        request = RequestFactory().get('/')
+        request.user = SimpleNamespace(is_authenticated=True, pk=999999999)
+        
+        for nivel in options['niveles']:
+            # Tasa holgada: la ventana queda llena a `nivel` sin llegar a throttlear
+            limite = (nivel + options['peticiones']) * 2
+            atributos = {'scope': 'benchmark', 'rate': f'{limite}/hour'}
+            
+            drf = type('HistorialDRF', (UserRateThrottle,), atributos)
+            clave = drf().get_cache_key(request, None)
+            ahora = time.time()
+            cache.set(clave, [ahora - i * 0.01 for i in range(nivel)], 3600)
+            bytes_drf = len(pickle.dumps(cache.get(clave)))
+            us_drf = self._medir(drf, request, options['peticiones'])
+            cache.delete(clave)
+            linea = f'[{nivel:>6}] DRF: {us_drf:8.1f} µs/petición, estado {bytes_drf / 1024:.1f} KB'
+            
+            if r is not None:
+                gcra = type('GCRA', (GCRARedisMixin, UserRateThrottle), atributos)
+                clave_gcra = f'{PREFIJO_GCRA}{clave}'
+                intervalo = 3600 * 1000 / limite
+                r.set(clave_gcra, f'{ahora * 1000 + nivel * intervalo:.3f}', px=3600 * 1000)
+                bytes_gcra = len(r.get(clave_gcra))
+                us_gcra = self._medir(gcra, request, options['peticiones'])
+                r.delete(clave_gcra)
+                linea += f' | GCRA: {us_gcra:8.1f} µs/petición, estado {bytes_gcra} B'
+            
+            self.stdout.write(self.style.SUCCESS(f'[OK] {linea}'))
+    
+    def _medir(self, clase, request, peticiones):
+        inicio = time.perf_counter()
+        for _ in range(peticiones):
+            if not clase().allow_request(request, None):
+                self.stdout.write(self.style.ERROR('Throttle inesperado durante la medición'))
+                break
+        return (time.perf_counter() - inicio) / peticiones * 1e6
@@ -0,0 +1,51 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Configurar Shards de Stock
+═══════════════════════════════════════════════════════════════════════════════
+
+Activa, redimensiona o desactiva el modo shards para un producto "caliente"
+(flash sales). En modo shards cada reserva actualiza una fila de StockShard
+elegida al azar en lugar de la fila del producto.
+
+USO:
+    python manage.py configurar_shards_stock 42 --shards 8   # Activar con 8 shards
+    python manage.py configurar_shards_stock 42 --shards 0   # Volver al modo normal
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from api.models import Producto, StockShard
+import logging
+
+logger = logging.getLogger('security')
+
+
+class Command(BaseCommand):
+    help = 'Activa/desactiva los contadores de stock repartidos (shards) de un producto'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('producto_id', type=int, help='ID del producto')
+        parser.add_argument(
+            '--shards',
+            type=int,
+            required=True,
+            help='Número de shards (0 = desactivar)',
+        )
+    
+    def handle(self, *args, **options):
+        num_shards = options['shards']
+        if num_shards < 0 or num_shards > 64:
+            raise CommandError('--shards debe estar entre 0 y 64')
+        
+        try:
+            producto = Producto.objects.get(pk=options['producto_id'])
+        except Producto.DoesNotExist:
+            raise CommandError(f'Producto {options["producto_id"]} no existe')
+        
+        StockShard.configurar(producto, num_shards)
+        
+        mensaje = (
+            f'[OK] Producto {producto.id} ({producto.nombre}): num_shards={num_shards}, '
+            f'reservado={producto.stock_reservado}, disponible={producto.stock}'
+        )
+        self.stdout.write(self.style.SUCCESS(mensaje))
+        logger.info(f'[STOCK_SHARDS] {mensaje}')
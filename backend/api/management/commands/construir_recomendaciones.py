@@ -0,0 +1,37 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Construir Índice de Recomendaciones
+═══════════════════════════════════════════════════════════════════════════════
+
+Incorpora los pedidos nuevos al índice de co-compra y recalcula el top-K de
+los productos afectados. Con --completo reconstruye la matriz desde cero.
+
+USO:
+    python manage.py construir_recomendaciones
+    python manage.py construir_recomendaciones --completo
+"""
+
+from django.core.management.base import BaseCommand
+from api.utils.recomendaciones import actualizar_indice
+
+
+class Command(BaseCommand):
+    help = 'Actualiza el índice de co-compra y las recomendaciones por producto'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--completo',
+            action='store_true',
+            help='Reconstruir desde cero (ignora la marca de agua)',
+        )
+    
+    def handle(self, *args, **options):
+        resultado = actualizar_indice(completo=options['completo'])
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'[OK] Líneas procesadas: {resultado["lineas"]}, '
+                f'productos actualizados: {resultado["productos_actualizados"]}, '
+                f'tiempo: {resultado["segundos"]}s'
+            )
+        )
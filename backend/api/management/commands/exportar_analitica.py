@@ -0,0 +1,55 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Exportar Eventos de Analítica
+═══════════════════════════════════════════════════════════════════════════════
+
+Extrae los eventos de carrito, reservas y pedidos de una ventana como
+columnas y los guarda en Parquet (si pyarrow está instalado) o .npz.
+Con --calcular además recalcula y cachea los informes del admin.
+Lee de una réplica si hay alguna configurada (api/db_router.py).
+
+USO:
+    python manage.py exportar_analitica --dias 90 --directorio /tmp/analitica
+    python manage.py exportar_analitica --dias 30 --calcular
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from api.db_router import lectura_replica
+from api.utils import analitica
+
+
+class Command(BaseCommand):
+    help = 'Exporta eventos de carrito/reservas/pedidos a columnas (Parquet o npz)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=30, help='Ventana en días')
+        parser.add_argument('--directorio', help='Directorio de salida')
+        parser.add_argument('--calcular', action='store_true', help='Recalcular informes en caché')
+    
+    def handle(self, *args, **options):
+        with lectura_replica() as alias:
+            if alias:
+                self.stdout.write(f'[REPLICA] Leyendo de {alias}')
+            self._exportar(options)
+    
+    def _exportar(self, options):
+        dias = options['dias']
+        
+        if options['directorio']:
+            inicio = time.perf_counter()
+            eventos = analitica.extraer_eventos(dias)
+            rutas = analitica.exportar(eventos, options['directorio'])
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] {sum(len(c["t"]) for c in eventos.values())} eventos exportados '
+                f'en {time.perf_counter() - inicio:.2f}s'
+            ))
+            for ruta in rutas:
+                self.stdout.write(f'   - {ruta}')
+        
+        if options['calcular']:
+            resultado = analitica.calcular(dias)
+            self.stdout.write(self.style.SUCCESS(
+                f'[OK] Informes de {dias} días calculados en {resultado["segundos"]}s'
+            ))
@@ -0,0 +1,53 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Servidor SMTP Sumidero
+═══════════════════════════════════════════════════════════════════════════════
+
+Levanta el sumidero SMTP local (api/utils/smtp_sumidero.py) en primer plano.
+Acepta todos los emails, no los entrega y muestra un resumen periódico.
+
+USO:
+    python manage.py smtp_sumidero --puerto 1025
+    python manage.py smtp_sumidero --puerto 1025 --latencia-conexion 0.2
+
+Para apuntar la app al sumidero (settings o variables de entorno):
+    CORREO_PROVEEDORES = {'local': {'host': '127.0.0.1', 'port': 1025, 'use_tls': False}}
+    CORREO_PROVEEDOR = 'local'
+"""
+
+import time
+
+from django.core.management.base import BaseCommand
+from api.utils.smtp_sumidero import SumideroSMTP
+
+
+class Command(BaseCommand):
+    help = 'Servidor SMTP local que acepta y descarta emails (tests de integración y benchmarks)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--puerto', type=int, default=1025)
+        parser.add_argument('--latencia-conexion', type=float, default=0.0,
+                            help='Segundos antes del saludo (simula TCP+TLS+AUTH del proveedor)')
+    
+    def handle(self, *args, **options):
+        sumidero = SumideroSMTP(
+            host=options['host'],
+            puerto=options['puerto'],
+            latencia_conexion=options['latencia_conexion']
+        ).iniciar()
+        self.stdout.write(self.style.SUCCESS(
+            f'🕳️  Sumidero SMTP escuchando en {sumidero.host}:{sumidero.puerto} (Ctrl+C para salir)'
+        ))
+        
+        vistos = 0
+        try:
+            while True:
+                time.sleep(5)
+                if len(sumidero.mensajes) != vistos:
+                    vistos = len(sumidero.mensajes)
+                    self.stdout.write(f'📨 {vistos} mensajes | {sumidero.conexiones} conexiones')
+        except KeyboardInterrupt:
+            pass
+        finally:
+            sumidero.detener()
@@ -0,0 +1,64 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+MANAGEMENT COMMAND - Workers de Celery por cola
+═══════════════════════════════════════════════════════════════════════════════
+
+Genera (o lanza) un worker por cola con el pool y la concurrencia de
+settings.WORKERS_CELERY, ajustados a la plataforma:
+- inventory / maintenance: threads (I/O contra BD y Redis)
+- email: threads (o gevent con CELERY_POOL_EMAIL=gevent)
+- analytics: prefork (CPU); 'solo' en Windows
+
+USO:
+    python manage.py workers_celery                  # Imprime los comandos
+    python manage.py workers_celery --cola email     # Solo una cola
+    python manage.py workers_celery --ejecutar       # Lanza los workers y espera
+"""
+
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Comandos (o procesos) de un worker de Celery por cola'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--cola', action='append', choices=sorted(settings.WORKERS_CELERY),
+                            help='Cola a incluir (repetible; por defecto todas)')
+        parser.add_argument('--ejecutar', action='store_true', help='Lanza los workers en vez de imprimirlos')
+        parser.add_argument('--loglevel', default='info')
+    
+    def handle(self, *args, **options):
+        colas = options['cola'] or list(settings.WORKERS_CELERY)
+        comandos = [self._comando(cola, options['loglevel']) for cola in colas]
+        
+        if not options['ejecutar']:
+            for comando in comandos:
+                self.stdout.write(' '.join(comando))
+            return
+        
+        procesos = [subprocess.Popen(comando) for comando in comandos]
+        self.stdout.write(self.style.SUCCESS(f'[OK] {len(procesos)} workers: {", ".join(colas)}'))
+        try:
+            codigos = [proceso.wait() for proceso in procesos]
+        except KeyboardInterrupt:
+            for proceso in procesos:
+                proceso.terminate()
+            codigos = [proceso.wait() for proceso in procesos]
+        
+        if any(codigos):
+            raise CommandError(f'Workers terminados con error: {codigos}')
+    
+    def _comando(self, cola, loglevel):
+        worker = settings.WORKERS_CELERY[cola]
+        return [
+            sys.executable, '-m', 'celery', '-A', 'config', 'worker',
+            '-Q', cola,
+            '-P', worker['pool'],
+            '-c', str(worker['concurrencia']),
+            '-n', f'{cola}@%h',
+            '-l', loglevel,
+        ]
@@ -5,18 +5,41 @@
 
 Middleware para autenticar usuarios usando JWT Access Tokens.
 Valida que los tokens no estén en la blacklist (logout).
+Mide el tiempo de hashing de contraseñas por petición (Server-Timing).
+Instrumenta SQL, caché y serialización de cada petición (N+1, lentas).
+Fija a la primaria las lecturas de quien acaba de escribir (réplicas).
+Comprime las respuestas con variantes precomprimidas en caché.
+
+CompresionMiddleware y LecturaPrimariaMiddleware son también async (sin
+saltos de hilo bajo ASGI); SeguridadAsyncMiddleware y ComunAsyncMiddleware
+son los de Django sin sync_to_async (ver MIDDLEWARE_LECTURAS en settings.py).
 
 El frontend envía: Authorization: Bearer <jwt_token>
 Este middleware verifica el JWT y autentica al usuario automáticamente.
 """
 
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
 from django.http import JsonResponse
+from django.middleware.common import CommonMiddleware
+from django.middleware.security import SecurityMiddleware
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_sequence
 from .utils import obtener_usuario_desde_token, extraer_token_desde_header
 from .models import TokenBlacklist
+from .hashers import metricas_peticion
+from .db_router import primaria_fijada
+from .utils import compresion, instrumentacion
+import json
 import logging
+import random
+import time
 
 logger = logging.getLogger('security')
+logger_auth = logging.getLogger('auth')
+logger_instrumentacion = logging.getLogger('instrumentacion')
 
 
 class JWTAuthenticationMiddleware:
@@ -97,3 +120,280 @@ class TokenBlacklistMiddleware:
         else:
             ip = request.META.get('REMOTE_ADDR')
         return ip
+
+
+class MetricasHashMiddleware:
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    ⏱️ MIDDLEWARE - Tiempo de Hashing de Contraseñas por Petición
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Abre un acumulador por petición que los hashers de api/hashers.py
+    incrementan en cada encode/verify. Si la petición calculó algún hash:
+    - Añade `Server-Timing: hash;dur=<ms>` a la respuesta
+    - Registra la duración en el log de auth (login, registro, reset)
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        metricas = {'ms': 0.0, 'operaciones': 0}
+        token = metricas_peticion.set(metricas)
+        try:
+            response = self.get_response(request)
+        finally:
+            metricas_peticion.reset(token)
+        
+        if metricas['operaciones']:
+            valor = f'hash;dur={metricas["ms"]:.1f}'
+            if response.has_header('Server-Timing'):
+                valor = f'{response["Server-Timing"]}, {valor}'
+            response['Server-Timing'] = valor
+            logger_auth.info(
+                f'[HASH_TIEMPO] {request.method} {request.path} | '
+                f'{metricas["operaciones"]} hash(es) | {metricas["ms"]:.1f} ms'
+            )
+        return response
+
+
+class InstrumentacionMiddleware:
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    🔬 MIDDLEWARE - SQL, Caché y Serialización por Petición
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Mide cada petición con api/utils/instrumentacion.py:
+    - `Server-Timing: db;dur=..;desc="N consultas", cache;desc=.., ser;dur=..,
+      total;dur=..` (si INSTRUMENTACION_SERVER_TIMING)
+    - Una línea JSON en el log 'instrumentacion' (WARNING si hay N+1: alguna
+      huella repetida INSTRUMENTACION_N_MAS_1 veces o más)
+    - Las lentas (>= INSTRUMENTACION_LENTA_MS) y las N+1 se muestrean
+      (INSTRUMENTACION_MUESTREO) en MuestrasLentas
+    
+    Las respuestas en streaming se serializan al enviarse: su tiempo no entra.
+    """
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+    
+    def __call__(self, request):
+        if not settings.INSTRUMENTACION_ACTIVA:
+            return self.get_response(request)
+        
+        inicio = time.perf_counter()
+        with instrumentacion.medir() as medicion:
+            response = self.get_response(request)
+        ms_total = (time.perf_counter() - inicio) * 1000
+        
+        if settings.INSTRUMENTACION_SERVER_TIMING:
+            valor = medicion.server_timing(ms_total)
+            if response.has_header('Server-Timing'):
+                valor = f'{response["Server-Timing"]}, {valor}'
+            response['Server-Timing'] = valor
+        
+        usuario = getattr(request, 'user', None)
+        n_mas_1 = medicion.repetidas(settings.INSTRUMENTACION_N_MAS_1)
+        registro = {
+            'metodo': request.method,
+            'ruta': request.path,
+            'estado': response.status_code,
+            'usuario': usuario.pk if usuario is not None and usuario.is_authenticated else None,
+            'ms': round(ms_total, 1),
+            **medicion.resumen(),
+            'n_mas_1': [{'sql': sql[:500], 'veces': veces} for sql, veces in list(n_mas_1.items())[:5]],
+        }
+        logger_instrumentacion.log(logging.WARNING if n_mas_1 else logging.INFO, json.dumps(registro))
+        
+        if (n_mas_1 or ms_total >= settings.INSTRUMENTACION_LENTA_MS) \
+                and random.random() < settings.INSTRUMENTACION_MUESTREO:
+            instrumentacion.MuestrasLentas.guardar({'fecha': time.time(), **registro})
+        return response
+
+
+class LecturaPrimariaMiddleware:
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    🗄️ MIDDLEWARE - Read-your-writes con Réplicas de Lectura
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Tras una petición de escritura (POST/PUT/PATCH/DELETE) el cliente lee de
+    la primaria durante DB_PRIMARIA_TRAS_ESCRIBIR segundos, aunque la vista
+    sea @solo_lectura: así no ve datos anteriores a su propio cambio por el
+    retraso de la réplica.
+    
+    La marca va en una cookie y, para clientes JWT que no la envían, en un
+    flag de caché por usuario. Sin réplicas configuradas no hace nada.
+    Debe ir después de JWTAuthenticationMiddleware (usa request.user).
+    """
+    
+    COOKIE = 'leer_primaria'
+    METODOS_LECTURA = ('GET', 'HEAD', 'OPTIONS')
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not settings.DB_REPLICAS:
+            return self.get_response(request)
+        
+        usuario = getattr(request, 'user', None)
+        autenticado = usuario is not None and usuario.is_authenticated
+        fijada = request.COOKIES.get(self.COOKIE) == '1' or (
+            autenticado and cache.get(self.clave(usuario.pk)) is not None
+        )
+        
+        token = primaria_fijada.set(fijada)
+        try:
+            response = self.get_response(request)
+        finally:
+            primaria_fijada.reset(token)
+        
+        if request.method not in self.METODOS_LECTURA:
+            segundos = settings.DB_PRIMARIA_TRAS_ESCRIBIR
+            response.set_cookie(self.COOKIE, '1', max_age=segundos, httponly=True, samesite='Lax')
+            if autenticado:
+                cache.set(self.clave(usuario.pk), 1, segundos)
+        return response
+    
+    async def __acall__(self, request):
+        if not settings.DB_REPLICAS:
+            return await self.get_response(request)
+        
+        usuario = getattr(request, 'user', None)
+        autenticado = usuario is not None and usuario.is_authenticated
+        fijada = request.COOKIES.get(self.COOKIE) == '1' or (
+            autenticado and await cache.aget(self.clave(usuario.pk)) is not None
+        )
+        
+        token = primaria_fijada.set(fijada)
+        try:
+            response = await self.get_response(request)
+        finally:
+            primaria_fijada.reset(token)
+        
+        if request.method not in self.METODOS_LECTURA:
+            segundos = settings.DB_PRIMARIA_TRAS_ESCRIBIR
+            response.set_cookie(self.COOKIE, '1', max_age=segundos, httponly=True, samesite='Lax')
+            if autenticado:
+                await cache.aset(self.clave(usuario.pk), 1, segundos)
+        return response
+    
+    @staticmethod
+    def clave(usuario_id):
+        return f'db:primaria:{usuario_id}'
+
+
+class CompresionMiddleware:
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    🗜️ MIDDLEWARE - Compresión con Variantes Precomprimidas
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Sustituye a GZipMiddleware (ver api/utils/compresion.py):
+    - br / zstd / gzip según Accept-Encoding
+    - Los cuerpos grandes repetidos (catálogo) salen de la variante en caché
+      en vez de comprimirse en cada petición
+    - Nada por debajo de COMPRESION_MINIMO, con Content-Encoding ya puesto
+      o con media ya comprimida (imágenes, zip, pdf...)
+    - Streaming: gzip al vuelo como GZipMiddleware
+    
+    Debe ir el primero de MIDDLEWARE (comprime la respuesta final).
+    Bajo ASGI comprime en un hilo para no bloquear el event loop.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.comprimir(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if not response.streaming and len(response.content) < settings.COMPRESION_MINIMO:
+            return response
+        # CPU de compresión y variante en caché (Redis) fuera del event loop
+        return await sync_to_async(self.comprimir, thread_sensitive=False)(request, response)
+    
+    def comprimir(self, request, response):
+        if response.has_header('Content-Encoding') or not compresion.comprimible(response.get('Content-Type', '')):
+            return response
+        if not response.streaming and len(response.content) < settings.COMPRESION_MINIMO:
+            return response
+        
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        
+        if response.streaming:
+            if response.is_async or compresion.negociar(accept_encoding, ['gzip']) is None:
+                return response
+            codificacion = 'gzip'
+            response.streaming_content = compress_sequence(
+                response.streaming_content,
+                max_random_bytes=compresion.BYTES_ALEATORIOS_GZIP,
+            )
+            del response.headers['Content-Length']
+        else:
+            codificacion = compresion.negociar(accept_encoding)
+            if codificacion is None:
+                return response
+            
+            comprimido = compresion.variante(response.content, codificacion, self.compartible(response))
+            if len(comprimido) >= len(response.content):
+                return response
+            response.content = comprimido
+            response.headers['Content-Length'] = str(len(comprimido))
+        
+        # ETag fuerte → débil (RFC 9110 8.8.1), como GZipMiddleware
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = codificacion
+        return response
+    
+    @staticmethod
+    def compartible(response):
+        """Respuesta sin datos de sesión: su variante puede ir a la caché"""
+        cache_control = response.get('Cache-Control', '').lower()
+        return not response.cookies and 'private' not in cache_control and 'no-store' not in cache_control
+
+
+class _ProcesoSinHilo:
+    """
+    Para middlewares de Django cuyos process_request/process_response no
+    hacen E/S: bajo ASGI MiddlewareMixin los ejecuta con sync_to_async
+    (dos saltos al hilo síncrono por petición); aquí se llaman directamente.
+    """
+    
+    async def __acall__(self, request):
+        response = None
+        if hasattr(self, 'process_request'):
+            response = self.process_request(request)
+        response = response or await self.get_response(request)
+        if hasattr(self, 'process_response'):
+            response = self.process_response(request, response)
+        return response
+
+
+class SeguridadAsyncMiddleware(_ProcesoSinHilo, SecurityMiddleware):
+    """SecurityMiddleware (cabeceras y redirección HTTPS) sin saltos de hilo"""
+
+
+class ComunAsyncMiddleware(_ProcesoSinHilo, CommonMiddleware):
+    """CommonMiddleware (APPEND_SLASH, DISALLOWED_USER_AGENTS) sin saltos de hilo"""
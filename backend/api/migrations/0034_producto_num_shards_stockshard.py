@@ -0,0 +1,36 @@
+# Generated by Django 4.2.7 on 2025-11-27 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0033_alter_loginattempt_attempt_type'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='num_shards',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Número de shards de reserva (0 = modo normal de fila única)'),
+        ),
+        migrations.CreateModel(
+            name='StockShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('indice', models.PositiveSmallIntegerField(help_text='Índice del shard (0..N-1)')),
+                ('capacidad', models.IntegerField(default=0, help_text='Unidades asignadas a este shard (reservadas + libres)')),
+                ('reservado', models.IntegerField(default=0, help_text='Unidades reservadas a través de este shard')),
+                ('producto', models.ForeignKey(help_text='Producto al que pertenece el shard', on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='api.producto')),
+            ],
+            options={
+                'verbose_name': 'Shard de Stock',
+                'verbose_name_plural': 'Shards de Stock',
+                'db_table': 'stock_shards',
+                'ordering': ['producto', 'indice'],
+                'unique_together': {('producto', 'indice')},
+            },
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.7 on 2025-11-28 09:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0034_producto_num_shards_stockshard'),
+    ]
+    
+    operations = [
+        migrations.CreateModel(
+            name='IndiceCoCompra',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ultimo_pedido_id', models.BigIntegerField(default=0, help_text='Último pedido incorporado a la matriz')),
+                ('matriz', models.BinaryField(blank=True, help_text='Matriz de co-ocurrencia (CSR, formato npz)', null=True)),
+                ('lineas_procesadas', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Índice de Co-compra',
+                'verbose_name_plural': 'Índice de Co-compra',
+                'db_table': 'indice_cocompra',
+            },
+        ),
+        migrations.CreateModel(
+            name='RecomendacionProducto',
+            fields=[
+                ('producto', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='recomendacion', serialize=False, to='api.producto')),
+                ('recomendados', models.JSONField(default=list, help_text='IDs de productos recomendados, de mayor a menor similitud')),
+                ('puntuaciones', models.JSONField(default=list, help_text='Similitud coseno de cada recomendado (mismo orden)')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Recomendación de Producto',
+                'verbose_name_plural': 'Recomendaciones de Productos',
+                'db_table': 'recomendaciones_producto',
+            },
+        ),
+    ]
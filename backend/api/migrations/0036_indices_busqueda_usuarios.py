@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2025-11-29 10:15
+#
+# Índices GIN trigram para la búsqueda del listado de usuarios del admin
+# (UserManagementViewSet). auth_user pertenece a django.contrib.auth, así que
+# los índices se crean con SQL y solo en PostgreSQL.
+#
+# Las expresiones coinciden con lo que genera `icontains`:
+#     UPPER("auth_user"."username"::text) LIKE UPPER('%x%')
+
+from django.db import migrations
+
+COLUMNAS = ('username', 'first_name', 'last_name', 'email')
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for columna in COLUMNAS:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS auth_user_{columna}_trgm '
+            f'ON auth_user USING gin (UPPER({columna}::text) gin_trgm_ops)'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for columna in COLUMNAS:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS auth_user_{columna}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+    
+    dependencies = [
+        ('api', '0035_indicecocompra_recomendacionproducto'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+    
+    operations = [
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2025-11-29 16:20
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('api', '0036_indices_busqueda_usuarios'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserOrderStats',
+            fields=[
+                ('usuario', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='order_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total_pedidos', models.PositiveIntegerField(default=0)),
+                ('pedidos_cancelados', models.PositiveIntegerField(default=0)),
+                ('valor_total', models.DecimalField(decimal_places=2, default=0, help_text='Suma de pedidos confirmados o posteriores (lifetime value)', max_digits=14)),
+                ('primer_pedido', models.DateTimeField(blank=True, null=True)),
+                ('ultimo_pedido', models.DateTimeField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Estadísticas de Pedidos de Usuario',
+                'verbose_name_plural': 'Estadísticas de Pedidos de Usuarios',
+                'db_table': 'user_order_stats',
+                'indexes': [models.Index(fields=['-total_pedidos'], name='uos_total_pedidos_idx'), models.Index(fields=['-valor_total'], name='uos_valor_total_idx'), models.Index(fields=['primer_pedido'], name='uos_primer_pedido_idx')],
+            },
+        ),
+    ]
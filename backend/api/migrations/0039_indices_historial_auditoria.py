@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2025-11-29 12:05
+#
+# Índices del historial de auditoría (AuditLogViewSet):
+# - (timestamp DESC, id DESC) para la paginación keyset
+# - GIN trigram sobre UPPER(objeto_repr) para `search` (icontains)
+# - GIN jsonb_ops sobre detalles para filtros por clave (@>)
+# Los GIN solo existen en PostgreSQL y se crean con SQL.
+
+from django.db import migrations, models
+
+INDICES_GIN = {
+    'audit_logs_repr_trgm': 'USING gin (UPPER(objeto_repr::text) gin_trgm_ops)',
+    'audit_logs_detalles_gin': 'USING gin (detalles)',
+}
+
+
+def crear_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    for nombre, definicion in INDICES_GIN.items():
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {nombre} ON audit_logs {definicion}'
+        )
+
+
+def eliminar_indices(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for nombre in INDICES_GIN:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {nombre}')
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY no puede ejecutarse dentro de una transacción
+    atomic = False
+    
+    dependencies = [
+        ('api', '0038_auditlog_timestamp_default'),
+    ]
+    
+    operations = [
+        migrations.RemoveIndex(
+            model_name='auditlog',
+            name='audit_logs_timesta_e93820_idx',
+        ),
+        migrations.AddIndex(
+            model_name='auditlog',
+            index=models.Index(fields=['-timestamp', '-id'], name='audit_ts_id_idx'),
+        ),
+        migrations.RunPython(crear_indices, eliminar_indices),
+    ]
@@ -1,12 +1,20 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Count, Sum, Min, Max, Value
+from django.db.models.functions import Coalesce, Greatest, Least
 from django.contrib.auth.models import User
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.utils import timezone
 from django.core.cache import cache
+from django.conf import settings
+from django.core.exceptions import ValidationError
 from datetime import timedelta
 import secrets
 import hashlib
+import logging
+import random
+
+logger_security = logging.getLogger('security')
 
 
 class UserProfile(models.Model):
@@ -83,6 +91,12 @@ class Producto(models.Model):
     # Campo legado para compatibilidad (se calcula automáticamente)
     stock = models.IntegerField(default=0, help_text="Stock disponible (total - reservado - vendido)")
     
+    # ⚡ Modo "flash sale": reservas repartidas en N shards (0 = fila única)
+    num_shards = models.PositiveSmallIntegerField(
+        default=0,
+        help_text="Número de shards de reserva (0 = modo normal de fila única)"
+    )
+    
     categoria = models.CharField(max_length=50, choices=CATEGORIAS, default='otros')
     imagen_url = models.TextField(blank=True, null=True)  # Legado: Base64 (mantener para compatibilidad)
     imagen = models.ImageField(upload_to='productos/', blank=True, null=True)  # ✅ Nuevo: Archivos reales
@@ -105,30 +119,134 @@ class Producto(models.Model):
     def __str__(self):
         return self.nombre
     
+    @classmethod
+    def por_id(cls, pk):
+        """
+        Producto por id con sentencia preparada (ver utils/sentencias.py).
+        
+        Returns:
+            Producto o None si no existe (o el id no es válido)
+        """
+        from .utils.sentencias import PRODUCTO_POR_ID
+        
+        try:
+            pk = cls._meta.pk.to_python(pk)
+        except ValidationError:
+            return None
+        return PRODUCTO_POR_ID.primero(pk)
+    
     @property
     def stock_disponible(self):
-        """Calcula el stock disponible (total - reservado - vendido)"""
-        return max(0, self.stock_total - self.stock_reservado - self.stock_vendido)
+        """
+        Calcula el stock disponible (total - reservado - vendido).
+        
+        En modo shards el reservado real es la suma de los shards;
+        stock_reservado de la fila es solo un espejo que refresca el rebalanceo.
+        """
+        return max(0, self.stock_total - self.stock_reservado_real - self.stock_vendido)
+    
+    @property
+    def stock_reservado_real(self):
+        """Stock reservado exacto (agrega los shards si el producto está shardeado)"""
+        if self.num_shards and self.pk:
+            return StockShard.objects.filter(producto_id=self.pk).aggregate(
+                total=models.Sum('reservado')
+            )['total'] or 0
+        return self.stock_reservado
+    
+    def reservar_stock(self, cantidad):
+        """
+        Reserva `cantidad` unidades de forma atómica.
+        
+        - Modo normal: un UPDATE condicional sobre la fila del producto.
+        - Modo shards: un UPDATE condicional sobre un shard elegido al azar,
+          sin bloquear la fila del producto.
+        
+        Returns:
+            bool: True si se reservó, False si no hay stock suficiente
+        """
+        from .utils.stock_cache import StockCache
+        
+        if self.num_shards:
+            reservado = StockShard.reservar(self, cantidad)
+            if reservado:
+                StockCache.ajustar(self.pk, -cantidad)
+            return reservado
+        
+        actualizados = Producto.objects.filter(
+            pk=self.pk,
+            stock_total__gte=models.F('stock_reservado') + models.F('stock_vendido') + cantidad
+        ).update(
+            stock_reservado=models.F('stock_reservado') + cantidad,
+            stock=models.F('stock_total') - models.F('stock_reservado') - models.F('stock_vendido') - cantidad
+        )
+        if not actualizados:
+            return False
+        
+        self.refresh_from_db(fields=['stock_reservado', 'stock'])
+        StockCache.publicar(self.pk, self.stock)
+        cache.delete('productos_carrusel_cache')
+        return True
+    
+    def liberar_stock(self, cantidad):
+        """Libera `cantidad` unidades reservadas (nunca deja el reservado en negativo)"""
+        from .utils.stock_cache import StockCache
+        
+        if self.num_shards:
+            StockShard.liberar(self, cantidad)
+            StockCache.ajustar(self.pk, cantidad)
+            return
+        
+        reservado_nuevo = Greatest(models.F('stock_reservado') - cantidad, models.Value(0))
+        Producto.objects.filter(pk=self.pk).update(
+            stock_reservado=reservado_nuevo,
+            stock=Greatest(
+                models.F('stock_total') - reservado_nuevo - models.F('stock_vendido'),
+                models.Value(0)
+            )
+        )
+        self.refresh_from_db(fields=['stock_reservado', 'stock'])
+        StockCache.publicar(self.pk, self.stock)
+        cache.delete('productos_carrusel_cache')
     
     def save(self, *args, **kwargs):
         """
         Actualizar stock automáticamente al guardar.
-        Invalida caché de carrusel si el producto está en carrusel o cambió de estado.
+        Invalida caché de carrusel si el producto está en carrusel o cambió de estado,
+        y purga los listados públicos en el proxy HTTP (tras el commit).
         """
+        from .utils.stock_cache import StockCache
+        from .utils import cache_http
+        
         self.stock = self.stock_disponible
         super().save(*args, **kwargs)
         
+        # ⚡ Modo shards: un cambio de stock_total redistribuye la capacidad
+        if self.num_shards:
+            StockShard.rebalancear(self)
+        else:
+            StockCache.publicar(self.pk, self.stock)
+        
         # ✅ Invalidar caché si el producto está en carrusel o es activo
         if self.en_carrusel or self.activo:
             cache.delete('productos_carrusel_cache')
+        
+        # 🌐 Sin condición: un producto recién desactivado también sale de los listados
+        cache_http.purgar(cache_http.claves_producto(self))
     
     def delete(self, *args, **kwargs):
         """
-        Al eliminar un producto, invalidar caché de carrusel.
+        Al eliminar un producto, invalidar caché de carrusel y purgar los
+        listados públicos en el proxy HTTP.
         """
+        from .utils.stock_cache import StockCache
+        from .utils import cache_http
+        
         # Invalidar caché antes de eliminar
         if self.en_carrusel or self.activo:
             cache.delete('productos_carrusel_cache')
+        StockCache.invalidar(self.pk)
+        cache_http.purgar(cache_http.claves_producto(self))
         
         super().delete(*args, **kwargs)
 
@@ -151,6 +269,9 @@ class Pedido(models.Model):
         ('transferencia', 'Transferencia'),
     ]
     
+    # Estados que suman al valor del cliente (mismos que las estadísticas de ventas)
+    ESTADOS_CON_VALOR = ('confirmado', 'en_preparacion', 'en_camino', 'entregado')
+    
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='pedidos')
     estado = models.CharField(max_length=20, choices=ESTADOS, default='pendiente')
     metodo_pago = models.CharField(max_length=20, choices=METODOS_PAGO, default='efectivo')
@@ -180,6 +301,41 @@ class Pedido(models.Model):
     
     def __str__(self):
         return f'Pedido #{self.id} - {self.usuario.username}'
+    
+    CAMPOS_STATS = ('usuario_id', 'estado', 'total')
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instancia = super().from_db(db, field_names, values)
+        # Valores cargados: base del delta de UserOrderStats al guardar
+        cargados = dict(zip(field_names, values))
+        if all(campo in cargados for campo in cls.CAMPOS_STATS):
+            instancia._stats_previas = {campo: cargados[campo] for campo in cls.CAMPOS_STATS}
+        return instancia
+    
+    def _valores_stats(self):
+        return {campo: getattr(self, campo) for campo in self.CAMPOS_STATS}
+    
+    def save(self, *args, **kwargs):
+        """Guarda y aplica a UserOrderStats solo la diferencia (alta o cambio de estado/total)"""
+        if self._state.adding:
+            anterior = None
+        else:
+            anterior = getattr(self, '_stats_previas', None)
+            if anterior is None:
+                anterior = Pedido.objects.filter(pk=self.pk).values(*self.CAMPOS_STATS).first()
+        
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            UserOrderStats.aplicar_cambio(anterior, self._valores_stats(), self.created_at)
+        self._stats_previas = self._valores_stats()
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            resultado = super().delete(*args, **kwargs)
+            # Primer/último pedido no se pueden restar: se recalcula el usuario
+            UserOrderStats.recalcular([self.usuario_id])
+        return resultado
 
 
 class DetallePedido(models.Model):
@@ -203,6 +359,222 @@ class DetallePedido(models.Model):
         super().save(*args, **kwargs)
 
 
+class UserOrderStats(models.Model):
+    """
+    Estadísticas de pedidos por usuario, desnormalizadas (una fila por
+    usuario con pedidos).
+    
+    Se mantienen de forma incremental desde Pedido.save()/delete(): un
+    UPDATE con F() por cambio que afecte a los contadores. Las escrituras
+    masivas (QuerySet.update, bulk_create) no pasan por save(): después de
+    ellas, o para corregir cualquier deriva, se ejecuta
+    `python manage.py backfill_user_order_stats` (idempotente).
+    
+    Las analíticas (clientes más activos, retención, cohortes) leen esta
+    tabla en lugar de agrupar usuarios × pedidos.
+    """
+    
+    usuario = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='order_stats'
+    )
+    total_pedidos = models.PositiveIntegerField(default=0)
+    pedidos_cancelados = models.PositiveIntegerField(default=0)
+    valor_total = models.DecimalField(
+        max_digits=14,
+        decimal_places=2,
+        default=0,
+        help_text='Suma de pedidos confirmados o posteriores (lifetime value)'
+    )
+    primer_pedido = models.DateTimeField(null=True, blank=True)
+    ultimo_pedido = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    CAMPOS_CONTADORES = ('total_pedidos', 'pedidos_cancelados', 'valor_total')
+    
+    class Meta:
+        db_table = 'user_order_stats'
+        verbose_name = 'Estadísticas de Pedidos de Usuario'
+        verbose_name_plural = 'Estadísticas de Pedidos de Usuarios'
+        indexes = [
+            models.Index(fields=['-total_pedidos'], name='uos_total_pedidos_idx'),
+            models.Index(fields=['-valor_total'], name='uos_valor_total_idx'),
+            models.Index(fields=['primer_pedido'], name='uos_primer_pedido_idx'),
+        ]
+    
+    def __str__(self):
+        return f'{self.usuario_id}: {self.total_pedidos} pedidos, {self.valor_total}'
+    
+    @staticmethod
+    def contribucion(valores):
+        """Lo que aporta un pedido (usuario_id, estado, total) a los contadores"""
+        estado = valores['estado']
+        return {
+            'total_pedidos': 1,
+            'pedidos_cancelados': 1 if estado == 'cancelado' else 0,
+            'valor_total': valores['total'] if estado in Pedido.ESTADOS_CON_VALOR else 0,
+        }
+    
+    @classmethod
+    def aplicar_cambio(cls, anterior, actual, fecha_pedido):
+        """
+        Aplica la diferencia entre el estado anterior de un pedido (None si es
+        nuevo) y el actual. Sin diferencia no escribe nada.
+        """
+        if anterior is not None and anterior['usuario_id'] != actual['usuario_id']:
+            cls.recalcular([anterior['usuario_id'], actual['usuario_id']])
+            return
+        
+        nuevo = cls.contribucion(actual)
+        previo = cls.contribucion(anterior) if anterior is not None else dict.fromkeys(nuevo, 0)
+        cambios = {
+            campo: F(campo) + (nuevo[campo] - previo[campo])
+            for campo in cls.CAMPOS_CONTADORES
+            if nuevo[campo] != previo[campo]
+        }
+        if anterior is None:
+            fecha = Value(fecha_pedido, output_field=models.DateTimeField())
+            cambios['primer_pedido'] = Coalesce(Least('primer_pedido', fecha), fecha)
+            cambios['ultimo_pedido'] = Coalesce(Greatest('ultimo_pedido', fecha), fecha)
+        if not cambios:
+            return
+        
+        cambios['updated_at'] = timezone.now()
+        filas = cls.objects.filter(usuario_id=actual['usuario_id'])
+        if not filas.update(**cambios):
+            # Primer pedido del usuario: crear la fila (sin carrera) y repetir
+            cls.objects.bulk_create([cls(usuario_id=actual['usuario_id'])], ignore_conflicts=True)
+            filas.update(**cambios)
+    
+    @classmethod
+    def recalcular(cls, usuario_ids=None, lote=5000):
+        """
+        Recalcula desde la tabla de pedidos (un GROUP BY) y hace upsert por
+        lotes. Sin usuario_ids recalcula todos y borra filas huérfanas.
+        
+        Returns:
+            int: Filas escritas
+        """
+        agregados = Pedido.objects.order_by().values('usuario_id').annotate(
+            n_pedidos=Count('id'),
+            n_cancelados=Count('id', filter=Q(estado='cancelado')),
+            valor=Coalesce(
+                Sum('total', filter=Q(estado__in=Pedido.ESTADOS_CON_VALOR)),
+                Value(0, output_field=models.DecimalField())
+            ),
+            primero=Min('created_at'),
+            ultimo=Max('created_at'),
+        )
+        huerfanas = cls.objects.exclude(usuario_id__in=Pedido.objects.values('usuario_id'))
+        if usuario_ids is not None:
+            agregados = agregados.filter(usuario_id__in=usuario_ids)
+            huerfanas = huerfanas.filter(usuario_id__in=usuario_ids)
+        
+        ahora = timezone.now()
+        escritas = 0
+        filas = []
+        for fila in agregados.iterator(chunk_size=lote):
+            filas.append(cls(
+                usuario_id=fila['usuario_id'],
+                total_pedidos=fila['n_pedidos'],
+                pedidos_cancelados=fila['n_cancelados'],
+                valor_total=fila['valor'],
+                primer_pedido=fila['primero'],
+                ultimo_pedido=fila['ultimo'],
+                updated_at=ahora,
+            ))
+            if len(filas) >= lote:
+                escritas += cls._upsert(filas)
+                filas = []
+        if filas:
+            escritas += cls._upsert(filas)
+        
+        huerfanas.delete()
+        return escritas
+    
+    @classmethod
+    def _upsert(cls, filas):
+        cls.objects.bulk_create(
+            filas,
+            update_conflicts=True,
+            unique_fields=['usuario'],
+            update_fields=[
+                'total_pedidos', 'pedidos_cancelados', 'valor_total',
+                'primer_pedido', 'ultimo_pedido', 'updated_at',
+            ],
+        )
+        return len(filas)
+
+
+class IndiceCoCompra(models.Model):
+    """
+    Estado del índice de co-compra (fila única).
+    
+    Guarda la matriz dispersa producto×producto de pedidos en común
+    (scipy CSR serializada con save_npz) y la marca de agua del último
+    pedido procesado, para que el job solo procese pedidos nuevos.
+    """
+    
+    ultimo_pedido_id = models.BigIntegerField(
+        default=0,
+        help_text='Último pedido incorporado a la matriz'
+    )
+    matriz = models.BinaryField(
+        null=True,
+        blank=True,
+        help_text='Matriz de co-ocurrencia (CSR, formato npz)'
+    )
+    lineas_procesadas = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'indice_cocompra'
+        verbose_name = 'Índice de Co-compra'
+        verbose_name_plural = 'Índice de Co-compra'
+    
+    def __str__(self):
+        return f'Índice co-compra (pedido #{self.ultimo_pedido_id})'
+    
+    @classmethod
+    def obtener(cls):
+        """Retorna la fila única del índice (la crea si no existe)"""
+        indice, _ = cls.objects.get_or_create(pk=1)
+        return indice
+
+
+class RecomendacionProducto(models.Model):
+    """
+    Top-K de productos comprados junto con un producto (similitud coseno
+    sobre la matriz de co-compra). Una fila compacta por producto.
+    """
+    
+    producto = models.OneToOneField(
+        Producto,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='recomendacion'
+    )
+    recomendados = models.JSONField(
+        default=list,
+        help_text='IDs de productos recomendados, de mayor a menor similitud'
+    )
+    puntuaciones = models.JSONField(
+        default=list,
+        help_text='Similitud coseno de cada recomendado (mismo orden)'
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'recomendaciones_producto'
+        verbose_name = 'Recomendación de Producto'
+        verbose_name_plural = 'Recomendaciones de Productos'
+    
+    def __str__(self):
+        return f'Recomendaciones de {self.producto_id}: {len(self.recomendados)}'
+
+
 class Notificacion(models.Model):
     """Sistema de notificaciones"""
     
@@ -259,13 +631,17 @@ class AuditLog(models.Model):
     detalles = models.JSONField(default=dict)  # Datos completos del cambio
     ip_address = models.GenericIPAddressField(null=True, blank=True)
     user_agent = models.CharField(max_length=500, blank=True, null=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Momento de la acción (no de la inserción: las filas se insertan en lote)
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'audit_logs'
         ordering = ['-timestamp']
+        # Búsqueda trigram en objeto_repr y GIN sobre detalles (jsonb):
+        # migración 0039, solo PostgreSQL
         indexes = [
-            models.Index(fields=['-timestamp']),
+            # Paginación keyset: WHERE (timestamp, id) < (...) ORDER BY timestamp DESC, id DESC
+            models.Index(fields=['-timestamp', '-id'], name='audit_ts_id_idx'),
             models.Index(fields=['modulo', '-timestamp']),
             models.Index(fields=['usuario', '-timestamp']),
         ]
@@ -381,6 +757,11 @@ class RefreshToken(models.Model):
             ip_address=ip_address
         )
         
+        # La fila es la familia: las rotaciones posteriores viven en Redis
+        from .utils import sesiones
+        if sesiones.activo():
+            sesiones.registrar_familia(usuario.id, jti, token_hash, expires_at)
+        
         return token_plano, refresh_token
     
     @classmethod
@@ -405,6 +786,87 @@ class RefreshToken(models.Model):
         except cls.DoesNotExist:
             return None
     
+    @classmethod
+    def rotar_token(cls, token_plano, duracion_horas=2, user_agent=None, ip_address=None):
+        """
+        Rota un refresh token: invalida el presentado y emite uno nuevo.
+        
+        - Con Redis: rotación atómica dentro de la familia, sin escribir en BD.
+          Presentar un token ya rotado revoca la familia (reutilización),
+          salvo dentro de la ventana de gracia: se retorna el token vigente.
+        - Sin Redis: verificar + crear + revocar en BD (flujo clásico).
+        
+        Returns:
+            tuple: (usuario_id, nuevo_token_plano) o (None, None) si no es válido
+        """
+        from .utils import sesiones
+        
+        if sesiones.activo():
+            nuevo_plano = cls.generate_token()
+            token_hash = cls.hash_token(token_plano)
+            try:
+                for _ in range(2):
+                    resultado, usuario_id, familia, entregado = sesiones.rotar(
+                        token_hash, cls.hash_token(nuevo_plano), nuevo_plano, duracion_horas * 3600
+                    )
+                    if resultado == sesiones.ROTADO:
+                        return usuario_id, entregado
+                    
+                    if resultado == sesiones.REUTILIZADO:
+                        # Evento de seguridad: se revoca en BD sin esperar al volcado
+                        cls.objects.filter(jti=sesiones.jti_de_familia(familia)).update(
+                            revocado=True,
+                            revocado_at=timezone.now()
+                        )
+                        logger_security.warning(
+                            f'[REFRESH_REUSE] Token reutilizado, familia revocada: {familia}'
+                        )
+                        return None, None
+                    
+                    if resultado != sesiones.DESCONOCIDO:
+                        return None, None
+                    
+                    # Familia ausente en Redis (anterior al sistema o Redis reiniciado)
+                    fila = cls.objects.filter(token_hash=token_hash).first()
+                    if not fila or not fila.is_valid():
+                        return None, None
+                    if not sesiones.rehidratar(fila):
+                        # La familia sigue viva: solo falta la clave de este token (no se pisa)
+                        return None, None
+                return None, None
+            except Exception as e:
+                logger_security.error(f'[SESIONES_ERROR] Rotación en Redis falló, usando BD: {str(e)}')
+        
+        refresh_token = cls.verificar_token(token_plano)
+        if not refresh_token:
+            return None, None
+        
+        nuevo_plano, _ = cls.crear_token(
+            usuario=refresh_token.usuario,
+            duracion_horas=duracion_horas,
+            user_agent=user_agent,
+            ip_address=ip_address
+        )
+        refresh_token.revocar()
+        return refresh_token.usuario_id, nuevo_plano
+    
+    @classmethod
+    def usuario_id_de_token(cls, token_plano):
+        """usuario_id dueño de un refresh token válido (sin rotarlo), o None"""
+        from .utils import sesiones
+        
+        token_hash = cls.hash_token(token_plano)
+        if sesiones.activo():
+            try:
+                usuario_id = sesiones.usuario_de_token(token_hash)
+                if usuario_id:
+                    return usuario_id
+            except Exception as e:
+                logger_security.error(f'[SESIONES_ERROR] {str(e)}')
+        
+        fila = cls.objects.filter(token_hash=token_hash).first()
+        return fila.usuario_id if fila and fila.is_valid() else None
+    
     @classmethod
     def limpiar_tokens_expirados(cls):
         """Elimina tokens expirados de la base de datos"""
@@ -416,6 +878,11 @@ class RefreshToken(models.Model):
     @classmethod
     def revocar_todos_usuario(cls, usuario):
         """Revoca todos los tokens de un usuario (útil para logout global)"""
+        from .utils import sesiones
+        
+        # Redis: un patrón de claves (sesion:u:<id>:f:*)
+        sesiones.revocar_todos(usuario.id)
+        
         tokens = cls.objects.filter(usuario=usuario, revocado=False)
         count = tokens.update(
             revocado=True,
@@ -628,7 +1095,10 @@ class TokenBlacklist(models.Model):
         Returns:
             bool: True si está en blacklist, False si no
         """
-        return cls.objects.filter(token=token).exists()
+        # Se consulta en cada petición autenticada: sentencia preparada
+        from .utils.sentencias import TOKEN_EN_BLACKLIST
+        
+        return bool(TOKEN_EN_BLACKLIST.filas(token))
     
     @classmethod
     def agregar_a_blacklist(cls, token: str, usuario, razon: str = 'logout'):
@@ -712,7 +1182,23 @@ class Cart(models.Model):
         ordering = ['-updated_at']
     
     def __str__(self):
-        return f'Carrito de {self.user.email}'
+        # Sin consulta extra si el usuario no viene cargado (logs, admin)
+        if Cart.user.is_cached(self):
+            return f'Carrito de {self.user.email}'
+        return f'Carrito del usuario #{self.user_id}'
+    
+    @classmethod
+    def del_usuario(cls, usuario):
+        """
+        Carrito del usuario (lo crea si no tiene). La lectura usa sentencia
+        preparada (ver utils/sentencias.py).
+        """
+        from .utils.sentencias import CARRITO_DE_USUARIO
+        
+        carrito = CARRITO_DE_USUARIO.primero(usuario.pk)
+        if carrito is None:
+            carrito, _ = cls.objects.get_or_create(user=usuario)
+        return carrito
     
     def get_total(self):
         """Calcula el total del carrito"""
@@ -979,9 +1465,11 @@ class StockReservation(models.Model):
         Returns:
             StockReservation: Objeto creado
         """
+        from .utils import expiracion_reservas
+        
         expires_at = timezone.now() + timedelta(minutes=ttl_minutos)
         
-        return cls.objects.create(
+        reserva = cls.objects.create(
             usuario=usuario,
             producto=producto,
             cantidad=cantidad,
@@ -990,38 +1478,258 @@ class StockReservation(models.Model):
             user_agent=user_agent,
             status='pending'
         )
+        
+        # Temporizador en Redis: se libera al vencer, sin esperar al barrido
+        expiracion_reservas.programar([reserva])
+        return reserva
+    
+    @classmethod
+    def expirar(cls, ids, ahora=None):
+        """
+        Expira en bloque las reservas `ids` que sigan pendientes y vencidas.
+        
+        Un UPDATE marca las reservas y el stock se libera una vez por
+        producto con la suma de cantidades. Las filas bloqueadas por otro
+        worker (SKIP LOCKED) o ya confirmadas/canceladas se ignoran.
+        
+        Args:
+            ids: Ids de StockReservation candidatos
+            ahora: Instante de corte (default: timezone.now())
+        
+        Returns:
+            list: Ids de las reservas liberadas
+        """
+        ahora = ahora or timezone.now()
+        
+        with transaction.atomic():
+            vencidas = list(
+                cls.objects.select_for_update(skip_locked=True)
+                .filter(pk__in=ids, status='pending', expires_at__lte=ahora)
+                .values_list('pk', 'producto_id', 'cantidad')
+            )
+            if not vencidas:
+                return []
+            
+            cls.objects.filter(pk__in=[pk for pk, _, _ in vencidas]).update(
+                status='expired',
+                cancelled_at=ahora
+            )
+            
+            por_producto = {}
+            for _, producto_id, cantidad in vencidas:
+                por_producto[producto_id] = por_producto.get(producto_id, 0) + cantidad
+            
+            # Liberar stock (UPDATE atómico, respeta el modo shards)
+            for producto in Producto.objects.filter(pk__in=por_producto):
+                producto.liberar_stock(por_producto[producto.pk])
+        
+        return [pk for pk, _, _ in vencidas]
     
     @classmethod
-    def liberar_reservas_expiradas(cls):
+    def liberar_reservas_expiradas(cls, lote=None):
         """
         Libera todas las reservas expiradas (ROLLBACK automático).
-        Debe ejecutarse periódicamente (cada 5 minutos).
+        
+        Red de seguridad del temporizador en Redis (utils/expiracion_reservas):
+        recorre las vencidas por rangos de id y las expira con expirar().
         
         Returns:
             int: Número de reservas liberadas
         """
+        lote = lote or settings.RESERVAS_EXPIRACION_LOTE
         ahora = timezone.now()
-        reservas_expiradas = cls.objects.filter(
-            status='pending',
-            expires_at__lt=ahora
-        )
+        vencidas = cls.objects.filter(status='pending', expires_at__lt=ahora).order_by('pk')
         
         count = 0
-        for reserva in reservas_expiradas:
-            # Liberar stock
-            producto = reserva.producto
-            producto.stock_reservado -= reserva.cantidad
-            producto.save()
-            
-            # Marcar como expirada
-            reserva.status = 'expired'
-            reserva.cancelled_at = ahora
-            reserva.save()
-            count += 1
+        ultimo = 0
+        while True:
+            ids = list(vencidas.filter(pk__gt=ultimo).values_list('pk', flat=True)[:lote])
+            if not ids:
+                break
+            count += len(cls.expirar(ids, ahora))
+            ultimo = ids[-1]
         
         return count
 
 
+class StockShard(models.Model):
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    ⚡ MODELO - StockShard (Contador de Reservas Repartido)
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Para productos "calientes" (flash sales) la capacidad de reserva se reparte
+    en N filas. Cada checkout actualiza un shard elegido al azar, de modo que
+    las reservas concurrentes del mismo producto no se serializan en una sola fila.
+    
+    INVARIANTES:
+    - reservado <= capacidad en cada shard
+    - Σ reservado = stock reservado real del producto
+    - Σ (capacidad - reservado) = stock disponible (tras rebalancear)
+    
+    El rebalanceo periódico redistribuye la capacidad libre entre los shards
+    y refresca el espejo Producto.stock_reservado.
+    """
+    
+    producto = models.ForeignKey(
+        Producto,
+        on_delete=models.CASCADE,
+        related_name='shards',
+        help_text='Producto al que pertenece el shard'
+    )
+    indice = models.PositiveSmallIntegerField(
+        help_text='Índice del shard (0..N-1)'
+    )
+    capacidad = models.IntegerField(
+        default=0,
+        help_text='Unidades asignadas a este shard (reservadas + libres)'
+    )
+    reservado = models.IntegerField(
+        default=0,
+        help_text='Unidades reservadas a través de este shard'
+    )
+    
+    class Meta:
+        db_table = 'stock_shards'
+        verbose_name = 'Shard de Stock'
+        verbose_name_plural = 'Shards de Stock'
+        unique_together = ('producto', 'indice')
+        ordering = ['producto', 'indice']
+    
+    def __str__(self):
+        return f'Shard {self.indice} de {self.producto_id}: {self.reservado}/{self.capacidad}'
+    
+    @classmethod
+    def reservar(cls, producto, cantidad):
+        """
+        Reserva en un shard aleatorio con capacidad libre suficiente.
+        
+        Si ningún shard individual alcanza (capacidad fragmentada) la reserva
+        se reparte entre varios shards bajo bloqueo.
+        
+        Returns:
+            bool: True si se reservó
+        """
+        ids = list(cls.objects.filter(producto_id=producto.pk).values_list('id', flat=True))
+        random.shuffle(ids)
+        
+        for shard_id in ids:
+            actualizados = cls.objects.filter(
+                id=shard_id,
+                capacidad__gte=models.F('reservado') + cantidad
+            ).update(reservado=models.F('reservado') + cantidad)
+            if actualizados:
+                return True
+        
+        # Camino lento: repartir la reserva entre shards
+        with transaction.atomic():
+            shards = list(cls.objects.select_for_update().filter(producto_id=producto.pk).order_by('indice'))
+            if sum(s.capacidad - s.reservado for s in shards) < cantidad:
+                return False
+            
+            pendiente = cantidad
+            for shard in shards:
+                parte = min(shard.capacidad - shard.reservado, pendiente)
+                if parte <= 0:
+                    continue
+                shard.reservado += parte
+                pendiente -= parte
+                if pendiente == 0:
+                    break
+            cls.objects.bulk_update(shards, ['reservado'])
+        
+        return True
+    
+    @classmethod
+    def liberar(cls, producto, cantidad):
+        """Libera `cantidad` unidades, repartiendo entre shards si hace falta"""
+        ids = list(cls.objects.filter(
+            producto_id=producto.pk,
+            reservado__gte=cantidad
+        ).values_list('id', flat=True))
+        random.shuffle(ids)
+        
+        for shard_id in ids:
+            if cls.objects.filter(id=shard_id, reservado__gte=cantidad).update(
+                reservado=models.F('reservado') - cantidad
+            ):
+                return
+        
+        # Ningún shard tiene la cantidad completa: liberar por partes
+        with transaction.atomic():
+            pendiente = cantidad
+            for shard in cls.objects.select_for_update().filter(producto_id=producto.pk, reservado__gt=0):
+                parte = min(shard.reservado, pendiente)
+                shard.reservado -= parte
+                shard.save(update_fields=['reservado'])
+                pendiente -= parte
+                if pendiente == 0:
+                    break
+    
+    @classmethod
+    def rebalancear(cls, producto):
+        """
+        Redistribuye la capacidad libre entre los shards y refresca el espejo
+        stock_reservado/stock de la fila del producto.
+        
+        La suma de reservas es exacta: se toma bajo bloqueo de todos los shards.
+        """
+        with transaction.atomic():
+            fila = Producto.objects.select_for_update().get(pk=producto.pk)
+            shards = list(cls.objects.select_for_update().filter(producto_id=fila.pk).order_by('indice'))
+            if not shards:
+                return
+            
+            reservado = sum(s.reservado for s in shards)
+            libre = max(0, fila.stock_total - fila.stock_vendido - reservado)
+            base, resto = divmod(libre, len(shards))
+            
+            for i, shard in enumerate(shards):
+                shard.capacidad = shard.reservado + base + (1 if i < resto else 0)
+            cls.objects.bulk_update(shards, ['capacidad'])
+            
+            Producto.objects.filter(pk=fila.pk).update(stock_reservado=reservado, stock=libre)
+        
+        from .utils.stock_cache import StockCache
+        StockCache.publicar(fila.pk, libre)
+        cache.delete('productos_carrusel_cache')
+    
+    @classmethod
+    def configurar(cls, producto, num_shards):
+        """
+        Activa (num_shards > 0), redimensiona o desactiva (0) el modo shards.
+        
+        Las reservas existentes se conservan: al activar quedan en el shard 0;
+        al desactivar se consolidan de vuelta en Producto.stock_reservado.
+        """
+        with transaction.atomic():
+            fila = Producto.objects.select_for_update().get(pk=producto.pk)
+            shards = list(cls.objects.select_for_update().filter(producto_id=fila.pk))
+            reservado = sum(s.reservado for s in shards) if shards else fila.stock_reservado
+            
+            cls.objects.filter(producto_id=fila.pk).delete()
+            
+            if num_shards > 0:
+                cls.objects.bulk_create([
+                    cls(producto_id=fila.pk, indice=i, reservado=reservado if i == 0 else 0)
+                    for i in range(num_shards)
+                ])
+            
+            Producto.objects.filter(pk=fila.pk).update(
+                num_shards=num_shards,
+                stock_reservado=reservado,
+                stock=max(0, fila.stock_total - reservado - fila.stock_vendido)
+            )
+        
+        producto.num_shards = num_shards
+        if num_shards > 0:
+            cls.rebalancear(producto)
+        producto.refresh_from_db()
+
+        from .utils.stock_cache import StockCache
+        StockCache.publicar(producto.pk, producto.stock)
+
+
 class Favorito(models.Model):
     """
     Modelo para guardar productos favoritos de los usuarios
@@ -1067,6 +1775,9 @@ class EmailVerification(models.Model):
     1. Usuario se registra → Se crea EmailVerification (sin User aún)
     2. Usuario verifica código → Se crea User
     3. Usuario inicia sesión → Acceso completo
+    
+    Con Redis el paso 1 no toca la tabla: el registro pendiente vive en
+    api/utils/codigos_verificacion.py y la fila se crea ya verificada en el 2.
     """
     
     usuario = models.ForeignKey(
@@ -1362,6 +2073,9 @@ class PasswordRecoveryCode(models.Model):
     - Límite de 3 reenvíos
     - Cooldown de 1 minuto entre reenvíos
     - Uso único
+    
+    Con Redis el código pendiente vive en api/utils/codigos_verificacion.py
+    (hash + intentos, TTL = expiración) y la fila se crea al verificarlo.
     """
     
     usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='password_recovery_codes')
@@ -1407,15 +2121,16 @@ class PasswordRecoveryCode(models.Model):
         """
         Crea un nuevo código de recuperación.
         Invalida códigos anteriores sin usar.
+        
+        Con Redis retorna una instancia SIN guardar (el código queda en
+        Redis); marcar_verificado() la guarda tras verificarla.
         """
-        # Invalidar códigos anteriores sin usar
-        cls.objects.filter(usuario=usuario, verificado=False).delete()
+        from .utils import codigos_verificacion as codigos
         
         # Crear nuevo código
         codigo = cls.generar_codigo()
         expires_at = timezone.now() + timedelta(minutes=duracion_minutos)
-        
-        recovery_code = cls.objects.create(
+        recovery_code = cls(
             usuario=usuario,
             codigo=codigo,
             expires_at=expires_at,
@@ -1423,6 +2138,21 @@ class PasswordRecoveryCode(models.Model):
             user_agent=user_agent
         )
         
+        if codigos.activo():
+            try:
+                # Reemplaza el código anterior del usuario
+                codigos.guardar(
+                    codigos.RECUPERACION, usuario.id, codigo, duracion_minutos,
+                    ip_address=ip_address or '', user_agent=user_agent
+                )
+                return recovery_code
+            except Exception as e:
+                logger_security.warning(f'[RECUPERACION_REDIS_ERROR] Se usa la BD: {str(e)}')
+        
+        # Invalidar códigos anteriores sin usar
+        cls.objects.filter(usuario=usuario, verificado=False).delete()
+        recovery_code.save()
+        
         return recovery_code
     
     def is_valid(self):
@@ -1463,20 +2193,50 @@ class PasswordRecoveryCode(models.Model):
         self.ultimo_reenvio = timezone.now()
         self.save()
     
-    @staticmethod
-    def verificar_codigo(usuario, codigo):
+    @classmethod
+    def comprobar_codigo(cls, usuario, codigo):
+        """
+        Verifica el código y cuenta el intento fallido.
+        
+        Con Redis es un solo round-trip (script Lua); si el código no está en
+        Redis (expirado o emitido en BD) se consulta la tabla.
+        
+        Returns:
+            tuple: (PasswordRecoveryCode o None, bloqueado)
+        """
+        from .utils import codigos_verificacion as codigos
+        
+        if codigos.activo():
+            resultado, datos = codigos.verificar(codigos.RECUPERACION, usuario.id, codigo)
+            if resultado == codigos.VERIFICADO:
+                return cls(
+                    usuario=usuario,
+                    codigo=codigo,
+                    expires_at=timezone.now(),
+                    ip_address=datos.get('ip_address') or None,
+                    user_agent=datos.get('user_agent', '')
+                ), False
+            if resultado != codigos.DESCONOCIDO:
+                return None, resultado == codigos.BLOQUEADO
+        
+        recovery_code = cls.objects.filter(
+            usuario=usuario,
+            codigo=codigo,
+            verificado=False
+        ).order_by('-created_at').first()
+        
+        if recovery_code is None:
+            return None, False
+        if recovery_code.is_valid():
+            return recovery_code, False
+        
+        recovery_code.incrementar_intentos()
+        return None, recovery_code.intentos_fallidos >= 5
+    
+    @classmethod
+    def verificar_codigo(cls, usuario, codigo):
         """Verifica si el código es válido para el usuario"""
-        try:
-            recovery_code = PasswordRecoveryCode.objects.get(
-                usuario=usuario,
-                codigo=codigo
-            )
-            
-            if recovery_code.is_valid():
-                return recovery_code
-            return None
-        except PasswordRecoveryCode.DoesNotExist:
-            return None
+        return cls.comprobar_codigo(usuario, codigo)[0]
     
     @staticmethod
     def limpiar_codigos_expirados():
@@ -1492,6 +2252,9 @@ class PasswordRecoveryCode(models.Model):
     @staticmethod
     def invalidar_codigos_usuario(usuario):
         """Invalida todos los códigos de un usuario"""
+        from .utils import codigos_verificacion
+        codigos_verificacion.descartar(codigos_verificacion.RECUPERACION, usuario.id)
+        
         codigos = PasswordRecoveryCode.objects.filter(usuario=usuario, verificado=False)
         count = codigos.count()
         for codigo in codigos:
@@ -0,0 +1,125 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+⚡ RENDERERS / PARSERS JSON - orjson con fallback a la stdlib
+═══════════════════════════════════════════════════════════════════════════════
+
+El catálogo serializa cientos de productos por petición: con orjson el
+render es varias veces más rápido que el json de la stdlib que usa DRF.
+
+Misma salida (semántica) que JSONRenderer/JSONParser de DRF:
+- Compacto y UTF-8, con U+2028/U+2029 escapados como hace DRF
+- datetime (Z para UTC), date, time y UUID nativos en orjson; Decimal,
+  timedelta, QuerySet, lazy strings, etc. con el encoder de DRF
+- Claves no string convertidas a string
+Se delega en DRF (stdlib) cuando orjson no está instalado, se pide indent,
+UNICODE_JSON/COMPACT_JSON están desactivados, el charset no es UTF-8, o
+el dato no cabe en orjson (enteros de más de 64 bits). Única diferencia:
+NaN/Infinity se renderizan como null en vez de dar error 500.
+
+Para listas muy grandes: respuesta_json_streaming() (por lotes).
+
+Ver REST_FRAMEWORK en settings.py (JSON_ORJSON=False vuelve a DRF).
+"""
+
+import io
+
+from django.http import StreamingHttpResponse
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+if orjson is not None:
+    OPCIONES_ORJSON = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z | orjson.OPT_SERIALIZE_NUMPY
+
+# Tipos que orjson no conoce: mismas conversiones que el JSONRenderer de DRF
+_default = JSONEncoder().default
+
+# orjson lee los enteros de más de 64 bits como float: los cuerpos con 19+
+# cifras seguidas van a la stdlib (translate + `in`: mucho más rápido que una regex)
+_CIFRAS_A_CERO = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_ENTERO_GRANDE = b'0' * 19
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer de DRF sobre orjson"""
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        
+        if (
+            orjson is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        try:
+            contenido = orjson.dumps(data, default=_default, option=OPCIONES_ORJSON)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        
+        # Igual que DRF: separadores de línea escapados (JSON válido como JS)
+        return contenido.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser de DRF sobre orjson"""
+    
+    renderer_class = ORJSONRenderer
+    
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', 'utf-8')
+        if orjson is None or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+        
+        contenido = stream.read()
+        if _ENTERO_GRANDE not in contenido.translate(_CIFRAS_A_CERO):
+            try:
+                return orjson.loads(contenido)
+            except orjson.JSONDecodeError:
+                pass
+        
+        # DRF decide (y da el mismo ParseError)
+        return super().parse(io.BytesIO(contenido), media_type, parser_context)
+
+
+def respuesta_json_streaming(cabecera, clave, elementos, serializar, lote=200, status=200):
+    """
+    Respuesta `{**cabecera, clave: [...]}` que se serializa y envía por lotes:
+    el primer byte sale antes y nunca está todo el JSON en memoria.
+    
+    Args:
+        cabecera: dict con las claves que van antes de la lista (p. ej. count)
+        clave: Nombre de la lista
+        elementos: Secuencia de objetos a serializar
+        serializar: Callable lote → lista de dicts (p. ej. Serializer(many=True).data)
+        lote: Elementos por fragmento
+    
+    Uso:
+        return respuesta_json_streaming(
+            {'count': len(productos)}, 'data', productos,
+            lambda lote: ProductoSerializer(lote, many=True, context=contexto).data,
+        )
+    """
+    renderer = ORJSONRenderer()
+    
+    def fragmentos():
+        inicio = renderer.render(cabecera)[:-1]
+        yield inicio + (b',' if cabecera else b'') + renderer.render(clave) + b':['
+        
+        primero = True
+        for i in range(0, len(elementos), lote):
+            datos = serializar(elementos[i:i + lote])
+            if not datos:
+                continue
+            yield (b'' if primero else b',') + renderer.render(datos)[1:-1]
+            primero = False
+        yield b']}'
+    
+    return StreamingHttpResponse(fragmentos(), status=status, content_type=renderer.media_type)
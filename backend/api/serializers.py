@@ -223,6 +223,32 @@ class ProductoSerializer(serializers.ModelSerializer):
         )
 
 
+class ProductoCardSerializer(serializers.ModelSerializer):
+    """
+    Proyección de tarjeta: solo lo que pinta una card de producto.
+    
+    Sin favoritos_count ni creado_por (evita subconsultas por fila).
+    Usar con `.only(*ProductoCardSerializer.CAMPOS)`.
+    """
+    CAMPOS = (
+        'id', 'nombre', 'precio', 'descuento', 'categoria', 'imagen', 'imagen_url',
+        'stock_total', 'stock_reservado', 'stock_vendido',
+    )
+    
+    stock = serializers.SerializerMethodField()
+    imagen_url = serializers.SerializerMethodField()
+    
+    class Meta:
+        model = Producto
+        fields = ['id', 'nombre', 'precio', 'descuento', 'categoria', 'imagen_url', 'stock']
+    
+    def get_imagen_url(self, obj):
+        return ProductoSerializer.get_imagen_url(self, obj)
+    
+    def get_stock(self, obj):
+        return max(0, obj.stock_total - obj.stock_reservado - obj.stock_vendido)
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # 🛒 CARRITO DE COMPRAS - SERIALIZERS
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -37,6 +37,9 @@ class UserListSerializer(serializers.ModelSerializer):
     # Email parcialmente oculto para privacidad
     email_parcial = serializers.SerializerMethodField()
     
+    # Anotado por UserManagementViewSet.get_queryset (subconsulta)
+    total_pedidos = serializers.IntegerField(read_only=True, default=0)
+    
     class Meta:
         model = User
         fields = [
@@ -49,6 +52,7 @@ class UserListSerializer(serializers.ModelSerializer):
             'rol',
             'fecha_registro',
             'ultimo_acceso',
+            'total_pedidos',
         ]
     
     def get_email_parcial(self, obj):
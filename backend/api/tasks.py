@@ -11,11 +11,22 @@ Tareas:
 3. enviar_email_verificacion() - Envía email de verificación con código
 4. limpiar_codigos_verificacion() - Limpia códigos de verificación expirados
 5. enviar_email_recuperacion() - Envía email de recuperación de contraseña
+6. rebalancear_stock_shards() - Redistribuye capacidad de productos shardeados
+7. reconciliar_stock_cache() - Corrige deriva entre Redis y BD del stock disponible
+8. precalcular_productos_relacionados() - Recalcula vecinos para el detalle de producto
+9. actualizar_recomendaciones() - Incorpora pedidos nuevos al índice de co-compra
+10. volcar_sesiones() - Write-behind de familias de refresh tokens (Redis → BD)
+11. registrar_intento_login() - Fila LoginAttempt + logging de auth fuera del login
+12. enviar_lote_correos() - Envía la cola de emails en lotes por una conexión SMTP
+13. calcular_analitica() - Embudo, cohortes y abandono (NumPy) a caché para el admin
+14. volcar_auditoria() - Inserta en lote las filas de AuditLog encoladas en Redis
+15. purgar_auditoria() - Vacía el historial de auditoría por rangos de id
+16. expirar_reservas_vencidas() - Libera al vencer las reservas del sorted set de Redis
+17. medir_lag_replicas() - Retraso de cada réplica de lectura para el router de BD
 """
 
 from celery import shared_task
 from django.utils import timezone
-from django.db import transaction
 from .validators import hash_email_para_logs
 import logging
 
@@ -25,72 +36,32 @@ logger = logging.getLogger(__name__)
 @shared_task(bind=True, max_retries=3)
 def liberar_reservas_expiradas(self):
     """
-    🔄 TAREA: Liberar reservas de stock expiradas
+    🔄 TAREA: Liberar reservas de stock expiradas (red de seguridad)
     
-    Ejecuta cada minuto (configurado en celery.py)
+    Ejecuta cada 5 minutos (configurado en celery.py). La expiración
+    normal la hace expirar_reservas_vencidas desde el sorted set de Redis;
+    este barrido recoge las reservas que no llegaron a él (sin Redis,
+    Redis caído, ZADD fallido).
     
     Flujo:
-    1. Busca todas las reservas con status='pending' y expires_at < ahora
-    2. Para cada reserva expirada:
-       - Libera el stock_reservado del producto
-       - Marca la reserva como 'expired'
+    1. Recorre por rangos de id las reservas con status='pending' y expires_at < ahora
+    2. Cada rango se expira con StockReservation.expirar():
+       - Un UPDATE marca las reservas como 'expired'
+       - El stock_reservado se libera una vez por producto
     3. Retorna cantidad de reservas liberadas
     
     Seguridad:
-    - @transaction.atomic: Si falla, todo se revierte
+    - Cada rango en su transacción, con SELECT ... FOR UPDATE SKIP LOCKED
     - Manejo de excepciones con reintentos
-    - Logging detallado para auditoría
     """
-    from .models import StockReservation, Producto
+    from .models import StockReservation
     
     try:
         ahora = timezone.now()
+        count = StockReservation.liberar_reservas_expiradas()
         
-        # Buscar reservas expiradas
-        reservas_expiradas = StockReservation.objects.filter(
-            status='pending',
-            expires_at__lt=ahora
-        ).select_related('producto', 'usuario')
-        
-        count = 0
-        
-        with transaction.atomic():
-            for reserva in reservas_expiradas:
-                try:
-                    # Liberar stock_reservado
-                    producto = reserva.producto
-                    producto.stock_reservado -= reserva.cantidad
-                    
-                    # Validar que no quede negativo
-                    if producto.stock_reservado < 0:
-                        logger.warning(
-                            f'[RESERVA_EXPIRADA] Stock negativo detectado para '
-                            f'producto {producto.id}. Corrigiendo a 0.'
-                        )
-                        producto.stock_reservado = 0
-                    
-                    producto.save()
-                    
-                    # Marcar reserva como expirada
-                    reserva.status = 'expired'
-                    reserva.cancelled_at = ahora
-                    reserva.save()
-                    
-                    count += 1
-                    
-                    logger.info(
-                        f'[RESERVA_EXPIRADA] Liberada reserva {reserva.id} '
-                        f'del usuario {reserva.usuario.username} '
-                        f'(Producto: {producto.nombre}, Cantidad: {reserva.cantidad})'
-                    )
-                
-                except Exception as e:
-                    logger.error(
-                        f'[RESERVA_EXPIRADA_ERROR] Error liberando reserva {reserva.id}: {str(e)}'
-                    )
-                    continue
-        
-        logger.info(f'[RESERVAS_EXPIRADAS] Total liberadas: {count}')
+        if count:
+            logger.info(f'[RESERVAS_EXPIRADAS] Total liberadas por el barrido: {count}')
         return {
             'status': 'success',
             'reservas_liberadas': count,
@@ -166,19 +137,17 @@ def enviar_email_verificacion(self, email=None, codigo=None, nombre=None, usuari
     
     Flujo:
     1. Obtiene datos del usuario (temporal o existente)
-    2. Renderiza plantilla HTML con contexto
-    3. Envía el email usando Gmail SMTP (HTML + texto plano)
+    2. Renderiza plantilla HTML con contexto (plantilla compilada en caché)
+    3. Encola el email para el envío por lotes (api/utils/correo.py)
     4. Registra el resultado en logs
     
     Seguridad:
-    - Reintentos automáticos (max 3)
+    - Reintentos automáticos (max 3, backoff exponencial con jitter)
     - Logging detallado
     - Manejo de excepciones
     """
-    from django.core.mail import EmailMultiAlternatives
     from django.contrib.auth.models import User
-    from django.conf import settings
-    from django.template.loader import render_to_string
+    from .utils import correo
     
     try:
         # Modo OPCIÓN 1: Datos temporales (sin usuario aún)
@@ -206,9 +175,6 @@ def enviar_email_verificacion(self, email=None, codigo=None, nombre=None, usuari
             'username': nombre_usuario,
         }
         
-        # Renderizar plantilla HTML
-        html_content = render_to_string('emails/verificacion_email.html', context)
-        
         # Mensaje de texto plano (fallback)
         text_content = f'''
 Hola {nombre_usuario},
@@ -223,20 +189,19 @@ Saludos,
 Equipo Electronica Isla
         '''
         
-        # Crear email con HTML y texto plano
-        subject = 'Verifica tu cuenta - Electronica Isla'
-        email_msg = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[email_destino]
+        # Crear email con HTML (plantilla en caché) y texto plano
+        email_msg = correo.construir_desde_plantilla(
+            asunto='Verifica tu cuenta - Electronica Isla',
+            texto=text_content,
+            para=[email_destino],
+            nombre_plantilla='emails/verificacion_email.html',
+            contexto=context
         )
-        email_msg.attach_alternative(html_content, "text/html")
         
-        # Enviar email
-        email_msg.send(fail_silently=False)
+        # Encolar para envío por lotes (sin Redis: envío directo)
+        correo.encolar(email_msg)
         
-        logger.info(f'[EMAIL_VERIFICACION] Enviado a {email_destino} (HTML)')
+        logger.info(f'[EMAIL_VERIFICACION] Encolado para {email_destino} (HTML)')
         return {
             'status': 'success',
             'email': email_destino,
@@ -253,8 +218,8 @@ Equipo Electronica Isla
     
     except Exception as exc:
         logger.error(f'[EMAIL_ERROR] {str(exc)}')
-        # Reintentar con backoff exponencial (60 segundos)
-        raise self.retry(exc=exc, countdown=60)
+        # Reintentar con backoff exponencial + jitter
+        raise self.retry(exc=exc, countdown=correo.espera_reintento(self.request.retries))
 
 
 @shared_task(bind=True, max_retries=3)
@@ -315,18 +280,16 @@ def enviar_email_recuperacion(self, email=None, nombre=None, codigo=None, usuari
     
     Flujo:
     1. Obtiene datos del usuario
-    2. Renderiza plantilla HTML con contexto
-    3. Envía el email usando Gmail SMTP (HTML + texto plano)
+    2. Renderiza plantilla HTML con contexto (plantilla compilada en caché)
+    3. Encola el email para el envío por lotes (api/utils/correo.py)
     4. Registra el resultado en logs
     
     Seguridad:
-    - Reintentos automáticos (max 3)
+    - Reintentos automáticos (max 3, backoff exponencial con jitter)
     - Logging detallado
     - Manejo de excepciones
     """
-    from django.core.mail import EmailMultiAlternatives
-    from django.conf import settings
-    from django.template.loader import render_to_string
+    from .utils import correo
     
     try:
         if not email or not codigo or not nombre:
@@ -339,9 +302,6 @@ def enviar_email_recuperacion(self, email=None, nombre=None, codigo=None, usuari
             'expiracion_minutos': 15,
         }
         
-        # Renderizar plantilla HTML
-        html_content = render_to_string('emails/recuperacion_contraseña.html', context)
-        
         # Mensaje de texto plano (fallback)
         text_content = f'''
 Hola {nombre},
@@ -358,22 +318,21 @@ Saludos,
 Equipo Electronica Isla
         '''
         
-        # Crear email con HTML y texto plano
-        subject = 'Código de recuperación de contraseña - Electronica Isla'
-        email_msg = EmailMultiAlternatives(
-            subject=subject,
-            body=text_content,
-            from_email=settings.DEFAULT_FROM_EMAIL,
-            to=[email]
+        # Crear email con HTML (plantilla en caché) y texto plano
+        email_msg = correo.construir_desde_plantilla(
+            asunto='Código de recuperación de contraseña - Electronica Isla',
+            texto=text_content,
+            para=[email],
+            nombre_plantilla='emails/recuperacion_contraseña.html',
+            contexto=context
         )
-        email_msg.attach_alternative(html_content, "text/html")
         
-        # Enviar email
-        email_msg.send(fail_silently=False)
+        # Encolar para envío por lotes (sin Redis: envío directo)
+        correo.encolar(email_msg)
         
         # ✅ MEJORADO: NO loguear email completo, usar hash
         email_hash = hash_email_para_logs(email)
-        logger.info(f'[EMAIL_RECUPERACION] Enviado a {email_hash} (usuario_id: {usuario_id})')
+        logger.info(f'[EMAIL_RECUPERACION] Encolado para {email_hash} (usuario_id: {usuario_id})')
         return {
             'status': 'success',
             'email_hash': email_hash,
@@ -383,5 +342,371 @@ Equipo Electronica Isla
     
     except Exception as exc:
         logger.error(f'[EMAIL_RECUPERACION_ERROR] Error enviando email (usuario_id: {usuario_id})')
-        # Reintentar con backoff exponencial (60 segundos)
+        # Reintentar con backoff exponencial + jitter
+        raise self.retry(exc=exc, countdown=correo.espera_reintento(self.request.retries))
+
+
+@shared_task(bind=True, max_retries=3)
+def rebalancear_stock_shards(self):
+    """
+    ⚡ TAREA: Rebalancear shards de stock (productos en modo flash sale)
+    
+    Ejecuta cada minuto (configurado en celery.py)
+    
+    Flujo:
+    1. Busca los productos con num_shards > 0
+    2. Redistribuye la capacidad libre entre sus shards
+    3. Refresca el espejo Producto.stock_reservado con la suma exacta
+    
+    Los productos normales (num_shards = 0) no se tocan.
+    """
+    from .models import Producto, StockShard
+    
+    try:
+        productos = Producto.objects.filter(num_shards__gt=0).only('id', 'num_shards')
+        
+        count = 0
+        for producto in productos:
+            try:
+                StockShard.rebalancear(producto)
+                count += 1
+            except Exception as e:
+                logger.error(f'[SHARDS_ERROR] Error rebalanceando producto {producto.id}: {str(e)}')
+                continue
+        
+        logger.info(f'[SHARDS_REBALANCEADOS] Total productos: {count}')
+        return {
+            'status': 'success',
+            'productos_rebalanceados': count,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[REBALANCEAR_SHARDS_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def reconciliar_stock_cache(self):
+    """
+    📦 TAREA: Reconciliar proyección de stock en Redis
+    
+    Ejecuta cada 5 minutos (configurado en celery.py)
+    
+    Compara el stock disponible publicado en Redis con la BD y corrige las
+    claves desviadas (deltas perdidos, caídas de Redis, escrituras cruzadas).
+    """
+    from .utils.stock_cache import StockCache
+    
+    try:
+        resultado = StockCache.reconciliar()
+        
+        logger.info(
+            f'[STOCK_CACHE_RECONCILIADO] Revisados: {resultado["revisados"]}, '
+            f'corregidos: {resultado["corregidos"]}'
+        )
+        return {
+            'status': 'success',
+            **resultado,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[RECONCILIAR_STOCK_CACHE_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task(bind=True, max_retries=3)
+def precalcular_productos_relacionados(self):
+    """
+    🔗 TAREA: Precalcular productos relacionados
+    
+    Ejecuta cada hora (configurado en celery.py)
+    
+    Combina compras conjuntas, favoritos en común y categoría para cada
+    producto activo y guarda los IDs de sus vecinos en caché.
+    """
+    from .utils.relacionados import ProductosRelacionados
+    
+    try:
+        count = ProductosRelacionados.precalcular()
+        
+        logger.info(f'[RELACIONADOS_PRECALCULADOS] Total productos: {count}')
+        return {
+            'status': 'success',
+            'productos_procesados': count,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[PRECALCULAR_RELACIONADOS_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=300)
+
+
+@shared_task(bind=True, max_retries=3)
+def actualizar_recomendaciones(self, completo=False):
+    """
+    🧮 TAREA: Actualizar índice de co-compra (recomendaciones)
+    
+    Ejecuta cada 15 minutos (incremental) y cada noche (completo),
+    configurado en celery.py
+    
+    Args:
+        completo: Reconstruir la matriz desde cero
+    """
+    from .utils.recomendaciones import actualizar_indice
+    
+    try:
+        resultado = actualizar_indice(completo=completo)
+        
+        logger.info(
+            f'[RECOMENDACIONES_ACTUALIZADAS] Líneas: {resultado["lineas"]}, '
+            f'productos: {resultado["productos_actualizados"]}, '
+            f'tiempo: {resultado["segundos"]}s'
+        )
+        return {
+            'status': 'success',
+            **resultado,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[ACTUALIZAR_RECOMENDACIONES_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=300)
+
+
+@shared_task(bind=True, max_retries=3)
+def volcar_sesiones(self):
+    """
+    🔑 TAREA: Volcar sesiones (write-behind Redis → Postgres)
+    
+    Ejecuta cada minuto (configurado en celery.py)
+    
+    Las rotaciones de refresh tokens solo escriben en Redis. Esta tarea
+    vuelca a refresh_tokens el token actual, expiración y último uso de las
+    familias modificadas, y marca como revocadas las familias eliminadas.
+    """
+    from .utils import sesiones
+    
+    try:
+        resultado = sesiones.volcar_pendientes()
+        
+        logger.info(
+            f'[SESIONES_VOLCADAS] Actualizadas: {resultado["actualizadas"]}, '
+            f'revocadas: {resultado["revocadas"]}'
+        )
+        return {
+            'status': 'success',
+            **resultado,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[VOLCAR_SESIONES_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=30)
+
+
+@shared_task(bind=True, max_retries=3, ignore_result=True)
+def registrar_intento_login(self, ip_address=None, username=None, success=False,
+                            user_agent=None, cuenta=None, email=None, rol=None):
+    """
+    🔐 TAREA: Registrar intento de login
+    
+    Encolada por la vista de login para no escribir LoginAttempt ni
+    loguear dentro de la petición. El bloqueo por fuerza bruta no depende
+    de esta fila: usa los contadores en caché de IntentosLogin (si la caché
+    falla, la vista escribe la fila en línea y el bloqueo se calcula con ella).
+    """
+    from .utils.intentos_login import IntentosLogin
+    
+    try:
+        IntentosLogin.procesar(
+            ip_address=ip_address,
+            username=username,
+            success=success,
+            user_agent=user_agent,
+            cuenta=cuenta,
+            email=email,
+            rol=rol
+        )
+    except Exception as exc:
+        logger.error(f'[REGISTRAR_INTENTO_LOGIN_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=10)
+
+
+@shared_task(bind=True, max_retries=5)
+def enviar_lote_correos(self):
+    """
+    📮 TAREA: Enviar lote de correos
+    
+    La programa el primer email encolado (tras unos segundos para juntar
+    más) y, como respaldo, beat cada minuto. Envía toda la cola de Redis en
+    lotes de CORREO_LOTE por la conexión SMTP persistente del worker.
+    
+    Si la conexión cae dos veces seguidas los mensajes vuelven a la cola y
+    la tarea se reintenta con backoff exponencial + jitter.
+    """
+    from .utils import correo
+    
+    try:
+        enviados = correo.drenar()
+        if enviados:
+            logger.info(f'[CORREO_LOTE] Enviados: {enviados}')
+        return {
+            'status': 'success',
+            'enviados': enviados,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except correo.EnvioInterrumpido as exc:
+        logger.error(f'[CORREO_LOTE_ERROR] {str(exc)} | Pendientes: {len(exc.pendientes)}')
+        raise self.retry(exc=exc, countdown=correo.espera_reintento(self.request.retries))
+
+
+@shared_task(bind=True, max_retries=3)
+def calcular_analitica(self, dias=None):
+    """
+    📈 TAREA: Calcular analítica de embudo, cohortes y abandono
+    
+    Ejecuta cada hora para las ventanas de DIAS_PROGRAMADOS (configurado en
+    celery.py) y bajo demanda cuando el admin pide una ventana sin caché.
+    Lee de una réplica si hay alguna (solo escribe en caché).
+    
+    Args:
+        dias: Ventana en días (None = todas las programadas)
+    """
+    from .db_router import lectura_replica
+    from .utils import analitica
+    
+    ventanas = [dias] if dias else analitica.DIAS_PROGRAMADOS
+    
+    try:
+        with lectura_replica():
+            resultados = [analitica.calcular(ventana) for ventana in ventanas]
+        return {
+            'status': 'success',
+            'ventanas': {r['dias']: r['segundos'] for r in resultados},
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[CALCULAR_ANALITICA_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=300)
+
+
+@shared_task(bind=True, max_retries=5)
+def volcar_auditoria(self):
+    """
+    🔍 TAREA: Volcar auditoría del admin
+    
+    La programa la primera acción encolada (tras unos segundos para juntar
+    más) y, como respaldo, beat cada minuto. Inserta la cola de Redis en
+    audit_logs con bulk_create en lotes de AUDITORIA_LOTE.
+    """
+    from .utils import audit
+    
+    try:
+        insertadas = audit.volcar()
+        if insertadas:
+            logger.info(f'[AUDITORIA_VOLCADA] Filas: {insertadas}')
+        return {
+            'status': 'success',
+            'insertadas': insertadas,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[VOLCAR_AUDITORIA_ERROR] {str(exc)}')
+        raise self.retry(exc=exc, countdown=30)
+
+
+@shared_task(bind=True, max_retries=3)
+def purgar_auditoria(self, hasta_id):
+    """
+    🧹 TAREA: Vaciar historial de auditoría
+    
+    Encolada por DELETE /api/admin/historial/clear_all/. Borra por rangos
+    de id hasta `hasta_id` y deja el progreso en caché
+    (GET /api/admin/historial/purga/).
+    
+    Args:
+        hasta_id: Último id incluido en la purga
+    """
+    from .utils import audit
+    
+    try:
+        eliminados = audit.purgar(hasta_id)
+        logger.info(f'[AUDITORIA_PURGADA] Filas: {eliminados}, hasta id: {hasta_id}')
+        return {
+            'status': 'success',
+            'eliminados': eliminados,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[PURGAR_AUDITORIA_ERROR] {str(exc)}')
+        if self.request.retries >= self.max_retries:
+            # Sin más reintentos: que clear_all no se quede viendo 'en_curso'
+            audit.marcar_purga_fallida(str(exc))
+            raise
         raise self.retry(exc=exc, countdown=60)
+
+
+@shared_task(bind=True, ignore_result=True)
+def expirar_reservas_vencidas(self):
+    """
+    ⏱️ TAREA: Expirar reservas vencidas (temporizador en Redis)
+    
+    Beat cada 5 segundos. Extrae del sorted set `reservas:expiracion` las
+    reservas con expires_at <= ahora y las libera en bloque. Sin nada
+    vencido es un único ZRANGEBYSCORE; sin Redis no hace nada.
+    
+    Sin reintentos: la siguiente ejecución llega en segundos y los ids de
+    un lote fallido vuelven al sorted set.
+    """
+    from .utils import expiracion_reservas
+    
+    try:
+        liberadas = expiracion_reservas.procesar_vencidas()
+        if liberadas:
+            logger.info(f'[RESERVAS_EXPIRADAS] Liberadas al vencer: {liberadas}')
+        return {
+            'status': 'success',
+            'reservas_liberadas': liberadas,
+            'timestamp': timezone.now().isoformat()
+        }
+    
+    except Exception as exc:
+        logger.error(f'[EXPIRAR_RESERVAS_ERROR] {str(exc)}')
+        return {
+            'status': 'error',
+            'error': str(exc),
+            'timestamp': timezone.now().isoformat()
+        }
+
+
+@shared_task(bind=True, ignore_result=True)
+def medir_lag_replicas(self):
+    """
+    🗄️ TAREA: Medir el retraso de las réplicas de lectura
+    
+    Beat cada 15 segundos. Deja en caché el lag de cada réplica; el router
+    (api/db_router.py) descarta las atrasadas o caídas y, con
+    DB_REPLICA_SELECCION='menor_lag', elige la más al día. Sin réplicas
+    configuradas no hace nada.
+    """
+    from django.conf import settings
+    from .db_router import medir_lag_replicas as medir
+    
+    if not settings.DB_REPLICAS:
+        return {'status': 'success', 'replicas': {}, 'timestamp': timezone.now().isoformat()}
+    
+    lags = medir()
+    atrasadas = [alias for alias, lag in lags.items() if lag > settings.DB_REPLICA_LAG_MAXIMO]
+    if atrasadas:
+        logger.warning(f'[REPLICAS_ATRASADAS] {atrasadas} (lags: {lags})')
+    return {
+        'status': 'success',
+        'replicas': lags,
+        'timestamp': timezone.now().isoformat()
+    }
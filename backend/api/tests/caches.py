@@ -0,0 +1,61 @@
+"""
+🧰 CACHÉS PARA TESTS
+═══════════════════════════════════════════════════════════════════════════════
+
+Fijan el backend de caché de un test para que el resultado no dependa de
+si hay un Redis escuchando en 127.0.0.1:6379:
+- LOCAL: LocMemCache. get_redis() retorna None → rutas de fallback a BD
+- REDIS_CAIDO: django_redis contra un puerto cerrado. La caché de Django
+  ignora los errores (IGNORE_EXCEPTIONS) pero get_redis() retorna un
+  cliente cuyos comandos lanzan RedisError (Redis caído en producción)
+- redis_falso(): django_redis sobre un servidor fakeredis nuevo; la caché
+  de Django y get_redis() comparten los datos. Requiere fakeredis (y lupa
+  para los scripts Lua)
+
+Uso:
+    @override_settings(CACHES=LOCAL)
+    class TestFallback: ...
+    
+    with override_settings(CACHES=redis_falso()):
+        ...
+"""
+
+import itertools
+
+_SESIONES = {'BACKEND': 'api.cache_backends.LocMemCache', 'LOCATION': 'session-cache'}
+
+LOCAL = {
+    'default': {'BACKEND': 'api.cache_backends.LocMemCache', 'LOCATION': 'tests'},
+    'sessions': _SESIONES,
+}
+
+REDIS_CAIDO = {
+    'default': {
+        'BACKEND': 'api.cache_backends.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:1/1',
+        'OPTIONS': {'IGNORE_EXCEPTIONS': True, 'SOCKET_CONNECT_TIMEOUT': 0.1, 'SOCKET_TIMEOUT': 0.1},
+    },
+    'sessions': _SESIONES,
+}
+
+_servidores = itertools.count()
+
+
+def redis_falso():
+    """CACHES con un servidor fakeredis vacío (uno por llamada)"""
+    import fakeredis
+    
+    return {
+        'default': {
+            'BACKEND': 'api.cache_backends.RedisCache',
+            # django_redis guarda los pools por URL a nivel de proceso: una URL por servidor
+            'LOCATION': f'redis://fakeredis-{next(_servidores)}:6379/1',
+            'OPTIONS': {
+                'CONNECTION_POOL_KWARGS': {
+                    'connection_class': fakeredis.FakeConnection,
+                    'server': fakeredis.FakeServer(),
+                },
+            },
+        },
+        'sessions': _SESIONES,
+    }
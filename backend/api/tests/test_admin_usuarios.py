@@ -0,0 +1,99 @@
+"""
+👥 TESTS DEL DIRECTORIO DE USUARIOS DEL ADMIN
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Paginación keyset: las páginas recorren todos los usuarios sin repetir
+✅ Una búsqueda con más de una página tiene página 2 (antes se cortaba a 100)
+✅ total_pedidos sin cargar los pedidos (consultas constantes por página)
+✅ Total exacto fuera de PostgreSQL
+"""
+
+import pytest
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from api.models import Pedido
+
+
+URL = '/api/admin/users/'
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def cliente_admin():
+    admin = User.objects.create_user(username='jefe', email='jefe@example.com', password='x')
+    admin.profile.rol = 'admin'
+    admin.profile.save()
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    return client
+
+
+@pytest.fixture
+def usuarios():
+    return [
+        User.objects.create_user(
+            username=f'cliente{i:03d}',
+            email=f'cliente{i:03d}@example.com',
+            first_name='Ana' if i % 2 else 'Luis',
+        )
+        for i in range(30)
+    ]
+
+
+def recorrer(client, url):
+    """Sigue los cursores `next` y retorna (ids, respuestas)"""
+    ids, respuestas = [], []
+    while url:
+        data = client.get(url).json()
+        respuestas.append(data)
+        ids.extend(u['id'] for u in data['results'])
+        url = data['next']
+    return ids, respuestas
+
+
+@pytest.mark.django_db
+class TestDirectorioUsuarios:
+    """Listado /api/admin/users/"""
+    
+    def test_keyset_recorre_todos_sin_repetir(self, cliente_admin, usuarios):
+        ids, respuestas = recorrer(cliente_admin, f'{URL}?page_size=7')
+        
+        assert len(respuestas) == 5
+        assert ids == sorted(ids, reverse=True)
+        assert len(ids) == len(set(ids)) == User.objects.count()
+        assert respuestas[0]['count'] == User.objects.count()
+        assert respuestas[0]['count_estimado'] is False
+    
+    def test_busqueda_tiene_segunda_pagina(self, cliente_admin, usuarios):
+        ids, respuestas = recorrer(cliente_admin, f'{URL}?search=ana&page_size=10')
+        
+        assert len(respuestas) == 2
+        assert set(ids) == {u.id for u in usuarios if u.first_name == 'Ana'}
+        assert respuestas[0]['count'] == 15
+    
+    def test_total_pedidos_con_consultas_constantes(self, cliente_admin, usuarios, django_assert_max_num_queries):
+        for usuario in usuarios[:3]:
+            for _ in range(2):
+                Pedido.objects.create(
+                    usuario=usuario,
+                    total=Decimal('10.00'),
+                    direccion_entrega='Calle 1',
+                    telefono='600000000',
+                )
+        
+        # Sesión/throttle/permisos + conteo + página: no depende de usuarios ni pedidos
+        with django_assert_max_num_queries(6):
+            data = cliente_admin.get(f'{URL}?page_size=100').json()
+        
+        pedidos = {u['id']: u['total_pedidos'] for u in data['results']}
+        assert all(pedidos[u.id] == 2 for u in usuarios[:3])
+        assert pedidos[usuarios[3].id] == 0
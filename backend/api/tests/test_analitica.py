@@ -0,0 +1,189 @@
+"""
+📈 TESTS DE ANALÍTICA DE EMBUDO, COHORTES Y ABANDONO
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Embudo ordenado: un paso solo cuenta si ocurre después del anterior
+✅ Matriz de retención por cohorte mensual
+✅ Abandono de carrito (ventana en horas) y de checkout
+✅ Lectura columnar por bloques keyset (epoch y códigos calculados en SQL)
+✅ Endpoints del admin: 202 mientras se calcula (una tarea por ventana) y
+   después leen el resultado cacheado
+"""
+
+import pytest
+from unittest import mock
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+import numpy as np
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import CartAuditLog, StockReservation, Pedido, Producto
+from api.tests.caches import LOCAL
+from api.utils import analitica
+from api.utils.analitica import ACCIONES_CARRITO as A, ESTADOS_RESERVA as R, ESTADOS_PEDIDO as P
+
+HORA = 3600
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+def columnas(filas, codigo):
+    filas = list(filas)
+    return {
+        'usuario': np.array([f[0] for f in filas], dtype=np.int32),
+        codigo: np.array([f[1] for f in filas], dtype=np.int8),
+        't': np.array([f[2] for f in filas], dtype=np.int64),
+    }
+
+
+def eventos(carrito=(), reservas=(), pedidos=()):
+    """Eventos en memoria a partir de tuplas (usuario, código, epoch)"""
+    return {
+        'carrito': columnas(carrito, 'accion'),
+        'reservas': columnas(reservas, 'estado'),
+        'pedidos': columnas(pedidos, 'estado'),
+    }
+
+
+def epoch(anio, mes, dia=15):
+    return int(datetime(anio, mes, dia, tzinfo=dt_timezone.utc).timestamp())
+
+
+class TestInformes:
+    """Informes vectorizados sobre columnas"""
+    
+    def test_embudo_respeta_el_orden(self):
+        datos = eventos(
+            carrito=[(1, A['add'], 10), (2, A['add'], 10), (4, A['add'], 10), (3, A['remove'], 10)],
+            reservas=[
+                (1, R['confirmed'], 20),
+                (2, R['pending'], 5),      # antes de agregar al carrito: no cuenta
+                (2, R['cancelled'], 15),
+            ],
+            pedidos=[(1, P['entregado'], 30), (3, P['confirmado'], 30)],
+        )
+        
+        pasos = analitica.embudo(datos)
+        
+        assert [p['paso'] for p in pasos] == ['carrito', 'checkout', 'pago', 'pedido']
+        assert [p['usuarios'] for p in pasos] == [3, 2, 1, 1]
+        assert [p['conversion_paso'] for p in pasos] == [100.0, 66.67, 50.0, 100.0]
+        assert pasos[-1]['conversion_total'] == 33.33
+    
+    def test_retencion_por_cohorte(self):
+        datos = eventos(
+            carrito=[(1, A['add'], epoch(2025, 1)), (3, A['add'], epoch(2025, 1)), (2, A['add'], epoch(2025, 2))],
+            pedidos=[(1, P['entregado'], epoch(2025, 3)), (1, P['entregado'], epoch(2025, 3, 20))],
+        )
+        
+        assert analitica.cohortes(datos) == [
+            {'mes': '2025-01', 'usuarios': 2, 'retencion': [100.0, 0.0, 50.0]},
+            {'mes': '2025-02', 'usuarios': 1, 'retencion': [100.0, 0.0]},
+        ]
+    
+    def test_abandono(self):
+        t0 = epoch(2025, 6)
+        datos = eventos(
+            carrito=[(u, A['add'], t0) for u in (1, 2, 3, 4)] + [(1, A['add'], t0 + 10)],
+            reservas=[(1, R['confirmed'], t0), (2, R['confirmed'], t0), (3, R['cancelled'], t0),
+                      (4, R['expired'], t0), (5, R['pending'], t0)],
+            pedidos=[
+                (1, P['pendiente'], t0 + HORA),
+                (2, P['entregado'], t0 + 48 * HORA),  # fuera de la ventana de 24 h
+                (4, P['cancelado'], t0 + HORA),
+            ],
+        )
+        
+        resultado = analitica.abandono(datos)
+        
+        assert resultado['carritos'] == 4
+        assert resultado['carritos_abandonados'] == 3
+        assert resultado['tasa_abandono_carrito'] == 75.0
+        assert resultado['tasa_abandono_checkout'] == 50.0
+        assert resultado['reservas_pendientes'] == 1
+        assert resultado['por_semana'] == [
+            {'semana': '2025-06-09', 'carritos': 4, 'abandonados': 3, 'tasa_abandono': 75.0}
+        ]
+    
+    def test_sin_eventos(self):
+        datos = eventos()
+        
+        assert [p['usuarios'] for p in analitica.embudo(datos)] == [0, 0, 0, 0]
+        assert analitica.cohortes(datos) == []
+        assert analitica.abandono(datos)['tasa_abandono_carrito'] == 0.0
+
+
+@pytest.fixture
+def actividad():
+    """Dos clientes con carrito, reserva y (uno) pedido"""
+    producto = Producto.objects.create(nombre='Café', descripcion='-', precio=Decimal('5.00'), stock_total=50)
+    clientes = [User.objects.create_user(username=f'cliente{i}', password='x') for i in range(2)]
+    for cliente in clientes:
+        CartAuditLog.objects.create(user=cliente, action='add', product_id=producto.id)
+        CartAuditLog.objects.create(user=cliente, action='update', product_id=producto.id)
+    StockReservation.objects.create(
+        usuario=clientes[0], producto=producto, cantidad=1, status='confirmed',
+        expires_at=timezone.now() + timedelta(minutes=15)
+    )
+    Pedido.objects.create(
+        usuario=clientes[0], total=Decimal('5.00'), estado='confirmado',
+        direccion_entrega='Calle 1', telefono='600000000'
+    )
+    return clientes
+
+
+@pytest.mark.django_db
+class TestLecturaYEndpoints:
+    """Extracción desde la BD y vistas del admin"""
+    
+    def test_lectura_por_bloques(self, actividad):
+        datos = analitica.extraer_eventos(30, lote=3)
+        carrito = datos['carrito']
+        
+        esperado = list(CartAuditLog.objects.order_by('id').values_list('user_id', 'action', 'timestamp'))
+        assert carrito['usuario'].tolist() == [fila[0] for fila in esperado]
+        assert carrito['accion'].tolist() == [A[fila[1]] for fila in esperado]
+        assert carrito['t'].tolist() == [int(fila[2].timestamp()) for fila in esperado]
+        assert datos['reservas']['estado'].tolist() == [R['confirmed']]
+        assert datos['pedidos']['total'].tolist() == [5.0]
+    
+    def test_endpoints_admin(self, actividad):
+        admin = User.objects.create_user(username='jefe', password='x')
+        admin.profile.rol = 'admin'
+        admin.profile.save()
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        
+        # Sin resultado: 202 y el cálculo se encola una sola vez por ventana
+        with mock.patch('api.tasks.calcular_analitica.delay') as encolar:
+            for _ in range(2):
+                respuesta = client.get('/api/admin/estadisticas/embudo/?dias=30')
+                assert respuesta.status_code == 202
+                assert respuesta.json() == {'estado': 'calculando', 'dias': 30}
+        encolar.assert_called_once_with(30)
+        
+        # El worker termina: las siguientes consultas leen la caché
+        analitica.calcular(30)
+        embudo = client.get('/api/admin/estadisticas/embudo/?dias=30')
+        assert embudo.status_code == 200
+        assert [p['usuarios'] for p in embudo.json()['embudo']] == [2, 1, 1, 1]
+        assert cache.get(analitica.clave_resultado(30)) is not None
+        
+        abandono = client.get('/api/admin/estadisticas/abandono/?dias=30').json()
+        assert abandono['abandono']['tasa_abandono_carrito'] == 50.0
+        assert client.get('/api/admin/estadisticas/cohortes/?dias=30').json()['cohortes'][0]['usuarios'] == 2
+        
+        assert client.get('/api/admin/estadisticas/embudo/?dias=12').status_code == 400
+        
+        client.force_authenticate(user=actividad[1])
+        assert client.get('/api/admin/estadisticas/embudo/').status_code == 403
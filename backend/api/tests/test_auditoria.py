@@ -0,0 +1,161 @@
+"""
+🔍 TESTS DEL MOTOR DE AUDITORÍA
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Instantánea desde los campos del modelo: sin imagen_url, password ni blobs
+✅ Textos largos recortados y detalles con tope de tamaño
+✅ Edición de producto: solo los campos que cambiaron (no request.data)
+✅ Cola en Redis: nada se inserta hasta el volcado, que usa bulk_create
+✅ Un lote movido a `auditoria:procesando` por un volcado que murió no se pierde
+"""
+
+import pytest
+from unittest import mock
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from rest_framework.test import APIClient
+from api.models import AuditLog, Producto
+from api.tests.caches import LOCAL
+from api.utils import audit
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # Sin Redis: registrar_* inserta la fila en el momento (TestColaEnRedis usa fakeredis)
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.fixture
+def admin():
+    usuario = User.objects.create_user(username='jefe', password='x')
+    usuario.profile.rol = 'admin'
+    usuario.profile.save()
+    return usuario
+
+
+@pytest.fixture
+def producto(admin):
+    return Producto.objects.create(
+        nombre='Café', descripcion='Tostado', precio=Decimal('10.00'),
+        stock_total=20, creado_por=admin, imagen_url='data:image/png;base64,' + 'A' * 50000
+    )
+
+
+def peticion(usuario):
+    request = RequestFactory().post('/', REMOTE_ADDR='10.0.0.1')
+    request.user = usuario
+    return request
+
+
+@pytest.mark.django_db
+class TestValores:
+    """instantanea() y diferencias()"""
+    
+    def test_excluye_imagen_password_y_autor(self, admin, producto):
+        datos = audit.instantanea(producto)
+        
+        assert 'imagen_url' not in datos
+        assert datos['precio'] == '10.00'
+        assert datos['stock_total'] == 20 and 'creado_por_id' not in datos
+        assert 'password' not in audit.instantanea(admin)
+    
+    def test_recorta_textos_largos(self, producto):
+        producto.descripcion = 'x' * 5000
+        
+        valor = audit.instantanea(producto)['descripcion']
+        
+        assert len(valor) < 600
+        assert valor.endswith('(5000 caracteres)')
+    
+    def test_tope_de_detalles(self, admin):
+        cambios = {f'campo{i}': 'y' * 400 for i in range(100)}
+        
+        log = audit.registrar_accion(peticion(admin), 'editar', 'producto', 1, 'x', {'cambios_realizados': cambios})
+        
+        assert 'omitido' in log.detalles['cambios_realizados']
+    
+    def test_diferencias(self):
+        assert audit.diferencias({'a': 1, 'b': 2}, {'a': 1, 'b': 3}) == {'b': {'anterior': 2, 'nuevo': 3}}
+
+
+@pytest.mark.django_db
+def test_edicion_de_producto_solo_campos_cambiados(admin, producto):
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    
+    response = client.patch(f'/api/admin/productos/{producto.id}/', {
+        'precio': '12.50',
+        'descripcion': 'Tostado',           # sin cambio
+        'imagen_url': 'B' * 200000,          # de solo lectura: nunca se audita
+    }, format='json')
+    
+    assert response.status_code == 200
+    log = AuditLog.objects.get(accion='editar')
+    assert log.detalles == {'cambios_realizados': {'precio': {'anterior': '10.00', 'nuevo': '12.50'}}}
+
+
+@pytest.mark.django_db
+class TestColaEnRedis:
+    """Escritura en lote"""
+    
+    @pytest.fixture
+    def redis(self):
+        fakeredis = pytest.importorskip('fakeredis')
+        servidor = fakeredis.FakeStrictRedis()
+        with mock.patch('api.utils.audit.get_redis', return_value=servidor), \
+                mock.patch('api.tasks.volcar_auditoria.apply_async') as programar:
+            yield servidor, programar
+    
+    def test_encola_y_vuelca_en_lote(self, redis, admin, producto, django_assert_num_queries):
+        servidor, programar = redis
+        logs = [audit.registrar_creacion(peticion(admin), 'producto', producto) for _ in range(3)]
+        
+        assert AuditLog.objects.count() == 0
+        assert servidor.llen(audit.CLAVE_COLA) == 3
+        programar.assert_called_once()
+        
+        with django_assert_num_queries(1):
+            assert audit.volcar(lote=10) == 3
+        
+        guardados = list(AuditLog.objects.order_by('id'))
+        assert [g.timestamp for g in guardados] == [log.timestamp for log in logs]
+        assert guardados[0].usuario == admin
+        assert guardados[0].detalles['datos_creados']['nombre'] == 'Café'
+        assert servidor.llen(audit.CLAVE_COLA) == 0
+    
+    def test_fallo_devuelve_el_lote_a_la_cola(self, redis, admin, producto):
+        servidor, _ = redis
+        audit.registrar_creacion(peticion(admin), 'producto', producto)
+        
+        with mock.patch.object(AuditLog.objects, 'bulk_create', side_effect=RuntimeError('bd caída')):
+            with pytest.raises(RuntimeError):
+                audit.volcar()
+        
+        assert servidor.llen(audit.CLAVE_COLA) == 1
+        assert not servidor.exists(audit.CLAVE_PROCESANDO, audit.CLAVE_VOLCANDO)
+    
+    def test_recupera_lote_de_un_volcado_muerto(self, redis, admin, producto):
+        servidor, _ = redis
+        logs = [audit.registrar_creacion(peticion(admin), 'producto', producto) for _ in range(3)]
+        
+        # Worker muerto (SIGKILL) tras mover el lote y antes del INSERT
+        servidor.lmove(audit.CLAVE_COLA, audit.CLAVE_PROCESANDO, 'LEFT', 'RIGHT')
+        servidor.lmove(audit.CLAVE_COLA, audit.CLAVE_PROCESANDO, 'LEFT', 'RIGHT')
+        
+        assert audit.volcar() == 3
+        assert [g.timestamp for g in AuditLog.objects.order_by('id')] == [log.timestamp for log in logs]
+        assert not servidor.exists(audit.CLAVE_COLA, audit.CLAVE_PROCESANDO)
+    
+    def test_un_volcado_a_la_vez(self, redis, admin, producto):
+        servidor, _ = redis
+        audit.registrar_creacion(peticion(admin), 'producto', producto)
+        servidor.set(audit.CLAVE_VOLCANDO, 1)
+        
+        assert audit.volcar() == 0
+        assert servidor.llen(audit.CLAVE_COLA) == 1
@@ -0,0 +1,178 @@
+"""
+🌐 TESTS DE CACHÉ HTTP (Cache-Control, GET condicional, Surrogate-Key)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Los GET públicos envían Cache-Control, ETag, Last-Modified y Surrogate-Key
+✅ If-None-Match coincidente → 304 sin ejecutar la vista
+✅ El ETag cambia al editar un producto, reservar stock o marcar favorito
+✅ Guardar/eliminar un producto purga sus claves una sola vez, tras el commit
+✅ ProxyLocal (sustituto de Varnish) sirve desde caché hasta la purga
+✅ PurgadorHTTP envía PURGE con las claves a cada proxy
+"""
+
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.models import Favorito, Producto
+from api.tests.caches import LOCAL
+from api.utils import cache_http
+
+PROXY_LOCAL = 'api.utils.cache_http.ProxyLocal'
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # Los vecinos precalculados se leen de la caché: no depender de Redis
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        cache_http.descartar_pendientes()
+        yield
+        cache.clear()
+        cache_http.descartar_pendientes()
+
+
+@pytest.fixture
+def productos(db):
+    productos = [
+        Producto.objects.create(nombre=f'Producto {i}', descripcion='Catálogo', precio=10 + i,
+                                categoria='herramientas' if i == 2 else 'electrodomesticos',
+                                stock_total=5, activo=True, en_all_products=True, en_carrusel=i == 0)
+        for i in range(3)
+    ]
+    cache_http.descartar_pendientes()  # Purgas de la creación
+    return productos
+
+
+@pytest.fixture
+def proxy():
+    with override_settings(CACHE_HTTP_PURGADOR=PROXY_LOCAL):
+        cache_http._purgadores.pop(PROXY_LOCAL, None)
+        yield cache_http.obtener_purgador()
+
+
+@pytest.mark.django_db
+class TestCabeceras:
+    """Política, validadores y Surrogate-Key de cada vista"""
+    
+    def test_catalogo(self, productos):
+        respuesta = APIClient().get(reverse('catalogo-productos'), {'categoria': 'electrodomesticos'})
+        
+        assert respuesta.status_code == 200
+        assert set(respuesta['Cache-Control'].split(', ')) == {'public', 'max-age=60', 'stale-while-revalidate=300'}
+        assert respuesta['ETag'].startswith('"')
+        assert 'Last-Modified' in respuesta
+        assert respuesta['Surrogate-Key'] == 'catalogo categoria:electrodomesticos'
+    
+    def test_detalle_con_relacionados(self, productos):
+        producto, relacionado, _ = productos
+        cache.set(f'relacionados:{producto.pk}', [relacionado.pk])
+        
+        respuesta = APIClient().get(f'/api/productos/{producto.pk}/')
+        assert respuesta['Surrogate-Key'] == f'producto:{producto.pk} producto:{relacionado.pk}'
+        
+        # El relacionado está en el ámbito: editarlo cambia el ETag del detalle
+        relacionado.precio = 99
+        relacionado.save()
+        assert APIClient().get(f'/api/productos/{producto.pk}/')['ETag'] != respuesta['ETag']
+    
+    def test_sin_cache_en_errores(self, productos):
+        for url in ('/api/productos/999999/', '/api/productos/abc/'):
+            respuesta = APIClient().get(url)
+            assert respuesta.status_code == 404
+            assert 'Cache-Control' not in respuesta and 'ETag' not in respuesta
+
+
+@pytest.mark.django_db
+class TestGetCondicional:
+    """If-None-Match / If-Modified-Since"""
+    
+    def test_304_sin_ejecutar_la_vista(self, productos, django_assert_max_num_queries):
+        url = reverse('productos-carrusel')
+        etag = APIClient().get(url)['ETag']
+        
+        with django_assert_max_num_queries(2):  # Solo los dos agregados
+            respuesta = APIClient().get(url, HTTP_IF_NONE_MATCH=f'W/{etag}')
+        assert respuesta.status_code == 304
+        assert respuesta['ETag'] == etag
+        assert respuesta['Surrogate-Key'] == 'carrusel'
+        assert not respuesta.content
+    
+    def test_etag_cambia(self, productos):
+        url = '/api/productos/'
+        etags = [APIClient().get(url)['ETag']]
+        
+        productos[1].nombre = 'Renombrado'
+        productos[1].save()
+        etags.append(APIClient().get(url)['ETag'])
+        
+        productos[2].reservar_stock(1)  # UPDATE sin tocar updated_at
+        etags.append(APIClient().get(url)['ETag'])
+        
+        Favorito.objects.create(usuario=User.objects.create_user('fan', password='x'), producto=productos[0])
+        etags.append(APIClient().get(url)['ETag'])
+        
+        assert len(set(etags)) == 4
+        assert APIClient().get(url, HTTP_IF_NONE_MATCH=etags[-1]).status_code == 304
+
+
+@pytest.mark.django_db
+class TestPurga:
+    """Producto.save/delete y receivers → purgador"""
+    
+    def test_una_purga_tras_el_commit(self, productos, proxy, django_capture_on_commit_callbacks):
+        producto = productos[0]
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            producto.save()
+        assert proxy.purgas == []
+        
+        for callback in callbacks:
+            callback()
+        assert proxy.purgas == [sorted(cache_http.claves_producto(producto))]
+    
+    def test_proxy_local(self, productos, proxy, django_capture_on_commit_callbacks):
+        client = APIClient()
+        producto, _, otro = productos  # `otro`: de otra categoría, no relacionado
+        url_producto, url_otro = f'/api/productos/{producto.pk}/', f'/api/productos/{otro.pk}/'
+        for url in (url_producto, url_otro, reverse('catalogo-productos'), url_producto):
+            proxy.get(client, url)
+        assert (proxy.aciertos, proxy.fallos) == (1, 3)
+        
+        with django_capture_on_commit_callbacks(execute=True):
+            producto.delete()
+        
+        assert proxy.get(client, url_producto).status_code == 404  # Purgado: vuelve a Django
+        proxy.get(client, url_otro)  # Otro producto: sigue en el proxy
+        assert (proxy.aciertos, proxy.fallos) == (2, 4)
+
+
+def test_purgador_http():
+    recibidas = []
+    
+    class Proxy(BaseHTTPRequestHandler):
+        def do_PURGE(self):
+            recibidas.append((self.path, self.headers['xkey-purge']))
+            self.send_response(200)
+            self.end_headers()
+        
+        def log_message(self, *args):
+            pass
+    
+    servidor = HTTPServer(('127.0.0.1', 0), Proxy)
+    hilo = threading.Thread(target=servidor.handle_request)
+    hilo.start()
+    try:
+        with override_settings(CACHE_HTTP_PURGA_URLS=[f'http://127.0.0.1:{servidor.server_port}/'],
+                               CACHE_HTTP_PURGA_CABECERA='xkey-purge'):
+            cache_http.PurgadorHTTP().purgar(['producto:7', 'catalogo'])
+        hilo.join(timeout=5)
+    finally:
+        servidor.server_close()
+    
+    assert recibidas == [('/', 'producto:7 catalogo')]
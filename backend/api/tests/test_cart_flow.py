@@ -14,6 +14,7 @@ Tests para verificar:
 
 import json
 import pytest
+from unittest import mock
 from django.urls import reverse
 from rest_framework.test import APIClient
 from api.models import Producto, Cart, CartItem
@@ -301,6 +302,35 @@ class TestCartFlow:
         assert 'error' in data
         assert 'Stock insuficiente' in data['error']
 
+    def test_checkout_error_libera_todo_el_stock(self, api_client, test_user, test_products):
+        """❌ Si falla crear una reserva se libera también el stock de ese item"""
+        from api.models import StockReservation
+        api_client.force_authenticate(user=test_user)
+        
+        cart = Cart.objects.create(user=test_user)
+        for producto in test_products[:2]:
+            CartItem.objects.create(cart=cart, product=producto, quantity=3, price_at_addition=producto.precio)
+        
+        crear_reserva = StockReservation.crear_reserva
+        llamadas = []
+        
+        def crear_o_fallar(*args, **kwargs):
+            llamadas.append(kwargs['producto'].id)
+            if len(llamadas) == 2:
+                raise RuntimeError('bd caída')
+            return crear_reserva(*args, **kwargs)
+        
+        # Falla el segundo item: su stock ya está reservado pero su StockReservation no existe
+        with mock.patch.object(StockReservation, 'crear_reserva', side_effect=crear_o_fallar):
+            response = api_client.post(reverse('carrito-checkout'))
+        
+        assert response.status_code == 500
+        assert len(llamadas) == 2
+        for producto in test_products[:2]:
+            producto.refresh_from_db()
+            assert producto.stock_reservado == 0
+        assert not StockReservation.objects.filter(status='pending').exists()
+
     def test_no_autenticado_no_puede_acceder(self, api_client):
         """❌ Usuario no autenticado no puede acceder al carrito"""
         response = api_client.get(reverse('carrito-list'))
@@ -0,0 +1,129 @@
+"""
+🔢 TESTS DEL ALMACÉN DE CÓDIGOS EN REDIS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Registro → verificación sin filas en email_verifications hasta el éxito
+✅ El código se guarda como HMAC y caduca con el TTL
+✅ Intentos fallidos atómicos: 5 fallos bloquean el código
+✅ Reenvío con espera y límite en Redis
+✅ Recuperación de contraseña: fila creada solo al verificar
+
+Usan fakeredis (con lupa para los scripts Lua); se omiten si no está instalado.
+"""
+
+import pytest
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from api.models import EmailVerification, PasswordRecoveryCode
+from api.utils import codigos_verificacion as codigos
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+EMAIL = 'pendiente@example.com'
+
+
+@pytest.fixture(autouse=True)
+def sin_throttle():
+    """Los tests encadenan más peticiones que el límite anónimo de login"""
+    cache.clear()
+    with mock.patch('api.throttles.AnonLoginRateThrottle.allow_request', return_value=True):
+        yield
+    cache.clear()
+
+
+@pytest.fixture
+def redis():
+    servidor = fakeredis.FakeStrictRedis()
+    with mock.patch('api.utils.codigos_verificacion.get_redis', return_value=servidor):
+        yield servidor
+
+
+@pytest.fixture
+def registro(redis):
+    """Registro pendiente; retorna el código enviado por email"""
+    with mock.patch('api.views_verificacion.enviar_email_verificacion.delay') as envio:
+        response = APIClient().post('/api/auth/register-with-verification/', {
+            'username': 'pendiente',
+            'email': EMAIL,
+            'password': 'SecurePass123!',
+            'first_name': 'Pen',
+        }, format='json')
+    assert response.status_code == 201
+    return envio.call_args.kwargs['codigo']
+
+
+def verificar(codigo):
+    return APIClient().post('/api/auth/verify-email/', {'email': EMAIL, 'codigo': codigo}, format='json')
+
+
+@pytest.mark.django_db
+class TestRegistroEnRedis:
+    """Registro pendiente en Redis"""
+    
+    def test_registro_no_escribe_en_bd(self, redis, registro):
+        assert EmailVerification.objects.count() == 0
+        
+        clave = codigos.clave(codigos.REGISTRO, EMAIL)
+        guardado = redis.hgetall(clave)
+        assert guardado[b'codigo'] == codigos.hash_codigo(EMAIL, registro).encode()
+        assert registro.encode() not in guardado.values()
+        assert 0 < redis.ttl(clave) <= 5 * 60
+    
+    def test_verificacion_crea_usuario_y_fila(self, redis, registro):
+        response = verificar(registro)
+        
+        assert response.status_code == 200
+        usuario = User.objects.get(username='pendiente')
+        assert usuario.is_active and usuario.check_password('SecurePass123!')
+        assert EmailVerification.objects.get().verificado
+        assert not redis.exists(codigos.clave(codigos.REGISTRO, EMAIL))
+    
+    def test_cinco_fallos_bloquean_el_codigo(self, registro):
+        incorrecto = '000000' if registro != '000000' else '111111'
+        estados = [verificar(incorrecto).status_code for _ in range(5)]
+        
+        assert estados == [400, 400, 400, 400, 429]
+        assert verificar(registro).status_code == 429
+        assert not User.objects.filter(username='pendiente').exists()
+    
+    def test_codigo_expirado_desaparece(self, redis, registro):
+        redis.delete(codigos.clave(codigos.REGISTRO, EMAIL))
+        
+        response = verificar(registro)
+        
+        assert response.status_code == 400
+        assert EmailVerification.objects.count() == 0
+    
+    def test_reenvio_respeta_espera(self, redis, registro):
+        url = '/api/auth/resend-verification/'
+        clave = codigos.clave(codigos.REGISTRO, EMAIL)
+        
+        with mock.patch('api.views_verificacion.enviar_email_verificacion.delay') as envio:
+            assert APIClient().post(url, {'email': EMAIL}, format='json').status_code == 200
+            assert APIClient().post(url, {'email': EMAIL}, format='json').status_code == 429
+        
+        nuevo = envio.call_args.kwargs['codigo']
+        assert redis.hget(clave, 'reenvios') == b'1'
+        assert verificar(nuevo).status_code == 200
+
+
+@pytest.mark.django_db
+class TestRecuperacionEnRedis:
+    """PasswordRecoveryCode con el código en Redis"""
+    
+    def test_fila_solo_al_verificar(self, redis, django_user_model):
+        usuario = django_user_model.objects.create_user(username='recupera', email='r@example.com', password='x')
+        
+        recovery_code = PasswordRecoveryCode.crear_codigo(usuario)
+        assert recovery_code.pk is None
+        assert PasswordRecoveryCode.verificar_codigo(usuario, '999999' if recovery_code.codigo != '999999' else '888888') is None
+        
+        verificado = PasswordRecoveryCode.verificar_codigo(usuario, recovery_code.codigo)
+        verificado.marcar_verificado()
+        
+        assert PasswordRecoveryCode.objects.get().verificado
+        assert PasswordRecoveryCode.verificar_codigo(usuario, recovery_code.codigo) is None
@@ -0,0 +1,124 @@
+"""
+🚦 TESTS DE COLAS DE CELERY
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Toda tarea de api.tasks tiene ruta a una cola declarada
+✅ Con workers dedicados, una cola de emails lentos no retrasa el inventario
+✅ workers_celery genera un worker por cola con su pool y concurrencia
+
+El test de throughput usa el broker en memoria de kombu y workers de
+celery.contrib.testing en hilos del propio proceso.
+"""
+
+import time
+from contextlib import ExitStack
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from celery import Celery
+from celery.contrib.testing.worker import start_worker
+from django.conf import settings
+from django.core.management import call_command
+
+import api.tasks  # noqa: F401  (registra las tareas)
+from config.celery import app as celery_app
+
+EMAILS = 20
+DURACION_EMAIL = 0.05  # Segundos por envío SMTP simulado
+
+
+def test_todas_las_tareas_enrutadas():
+    tareas = {nombre for nombre in celery_app.tasks if nombre.startswith('api.tasks.')}
+    colas = {cola.name for cola in settings.CELERY_TASK_QUEUES}
+    
+    assert tareas == set(settings.CELERY_TASK_ROUTES)
+    assert {ruta['queue'] for ruta in settings.CELERY_TASK_ROUTES.values()} <= colas
+    for cola in settings.WORKERS_CELERY:
+        assert cola in colas
+
+
+@pytest.fixture(scope='module')
+def prueba():
+    """
+    App con broker en memoria y dos tareas que simulan las reales, con sus
+    rutas de settings. Una sola app por proceso: el worker embebido de
+    celery.contrib.testing resuelve las tareas en la primera app que arranca.
+    """
+    # Sin el fixup de Django: el worker no toca la BD (bloqueada en pytest)
+    app = Celery('prueba', broker='memory://', backend='cache+memory://', fixups=[])
+    app.conf.update(
+        task_queues=settings.CELERY_TASK_QUEUES,
+        task_routes={
+            'prueba.email': settings.CELERY_TASK_ROUTES['api.tasks.enviar_email_recuperacion'],
+            'prueba.inventario': settings.CELERY_TASK_ROUTES['api.tasks.expirar_reservas_vencidas'],
+        },
+        broker_transport_options={'polling_interval': 0.01},
+        worker_prefetch_multiplier=1,
+        task_acks_late=True,
+    )
+    hechos = {}
+    
+    # Otro nombre: las shared_task de api.tasks también se registran en esta app
+    @app.task(name='prueba.email')
+    def email(i):
+        time.sleep(DURACION_EMAIL)
+        hechos['email'].append(time.monotonic())
+    
+    @app.task(name='prueba.inventario')
+    def inventario():
+        hechos['inventario'] = time.monotonic()
+    
+    yield SimpleNamespace(app=app, email=email, inventario=inventario, hechos=hechos)
+    
+    # start_worker deja esta app como actual: las shared_task vuelven a la del proyecto
+    celery_app.set_current()
+    celery_app.set_default()
+
+
+def medir(prueba, colas, opciones):
+    """Backlog de emails y luego una tarea de inventario: latencia de esta"""
+    hechos = prueba.hechos
+    hechos.clear()
+    hechos['email'] = []
+    
+    with ExitStack() as workers:
+        for cola in colas:
+            workers.enter_context(start_worker(prueba.app, pool='solo', queues=cola, perform_ping_check=False))
+        inicio = time.monotonic()
+        for i in range(EMAILS):
+            prueba.email.apply_async((i,), **opciones)
+        prueba.inventario.apply_async(**opciones)
+        
+        limite = inicio + 30
+        while (len(hechos['email']) < EMAILS or 'inventario' not in hechos) and time.monotonic() < limite:
+            time.sleep(0.01)
+    
+    assert len(hechos['email']) == EMAILS
+    return hechos['inventario'] - inicio, hechos['email'][-1] - inicio
+
+
+def test_email_no_retrasa_inventario(prueba):
+    backlog = EMAILS * DURACION_EMAIL
+    
+    # Antes: una sola cola FIFO, el inventario espera a todos los emails
+    latencia_antes, _ = medir(prueba, [['celery']], {'queue': 'celery'})
+    
+    # Después: rutas de settings y un worker por cola
+    latencia_despues, fin_emails = medir(prueba, [['email'], ['inventory']], {})
+    
+    assert latencia_antes >= backlog
+    assert latencia_despues < backlog / 4
+    assert fin_emails >= backlog
+
+
+def test_workers_celery_por_cola():
+    salida = StringIO()
+    call_command('workers_celery', stdout=salida)
+    lineas = salida.getvalue().splitlines()
+    
+    assert len(lineas) == len(settings.WORKERS_CELERY)
+    email = next(linea for linea in lineas if '-Q email' in linea)
+    worker = settings.WORKERS_CELERY['email']
+    assert f"-P {worker['pool']} -c {worker['concurrencia']}" in email
@@ -0,0 +1,114 @@
+"""
+🗜️ TESTS DE COMPRESIÓN DE RESPUESTAS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Negociación de Accept-Encoding con q-values y comodín
+✅ Un cuerpo repetido se sirve desde la variante precomprimida (sin recomprimir)
+✅ Umbral mínimo, media ya comprimida y Content-Encoding previo se respetan
+✅ Las respuestas privadas (Set-Cookie) se comprimen al vuelo, sin caché
+✅ Streaming en gzip y ETag débil, como GZipMiddleware
+"""
+
+import gzip
+import json
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, override_settings
+from api.middleware import CompresionMiddleware
+from api.tests.caches import LOCAL
+from api.utils import compresion
+
+CATALOGO = json.dumps({'data': [{'id': i, 'nombre': f'Producto {i}', 'precio': '10.00'} for i in range(500)]}).encode()
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # LocMem hace de caché compartida entre workers, haya o no Redis
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        compresion.limpiar_local()
+        yield
+        cache.clear()
+        compresion.limpiar_local()
+
+
+@pytest.fixture(autouse=True)
+def solo_gzip():
+    # Resultados independientes de brotli/zstandard instalados
+    with mock.patch.object(compresion, 'brotli', None), mock.patch.object(compresion, 'zstandard', None):
+        yield
+
+
+def servir(respuesta, accept_encoding='gzip, deflate, br'):
+    request = RequestFactory().get('/api/catalogo/productos/', HTTP_ACCEPT_ENCODING=accept_encoding)
+    return CompresionMiddleware(lambda request: respuesta() if callable(respuesta) else respuesta)(request)
+
+
+def json_response(contenido=CATALOGO, **headers):
+    return HttpResponse(contenido, content_type='application/json', headers=headers)
+
+
+class TestNegociacion:
+    """compresion.negociar"""
+    
+    def test_q_values(self):
+        with mock.patch.object(compresion, 'brotli', object()):
+            assert compresion.negociar('gzip, deflate, br') == 'br'
+            assert compresion.negociar('gzip;q=1.0, br;q=0.5') == 'gzip'
+            assert compresion.negociar('br;q=0, *;q=0.1') == 'gzip'
+        assert compresion.negociar('gzip;q=0, identity') is None
+        assert compresion.negociar('*') == 'gzip'
+        assert compresion.negociar('') is None
+
+
+class TestMiddleware:
+    """CompresionMiddleware"""
+    
+    def test_cuerpo_repetido_precomprimido(self):
+        with mock.patch.object(compresion, 'comprimir', wraps=compresion.comprimir) as comprimir:
+            respuestas = [servir(json_response) for _ in range(3)]
+        
+        assert comprimir.call_count == 1
+        for respuesta in respuestas:
+            assert respuesta['Content-Encoding'] == 'gzip'
+            assert respuesta['Vary'] == 'Accept-Encoding'
+            assert int(respuesta['Content-Length']) == len(respuesta.content)
+            assert gzip.decompress(respuesta.content) == CATALOGO
+        
+        # Otro worker: lo encuentra en la caché compartida
+        compresion.limpiar_local()
+        with mock.patch.object(compresion, 'comprimir') as comprimir:
+            assert gzip.decompress(servir(json_response).content) == CATALOGO
+        comprimir.assert_not_called()
+    
+    def test_sin_compresion(self):
+        assert not servir(json_response(b'{"ok":true}')).has_header('Content-Encoding')
+        assert not servir(HttpResponse(b'\x89PNG' * 5000, content_type='image/png')).has_header('Content-Encoding')
+        assert servir(json_response(**{'Content-Encoding': 'br'}))['Content-Encoding'] == 'br'
+        
+        sin_gzip = servir(json_response, accept_encoding='identity')
+        assert sin_gzip.content == CATALOGO
+        assert sin_gzip['Vary'] == 'Accept-Encoding'
+    
+    def test_privada_al_vuelo(self):
+        def con_cookie():
+            respuesta = json_response()
+            respuesta.set_cookie('sessionid', 'x')
+            return respuesta
+        
+        with mock.patch.object(compresion, 'comprimir') as comprimir:
+            respuesta = servir(con_cookie)
+        comprimir.assert_not_called()
+        assert gzip.decompress(respuesta.content) == CATALOGO
+        assert compresion.metricas()['al_vuelo'] >= 1
+    
+    def test_streaming_y_etag(self):
+        streaming = servir(StreamingHttpResponse([CATALOGO[:5000], CATALOGO[5000:]], content_type='application/json'))
+        assert streaming['Content-Encoding'] == 'gzip'
+        assert gzip.decompress(b''.join(streaming.streaming_content)) == CATALOGO
+        
+        assert servir(json_response(ETag='"abc"'))['ETag'] == 'W/"abc"'
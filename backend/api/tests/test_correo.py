@@ -0,0 +1,161 @@
+"""
+📮 TESTS DEL PIPELINE DE CORREO
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar (contra el sumidero SMTP local):
+✅ Un lote de emails usa UNA conexión SMTP
+✅ Si el servidor corta la conexión se reabre y no se pierde ningún email
+✅ Métricas de throughput por proveedor
+✅ Backoff exponencial con jitter acotado
+✅ La tarea de verificación envía el HTML de la plantilla (sin Redis: directo)
+
+Con Redis (fakeredis):
+✅ Un 5xx de un mensaje va a correo:fallidos y no bloquea la cola
+✅ Si la conexión cae, lo no enviado vuelve a la cabeza de la cola
+✅ Un lote abandonado en correo:procesando se reenvía en el siguiente drenado
+"""
+
+import json
+import socket
+from unittest import mock
+
+import pytest
+from django.core import mail
+from django.core.cache import cache
+from django.test import override_settings
+from api.tests.caches import LOCAL, redis_falso
+from api.utils import correo
+from api.utils.smtp_sumidero import SumideroSMTP
+
+
+@pytest.fixture(autouse=True)
+def cache_local():
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+
+
+@pytest.fixture
+def sumidero():
+    with SumideroSMTP(rechazar={'rechazado@example.com'}) as servidor:
+        with override_settings(CORREO_PROVEEDORES={'sumidero': servidor.configuracion()}):
+            yield servidor
+            correo.descartar('sumidero')
+
+
+@pytest.fixture
+def redis():
+    pytest.importorskip('fakeredis')
+    with override_settings(CACHES=redis_falso()):
+        yield correo.get_redis()
+
+
+def _mensajes(n):
+    return [
+        correo.construir('Asunto', 'Texto', [f'destino{i}@example.com'], html='<p>Hola</p>')
+        for i in range(n)
+    ]
+
+
+class TestCorreo:
+    """Conexión persistente, reconexión y métricas"""
+    
+    def test_lote_una_conexion(self, sumidero):
+        assert correo.enviar(_mensajes(5), 'sumidero') == 5
+        assert correo.enviar(_mensajes(3), 'sumidero') == 3
+        
+        assert len(sumidero.mensajes) == 8
+        assert sumidero.conexiones == 1
+        assert correo.metricas()['sumidero']['enviados'] == 8
+    
+    def test_reconexion(self, sumidero):
+        correo.enviar(_mensajes(1), 'sumidero')
+        correo.conexion('sumidero').connection.sock.shutdown(socket.SHUT_RDWR)
+        
+        assert correo.enviar(_mensajes(2), 'sumidero') == 2
+        assert len(sumidero.mensajes) == 3
+        assert sumidero.conexiones == 2
+    
+    def test_error_permanente(self, sumidero):
+        mensajes = _mensajes(2)
+        mensajes.insert(1, correo.construir('Asunto', 'Texto', ['rechazado@example.com']))
+        
+        assert correo.enviar(mensajes, 'sumidero') == 2
+        assert sumidero.conexiones == 1
+        assert correo.metricas()['sumidero']['rechazados'] == 1
+    
+    def test_espera_reintento(self):
+        for intento in range(8):
+            tope = min(correo.BACKOFF_MAXIMO, correo.BACKOFF_BASE * 2 ** intento)
+            assert tope / 2 <= correo.espera_reintento(intento) <= tope
+
+
+@pytest.mark.django_db
+def test_tarea_verificacion():
+    from api.tasks import enviar_email_verificacion
+    
+    correo.descartar()
+    enviar_email_verificacion(email='nuevo@example.com', codigo='123456', nombre='Nuevo')
+    
+    assert len(mail.outbox) == 1
+    html, tipo = mail.outbox[0].alternatives[0]
+    assert tipo == 'text/html' and '123456' in html
+
+
+def _encolar(r, mensajes, clave=correo.CLAVE_COLA):
+    r.rpush(clave, *[correo._serializar(m) for m in mensajes])
+
+
+def _destinos(sumidero):
+    return [destinatarios[0] for _, destinatarios, _ in sumidero.mensajes]
+
+
+class TestDrenado:
+    """Cola en Redis: procesando, fallidos y reencolado"""
+    
+    def test_fallido_no_bloquea_la_cola(self, sumidero, redis):
+        mensajes = _mensajes(3)
+        mensajes.insert(1, correo.construir('Asunto', 'Texto', ['rechazado@example.com']))
+        _encolar(redis, mensajes)
+        
+        assert correo.drenar(lote=2, proveedor='sumidero') == 3
+        
+        assert len(sumidero.mensajes) == 3
+        assert not redis.exists(correo.CLAVE_COLA, correo.CLAVE_PROCESANDO, correo.CLAVE_DRENANDO)
+        fallido, = [json.loads(c) for c in redis.lrange(correo.CLAVE_FALLIDOS, 0, -1)]
+        assert fallido['para'] == ['rechazado@example.com']
+        assert fallido['error'].startswith('(554')
+    
+    def test_conexion_caida_reencola(self, sumidero, redis):
+        _encolar(redis, _mensajes(3))
+        enviar_real = correo.enviar
+        
+        def corta_tras_uno(mensajes, proveedor=None):
+            enviar_real(mensajes[:1], proveedor)
+            raise correo.EnvioInterrumpido('caída', mensajes[1:])
+        
+        with mock.patch.object(correo, 'enviar', side_effect=corta_tras_uno):
+            with pytest.raises(correo.EnvioInterrumpido):
+                correo.drenar(lote=3, proveedor='sumidero')
+        
+        pendientes = [json.loads(c)['para'][0] for c in redis.lrange(correo.CLAVE_COLA, 0, -1)]
+        assert pendientes == ['destino1@example.com', 'destino2@example.com']
+        assert not redis.exists(correo.CLAVE_PROCESANDO, correo.CLAVE_DRENANDO)
+        
+        assert correo.drenar(proveedor='sumidero') == 2
+        assert _destinos(sumidero) == [f'<destino{i}@example.com>' for i in range(3)]
+    
+    def test_lote_abandonado(self, sumidero, redis):
+        _encolar(redis, _mensajes(2), clave=correo.CLAVE_PROCESANDO)
+        _encolar(redis, [correo.construir('Asunto', 'Texto', ['ultimo@example.com'])])
+        
+        # Otro drenado en curso: no se toca nada
+        redis.set(correo.CLAVE_DRENANDO, 1)
+        assert correo.drenar(proveedor='sumidero') == 0
+        assert redis.llen(correo.CLAVE_PROCESANDO) == 2
+        
+        redis.delete(correo.CLAVE_DRENANDO)
+        assert correo.drenar(proveedor='sumidero') == 3
+        assert _destinos(sumidero) == [
+            '<destino0@example.com>', '<destino1@example.com>', '<ultimo@example.com>'
+        ]
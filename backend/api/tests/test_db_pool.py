@@ -0,0 +1,245 @@
+"""
+🏊 TESTS DEL POOL DE CONEXIONES Y SENTENCIAS PREPARADAS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ El pool reutiliza conexiones (LIFO) y respeta el máximo bajo carga en hilos
+✅ Sin conexión libre se espera hasta el timeout (PoolAgotado)
+✅ Health check: las conexiones rotas se descartan y se reemplazan
+✅ Reciclado por vida máxima e inactividad (sin bajar del mínimo)
+✅ Las consultas calientes usan PREPARE una vez por conexión y luego EXECUTE
+✅ Sin pool (o desactivadas) se ejecuta el mismo SQL sin preparar
+
+El pool es independiente del driver: se prueba con conexiones DB-API falsas.
+"""
+
+import threading
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import override_settings
+from api.db_pool import PoolAgotado, PoolConexiones, cerrar_pools, metricas, obtener_pool
+from api.models import Cart, Producto, TokenBlacklist
+from api.utils.sentencias import PRODUCTO_POR_ID, TOKEN_EN_BLACKLIST
+
+
+class ConexionFalsa:
+    """Conexión DB-API mínima"""
+    
+    def __init__(self, rota=False):
+        self.closed = 0
+        self.rota = rota
+        self.rollbacks = 0
+        self.ejecutadas = []
+    
+    def cursor(self):
+        conexion = self
+        
+        class Cursor:
+            def __enter__(self):
+                return self
+            
+            def __exit__(self, *exc):
+                return False
+            
+            def execute(self, sql, params=None):
+                if conexion.rota:
+                    raise OSError('server closed the connection unexpectedly')
+                conexion.ejecutadas.append((sql, params))
+            
+            def fetchall(self):
+                return []
+        
+        return Cursor()
+    
+    def rollback(self):
+        self.rollbacks += 1
+    
+    def close(self):
+        self.closed = 1
+
+
+def pool(**config):
+    return PoolConexiones('default', 'electro_isla', **{'minimo': 0, 'maximo': 2, 'timeout': 0.05, **config})
+
+
+class TestPool:
+    """PoolConexiones"""
+    
+    def test_reutiliza_la_mas_reciente(self):
+        p = pool()
+        a, b = p.obtener(ConexionFalsa), p.obtener(ConexionFalsa)
+        p.devolver(a)
+        p.devolver(b)
+        
+        assert p.obtener(ConexionFalsa) is b
+        assert p.obtener(ConexionFalsa) is a
+        assert p.metricas()['creadas'] == 2
+        assert p.metricas()['reutilizadas'] == 2
+        assert a.rollbacks == 1  # Se deshace cualquier transacción al devolver
+    
+    def test_agotado_tras_timeout(self):
+        p = pool(maximo=1)
+        p.obtener(ConexionFalsa)
+        
+        inicio = time.monotonic()
+        with pytest.raises(PoolAgotado):
+            p.obtener(ConexionFalsa)
+        assert time.monotonic() - inicio >= 0.05
+        assert p.metricas()['agotado'] == 1
+    
+    def test_espera_a_una_devuelta(self):
+        p = pool(maximo=1, timeout=5)
+        ocupada = p.obtener(ConexionFalsa)
+        threading.Timer(0.05, p.devolver, args=(ocupada,)).start()
+        
+        assert p.obtener(ConexionFalsa) is ocupada
+        metricas_pool = p.metricas()
+        assert metricas_pool['esperas'] == 1
+        assert metricas_pool['espera_media_ms'] >= 40
+    
+    def test_health_check_descarta_rotas(self):
+        p = pool(comprobar_tras=0)
+        rota = p.obtener(ConexionFalsa)
+        p.devolver(rota)
+        rota.rota = True
+        
+        nueva = p.obtener(ConexionFalsa)
+        assert nueva is not rota
+        assert rota.closed
+        metricas_pool = p.metricas()
+        assert metricas_pool['fallos_health_check'] == 1
+        assert metricas_pool['descartadas'] == 1
+        assert metricas_pool['total'] == 1
+    
+    def test_sin_health_check_si_se_uso_hace_poco(self):
+        p = pool(comprobar_tras=60)
+        conexion = p.obtener(ConexionFalsa)
+        p.devolver(conexion)
+        
+        assert p.obtener(ConexionFalsa) is conexion
+        assert conexion.ejecutadas == []
+    
+    def test_reciclado(self):
+        p = pool(vida_maxima=0)
+        vieja = p.obtener(ConexionFalsa)
+        p.devolver(vieja)
+        assert vieja.closed
+        assert p.metricas()['libres'] == 0
+        
+        # Inactivas: se cierran las que sobran del mínimo
+        p = pool(minimo=1, maximo=3, inactividad_maxima=0.01)
+        conexiones = [p.obtener(ConexionFalsa) for _ in range(3)]
+        for conexion in conexiones:
+            p.devolver(conexion)
+        time.sleep(0.02)
+        p.devolver(p.obtener(ConexionFalsa))
+        assert p.metricas()['total'] == 1
+        assert sum(conexion.closed for conexion in conexiones) == 2
+    
+    def test_fallo_al_conectar_libera_hueco(self):
+        p = pool(maximo=1)
+        
+        def falla():
+            raise OSError('connection refused')
+        
+        with pytest.raises(OSError):
+            p.obtener(falla)
+        assert p.obtener(ConexionFalsa) is not None
+    
+    def test_carga_en_hilos(self):
+        p = pool(maximo=3, timeout=5)
+        en_uso, pico = [0], [0]
+        lock = threading.Lock()
+        
+        def trabajador():
+            for _ in range(50):
+                conexion = p.obtener(ConexionFalsa)
+                with lock:
+                    en_uso[0] += 1
+                    pico[0] = max(pico[0], en_uso[0])
+                time.sleep(0.0005)
+                with lock:
+                    en_uso[0] -= 1
+                p.devolver(conexion)
+        
+        hilos = [threading.Thread(target=trabajador) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        
+        metricas_pool = p.metricas()
+        assert pico[0] <= 3
+        assert metricas_pool['creadas'] <= 3
+        assert metricas_pool['creadas'] + metricas_pool['reutilizadas'] == 400
+        assert metricas_pool['en_uso'] == 0
+    
+    def test_registro_y_cierre(self):
+        clave = ('default', 'test_electro_isla', None, None, None)
+        p = obtener_pool(clave, 'default', 'test_electro_isla', {'maximo': 2})
+        assert obtener_pool(clave, 'default', 'test_electro_isla', {}) is p
+        libre = p.obtener(ConexionFalsa)
+        p.devolver(libre)
+        assert any(m['base'] == 'test_electro_isla' for m in metricas())
+        
+        cerrar_pools('test_electro_isla')
+        assert libre.closed
+        assert not any(m['base'] == 'test_electro_isla' for m in metricas())
+
+
+@pytest.fixture
+def producto():
+    return Producto.objects.create(nombre='Lámpara', descripcion='LED', precio=50, stock_total=5, activo=True)
+
+
+@pytest.mark.django_db
+class TestSentencias:
+    """api/utils/sentencias.py"""
+    
+    def conexion_del_pool(self):
+        """Conexión de Django sobre una física del pool"""
+        p = pool()
+        fisica = p.obtener(ConexionFalsa)
+        return SimpleNamespace(vendor='postgresql', ops=connection.ops, pool=p, connection=fisica,
+                               cursor=fisica.cursor), fisica
+    
+    def test_prepara_una_vez_por_conexion(self):
+        falsa, fisica = self.conexion_del_pool()
+        with mock.patch('api.utils.sentencias.connections', {'default': falsa}):
+            PRODUCTO_POR_ID.filas(7)
+            PRODUCTO_POR_ID.filas(8)
+        
+        sentencias = [sql for sql, _ in fisica.ejecutadas]
+        assert sentencias[0].startswith('PREPARE producto_por_id AS SELECT "id", ')
+        assert sentencias[0].endswith('FROM "productos" WHERE id = $1')
+        assert sentencias[1:] == ['EXECUTE producto_por_id (%s)'] * 2
+        assert [params for _, params in fisica.ejecutadas[1:]] == [(7,), (8,)]
+    
+    def test_desactivadas_o_sin_pool(self):
+        falsa, fisica = self.conexion_del_pool()
+        with mock.patch('api.utils.sentencias.connections', {'default': falsa}):
+            with override_settings(DB_SENTENCIAS_PREPARADAS=False):
+                TOKEN_EN_BLACKLIST.filas('abc')
+            falsa.pool = None
+            TOKEN_EN_BLACKLIST.filas('abc')
+        
+        assert fisica.ejecutadas == [('SELECT 1 FROM "token_blacklist" WHERE token = %s LIMIT 1', ('abc',))] * 2
+    
+    def test_consultas_calientes_sin_pool(self, producto):
+        assert Producto.por_id(producto.pk).nombre == 'Lámpara'
+        assert Producto.por_id(str(producto.pk)).pk == producto.pk
+        assert Producto.por_id('abc') is None
+        assert Producto.por_id(producto.pk + 1000) is None
+        
+        usuario = User.objects.create_user(username='pool', password='x')
+        carrito = Cart.del_usuario(usuario)
+        assert Cart.del_usuario(usuario).pk == carrito.pk
+        
+        assert not TokenBlacklist.esta_en_blacklist('token-x')
+        TokenBlacklist.agregar_a_blacklist('token-x', usuario)
+        assert TokenBlacklist.esta_en_blacklist('token-x')
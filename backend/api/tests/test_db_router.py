@@ -0,0 +1,136 @@
+"""
+🗄️ TESTS DEL ROUTER DE RÉPLICAS DE LECTURA
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Solo los ámbitos @solo_lectura / lectura_replica() leen de réplica
+✅ Round robin entre réplicas sanas; menor_lag elige la más al día
+✅ Réplicas atrasadas o caídas se descartan (todas → primaria)
+✅ Read-your-writes: tras escribir, cookie y flag por usuario fijan la primaria
+✅ Dentro de transaction.atomic() se lee de la primaria
+✅ Las réplicas no se migran
+"""
+
+import math
+from types import SimpleNamespace
+
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from api.db_router import CLAVE_LAG, ReplicaRouter, lectura_replica, solo_lectura
+from api.middleware import LecturaPrimariaMiddleware
+from api.models import Producto
+from api.tests.caches import LOCAL
+
+REPLICAS = ['replica_1', 'replica_2']
+
+router = ReplicaRouter()
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # Lag medido y marcas de escritura en caché: sin Redis caído que las pierda
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def replicas():
+    with override_settings(DB_REPLICAS=REPLICAS, DB_REPLICA_SELECCION='round_robin', DB_REPLICA_LAG_MAXIMO=5):
+        yield
+
+
+def db_lectura():
+    return router.db_for_read(Producto) or 'default'
+
+
+class TestSeleccion:
+    """Elección de réplica por ámbito"""
+    
+    def test_fuera_de_ambito_primaria(self):
+        assert db_lectura() == 'default'
+        assert router.db_for_write(Producto) == 'default'
+    
+    def test_round_robin(self):
+        elegidas = []
+        for _ in range(4):
+            with lectura_replica():
+                elegidas.append(db_lectura())
+        assert elegidas[0] != elegidas[1]
+        assert elegidas[:2] == elegidas[2:]
+        assert set(elegidas) == set(REPLICAS)
+        assert db_lectura() == 'default'
+    
+    def test_menor_lag_y_descartes(self):
+        cache.set(CLAVE_LAG, {'replica_1': 2.5, 'replica_2': 0.1})
+        with override_settings(DB_REPLICA_SELECCION='menor_lag'):
+            with lectura_replica():
+                assert db_lectura() == 'replica_2'
+            
+            cache.set(CLAVE_LAG, {'replica_1': 2.5, 'replica_2': math.inf})
+            with lectura_replica():
+                assert db_lectura() == 'replica_1'
+        
+        cache.set(CLAVE_LAG, {'replica_1': 30.0, 'replica_2': math.inf})
+        with lectura_replica():
+            assert db_lectura() == 'default'
+    
+    def test_sin_replicas(self):
+        with override_settings(DB_REPLICAS=[]):
+            with lectura_replica() as alias:
+                assert alias is None
+                assert db_lectura() == 'default'
+    
+    def test_decorador_en_metodo(self):
+        class Vista:
+            @solo_lectura
+            def list(self, request):
+                return db_lectura()
+        
+        assert Vista().list(None) in REPLICAS
+    
+    @pytest.mark.django_db
+    def test_transaccion_lee_de_primaria(self):
+        # El test corre dentro de transaction.atomic()
+        with lectura_replica():
+            assert db_lectura() == 'default'
+    
+    def test_replicas_no_se_migran(self):
+        assert router.allow_migrate('replica_1', 'api') is False
+        assert router.allow_migrate('default', 'api') is None
+
+
+class TestReadYourWrites:
+    """LecturaPrimariaMiddleware"""
+    
+    def peticion(self, metodo, usuario=None, cookies=None):
+        @solo_lectura
+        def vista(request):
+            return HttpResponse(db_lectura())
+        
+        request = getattr(RequestFactory(), metodo)('/api/productos/')
+        request.user = usuario or AnonymousUser()
+        request.COOKIES.update(cookies or {})
+        return LecturaPrimariaMiddleware(vista)(request)
+    
+    def test_escritura_fija_primaria_por_cookie(self):
+        respuesta = self.peticion('post')
+        assert respuesta.cookies[LecturaPrimariaMiddleware.COOKIE]['max-age'] == 10
+        
+        fijada = self.peticion('get', cookies={LecturaPrimariaMiddleware.COOKIE: '1'})
+        assert fijada.content == b'default'
+        assert self.peticion('get').content.decode() in REPLICAS
+    
+    def test_escritura_fija_primaria_por_usuario(self):
+        usuario = SimpleNamespace(is_authenticated=True, pk=42)
+        assert self.peticion('get', usuario).content.decode() in REPLICAS
+        
+        self.peticion('patch', usuario)
+        
+        # Cliente JWT sin cookies: el flag de caché basta
+        assert self.peticion('get', usuario).content == b'default'
+        assert self.peticion('get', SimpleNamespace(is_authenticated=True, pk=43)).content.decode() in REPLICAS
@@ -6,11 +6,12 @@
 Tests para el sistema de verificación de email con código de 6 dígitos.
 """
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
 from api.models import EmailVerification, LoginAttempt
+from api.tests.caches import LOCAL, REDIS_CAIDO
 from unittest.mock import patch
 import json
 
@@ -187,6 +188,7 @@ class EmailVerificationModelTest(TestCase):
             self.assertTrue(codigo.verificado)
 
 
+@override_settings(CACHES=LOCAL)  # Flujo en BD (el de Redis: test_codigos_verificacion.py)
 class EmailVerificationEndpointsTest(TestCase):
     """Tests para los endpoints de verificación"""
     
@@ -361,6 +363,7 @@ class EmailVerificationEndpointsTest(TestCase):
         self.assertTrue(data['has_pending_verification'])
 
 
+@override_settings(CACHES=LOCAL)
 class EmailVerificationSecurityTest(TestCase):
     """Tests de seguridad para verificación de email"""
     
@@ -442,3 +445,39 @@ class EmailVerificationSecurityTest(TestCase):
         
         # Permitir 1 segundo de margen
         self.assertAlmostEqual(tiempo_expiracion, 15 * 60, delta=1)
+
+
+@override_settings(CACHES=REDIS_CAIDO)
+@patch('api.tasks.enviar_email_verificacion.delay')
+class VerificacionRedisCaidoTest(TestCase):
+    """Con Redis caído registro, estado, reenvío y verificación usan la BD"""
+    
+    def setUp(self):
+        self.client = Client()
+        self.email = 'caido@example.com'
+    
+    def post(self, url, data):
+        return self.client.post(url, data=json.dumps(data), content_type='application/json')
+    
+    def test_flujo_completo_en_bd(self, mock_email):
+        response = self.post('/api/auth/register-with-verification/', {
+            'username': 'caido',
+            'email': self.email,
+            'password': 'SecurePass123!',
+            'first_name': 'Caído',
+        })
+        self.assertEqual(response.status_code, 201)
+        verificacion = EmailVerification.objects.get(email_temporal=self.email)
+        
+        response = self.client.get('/api/auth/verification-status/', {'email': self.email})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['resend_count'], 0)
+        
+        response = self.post('/api/auth/resend-verification/', {'email': self.email})
+        self.assertEqual(response.status_code, 200)
+        verificacion.refresh_from_db()
+        self.assertEqual(verificacion.contador_reenvios, 1)
+        
+        response = self.post('/api/auth/verify-email/', {'email': self.email, 'codigo': verificacion.codigo})
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(User.objects.filter(username='caido').exists())
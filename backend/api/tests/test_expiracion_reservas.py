@@ -0,0 +1,168 @@
+"""
+⏱️ TESTS DE EXPIRACIÓN DE RESERVAS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ crear_reserva programa la expiración en el sorted set tras el commit
+✅ El poller libera solo las reservas vencidas, agregando por producto
+✅ Reservas confirmadas/canceladas se descartan sin tocar el stock
+✅ Si la liberación falla los ids vuelven al sorted set
+✅ Las reservas bloqueadas por otra transacción (SKIP LOCKED) vuelven al sorted set
+✅ El barrido periódico (red de seguridad) expira por rangos de id
+
+Usan fakeredis (con lupa para el script Lua); se omiten si no está instalado.
+"""
+
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.utils import timezone
+from api.models import Producto, StockReservation
+from api.utils import expiracion_reservas
+from api.utils.expiracion_reservas import CLAVE
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+
+@pytest.fixture
+def redis():
+    servidor = fakeredis.FakeStrictRedis()
+    with mock.patch('api.utils.expiracion_reservas.get_redis', return_value=servidor):
+        yield servidor
+
+
+@pytest.fixture
+def usuario():
+    return User.objects.create_user(username='comprador', password='x')
+
+
+@pytest.fixture
+def productos():
+    return [
+        Producto.objects.create(
+            nombre=f'Producto {i}',
+            descripcion='Reservable',
+            precio=100,
+            stock_total=20,
+            activo=True,
+        )
+        for i in range(2)
+    ]
+
+
+def reservar(usuario, producto, cantidad, ttl_minutos=15):
+    assert producto.reservar_stock(cantidad)
+    return StockReservation.crear_reserva(usuario, producto, cantidad, ttl_minutos=ttl_minutos)
+
+
+def vencer(*reservas):
+    """Deja las reservas vencidas en BD (el sorted set se ajusta aparte)"""
+    pasado = timezone.now() - timedelta(seconds=1)
+    StockReservation.objects.filter(pk__in=[r.pk for r in reservas]).update(expires_at=pasado)
+    return pasado
+
+
+@pytest.mark.django_db
+class TestTemporizador:
+    """Sorted set reservas:expiracion + expirar_reservas_vencidas"""
+    
+    def test_programa_tras_commit(self, redis, usuario, productos, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=False) as callbacks:
+            reserva = reservar(usuario, productos[0], 2)
+        assert redis.zcard(CLAVE) == 0
+        
+        for callback in callbacks:
+            callback()
+        assert redis.zscore(CLAVE, str(reserva.pk)) == pytest.approx(reserva.expires_at.timestamp())
+    
+    def test_libera_solo_vencidas(self, redis, usuario, productos, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            a = reservar(usuario, productos[0], 2)
+            b = reservar(usuario, productos[0], 3)
+            c = reservar(usuario, productos[1], 4)
+        pasado = vencer(a, b)
+        redis.zadd(CLAVE, {str(a.pk): pasado.timestamp(), str(b.pk): pasado.timestamp()})
+        
+        with mock.patch.object(Producto, 'liberar_stock', autospec=True, side_effect=Producto.liberar_stock) as liberar:
+            assert expiracion_reservas.procesar_vencidas() == 2
+        
+        # Una liberación por producto con la suma de cantidades
+        assert [(llamada.args[0].pk, llamada.args[1]) for llamada in liberar.call_args_list] == [(productos[0].pk, 5)]
+        
+        productos[0].refresh_from_db()
+        assert productos[0].stock_reservado == 0
+        assert set(StockReservation.objects.filter(status='expired').values_list('pk', flat=True)) == {a.pk, b.pk}
+        assert StockReservation.objects.get(pk=c.pk).status == 'pending'
+        assert redis.zrange(CLAVE, 0, -1) == [str(c.pk).encode()]
+    
+    def test_descarta_confirmadas(self, redis, usuario, productos, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            reserva = reservar(usuario, productos[0], 2)
+        StockReservation.objects.filter(pk=reserva.pk).update(status='confirmed')
+        pasado = vencer(reserva)
+        redis.zadd(CLAVE, {str(reserva.pk): pasado.timestamp()})
+        
+        assert expiracion_reservas.procesar_vencidas() == 0
+        assert redis.zcard(CLAVE) == 0
+        productos[0].refresh_from_db()
+        assert productos[0].stock_reservado == 2
+    
+    def test_fallo_devuelve_ids(self, redis, usuario, productos, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            reserva = reservar(usuario, productos[0], 2)
+        pasado = vencer(reserva)
+        redis.zadd(CLAVE, {str(reserva.pk): pasado.timestamp()})
+        
+        with mock.patch.object(StockReservation, 'expirar', side_effect=RuntimeError('BD caída')):
+            with pytest.raises(RuntimeError):
+                expiracion_reservas.procesar_vencidas()
+        
+        assert redis.zscore(CLAVE, str(reserva.pk)) == pytest.approx(pasado.timestamp())
+    
+    def test_bloqueadas_vuelven_al_zset(self, redis, usuario, productos, django_capture_on_commit_callbacks):
+        with django_capture_on_commit_callbacks(execute=True):
+            libre = reservar(usuario, productos[0], 2)
+            bloqueada = reservar(usuario, productos[1], 3)
+        pasado = vencer(libre, bloqueada)
+        redis.zadd(CLAVE, {str(libre.pk): pasado.timestamp(), str(bloqueada.pk): pasado.timestamp()})
+        
+        expirar = StockReservation.expirar
+        
+        def expirar_salvo_bloqueada(ids, ahora=None):
+            # SQLite no tiene SKIP LOCKED: la fila de otra transacción se simula excluyéndola
+            return expirar([pk for pk in ids if pk != bloqueada.pk], ahora)
+        
+        with mock.patch.object(StockReservation, 'expirar', side_effect=expirar_salvo_bloqueada):
+            assert expiracion_reservas.procesar_vencidas() == 1
+        
+        assert redis.zrange(CLAVE, 0, -1) == [str(bloqueada.pk).encode()]
+        assert redis.zscore(CLAVE, str(bloqueada.pk)) == pytest.approx(pasado.timestamp())
+        
+        # El siguiente poll la libera
+        assert expiracion_reservas.procesar_vencidas() == 1
+        assert redis.zcard(CLAVE) == 0
+        productos[1].refresh_from_db()
+        assert productos[1].stock_reservado == 0
+    
+    def test_sin_redis_no_hace_nada(self, usuario, productos):
+        with mock.patch('api.utils.expiracion_reservas.get_redis', return_value=None):
+            reserva = reservar(usuario, productos[0], 2)
+            vencer(reserva)
+            assert expiracion_reservas.procesar_vencidas() == 0
+        assert StockReservation.objects.get(pk=reserva.pk).status == 'pending'
+
+
+@pytest.mark.django_db
+def test_barrido_por_rangos(usuario, productos):
+    with mock.patch('api.utils.expiracion_reservas.get_redis', return_value=None):
+        reservas = [reservar(usuario, productos[i % 2], 1) for i in range(5)]
+    vencer(*reservas[:4])
+    
+    assert StockReservation.liberar_reservas_expiradas(lote=2) == 4
+    
+    for producto in productos:
+        producto.refresh_from_db()
+    assert [p.stock_reservado for p in productos] == [1, 0]
+    assert StockReservation.objects.filter(status='pending').count() == 1
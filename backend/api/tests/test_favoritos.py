@@ -0,0 +1,135 @@
+"""
+❤️ TESTS DE FAVORITOS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Verificación batch de favoritos
+✅ es-favorito con conteo y membresía
+✅ mis-favoritos paginado con proyección de tarjeta
+✅ SET en Redis: una escritura concurrente con la carga no deja un SET obsoleto
+✅ SET en Redis: las lecturas no renuevan el TTL
+"""
+
+from unittest import mock
+
+import pytest
+from rest_framework.test import APIClient
+from api.models import Producto, Favorito
+from api.utils.favoritos_cache import FavoritosCache
+
+
+@pytest.fixture
+def usuario(django_user_model):
+    return django_user_model.objects.create_user(username='fan', password='testpass123')
+
+
+@pytest.fixture
+def client(usuario):
+    client = APIClient()
+    client.force_authenticate(user=usuario)
+    return client
+
+
+@pytest.fixture
+def productos():
+    return [
+        Producto.objects.create(
+            nombre=f'Producto {i}',
+            descripcion='Descripción',
+            precio=100,
+            stock_total=5,
+            activo=True,
+        )
+        for i in range(1, 6)
+    ]
+
+
+@pytest.mark.django_db
+class TestFavoritos:
+    """Endpoints de favoritos"""
+    
+    def test_verificar_batch(self, client, usuario, productos):
+        Favorito.objects.create(usuario=usuario, producto=productos[0])
+        Favorito.objects.create(usuario=usuario, producto=productos[2])
+        ids = ','.join(str(p.id) for p in productos[:3])
+        
+        response = client.get(f'/api/favoritos/verificar-batch/?ids={ids}')
+        
+        assert response.status_code == 200
+        assert response.data['favoritos'] == {
+            str(productos[0].id): True,
+            str(productos[1].id): False,
+            str(productos[2].id): True,
+        }
+    
+    def test_agregar_y_es_favorito(self, client, productos):
+        producto = productos[0]
+        
+        response = client.post(f'/api/favoritos/agregar/{producto.id}/')
+        assert response.status_code == 201
+        
+        response = client.get(f'/api/favoritos/es-favorito/{producto.id}/')
+        assert response.data == {'es_favorito': True, 'favoritos_count': 1}
+        
+        client.delete(f'/api/favoritos/remover/{producto.id}/')
+        response = client.get(f'/api/favoritos/es-favorito/{producto.id}/')
+        assert response.data == {'es_favorito': False, 'favoritos_count': 0}
+    
+    def test_es_favorito_producto_inexistente(self, client):
+        response = client.get('/api/favoritos/es-favorito/999999/')
+        assert response.status_code == 404
+    
+    def test_mis_favoritos_paginado(self, client, usuario, productos):
+        for producto in productos:
+            Favorito.objects.create(usuario=usuario, producto=producto)
+        
+        response = client.get('/api/mis-favoritos/?page_size=2')
+        
+        assert response.status_code == 200
+        assert response.data['count'] == 5
+        assert response.data['next'] is not None
+        assert len(response.data['favoritos']) == 2
+        assert set(response.data['favoritos'][0].keys()) == {
+            'id', 'nombre', 'precio', 'descuento', 'categoria', 'imagen_url', 'stock'
+        }
+
+
+@pytest.fixture
+def redis():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    servidor = fakeredis.FakeStrictRedis()
+    with mock.patch('api.utils.favoritos_cache.get_redis', return_value=servidor):
+        yield servidor
+
+
+@pytest.mark.django_db
+class TestFavoritosCache:
+    """SET de favoritos por usuario en Redis"""
+    
+    def test_escritura_durante_la_carga(self, redis, usuario, productos):
+        producto = productos[1]
+        leer_bd = FavoritosCache._ids_desde_bd
+        
+        def leer_y_marcar(usuario_id, producto_ids=None):
+            ids = leer_bd(usuario_id, producto_ids)
+            # Otra petición marca el favorito entre la lectura y el guardado del SET
+            Favorito.objects.create(usuario=usuario, producto=producto)
+            FavoritosCache.agregar(usuario.id, producto.id)
+            return ids
+        
+        with mock.patch.object(FavoritosCache, '_ids_desde_bd', side_effect=leer_y_marcar):
+            FavoritosCache.miembros(usuario.id, [producto.id])
+        
+        assert not redis.exists(FavoritosCache.clave(usuario.id))
+        assert FavoritosCache.miembros(usuario.id, [producto.id]) == {producto.id: True}
+        assert redis.exists(FavoritosCache.clave(usuario.id))
+    
+    def test_lecturas_no_renuevan_ttl(self, redis, usuario, productos):
+        clave = FavoritosCache.clave(usuario.id)
+        FavoritosCache.miembros(usuario.id, [productos[0].id])
+        assert 0 < redis.ttl(clave) <= FavoritosCache.TTL
+        
+        redis.expire(clave, 100)
+        FavoritosCache.miembros(usuario.id, [productos[0].id])
+        assert redis.ttl(clave) <= 100
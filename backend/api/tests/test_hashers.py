@@ -0,0 +1,41 @@
+"""
+🔒 TESTS DE POLÍTICA DE HASHING
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Las iteraciones de PBKDF2 salen de PASSWORD_HASH_POLITICA
+✅ Cambiar la política rehashea la contraseña en el siguiente login
+✅ La respuesta del login incluye el tiempo de hashing (Server-Timing)
+"""
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+
+def _iteraciones(usuario):
+    usuario.refresh_from_db()
+    return int(usuario.password.split('$')[1])
+
+
+@pytest.mark.django_db
+class TestPoliticaHashing:
+    """Hashers configurables y rehash transparente"""
+    
+    def test_rehash_en_login(self, django_user_model):
+        cache.clear()
+        with override_settings(PASSWORD_HASH_POLITICA={'pbkdf2_iteraciones': 1000}):
+            usuario = django_user_model.objects.create_user(
+                username='hash_user', email='hash@example.com', password='testpass123'
+            )
+        assert _iteraciones(usuario) == 1000
+        
+        with override_settings(PASSWORD_HASH_POLITICA={'pbkdf2_iteraciones': 2000}):
+            response = APIClient().post(
+                '/api/auth/login/', {'username': 'hash_user', 'password': 'testpass123'}, format='json'
+            )
+        
+        assert response.status_code == 200
+        assert _iteraciones(usuario) == 2000
+        assert response['Server-Timing'].startswith('hash;dur=')
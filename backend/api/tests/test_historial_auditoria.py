@@ -0,0 +1,200 @@
+"""
+🗂️ TESTS DEL HISTORIAL DE AUDITORÍA
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Paginación keyset por (timestamp, id): sin repetir ni saltar con empates
+✅ El enlace `previous` vuelve a la página anterior
+✅ Filtros por clave de `detalles`, búsqueda y fechas inválidas (400)
+✅ clear_all: purga por lotes en segundo plano con progreso
+✅ Una purga fallida o abandonada (worker muerto) no bloquea la siguiente
+"""
+
+import pytest
+from datetime import timedelta
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import AuditLog
+from api.tasks import purgar_auditoria
+from api.tests.caches import LOCAL
+from api.utils import audit
+
+URL = '/api/admin/historial/'
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.fixture
+def admin():
+    usuario = User.objects.create_user(username='jefe', password='x')
+    usuario.profile.rol = 'admin'
+    usuario.profile.save()
+    return usuario
+
+
+@pytest.fixture
+def cliente(admin):
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    return client
+
+
+@pytest.fixture
+def registros(admin):
+    """10 filas; grupos de 3 comparten timestamp (empates en el cursor)"""
+    base = timezone.now() - timedelta(hours=1)
+    return AuditLog.objects.bulk_create([
+        AuditLog(
+            usuario=admin,
+            accion='editar',
+            modulo='producto',
+            objeto_id=i,
+            objeto_repr=f'Producto {i}',
+            detalles={'cambios_realizados': {'precio' if i % 2 else 'stock': {'anterior': 1, 'nuevo': 2}}},
+            timestamp=base + timedelta(minutes=i // 3),
+        )
+        for i in range(10)
+    ])
+
+
+def recorrer(client, url):
+    ids, respuestas = [], []
+    while url:
+        data = client.get(url).json()
+        respuestas.append(data)
+        ids.extend(r['id'] for r in data['results'])
+        url = data['next']
+    return ids, respuestas
+
+
+@pytest.mark.django_db
+class TestPaginacion:
+    """Keyset por (timestamp, id)"""
+    
+    def test_recorre_todo_en_orden(self, cliente, registros):
+        ids, respuestas = recorrer(cliente, f'{URL}?page_size=4')
+        
+        esperado = list(AuditLog.objects.order_by('-timestamp', '-id').values_list('id', flat=True))
+        assert ids == esperado
+        assert len(respuestas) == 3
+        assert respuestas[0]['previous'] is None
+        assert respuestas[0]['count'] == 10
+    
+    def test_previous_vuelve_a_la_pagina_anterior(self, cliente, registros):
+        primera = cliente.get(f'{URL}?page_size=4').json()
+        segunda = cliente.get(primera['next']).json()
+        
+        vuelta = cliente.get(segunda['previous']).json()
+        
+        assert [r['id'] for r in vuelta['results']] == [r['id'] for r in primera['results']]
+        assert vuelta['previous'] is None
+        assert vuelta['next'] is not None
+    
+    def test_cursor_invalido(self, cliente, registros):
+        assert cliente.get(f'{URL}?cursor=basura').status_code == 404
+
+
+@pytest.mark.django_db
+class TestFiltros:
+    """Filtros del historial"""
+    
+    def test_campo_modificado(self, cliente, registros):
+        data = cliente.get(f'{URL}?campo=precio').json()
+        
+        assert data['count'] == 5
+        assert all('precio' in r['detalles']['cambios_realizados'] for r in data['results'])
+    
+    def test_clave_de_detalles(self, cliente, admin):
+        for rol in ('admin', 'cliente', 'admin'):
+            AuditLog.objects.create(
+                usuario=admin, accion='cambiar_rol', modulo='usuario', objeto_id=1,
+                objeto_repr='x', detalles={'rol_nuevo': rol}
+            )
+        
+        data = cliente.get(f'{URL}?detalle_clave=rol_nuevo&detalle_valor=admin').json()
+        
+        assert data['count'] == 2
+        assert cliente.get(f'{URL}?detalle_clave=a__b&detalle_valor=1').status_code == 400
+    
+    def test_busqueda_por_repr_o_usuario(self, cliente, registros):
+        assert cliente.get(f'{URL}?search=producto 7').json()['count'] == 1
+        assert cliente.get(f'{URL}?search=jef').json()['count'] == 10
+    
+    def test_fechas(self, cliente, registros):
+        desde = (timezone.now() - timedelta(minutes=58, seconds=30)).isoformat().replace('+00:00', 'Z')
+        
+        assert cliente.get(URL, {'fecha_desde': desde}).json()['count'] == 4
+        assert cliente.get(f'{URL}?fecha_desde=ayer').status_code == 400
+
+
+@pytest.mark.django_db
+class TestPurga:
+    """clear_all en segundo plano"""
+    
+    def test_clear_all_purga_por_lotes(self, cliente, registros, settings):
+        settings.AUDITORIA_PURGA_LOTE = 3
+        
+        with mock.patch('api.tasks.purgar_auditoria.delay') as encolar:
+            response = cliente.delete(f'{URL}clear_all/')
+            # Una segunda petición no encola otra purga
+            assert cliente.delete(f'{URL}clear_all/').json()['purga']['estado'] == 'en_curso'
+        
+        assert response.status_code == 202
+        assert response.json()['count'] == 10
+        encolar.assert_called_once_with(registros[-1].id)
+        assert audit.estado_purga()['estado'] == 'en_curso'
+        
+        # El worker ejecuta la tarea
+        purgar_auditoria(registros[-1].id)
+        
+        assert AuditLog.objects.count() == 0
+        progreso = cliente.get(f'{URL}purga/').json()['purga']
+        assert progreso['estado'] == 'completada'
+        assert progreso['eliminados'] == 10
+    
+    def test_reintentos_agotados_marca_fallida(self, cliente, registros):
+        with mock.patch('api.tasks.purgar_auditoria.delay'):
+            cliente.delete(f'{URL}clear_all/')
+        
+        with mock.patch.object(audit, 'purgar', side_effect=RuntimeError('bd caída')):
+            resultado = purgar_auditoria.apply(args=(registros[-1].id,), retries=purgar_auditoria.max_retries)
+        assert isinstance(resultado.result, RuntimeError)
+        
+        progreso = cliente.get(f'{URL}purga/').json()['purga']
+        assert progreso['estado'] == 'fallida'
+        assert progreso['error'] == 'bd caída'
+        with mock.patch('api.tasks.purgar_auditoria.delay') as encolar:
+            assert cliente.delete(f'{URL}clear_all/').json()['purga']['estado'] == 'en_curso'
+        encolar.assert_called_once()
+    
+    def test_purga_abandonada_se_reinicia(self, cliente, registros):
+        with mock.patch('api.tasks.purgar_auditoria.delay') as encolar:
+            cliente.delete(f'{URL}clear_all/')
+            
+            # El worker murió (SIGKILL) sin avanzar ni marcarla como fallida
+            progreso = audit.estado_purga()
+            antes = timezone.now() - timedelta(seconds=audit.PURGA_SIN_PROGRESO + 1)
+            cache.set(audit.CLAVE_PURGA, {**progreso, 'actualizado_at': antes.isoformat()})
+            
+            cliente.delete(f'{URL}clear_all/')
+        
+        assert encolar.call_count == 2
+        assert not audit._abandonada(audit.estado_purga())
+    
+    def test_conserva_lo_posterior_al_inicio(self, registros):
+        hasta_id = registros[5].id
+        
+        assert audit.purgar(hasta_id, lote=2) == 6
+        
+        assert AuditLog.objects.count() == 4
+        assert not AuditLog.objects.filter(id__lte=hasta_id).exists()
@@ -0,0 +1,198 @@
+"""
+🔬 TESTS DE INSTRUMENTACIÓN (consultas, caché, serialización y N+1)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Presupuesto de consultas por endpoint: constante con 3 u 8 productos (sin N+1)
+✅ Huellas: la misma consulta con otros parámetros o listas IN cuenta igual
+✅ medir() cuenta consultas, aciertos/fallos de caché y tiempo de serializers
+✅ El middleware añade Server-Timing y registra una línea JSON por petición
+✅ Las N+1 se guardan en el buffer y se ven en /api/admin/instrumentacion/lentas/
+"""
+
+import json
+import logging
+
+import pytest
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from api.cache_backends import LocMemCache
+from api.middleware import InstrumentacionMiddleware
+from api.models import Cart, CartItem, Favorito, Producto
+from api.serializers import ProductoSerializer
+from api.tests.caches import LOCAL
+from api.utils import instrumentacion
+from api.utils.instrumentacion import MuestrasLentas, PresupuestoExcedido, medir, presupuesto_consultas
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    # Presupuestos medidos con caché local: con Redis caído cambian las consultas
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        MuestrasLentas.limpiar()
+        yield
+        cache.clear()
+        MuestrasLentas.limpiar()
+
+
+def crear_productos(cantidad):
+    fans = [User.objects.create_user(f'fan{i}', password='x') for i in range(2)]
+    productos = []
+    for i in range(cantidad):
+        producto = Producto.objects.create(
+            nombre=f'Producto {i}', descripcion='Catálogo', precio=10 + i, categoria='herramientas',
+            stock_total=50, activo=True, en_all_products=True, en_carrusel=True, en_carousel_card=True,
+            creado_por=fans[i % 2],
+        )
+        for fan in fans:
+            Favorito.objects.create(usuario=fan, producto=producto)
+        productos.append(producto)
+    return productos
+
+
+@pytest.fixture
+def cliente_carrito():
+    usuario = User.objects.create_user('comprador', email='comprador@example.com', password='x')
+    cart = Cart.objects.create(user=usuario)
+    for producto in crear_productos(3):
+        CartItem.objects.create(cart=cart, product=producto, quantity=1, price_at_addition=producto.precio)
+    client = APIClient()
+    client.force_authenticate(user=usuario)
+    return client, cart
+
+
+# (url, consultas) de los listados públicos: no dependen del número de productos
+PRESUPUESTOS_LISTADOS = [
+    ('/api/productos/', 4),
+    ('/api/carrusel/', 4),
+    ('/api/catalogo/productos/', 3),
+    ('/api/catalogo/tarjetas-inferiores/', 3),
+]
+
+
+@pytest.mark.django_db
+class TestPresupuestos:
+    """Consultas por endpoint con presupuesto_consultas()"""
+    
+    @pytest.mark.parametrize('url,consultas', PRESUPUESTOS_LISTADOS)
+    @pytest.mark.parametrize('cantidad', [3, 8])
+    def test_listados(self, url, consultas, cantidad):
+        crear_productos(cantidad)
+        
+        with presupuesto_consultas(consultas, repeticiones=1):
+            respuesta = APIClient().get(url)
+        assert respuesta.status_code == 200
+    
+    def test_actualizar_item(self, cliente_carrito):
+        client, cart = cliente_carrito
+        item = cart.items.first()
+        
+        with presupuesto_consultas(5, repeticiones=1):
+            respuesta = client.put(
+                reverse('carrito-item-detail', kwargs={'item_id': item.id}), {'quantity': 2}, format='json'
+            )
+        assert respuesta.status_code == 200
+        assert len(respuesta.json()['items']) == 3
+    
+    def test_eliminar_item(self, cliente_carrito):
+        client, cart = cliente_carrito
+        item = cart.items.first()
+        
+        with presupuesto_consultas(7, repeticiones=1):
+            respuesta = client.delete(reverse('carrito-item-detail', kwargs={'item_id': item.id}))
+        assert respuesta.status_code == 200
+        assert len(respuesta.json()['items']) == 2
+    
+    def test_str_del_carrito_sin_consultas(self, cliente_carrito, django_assert_num_queries):
+        _, cart = cliente_carrito
+        cart = Cart.objects.get(pk=cart.pk)
+        with django_assert_num_queries(0):
+            str(cart)
+    
+    def test_presupuesto_excedido(self, db):
+        productos = crear_productos(3)
+        with pytest.raises(PresupuestoExcedido, match='N\\+1'):
+            with presupuesto_consultas(10, repeticiones=1):
+                for producto in productos:
+                    producto.favoritos.count()
+
+
+def test_huella():
+    assert instrumentacion.huella('SELECT * FROM t WHERE id IN (%s, %s, %s)') == \
+        instrumentacion.huella('SELECT  *  FROM t WHERE id IN (%s)') == 'SELECT * FROM t WHERE id IN (...)'
+    assert instrumentacion.huella("SELECT * FROM t WHERE a = 'x' AND b = 12") == \
+        'SELECT * FROM t WHERE a = %s AND b = %s'
+
+
+@pytest.mark.django_db
+def test_medir():
+    productos = crear_productos(3)
+    cache_local = LocMemCache('instrumentacion-test', {})
+    cache_local.set('a', 1)
+    
+    with medir() as externa:
+        with medir() as interna:
+            for producto in productos:
+                Producto.objects.get(pk=producto.pk)
+            cache_local.get('a')
+            cache_local.get('b')
+            cache_local.get_many(['a', 'b', 'c'])
+            ProductoSerializer(productos, many=True).data
+    
+    for medicion in (externa, interna):
+        assert medicion.consultas >= 3
+        assert max(medicion.repetidas().values()) >= 3
+        assert (medicion.cache_aciertos, medicion.cache_fallos) == (2, 3)
+        assert medicion.ms_serializacion > 0
+
+
+@pytest.mark.django_db
+class TestMiddleware:
+
+    def test_server_timing_y_log(self, caplog):
+        crear_productos(2)
+        with caplog.at_level(logging.INFO, logger='instrumentacion'):
+            respuesta = APIClient().get('/api/catalogo/productos/')
+        
+        server_timing = respuesta['Server-Timing']
+        assert 'db;dur=' in server_timing and 'ser;dur=' in server_timing and 'total;dur=' in server_timing
+        registro = json.loads(caplog.records[-1].getMessage())
+        assert registro['ruta'] == '/api/catalogo/productos/'
+        assert registro['estado'] == 200
+        assert registro['consultas'] >= 1
+        assert registro['n_mas_1'] == []
+    
+    @override_settings(INSTRUMENTACION_N_MAS_1=3)
+    def test_n_mas_1_en_el_buffer(self, caplog):
+        productos = crear_productos(3)
+        
+        def vista_n_mas_1(request):
+            return HttpResponse(str(sum(producto.favoritos.count() for producto in productos)))
+        
+        with caplog.at_level(logging.INFO, logger='instrumentacion'):
+            InstrumentacionMiddleware(vista_n_mas_1)(RequestFactory().get('/n-mas-1/'))
+        assert caplog.records[-1].levelno == logging.WARNING
+        
+        admin = User.objects.create_user('jefe', password='x')
+        admin.profile.rol = 'admin'
+        admin.profile.save()
+        client = APIClient()
+        client.force_authenticate(user=admin)
+        respuesta = client.get(reverse('admin-instrumentacion-lentas'), {'limite': 5})
+        assert respuesta.status_code == 200
+        muestra, = respuesta.json()['muestras']
+        assert muestra['ruta'] == '/n-mas-1/'
+        assert muestra['n_mas_1'][0]['veces'] == 3
+        
+        assert client.delete(reverse('admin-instrumentacion-lentas')).status_code == 204
+        assert MuestrasLentas.listar() == []
+    
+    @override_settings(INSTRUMENTACION_LENTA_MS=0, INSTRUMENTACION_MUESTREO=0)
+    def test_muestreo(self):
+        APIClient().get('/api/carrusel/')
+        assert MuestrasLentas.listar() == []
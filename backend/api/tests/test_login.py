@@ -0,0 +1,133 @@
+"""
+🔐 TESTS DEL PIPELINE DE LOGIN
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Login por email o username con un único hash de contraseña (vía authenticate())
+✅ El intento se registra (en línea en los tests) con el resultado correcto
+✅ Con LOGIN_INTENTOS_ASINCRONOS se encola; si el broker falla, en línea
+✅ 5 fallos bloquean al usuario aunque cambie la IP
+✅ Con Redis caído un fallo de login sigue respondiendo 401 y el bloqueo sale de LoginAttempt
+"""
+
+import pytest
+from unittest import mock
+from django.contrib.auth.hashers import check_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.models import LoginAttempt
+from api.tests.caches import LOCAL, REDIS_CAIDO
+
+
+URL = '/api/auth/login/'
+
+
+@pytest.fixture
+def usuario(django_user_model):
+    return django_user_model.objects.create_user(
+        username='login_user', email='login@example.com', password='testpass123'
+    )
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    with override_settings(CACHES=LOCAL, LOGIN_INTENTOS_ASINCRONOS=False):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.mark.django_db
+class TestLogin:
+    """Pipeline de login"""
+    
+    @pytest.mark.parametrize('identificador', ['login@example.com', 'login_user'])
+    def test_login_un_solo_hash(self, usuario, identificador):
+        client = APIClient()
+        with mock.patch('django.contrib.auth.base_user.check_password', wraps=check_password) as hash_spy:
+            response = client.post(URL, {'username': identificador, 'password': 'testpass123'}, format='json')
+        
+        assert response.status_code == 200
+        assert response.data['user']['id'] == usuario.id
+        assert hash_spy.call_count == 1
+        assert LoginAttempt.objects.filter(username=identificador, success=True).count() == 1
+    
+    def test_fallo_registrado(self, usuario):
+        client = APIClient()
+        response = client.post(URL, {'username': 'login_user', 'password': 'mala'}, format='json')
+        
+        assert response.status_code == 401
+        assert LoginAttempt.objects.filter(username='login_user', success=False).count() == 1
+    
+    def test_bloqueo_por_usuario(self, usuario):
+        client = APIClient()
+        for i in range(5):
+            response = client.post(
+                URL, {'username': 'login_user', 'password': 'mala'},
+                format='json', REMOTE_ADDR=f'10.0.0.{i + 1}'
+            )
+            assert response.status_code == 401
+        
+        response = client.post(
+            URL, {'username': 'login_user', 'password': 'testpass123'},
+            format='json', REMOTE_ADDR='10.0.0.99'
+        )
+        assert response.status_code == 429
+        assert response.data['bloqueado'] is True
+        assert 0 < response.data['tiempo_restante'] <= 60
+    
+    @override_settings(LOGIN_INTENTOS_ASINCRONOS=True)
+    def test_registro_encolado(self, usuario):
+        client = APIClient()
+        with mock.patch('api.tasks.registrar_intento_login.delay') as delay:
+            response = client.post(URL, {'username': 'login_user', 'password': 'mala'}, format='json')
+        
+        assert response.status_code == 401
+        assert delay.call_args.kwargs['success'] is False
+        assert not LoginAttempt.objects.exists()
+        
+        with mock.patch('api.tasks.registrar_intento_login.delay', side_effect=OSError('broker caído')):
+            client.post(URL, {'username': 'login_user', 'password': 'mala'}, format='json')
+        assert LoginAttempt.objects.filter(username='login_user', success=False).count() == 1
+    
+    @override_settings(CACHES=REDIS_CAIDO)
+    def test_fallo_con_redis_caido(self, usuario):
+        response = APIClient().post(URL, {'username': 'login_user', 'password': 'mala'}, format='json')
+        
+        assert response.status_code == 401
+        assert LoginAttempt.objects.filter(username='login_user', success=False).count() == 1
+    
+    def test_senal_de_fallo(self, usuario):
+        recibidas = []
+        
+        def receptor(sender, credentials, **kwargs):
+            recibidas.append(credentials['username'])
+        
+        user_login_failed.connect(receptor)
+        try:
+            APIClient().post(URL, {'username': 'login@example.com', 'password': 'mala'}, format='json')
+        finally:
+            user_login_failed.disconnect(receptor)
+        assert recibidas == ['login_user']
+    
+    @override_settings(CACHES=REDIS_CAIDO, LOGIN_INTENTOS_ASINCRONOS=True)
+    def test_bloqueo_desde_bd_con_redis_caido(self, usuario):
+        client = APIClient()
+        with mock.patch('api.tasks.registrar_intento_login.delay') as delay:
+            for i in range(5):
+                response = client.post(
+                    URL, {'username': 'login_user', 'password': 'mala'},
+                    format='json', REMOTE_ADDR=f'10.0.0.{i + 1}'
+                )
+                assert response.status_code == 401
+            
+            response = client.post(
+                URL, {'username': 'login_user', 'password': 'testpass123'},
+                format='json', REMOTE_ADDR='10.0.0.99'
+            )
+        
+        assert response.status_code == 429
+        assert 0 < response.data['tiempo_restante'] <= 60
+        delay.assert_not_called()  # Sin contadores en caché los fallos se escriben en línea
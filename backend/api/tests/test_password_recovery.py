@@ -6,11 +6,12 @@
 Tests para el sistema de recuperación de contraseña con tokens seguros.
 """
 
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from datetime import timedelta
-from api.models import PasswordResetToken, LoginAttempt
+from api.models import PasswordResetToken, LoginAttempt, PasswordRecoveryCode
+from api.tests.caches import LOCAL, REDIS_CAIDO
 from unittest.mock import patch
 import json
 
@@ -179,6 +180,7 @@ class PasswordResetTokenModelTest(TestCase):
         self.assertEqual(PasswordResetToken.objects.first().usuario, self.user)
 
 
+@override_settings(CACHES=LOCAL)
 class PasswordResetEndpointsTest(TestCase):
     """Tests para los endpoints de recuperación de contraseña"""
     
@@ -379,6 +381,7 @@ class PasswordResetEndpointsTest(TestCase):
         self.assertEqual(response.status_code, 401)
 
 
+@override_settings(CACHES=LOCAL)
 class PasswordResetSecurityTest(TestCase):
     """Tests de seguridad para recuperación de contraseña"""
     
@@ -459,6 +462,7 @@ class PasswordResetSecurityTest(TestCase):
         self.assertIsNone(resultado2)
 
 
+@override_settings(CACHES=LOCAL)
 class ResetPasswordRateLimitingTest(TestCase):
     """Tests para el rate limiting en el endpoint reset-password"""
     
@@ -582,3 +586,24 @@ class ResetPasswordRateLimitingTest(TestCase):
         
         # Debería funcionar sin bloquear
         self.assertEqual(response.status_code, 200)
+
+
+@override_settings(CACHES=REDIS_CAIDO)
+class CodigoRecuperacionRedisCaidoTest(TestCase):
+    """Con Redis caído el código se guarda y se comprueba en BD"""
+    
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='testuser',
+            email='test@example.com',
+            password='TestPass123!'
+        )
+    
+    def test_comprobar_codigo_en_bd(self):
+        recovery_code = PasswordRecoveryCode.crear_codigo(self.user)
+        self.assertIsNotNone(recovery_code.pk)
+        
+        self.assertEqual(PasswordRecoveryCode.comprobar_codigo(self.user, '000000'), (None, False))
+        encontrado, bloqueado = PasswordRecoveryCode.comprobar_codigo(self.user, recovery_code.codigo)
+        self.assertEqual(encontrado, recovery_code)
+        self.assertFalse(bloqueado)
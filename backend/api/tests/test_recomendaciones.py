@@ -0,0 +1,120 @@
+"""
+🧮 TESTS DEL ÍNDICE DE CO-COMPRA
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Matriz Xᵀ·X y top-K coseno
+✅ Actualización incremental (solo pedidos nuevos)
+✅ Endpoint GET /api/productos/{id}/recomendados/
+"""
+
+from datetime import timedelta
+
+import numpy as np
+import pytest
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework.test import APIClient
+from api.models import Producto, Pedido, DetallePedido, IndiceCoCompra, RecomendacionProducto
+from api.utils.recomendaciones import matriz_coocurrencia, top_k_similares, actualizar_indice
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def cliente(django_user_model):
+    return django_user_model.objects.create_user(username='comprador', password='testpass123')
+
+
+@pytest.fixture
+def productos():
+    return [
+        Producto.objects.create(
+            nombre=f'Producto {i}', descripcion='Descripción', precio=100,
+            stock_total=10, activo=True,
+        )
+        for i in range(4)
+    ]
+
+
+def crear_pedido(usuario, productos):
+    pedido = Pedido.objects.create(
+        usuario=usuario, total=100, direccion_entrega='Calle 1', telefono='3000000000',
+    )
+    # Fuera del margen de pedidos en curso
+    Pedido.objects.filter(pk=pedido.pk).update(created_at=timezone.now() - timedelta(hours=1))
+    for producto in productos:
+        DetallePedido.objects.create(
+            pedido=pedido, producto=producto, cantidad=1, precio_unitario=100, subtotal=100
+        )
+    return pedido
+
+
+class TestMatematica:
+    """Matriz de co-ocurrencia y similitud"""
+    
+    def test_matriz_y_top_k(self):
+        # Pedido 1: {1, 2}, pedido 2: {1, 2, 3}, pedido 3: {1, 1}
+        pedidos = np.array([1, 1, 2, 2, 2, 3, 3])
+        items = np.array([1, 2, 1, 2, 3, 1, 1])
+        
+        C = matriz_coocurrencia(pedidos, items, 4)
+        
+        assert C[1, 1] == 3  # El duplicado del pedido 3 cuenta una vez
+        assert C[1, 2] == 2
+        assert C[2, 3] == 1
+        
+        similares = top_k_similares(C, [1], k=1)
+        ids, puntuaciones = similares[1]
+        assert list(ids) == [2]
+        assert puntuaciones[0] == pytest.approx(2 / np.sqrt(3 * 2))
+
+
+@pytest.mark.django_db
+class TestIndiceCoCompra:
+    """Construcción incremental y endpoint"""
+    
+    def test_incremental(self, cliente, productos):
+        a, b, c, d = productos
+        crear_pedido(cliente, [a, b])
+        
+        resultado = actualizar_indice()
+        assert resultado['lineas'] == 2
+        assert RecomendacionProducto.objects.get(producto=a).recomendados == [b.id]
+        
+        crear_pedido(cliente, [a, c])
+        crear_pedido(cliente, [a, c])
+        
+        resultado = actualizar_indice()
+        assert resultado['lineas'] == 4
+        assert RecomendacionProducto.objects.get(producto=a).recomendados == [c.id, b.id]
+        assert not RecomendacionProducto.objects.filter(producto=d).exists()
+        assert IndiceCoCompra.obtener().lineas_procesadas == 6
+        
+        # Sin pedidos nuevos no se procesa nada
+        assert actualizar_indice()['lineas'] == 0
+    
+    def test_endpoint_recomendados(self, cliente, productos):
+        a, b, c, d = productos
+        crear_pedido(cliente, [a, b])
+        actualizar_indice()
+        client = APIClient()
+        
+        response = client.get(f'/api/productos/{a.id}/recomendados/')
+        assert response.status_code == 200
+        assert response.data['fuente'] == 'co_compra'
+        assert [p['id'] for p in response.data['recomendados']] == [b.id]
+        
+        # Sin pedidos en común: fallback a relacionados
+        response = client.get(f'/api/productos/{d.id}/recomendados/')
+        assert response.data['fuente'] == 'relacionados'
+        assert client.get('/api/productos/999999/recomendados/').status_code == 404
+        
+        d.activo = False
+        d.save()
+        assert client.get(f'/api/productos/{d.id}/recomendados/').status_code == 404
@@ -0,0 +1,173 @@
+"""
+🔑 TESTS DE ROTACIÓN DE REFRESH TOKENS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar (flujo en BD, sin Redis):
+✅ Refresh rota el token y el anterior deja de servir
+✅ Logout revoca todos los tokens del usuario
+
+Con Redis (fakeredis, familias en api/utils/sesiones.py):
+✅ Rotación Lua sin escribir en BD; el volcado actualiza la fila
+✅ Token rotado dentro de la ventana de gracia → rota otra vez
+✅ Token rotado fuera de la ventana → familia revocada en Redis y en BD
+✅ revocar_todos borra solo las familias del usuario (sin SCAN)
+✅ Familia perdida en Redis → se rehidrata desde la fila de BD
+"""
+
+import time
+from unittest import mock
+
+import pytest
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.models import RefreshToken
+from api.tests.caches import LOCAL, redis_falso
+from api.utils import sesiones
+
+
+@pytest.fixture
+def usuario(django_user_model):
+    return django_user_model.objects.create_user(
+        username='sesion', email='sesion@example.com', password='testpass123'
+    )
+
+
+@pytest.fixture
+def sin_redis():
+    with override_settings(CACHES=LOCAL):
+        yield
+
+
+@pytest.fixture
+def redis():
+    pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    with override_settings(CACHES=redis_falso()):
+        yield sesiones.get_redis()
+
+
+@pytest.mark.django_db
+@pytest.mark.usefixtures('sin_redis')
+class TestRefreshTokens:
+    """Rotación y revocación"""
+    
+    def test_rotar_token(self, usuario):
+        token, _ = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        
+        usuario_id, nuevo = RefreshToken.rotar_token(token)
+        
+        assert usuario_id == usuario.id
+        assert nuevo != token
+        assert RefreshToken.rotar_token(token) == (None, None)
+        assert RefreshToken.usuario_id_de_token(nuevo) == usuario.id
+    
+    def test_endpoint_refresh_y_logout(self, usuario):
+        token, _ = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        client = APIClient()
+        client.cookies['refreshToken'] = token
+        
+        response = client.post('/api/auth/refresh/')
+        assert response.status_code == 200
+        assert response.data['user']['id'] == usuario.id
+        nuevo = response.cookies['refreshToken'].value
+        
+        client.cookies['refreshToken'] = nuevo
+        assert client.post('/api/auth/logout/').status_code == 200
+        assert RefreshToken.usuario_id_de_token(nuevo) is None
+        assert not RefreshToken.objects.filter(usuario=usuario, revocado=False).exists()
+
+
+@pytest.mark.django_db
+class TestFamiliasRedis:
+    """Rotación atómica, reutilización, volcado y rehidratación"""
+    
+    def rotar_en(self, token, segundos):
+        with mock.patch.object(sesiones.time, 'time', return_value=time.time() + segundos):
+            return RefreshToken.rotar_token(token)
+    
+    def test_rotar_y_volcar(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        
+        usuario_id, nuevo = RefreshToken.rotar_token(token)
+        
+        assert usuario_id == usuario.id
+        fila.refresh_from_db()
+        assert fila.token_hash == RefreshToken.hash_token(token)
+        assert RefreshToken.usuario_id_de_token(nuevo) == usuario.id
+        
+        assert sesiones.volcar_pendientes() == {'actualizadas': 1, 'revocadas': 0}
+        fila.refresh_from_db()
+        assert fila.token_hash == RefreshToken.hash_token(nuevo)
+        assert not fila.revocado
+    
+    @override_settings(REFRESH_GRACIA_SEGUNDOS=10)
+    def test_ventana_de_gracia(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        _, primero = RefreshToken.rotar_token(token)
+        
+        # Segunda pestaña con el token recién rotado: recibe el vigente, sin rotarlo
+        assert self.rotar_en(token, 5) == (usuario.id, primero)
+        assert redis.hget(sesiones.clave_token(RefreshToken.hash_token(primero)), 'estado') == b'activo'
+        assert redis.hget(sesiones.clave_familia(usuario.id, fila.jti), 'rotacion') == b'1'
+    
+    @override_settings(REFRESH_GRACIA_SEGUNDOS=10)
+    def test_pestanas_concurrentes_no_revocan(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        _, de_a = RefreshToken.rotar_token(token)
+        _, de_b = self.rotar_en(token, 1)
+        
+        # La cookie se queda con cualquiera de las dos respuestas: es el mismo token
+        assert de_a == de_b
+        usuario_id, siguiente = self.rotar_en(de_a, 60)
+        assert usuario_id == usuario.id
+        assert self.rotar_en(siguiente, 120)[0] == usuario.id
+        fila.refresh_from_db()
+        assert not fila.revocado
+    
+    @override_settings(REFRESH_GRACIA_SEGUNDOS=10)
+    def test_reutilizacion_revoca_familia(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        _, nuevo = RefreshToken.rotar_token(token)
+        
+        assert self.rotar_en(token, 30) == (None, None)
+        
+        fila.refresh_from_db()
+        assert fila.revocado
+        assert RefreshToken.rotar_token(nuevo) == (None, None)
+        assert RefreshToken.usuario_id_de_token(nuevo) is None
+        assert sesiones.volcar_pendientes() == {'actualizadas': 0, 'revocadas': 1}
+    
+    def test_revocar_todos(self, usuario, django_user_model, redis):
+        otro = django_user_model.objects.create_user(username='otro', password='testpass123')
+        tokens = [RefreshToken.crear_token(usuario=usuario, duracion_horas=2)[0] for _ in range(2)]
+        token_otro, _ = RefreshToken.crear_token(usuario=otro, duracion_horas=2)
+        
+        with mock.patch.object(type(redis), 'scan_iter', side_effect=AssertionError('SCAN')):
+            RefreshToken.revocar_todos_usuario(usuario)
+        
+        assert not redis.exists(sesiones.clave_familias(usuario.id))
+        assert all(RefreshToken.rotar_token(token) == (None, None) for token in tokens)
+        assert RefreshToken.rotar_token(token_otro)[0] == otro.id
+    
+    def test_rehidratar(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        redis.flushdb()  # Redis reiniciado sin persistencia
+        
+        usuario_id, nuevo = RefreshToken.rotar_token(token)
+        
+        assert usuario_id == usuario.id
+        assert redis.hget(sesiones.clave_familia(usuario.id, fila.jti), 'actual') == \
+            RefreshToken.hash_token(nuevo).encode()
+        assert redis.sismember(sesiones.clave_familias(usuario.id), sesiones.clave_familia(usuario.id, fila.jti))
+    
+    def test_no_rehidrata_familia_viva(self, usuario, redis):
+        token, fila = RefreshToken.crear_token(usuario=usuario, duracion_horas=2)
+        _, nuevo = RefreshToken.rotar_token(token)
+        familia = sesiones.clave_familia(usuario.id, fila.jti)
+        
+        # La clave del token original desaparece antes del volcado (fila de BD aún con su hash)
+        redis.delete(sesiones.clave_token(RefreshToken.hash_token(token)))
+        
+        assert RefreshToken.rotar_token(token) == (None, None)
+        assert redis.hget(familia, 'actual') == RefreshToken.hash_token(nuevo).encode()
+        assert RefreshToken.rotar_token(nuevo)[0] == usuario.id
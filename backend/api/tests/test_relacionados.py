@@ -0,0 +1,126 @@
+"""
+🔗 TESTS DE PRODUCTOS RELACIONADOS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Compras conjuntas pesan más que la categoría
+✅ Pedidos cancelados no cuentan
+✅ El precálculo por lotes da lo mismo que en un solo lote
+✅ Fallback por categoría sin precálculo
+✅ El detalle hidrata tarjetas en el orden precalculado
+"""
+
+from unittest import mock
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.models import Producto, Pedido, DetallePedido, Favorito
+from api.tests.caches import LOCAL
+from api.utils.relacionados import ProductosRelacionados
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.fixture
+def cliente(django_user_model):
+    return django_user_model.objects.create_user(username='comprador', password='testpass123')
+
+
+def crear_producto(nombre, categoria='herramientas'):
+    return Producto.objects.create(
+        nombre=nombre,
+        descripcion='Descripción',
+        precio=100,
+        stock_total=10,
+        categoria=categoria,
+        activo=True,
+    )
+
+
+def crear_pedido(usuario, productos, estado='entregado'):
+    pedido = Pedido.objects.create(
+        usuario=usuario,
+        estado=estado,
+        total=100,
+        direccion_entrega='Calle 1',
+        telefono='3000000000',
+    )
+    for producto in productos:
+        DetallePedido.objects.create(
+            pedido=pedido, producto=producto, cantidad=1, precio_unitario=100, subtotal=100
+        )
+    return pedido
+
+
+@pytest.mark.django_db
+class TestProductosRelacionados:
+    """Precálculo y lectura de vecinos"""
+    
+    def test_compras_conjuntas_primero(self, cliente):
+        taladro = crear_producto('Taladro')
+        misma_categoria = crear_producto('Martillo')
+        brocas = crear_producto('Brocas', categoria='otros')
+        crear_pedido(cliente, [taladro, brocas])
+        
+        ProductosRelacionados.precalcular()
+        
+        assert ProductosRelacionados.ids(taladro) == [brocas.id, misma_categoria.id]
+    
+    def test_favoritos_en_comun_y_cancelados(self, cliente):
+        a = crear_producto('A', categoria='otros')
+        b = crear_producto('B', categoria='hogar_entretenimiento')
+        c = crear_producto('C', categoria='electrodomesticos')
+        Favorito.objects.create(usuario=cliente, producto=a)
+        Favorito.objects.create(usuario=cliente, producto=b)
+        crear_pedido(cliente, [a, c], estado='cancelado')
+        
+        ProductosRelacionados.precalcular()
+        
+        assert ProductosRelacionados.ids(a) == [b.id]
+    
+    def test_por_lotes(self, cliente):
+        productos = [crear_producto(f'P{i}', categoria=('otros', 'herramientas')[i % 2]) for i in range(5)]
+        crear_pedido(cliente, productos[:3])
+        crear_pedido(cliente, productos[1:])
+        Favorito.objects.create(usuario=cliente, producto=productos[0])
+        Favorito.objects.create(usuario=cliente, producto=productos[4])
+        
+        assert ProductosRelacionados.precalcular() == 5
+        un_lote = {p.id: ProductosRelacionados.ids(p) for p in productos}
+        cache.clear()
+        with mock.patch.object(ProductosRelacionados, 'LOTE', 2):
+            assert ProductosRelacionados.precalcular() == 5
+        
+        assert {p.id: ProductosRelacionados.ids(p) for p in productos} == un_lote
+    
+    def test_fallback_por_categoria(self):
+        viejo = crear_producto('Viejo')
+        nuevo = crear_producto('Nuevo')
+        crear_producto('Otro', categoria='otros')
+        
+        assert ProductosRelacionados.ids(viejo) == [nuevo.id]
+    
+    def test_detalle_hidrata_tarjetas(self, cliente):
+        taladro = crear_producto('Taladro')
+        brocas = crear_producto('Brocas', categoria='otros')
+        inactivo = crear_producto('Inactivo')
+        crear_pedido(cliente, [taladro, brocas])
+        ProductosRelacionados.precalcular()
+        cache.set(ProductosRelacionados.clave(taladro.id), [brocas.id, inactivo.id])
+        inactivo.activo = False
+        inactivo.save()
+        
+        response = APIClient().get(f'/api/productos/{taladro.id}/')
+        
+        assert response.status_code == 200
+        relacionados = response.data['productos_relacionados']
+        assert [p['id'] for p in relacionados] == [brocas.id]
+        assert 'favoritos_count' not in relacionados[0]
@@ -0,0 +1,128 @@
+"""
+⚡ TESTS DE RENDERERS / PARSERS JSON (orjson)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ ORJSONRenderer produce los mismos bytes que el JSONRenderer de DRF
+✅ indent y enteros de más de 64 bits se delegan en DRF
+✅ ORJSONParser lee lo mismo que JSONParser (y mismos errores)
+✅ Las listas grandes se envían por lotes con el mismo JSON
+"""
+
+import json
+import uuid
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import BytesIO
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+from api.models import Producto
+from api.renderers import ORJSONParser, ORJSONRenderer, respuesta_json_streaming
+
+pytest.importorskip('orjson')
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+PAYLOAD = {
+    'count': 2,
+    'data': ReturnList([
+        ReturnDict({
+            'id': 1,
+            'nombre': 'Licuadora ñandú ⚡',
+            'precio': '129.90',
+            'descuento': Decimal('10.50'),
+            'activo': True,
+            'imagen': None,
+            'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'fecha': date(2024, 5, 1),
+            'codigo': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+            'nota': 'línea\u2028separada\u2029',
+            'categoria': gettext_lazy('Hogar'),
+        }, serializer=None),
+    ], serializer=None),
+    'por_estado': {1: 3, 'pendiente': 0.25},
+}
+
+
+class TestRenderer:
+    """ORJSONRenderer frente a JSONRenderer"""
+    
+    def test_mismos_bytes(self):
+        assert ORJSONRenderer().render(PAYLOAD) == JSONRenderer().render(PAYLOAD)
+        assert ORJSONRenderer().render(None) == b''
+    
+    def test_delega_en_drf(self):
+        con_indent = ORJSONRenderer().render(PAYLOAD, 'application/json; indent=2')
+        assert con_indent == JSONRenderer().render(PAYLOAD, 'application/json; indent=2')
+        assert b'\n' in con_indent
+        
+        grande = {'id': 2 ** 70}
+        assert ORJSONRenderer().render(grande) == JSONRenderer().render(grande)
+
+
+class TestParser:
+    """ORJSONParser frente a JSONParser"""
+    
+    def parse(self, parser, contenido):
+        return parser.parse(BytesIO(contenido), 'application/json', {})
+    
+    def test_mismo_resultado(self):
+        for contenido in (
+            JSONRenderer().render(PAYLOAD),
+            b'{"id": 123456789012345678901234567890, "precio": 1.5}',
+            '{"nombre": "ñandú"}'.encode(),
+        ):
+            assert self.parse(ORJSONParser(), contenido) == self.parse(JSONParser(), contenido)
+        
+        assert isinstance(self.parse(ORJSONParser(), b'{"id": 123456789012345678901234567890}')['id'], int)
+    
+    def test_mismos_errores(self):
+        for contenido in (b'{"a": ', b'{"a": NaN}', b''):
+            with pytest.raises(ParseError):
+                self.parse(ORJSONParser(), contenido)
+
+
+@pytest.mark.django_db
+def test_catalogo_por_lotes():
+    for i in range(5):
+        Producto.objects.create(nombre=f'Producto {i}', descripcion='Catálogo', precio=10 + i,
+                                stock_total=3, activo=True, en_all_products=True)
+    client = APIClient()
+    url = reverse('catalogo-productos')
+    
+    completa = client.get(url)
+    with override_settings(JSON_STREAMING_MINIMO=2):
+        por_lotes = client.get(url)
+    
+    assert not completa.streaming
+    assert por_lotes.streaming
+    assert por_lotes['Content-Type'] == 'application/json'
+    assert json.loads(b''.join(por_lotes.streaming_content)) == json.loads(completa.content)
+    assert json.loads(completa.content)['count'] == 5
+
+
+def test_streaming_por_lotes():
+    elementos = list(range(7))
+    respuesta = respuesta_json_streaming({'count': 7}, 'data', elementos, lambda lote: [{'n': n} for n in lote], lote=3)
+    fragmentos = list(respuesta.streaming_content)
+    
+    assert len(fragmentos) == 5  # Cabecera, 3 lotes y cierre
+    assert json.loads(b''.join(fragmentos)) == {'count': 7, 'data': [{'n': n} for n in elementos]}
+    
+    vacia = respuesta_json_streaming({}, 'data', [], lambda lote: lote)
+    assert b''.join(vacia.streaming_content) == b'{"data":[]}'
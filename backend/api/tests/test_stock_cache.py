@@ -0,0 +1,128 @@
+"""
+📦 TESTS DE PROYECCIÓN DE STOCK (REDIS)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Las mutaciones de stock publican el disponible
+✅ Fallback a BD cuando la clave no existe
+✅ Reconciliación corrige la deriva
+✅ Endpoint batch GET /api/productos/stock/?ids=
+✅ validar-stock usa el disponible real (no la columna legada)
+"""
+
+import pytest
+from django.core.cache import cache
+from django.test import override_settings
+from rest_framework.test import APIClient
+from api.models import Producto, StockShard
+from api.tests.caches import redis_falso
+from api.utils.stock_cache import StockCache
+
+pytest.importorskip('fakeredis')
+
+
+@pytest.fixture(autouse=True)
+def cache_redis():
+    """Proyección en un Redis falso y vacío: no depende de si hay Redis local"""
+    with override_settings(CACHES=redis_falso()):
+        yield
+
+
+@pytest.fixture
+def productos():
+    return [
+        Producto.objects.create(
+            nombre=f'Producto {i}',
+            descripcion='Descripción',
+            precio=100,
+            stock_total=10 * i,
+            activo=True,
+        )
+        for i in range(1, 4)
+    ]
+
+
+@pytest.mark.django_db
+class TestStockCache:
+    """Escritura en cada mutación + lectura con fallback"""
+    
+    def test_mutaciones_publican_disponible(self, productos):
+        producto = productos[0]
+        clave = StockCache.clave(producto.id)
+        
+        producto.reservar_stock(3)
+        assert cache.get(clave) == 7
+        
+        producto.liberar_stock(1)
+        assert cache.get(clave) == 8
+        
+        producto.stock_total = 20
+        producto.save()
+        assert cache.get(clave) == 18
+    
+    def test_modo_shards_aplica_deltas(self, productos):
+        producto = productos[1]
+        StockShard.configurar(producto, 4)
+        assert StockCache.obtener_uno(producto.id) == 20
+        
+        producto.reservar_stock(5)
+        assert cache.get(StockCache.clave(producto.id)) == 15
+        
+        producto.liberar_stock(2)
+        assert cache.get(StockCache.clave(producto.id)) == 17
+    
+    def test_fallback_a_bd(self, productos):
+        cache.clear()
+        
+        resultado = StockCache.obtener([p.id for p in productos] + [999999])
+        
+        assert resultado == {productos[0].id: 10, productos[1].id: 20, productos[2].id: 30}
+        assert cache.get(StockCache.clave(productos[2].id)) == 30
+    
+    def test_reconciliar_corrige_deriva(self, productos):
+        cache.clear()
+        StockCache.publicar(productos[0].id, 99)
+        StockCache.publicar(productos[1].id, 20)
+        
+        resultado = StockCache.reconciliar()
+        
+        assert resultado == {'revisados': 2, 'corregidos': 1}
+        assert cache.get(StockCache.clave(productos[0].id)) == 10
+
+
+@pytest.mark.django_db
+class TestStockEndpoints:
+    """Endpoints de consulta de stock"""
+    
+    def test_batch(self, productos):
+        client = APIClient()
+        ids = ','.join(str(p.id) for p in productos)
+        
+        response = client.get(f'/api/productos/stock/?ids={ids},999999')
+        
+        assert response.status_code == 200
+        assert response.data['stock'] == {
+            str(productos[0].id): 10,
+            str(productos[1].id): 20,
+            str(productos[2].id): 30,
+        }
+        assert response.data['no_encontrados'] == [999999]
+    
+    def test_batch_ids_invalidos(self):
+        client = APIClient()
+        
+        assert client.get('/api/productos/stock/').status_code == 400
+        assert client.get('/api/productos/stock/?ids=1,abc').status_code == 400
+    
+    def test_validar_stock_usa_disponible(self, productos, django_user_model):
+        user = django_user_model.objects.create_user(username='u', password='testpass123')
+        client = APIClient()
+        client.force_authenticate(user=user)
+        producto = productos[0]
+        producto.reservar_stock(10)
+        
+        response = client.get(f'/api/productos/{producto.id}/validar-stock/')
+        
+        assert response.status_code == 200
+        assert response.data['stock'] == 0
+        assert response.data['disponible'] is False
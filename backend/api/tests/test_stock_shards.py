@@ -0,0 +1,119 @@
+"""
+⚡ TESTS DE STOCK REPARTIDO (SHARDS)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Reserva atómica en modo normal (fila única)
+✅ Activar shards conserva las reservas existentes
+✅ Reservas en modo shards nunca superan el stock disponible
+✅ Liberar reservas repartidas entre varios shards
+✅ Rebalanceo refresca el espejo stock_reservado/stock
+✅ Desactivar shards consolida las reservas
+"""
+
+import pytest
+from api.models import Producto, StockShard
+
+
+@pytest.fixture
+def producto():
+    """Producto con 10 unidades disponibles"""
+    return Producto.objects.create(
+        nombre='Consola Flash Sale',
+        descripcion='Producto caliente',
+        precio=500,
+        stock_total=10,
+        activo=True,
+    )
+
+
+@pytest.mark.django_db
+class TestStockNormal:
+    """Modo normal: UPDATE condicional sobre la fila del producto"""
+    
+    def test_reservar_y_liberar(self, producto):
+        assert producto.reservar_stock(4) is True
+        assert producto.stock_reservado == 4
+        assert producto.stock == 6
+        
+        producto.liberar_stock(4)
+        assert producto.stock_reservado == 0
+        assert producto.stock == 10
+    
+    def test_reservar_sin_stock_suficiente(self, producto):
+        assert producto.reservar_stock(11) is False
+        producto.refresh_from_db()
+        assert producto.stock_reservado == 0
+    
+    def test_liberar_no_deja_negativo(self, producto):
+        producto.liberar_stock(3)
+        assert producto.stock_reservado == 0
+        assert producto.stock == 10
+
+
+@pytest.mark.django_db
+class TestStockShards:
+    """Modo shards: las reservas se reparten entre N filas"""
+    
+    def test_configurar_conserva_reservas(self, producto):
+        producto.reservar_stock(3)
+        StockShard.configurar(producto, 4)
+        
+        assert producto.num_shards == 4
+        assert producto.shards.count() == 4
+        assert producto.stock_reservado_real == 3
+        assert producto.stock_disponible == 7
+    
+    def test_reservas_no_superan_stock(self, producto):
+        StockShard.configurar(producto, 4)
+        
+        resultados = [producto.reservar_stock(1) for _ in range(12)]
+        
+        assert resultados.count(True) == 10
+        assert producto.stock_reservado_real == 10
+        assert producto.stock_disponible == 0
+    
+    def test_reserva_con_capacidad_fragmentada(self, producto):
+        StockShard.configurar(producto, 4)
+        
+        # 10 unidades en 4 shards (3, 3, 2, 2): ningún shard tiene 5 libres
+        assert producto.reservar_stock(5) is True
+        assert producto.stock_reservado_real == 5
+        assert producto.reservar_stock(6) is False
+        assert producto.reservar_stock(5) is True
+        assert producto.stock_disponible == 0
+    
+    def test_liberar_entre_varios_shards(self, producto):
+        StockShard.configurar(producto, 3)
+        for _ in range(6):
+            assert producto.reservar_stock(1) is True
+        
+        producto.liberar_stock(5)
+        
+        assert producto.stock_reservado_real == 1
+        assert all(s.reservado >= 0 for s in producto.shards.all())
+    
+    def test_rebalancear_refresca_espejo(self, producto):
+        StockShard.configurar(producto, 4)
+        producto.reservar_stock(2)
+        producto.reservar_stock(3)
+        
+        StockShard.rebalancear(producto)
+        producto.refresh_from_db()
+        
+        assert producto.stock_reservado == 5
+        assert producto.stock == 5
+        assert sum(s.capacidad for s in producto.shards.all()) == 10
+    
+    def test_desactivar_consolida_reservas(self, producto):
+        StockShard.configurar(producto, 4)
+        producto.reservar_stock(2)
+        producto.reservar_stock(2)
+        
+        StockShard.configurar(producto, 0)
+        
+        assert producto.num_shards == 0
+        assert producto.shards.count() == 0
+        assert producto.stock_reservado == 4
+        assert producto.reservar_stock(6) is True
+        assert producto.reservar_stock(1) is False
@@ -0,0 +1,129 @@
+"""
+🚦 TESTS DEL THROTTLE GCRA EN REDIS
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Ráfaga de N peticiones y luego una cada duración/N (misma tasa que DRF)
+✅ Retry-After exacto en segundos
+✅ Estado de tamaño constante (un número por clave)
+✅ Sin Redis o con Redis caído: historial de DRF en la caché de Django
+
+Usan fakeredis (con lupa para el script Lua); se omiten si no está instalado.
+"""
+
+import pytest
+from types import SimpleNamespace
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.test import RequestFactory, override_settings
+from rest_framework.throttling import UserRateThrottle
+from api.tests.caches import LOCAL
+from api.throttles import GCRARedisMixin, AdminRateThrottle, PREFIJO_GCRA
+
+fakeredis = pytest.importorskip('fakeredis')
+pytest.importorskip('lupa')
+
+
+class TresPorMinuto(GCRARedisMixin, UserRateThrottle):
+    scope = 'prueba'
+    rate = '3/minute'
+
+
+class Reloj:
+    def __init__(self):
+        self.ahora = 1_700_000_000.0
+    
+    def __call__(self):
+        return self.ahora
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    with override_settings(CACHES=LOCAL):
+        cache.clear()
+        yield
+        cache.clear()
+
+
+@pytest.fixture
+def redis():
+    servidor = fakeredis.FakeStrictRedis()
+    with mock.patch('api.throttles.get_redis', return_value=servidor):
+        yield servidor
+
+
+@pytest.fixture
+def reloj():
+    reloj = Reloj()
+    with mock.patch.object(TresPorMinuto, 'timer', side_effect=reloj):
+        yield reloj
+
+
+@pytest.fixture
+def request_usuario():
+    request = RequestFactory().get('/')
+    request.user = SimpleNamespace(is_authenticated=True, pk=7)
+    return request
+
+
+def peticion(request):
+    throttle = TresPorMinuto()
+    return throttle.allow_request(request, None), throttle
+
+
+class TestGCRA:
+    """Algoritmo y estado en Redis"""
+    
+    def test_rafaga_y_retry_after(self, redis, reloj, request_usuario):
+        assert [peticion(request_usuario)[0] for _ in range(3)] == [True, True, True]
+        
+        permitido, throttle = peticion(request_usuario)
+        
+        assert not permitido
+        assert throttle.wait() == 20  # una celda cada 60s / 3
+    
+    def test_libera_una_celda_por_intervalo(self, redis, reloj, request_usuario):
+        for _ in range(3):
+            peticion(request_usuario)
+        
+        reloj.ahora += 19.5
+        assert not peticion(request_usuario)[0]
+        reloj.ahora += 0.5
+        assert peticion(request_usuario)[0]
+        assert not peticion(request_usuario)[0]
+    
+    def test_estado_constante(self, redis, reloj, request_usuario):
+        for _ in range(3):
+            peticion(request_usuario)
+        
+        claves = redis.keys(f'{PREFIJO_GCRA}*')
+        assert len(claves) == 1
+        assert float(redis.get(claves[0])) == pytest.approx(reloj.ahora * 1000 + 60000)
+        assert 0 < redis.pttl(claves[0]) <= 60000
+        assert cache.get(TresPorMinuto().get_cache_key(request_usuario, None)) is None
+
+
+class TestFallback:
+    """Sin Redis o con errores"""
+    
+    def test_sin_redis_usa_historial_drf(self, reloj, request_usuario):
+        with mock.patch('api.throttles.get_redis', return_value=None):
+            resultados = [peticion(request_usuario)[0] for _ in range(4)]
+        
+        assert resultados == [True, True, True, False]
+        assert len(cache.get(TresPorMinuto().get_cache_key(request_usuario, None))) == 3
+    
+    def test_redis_caido_usa_historial_drf(self, reloj, request_usuario):
+        caido = mock.Mock()
+        caido.register_script.side_effect = ConnectionError('sin conexión')
+        with mock.patch('api.throttles.get_redis', return_value=caido), \
+                mock.patch('api.throttles._script_gcra', None):
+            resultados = [peticion(request_usuario)[0] for _ in range(4)]
+        
+        assert resultados == [True, True, True, False]
+
+
+def test_clases_del_proyecto_conservan_la_tasa_configurada():
+    assert issubclass(AdminRateThrottle, GCRARedisMixin)
+    assert AdminRateThrottle().rate == settings.REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']['admin']
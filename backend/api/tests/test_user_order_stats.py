@@ -0,0 +1,133 @@
+"""
+📈 TESTS DE ESTADÍSTICAS DE PEDIDOS POR USUARIO
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Alta, cambios de estado y borrado de pedidos mantienen user_order_stats
+✅ El mantenimiento incremental coincide con el recálculo completo
+✅ El backfill repara la deriva de escrituras masivas
+✅ /api/admin/estadisticas/usuarios/ lee la tabla desnormalizada
+"""
+
+import pytest
+from io import StringIO
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.test import APIClient
+from api.models import Pedido, UserOrderStats
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def clientes():
+    return [User.objects.create_user(username=f'comprador{i}', password='x') for i in range(3)]
+
+
+def crear_pedido(usuario, total, estado='pendiente'):
+    return Pedido.objects.create(
+        usuario=usuario,
+        total=Decimal(total),
+        estado=estado,
+        direccion_entrega='Calle 1',
+        telefono='600000000',
+    )
+
+
+def stats(usuario):
+    return UserOrderStats.objects.get(usuario=usuario)
+
+
+def instantanea():
+    return list(UserOrderStats.objects.order_by('usuario_id').values(
+        'usuario_id', 'total_pedidos', 'pedidos_cancelados', 'valor_total', 'primer_pedido', 'ultimo_pedido'
+    ))
+
+
+@pytest.mark.django_db
+class TestMantenimientoIncremental:
+    """Pedido.save()/delete() → user_order_stats"""
+    
+    def test_alta_y_transiciones(self, clientes):
+        cliente = clientes[0]
+        primero = crear_pedido(cliente, '100.00')
+        segundo = crear_pedido(cliente, '50.00', estado='confirmado')
+        
+        fila = stats(cliente)
+        assert fila.total_pedidos == 2
+        assert fila.valor_total == Decimal('50.00')
+        assert fila.primer_pedido == primero.created_at
+        assert fila.ultimo_pedido == segundo.created_at
+        
+        # Recargado desde BD: el delta usa los valores cargados
+        pedido = Pedido.objects.get(pk=primero.pk)
+        pedido.estado = 'confirmado'
+        pedido.save()
+        assert stats(cliente).valor_total == Decimal('150.00')
+        
+        pedido.estado = 'cancelado'
+        pedido.save()
+        fila = stats(cliente)
+        assert fila.valor_total == Decimal('50.00')
+        assert fila.pedidos_cancelados == 1
+    
+    def test_borrado_recalcula(self, clientes):
+        cliente = clientes[0]
+        primero = crear_pedido(cliente, '10.00', estado='entregado')
+        segundo = crear_pedido(cliente, '20.00', estado='entregado')
+        
+        segundo.delete()
+        fila = stats(cliente)
+        assert fila.total_pedidos == 1
+        assert fila.ultimo_pedido == primero.created_at
+        
+        primero.delete()
+        assert not UserOrderStats.objects.filter(usuario=cliente).exists()
+    
+    def test_incremental_igual_a_recalculo(self, clientes):
+        estados = ['pendiente', 'confirmado', 'entregado', 'cancelado']
+        for i in range(12):
+            pedido = crear_pedido(clientes[i % 3], f'{10 + i}.50')
+            pedido.estado = estados[i % 4]
+            pedido.save()
+        
+        incremental = instantanea()
+        UserOrderStats.recalcular()
+        assert instantanea() == incremental
+    
+    def test_backfill_repara_escrituras_masivas(self, clientes):
+        crear_pedido(clientes[0], '30.00')
+        Pedido.objects.update(estado='entregado')  # No pasa por save()
+        assert stats(clientes[0]).valor_total == 0
+        
+        call_command('backfill_user_order_stats', stdout=StringIO())
+        
+        assert stats(clientes[0]).valor_total == Decimal('30.00')
+
+
+@pytest.mark.django_db
+def test_estadisticas_usuarios_desde_tabla(clientes):
+    admin = User.objects.create_user(username='jefe', password='x')
+    admin.profile.rol = 'admin'
+    admin.profile.save()
+    for usuario, pedidos in zip(clientes, (3, 1, 0)):
+        for _ in range(pedidos):
+            crear_pedido(usuario, '20.00', estado='entregado')
+    
+    client = APIClient()
+    client.force_authenticate(user=admin)
+    data = client.get('/api/admin/estadisticas/usuarios/').json()
+    
+    assert [u['username'] for u in data['usuarios_mas_activos']] == ['comprador0', 'comprador1']
+    assert data['usuarios_mas_activos'][0]['pedidos_count'] == 3
+    assert data['total_usuarios'] == 2
+    assert data['usuarios_recurrentes'] == 1
+    assert data['tasa_retencion'] == 50.0
+    assert data['cohortes_primer_pedido'][0]['clientes'] == 2
@@ -0,0 +1,124 @@
+"""
+⚡ TESTS DE VISTAS ASYNC (proceso ASGI de lecturas)
+═══════════════════════════════════════════════════════════════════════════════
+
+Tests para verificar:
+✅ Carrusel, catálogo, tarjetas, detalle y stock devuelven el mismo JSON que las vistas DRF
+✅ Mismo ETag que la vista síncrona y 304 con If-None-Match
+✅ Los aciertos de stock en caché no consultan la BD
+✅ Solo GET/HEAD; 404 y 400 como en DRF
+✅ La cadena MIDDLEWARE_LECTURAS es async de punta a punta y comprime
+"""
+
+import gzip
+import json
+
+import pytest
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIHandler
+from django.test import AsyncClient, override_settings
+from rest_framework.test import APIClient
+from api.models import Favorito, Producto
+from api.utils import cache_http
+
+
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    cache.clear()
+    cache_http.descartar_pendientes()
+    yield
+    cache.clear()
+    cache_http.descartar_pendientes()
+
+
+@pytest.fixture
+def productos(db):
+    productos = [
+        Producto.objects.create(nombre=f'Producto {i}', descripcion='Catálogo ' * 20, precio=10 + i,
+                                categoria='herramientas' if i == 3 else 'electrodomesticos', stock_total=5,
+                                activo=True, en_all_products=True, en_carrusel=i < 2, en_carousel_card=i % 2 == 0)
+        for i in range(4)
+    ]
+    Favorito.objects.create(usuario=User.objects.create_user('fan', password='x'), producto=productos[0])
+    return productos
+
+
+@pytest.fixture
+def asgi():
+    """GET contra el proceso de lecturas (urls_async + MIDDLEWARE_LECTURAS)"""
+    with override_settings(ROOT_URLCONF='config.urls_async', MIDDLEWARE=settings.MIDDLEWARE_LECTURAS):
+        cliente = AsyncClient()
+        
+        async def get(url, metodo='get', **cabeceras):
+            return await getattr(cliente, metodo)(url, headers=cabeceras)
+        yield async_to_sync(get)
+
+
+URLS = [
+    '/api/carrusel/',
+    '/api/catalogo/productos/',
+    '/api/catalogo/productos/?categoria=herramientas',
+    '/api/catalogo/tarjetas-inferiores/',
+]
+
+
+@pytest.mark.django_db
+class TestMismaRespuesta:
+    """Vista async frente a la vista DRF"""
+    
+    def test_listados(self, productos, asgi):
+        for url in URLS:
+            sincrona = APIClient().get(url)
+            asincrona = asgi(url)
+            assert asincrona.status_code == 200, url
+            assert json.loads(asincrona.content) == json.loads(sincrona.content), url
+            assert asincrona['ETag'] == sincrona['ETag'], url
+            assert asincrona['Surrogate-Key'] == sincrona['Surrogate-Key'], url
+    
+    def test_detalle(self, productos, asgi):
+        url = f'/api/productos/{productos[0].pk}/'
+        APIClient().get(url)  # Precalcula los relacionados (entran en el ETag)
+        sincrona = APIClient().get(url)
+        asincrona = asgi(url)
+        
+        assert json.loads(asincrona.content) == json.loads(sincrona.content)
+        assert json.loads(asincrona.content)['producto']['favoritos_count'] == 1
+        assert asincrona['Surrogate-Key'] == sincrona['Surrogate-Key']
+        assert asincrona['ETag'] == sincrona['ETag']
+        assert asgi(url, if_none_match=asincrona['ETag']).status_code == 304
+    
+    def test_errores(self, productos, asgi):
+        assert asgi('/api/productos/999999/').status_code == 404
+        assert json.loads(asgi('/api/productos/999999/').content) == json.loads(APIClient().get('/api/productos/999999/').content)
+        assert asgi('/api/productos/stock/?ids=a,b').status_code == 400
+        assert asgi('/api/carrusel/', metodo='post').status_code == 405
+
+
+@pytest.mark.django_db
+def test_stock_desde_cache(productos, asgi, django_assert_num_queries):
+    ids = ','.join(str(p.pk) for p in productos) + ',999999'
+    primera = asgi(f'/api/productos/stock/?ids={ids}')
+    assert json.loads(primera.content) == json.loads(APIClient().get(f'/api/productos/stock/?ids={ids}').content)
+    
+    productos[1].reservar_stock(2)  # Publica el stock nuevo en caché
+    with django_assert_num_queries(1):  # Solo el inexistente va a BD
+        datos = json.loads(asgi(f'/api/productos/stock/?ids={ids}').content)
+    assert datos['stock'][str(productos[1].pk)] == 3
+    assert datos['no_encontrados'] == [999999]
+
+
+@pytest.mark.django_db
+def test_middleware_async(productos, asgi):
+    with override_settings(ROOT_URLCONF='config.urls_async', MIDDLEWARE=settings.MIDDLEWARE_LECTURAS):
+        handler = ASGIHandler()
+        handler.load_middleware(is_async=True)
+    assert iscoroutinefunction(handler._middleware_chain)
+    
+    respuesta = asgi('/api/catalogo/productos/', accept_encoding='gzip')
+    assert respuesta['Content-Encoding'] == 'gzip'
+    assert respuesta['ETag'].startswith('W/')
+    assert respuesta['X-Content-Type-Options'] == 'nosniff'
+    assert json.loads(gzip.decompress(respuesta.content))['count'] == 4
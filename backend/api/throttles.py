@@ -17,18 +17,109 @@ Scopes disponibles:
 SINCRONIZACIÓN:
 - LoginAttempt bloquea por IP/usuario (5 intentos/1 minuto)
 - Throttles DRF se aplican ADEMÁS para máxima seguridad
+
+ALMACENAMIENTO (GCRARedisMixin):
+SimpleRateThrottle guarda en caché la lista de timestamps de la ventana y la
+recorre, serializa y reescribe en cada petición (2000 floats para un admin
+activo). Con Redis las clases de este módulo usan GCRA (Generic Cell Rate
+Algorithm) en un script Lua:
+- Estado: un solo número por clave (TAT, "theoretical arrival time" en ms)
+- Una ida y vuelta (EVALSHA) y O(1) por petición, sin importar la tasa
+- Misma tasa de DEFAULT_THROTTLE_RATES: ráfaga de hasta N peticiones y
+  luego una cada duración/N
+- Retry-After = milisegundos hasta la siguiente celda libre (exacto)
+Sin Redis (tests con LocMemCache) o si el script falla se usa el historial
+de SimpleRateThrottle en la caché de Django (con Redis caído e
+IGNORE_EXCEPTIONS la caché no guarda nada y la petición se permite).
+Benchmark: python manage.py benchmark_throttle
 """
 
+import math
+
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
+from .utils.redis_client import get_redis
 import logging
 
 logger = logging.getLogger(__name__)
 
+PREFIJO_GCRA = 'throttle:gcra:'
+
+# KEYS[1]: clave | ARGV: ahora (ms), intervalo entre peticiones (ms), ventana (ms)
+# Retorna 0 si se permite o los ms a esperar
+_GCRA = """
+local ahora = tonumber(ARGV[1])
+local intervalo = tonumber(ARGV[2])
+local ventana = tonumber(ARGV[3])
+local tat = tonumber(redis.call('GET', KEYS[1]) or ahora)
+if tat < ahora then
+    tat = ahora
+end
+local nuevo = tat + intervalo
+local espera = nuevo - ahora - ventana
+if espera > 0 then
+    return math.ceil(espera)
+end
+redis.call('SET', KEYS[1], string.format('%.3f', nuevo), 'PX', math.ceil(nuevo - ahora))
+return 0
+"""
+_script_gcra = None
+
+
+class GCRARedisMixin:
+    """
+    Sustituye el historial de SimpleRateThrottle por GCRA en Redis.
+    
+    Se antepone a UserRateThrottle/AnonRateThrottle: conserva scope, rate,
+    get_cache_key() y timer; solo cambia dónde y cómo se guarda el estado.
+    """
+    espera_gcra = None
+    
+    def allow_request(self, request, view):
+        global _script_gcra
+        
+        if self.rate is None:
+            return True
+        
+        r = get_redis()
+        if r is None:
+            return super().allow_request(request, view)
+        
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+        
+        try:
+            if _script_gcra is None:
+                _script_gcra = r.register_script(_GCRA)
+            espera = _script_gcra(
+                keys=[f'{PREFIJO_GCRA}{self.key}'],
+                args=[
+                    round(self.timer() * 1000, 3),
+                    self.duration * 1000 / self.num_requests,
+                    self.duration * 1000,
+                ],
+                client=r
+            )
+        except Exception as e:
+            logger.warning(f'[THROTTLE_REDIS_ERROR] {self.scope}: {str(e)}')
+            return super().allow_request(request, view)
+        
+        if espera:
+            self.espera_gcra = int(espera) / 1000
+            return self.throttle_failure()
+        return True
+    
+    def wait(self):
+        """Segundos para Retry-After"""
+        if self.espera_gcra is not None:
+            return math.ceil(self.espera_gcra)
+        return super().wait()
+
 
 # ==========================================
 # 🔐 LOGIN (Anónimos)
 # ==========================================
-class AnonLoginRateThrottle(AnonRateThrottle):
+class AnonLoginRateThrottle(GCRARedisMixin, AnonRateThrottle):
     """
     Throttle para endpoints de autenticación (anónimos).
     Previene ataques de fuerza bruta en login/register.
@@ -42,7 +133,7 @@ class AnonLoginRateThrottle(AnonRateThrottle):
 # ==========================================
 # 🛒 CARRITO (Usuarios logueados)
 # ==========================================
-class CartWriteRateThrottle(UserRateThrottle):
+class CartWriteRateThrottle(GCRARedisMixin, UserRateThrottle):
     """
     Throttle para escritura masiva en carrito.
     Protege el endpoint bulk-update que sincroniza múltiples items.
@@ -54,7 +145,7 @@ class CartWriteRateThrottle(UserRateThrottle):
 # ==========================================
 # 💳 CHECKOUT (Usuarios logueados)
 # ==========================================
-class CheckoutRateThrottle(UserRateThrottle):
+class CheckoutRateThrottle(GCRARedisMixin, UserRateThrottle):
     """
     Throttle para proceso de checkout.
     Protege el endpoint crítico de checkout.
@@ -67,7 +158,7 @@ class CheckoutRateThrottle(UserRateThrottle):
 # ==========================================
 # 🧑‍💼 ADMIN
 # ==========================================
-class AdminRateThrottle(UserRateThrottle):
+class AdminRateThrottle(GCRARedisMixin, UserRateThrottle):
     """
     Throttle para panel administrativo.
     Protege endpoints CRUD del panel admin.
@@ -79,7 +170,7 @@ class AdminRateThrottle(UserRateThrottle):
 # ==========================================
 # 👥 USUARIOS LOGUEADOS (Límites generales)
 # ==========================================
-class UserGlobalRateThrottle(UserRateThrottle):
+class UserGlobalRateThrottle(GCRARedisMixin, UserRateThrottle):
     """
     Throttle general para usuarios logueados.
     Aplica a endpoints públicos que requieren autenticación.
@@ -91,7 +182,7 @@ class UserGlobalRateThrottle(UserRateThrottle):
 # ==========================================
 # 🌍 ANÓNIMOS (Consultas públicas)
 # ==========================================
-class AnonGlobalRateThrottle(AnonRateThrottle):
+class AnonGlobalRateThrottle(GCRARedisMixin, AnonRateThrottle):
     """
     Throttle general para usuarios anónimos.
     Aplica a endpoints públicos sin autenticación.
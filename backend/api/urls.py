@@ -14,6 +14,7 @@ from .views import (
     es_favorito,
     verificar_favoritos_batch,
     validar_stock_producto,
+    stock_productos_batch,
     mis_pedidos,
     mis_favoritos
 )
@@ -21,6 +22,9 @@ from .views_admin import (
     UserManagementViewSet,
     ProductoManagementViewSet,
     dashboard_stats,
+    metricas_correo,
+    metricas_pool_bd,
+    peticiones_lentas,
     AuditLogViewSet
 )
 from .views_pedidos import PedidoViewSet, NotificacionViewSet
@@ -28,7 +32,10 @@ from .views_estadisticas import (
     estadisticas_ventas,
     estadisticas_usuarios,
     estadisticas_productos,
-    reporte_completo
+    reporte_completo,
+    analitica_embudo,
+    analitica_cohortes,
+    analitica_abandono
 )
 from .views_recuperacion import (
     forgot_password_request,
@@ -53,6 +60,8 @@ notif_router.register(r'notificaciones', NotificacionViewSet, basename='notifica
 
 urlpatterns = [
     # Rutas públicas
+    # ⚠️ Antes del router: 'productos/stock/' chocaría con productos/{pk}/
+    path('productos/stock/', stock_productos_batch, name='stock-productos-batch'),
     path('', include(router.urls)),
     path('carrusel/', productos_carrusel, name='productos-carrusel'),
     path('catalogo/', include(urls_catalogo)),  # Agregar ruta catalogo
@@ -90,10 +99,16 @@ urlpatterns = [
     # Rutas de admin
     path('admin/', include(admin_router.urls)),
     path('admin/dashboard/stats/', dashboard_stats, name='admin-dashboard-stats'),
+    path('admin/correo/metricas/', metricas_correo, name='admin-correo-metricas'),
+    path('admin/bd/pool/', metricas_pool_bd, name='admin-bd-pool'),
+    path('admin/instrumentacion/lentas/', peticiones_lentas, name='admin-instrumentacion-lentas'),
     
     # Estadísticas avanzadas
     path('admin/estadisticas/ventas/', estadisticas_ventas, name='estadisticas-ventas'),
     path('admin/estadisticas/usuarios/', estadisticas_usuarios, name='estadisticas-usuarios'),
     path('admin/estadisticas/productos/', estadisticas_productos, name='estadisticas-productos'),
     path('admin/estadisticas/reporte/', reporte_completo, name='reporte-completo'),
+    path('admin/estadisticas/embudo/', analitica_embudo, name='analitica-embudo'),
+    path('admin/estadisticas/cohortes/', analitica_cohortes, name='analitica-cohortes'),
+    path('admin/estadisticas/abandono/', analitica_abandono, name='analitica-abandono'),
 ]
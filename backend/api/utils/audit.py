@@ -3,11 +3,68 @@
 🔍 UTILIDAD - Sistema de Auditoría
 ═══════════════════════════════════════════════════════════════════════════════
 Registra automáticamente todas las acciones realizadas en el panel de admin.
+
+Diferencias por campo:
+- instantanea(obj) lee los campos concretos del modelo (no obj.__dict__) y
+  convierte cada valor según el tipo del campo: sin json.dumps de prueba
+- Binarios (BinaryField) y campos excluidos (imagen_url en base64, password)
+  nunca se registran; de FileField/ImageField solo el nombre del archivo
+- Los textos largos se recortan a MAX_CARACTERES_VALOR
+- registrar_edicion(..., antes=instantanea(obj)) guarda solo lo que cambió,
+  sin mirar request.data (que puede traer imágenes de varios MB)
+
+Escritura en lote:
+- Las filas se encolan en Redis (`auditoria:cola`) y `volcar_auditoria`
+  las inserta con bulk_create en lotes de AUDITORIA_LOTE
+- Cada lote pasa con LMOVE a `auditoria:procesando` y se borra de ahí tras
+  el INSERT: si el worker muere entre medias, el siguiente volcado lo
+  devuelve a la cola (como correo.drenar)
+- El primer encolado programa el volcado (ESPERA_LOTE segundos para juntar
+  más); beat lo ejecuta además cada minuto como respaldo
+- Sin Redis (o si falla) la fila se escribe directamente
+
+Vaciado del historial:
+- iniciar_purga() fija el id máximo actual y encola `purgar_auditoria`,
+  que borra por rangos de id de AUDITORIA_PURGA_LOTE filas (transacciones
+  cortas, sin un DELETE gigante) y deja el progreso en caché
+- Lo registrado después de iniciar la purga se conserva
+- Si la tarea agota sus reintentos la purga queda 'fallida'; si el worker
+  muere sin avisar, una purga sin lotes nuevos en PURGA_SIN_PROGRESO
+  segundos se da por abandonada y clear_all puede iniciar otra
 """
 
 import json
+from datetime import date, datetime, time as dt_time
 from decimal import Decimal
+from functools import lru_cache
+from uuid import UUID
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Max, Min
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from api.models import AuditLog
+from .redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLAVE_COLA = 'auditoria:cola'
+CLAVE_PROCESANDO = 'auditoria:procesando'
+CLAVE_VOLCANDO = 'auditoria:volcando'
+CLAVE_PROGRAMADO = 'auditoria:volcado_programado'
+CLAVE_PURGA = 'auditoria:purga'
+ESPERA_LOTE = 5              # segundos para juntar filas antes de volcar
+TTL_VOLCANDO = 300           # cerrojo del volcado (se renueva en cada lote)
+TTL_PURGA = 60 * 60 * 24
+PURGA_SIN_PROGRESO = 60 * 15  # segundos sin lotes: la purga en curso se da por abandonada
+
+CAMPOS_EXCLUIDOS = {'imagen_url', 'password', 'creado_por_id', 'actualizado_por_id'}
+MAX_CARACTERES_VALOR = 500
+MAX_BYTES_DETALLES = 16 * 1024
 
 
 def get_client_ip(request):
@@ -20,39 +77,298 @@ def get_client_ip(request):
     return ip
 
 
-def serializar_objeto(obj):
+# ═══════════════════════════════════════════════════════════════════════════
+# Valores y diferencias
+# ═══════════════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=None)
+def _campos(modelo):
     """
-    Serializar un objeto a un diccionario JSON-compatible.
-    Maneja Decimals, fechas, y campos técnicos de Django.
-    NUNCA incluye imagen_url en los detalles.
+    Campos auditables del modelo: ((attname, es_archivo), ...).
+    Se calcula una vez por modelo y proceso. Los auto_now (updated_at)
+    cambian en cada guardado y no aportan a la diferencia.
     """
-    if not hasattr(obj, '__dict__'):
-        return str(obj)
-    
-    datos = {}
-    for key, value in obj.__dict__.items():
-        # Filtrar campos técnicos de Django
-        if key.startswith('_') or key in ['creado_por_id', 'actualizado_por_id']:
+    campos = []
+    for campo in modelo._meta.concrete_fields:
+        if campo.attname in CAMPOS_EXCLUIDOS or isinstance(campo, models.BinaryField):
             continue
-        
-        # ✅ EXCLUIR COMPLETAMENTE imagen_url - nunca mostrar en historial
-        if key == 'imagen_url':
+        if getattr(campo, 'auto_now', False):
             continue
-            
-        # Convertir Decimal a string
-        if isinstance(value, Decimal):
-            datos[key] = str(value)
-        # Otros valores
-        elif value is not None:
+        campos.append((campo.attname, isinstance(campo, models.FileField)))
+    return tuple(campos)
+
+
+def _recortar(texto):
+    if len(texto) > MAX_CARACTERES_VALOR:
+        return f'{texto[:MAX_CARACTERES_VALOR]}… ({len(texto)} caracteres)'
+    return texto
+
+
+def valor_auditable(valor):
+    """Valor JSON-compatible y acotado (por tipo, sin json.dumps)"""
+    if valor is None or isinstance(valor, (bool, int, float)):
+        return valor
+    if isinstance(valor, str):
+        return _recortar(valor)
+    if isinstance(valor, (Decimal, UUID)):
+        return str(valor)
+    if isinstance(valor, (datetime, date, dt_time)):
+        return valor.isoformat()
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return f'<binario: {len(valor)} bytes>'
+    if hasattr(valor, 'read') or hasattr(valor, 'chunks'):
+        # Archivo subido o FieldFile: solo el nombre
+        return getattr(valor, 'name', None) or '<archivo>'
+    if isinstance(valor, dict) and set(valor) == {'anterior', 'nuevo'}:
+        return {k: valor_auditable(v) for k, v in valor.items()}
+    return _recortar(str(valor))
+
+
+def instantanea(obj):
+    """
+    Valores auditables de una instancia: {attname: valor}.
+    Las FK se leen como <campo>_id (sin consultas).
+    """
+    datos = {}
+    for attname, es_archivo in _campos(type(obj)):
+        valor = getattr(obj, attname)
+        if es_archivo:
+            valor = valor.name or None
+        datos[attname] = valor_auditable(valor)
+    return datos
+
+
+def diferencias(antes, despues):
+    """{campo: {'anterior', 'nuevo'}} de los campos que cambiaron"""
+    return {
+        campo: {'anterior': antes.get(campo), 'nuevo': nuevo}
+        for campo, nuevo in despues.items()
+        if antes.get(campo) != nuevo
+    }
+
+
+def _limitar(detalles):
+    """
+    Tope de tamaño de `detalles` (una sola serialización por fila).
+    Si lo supera se guardan solo las claves afectadas.
+    """
+    crudo = json.dumps(detalles, cls=DjangoJSONEncoder)
+    if len(crudo) <= MAX_BYTES_DETALLES:
+        return detalles
+    return {
+        seccion: {'omitido': f'{len(crudo)} bytes', 'campos': list(valor)[:50]}
+        if isinstance(valor, dict) else valor
+        for seccion, valor in detalles.items()
+    }
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Escritura en lote
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _fila(log):
+    return json.dumps({
+        'usuario_id': log.usuario_id,
+        'accion': log.accion,
+        'modulo': log.modulo,
+        'objeto_id': log.objeto_id,
+        'objeto_repr': log.objeto_repr,
+        'detalles': log.detalles,
+        'ip_address': log.ip_address,
+        'user_agent': log.user_agent,
+        'timestamp': log.timestamp.isoformat(),
+    }, cls=DjangoJSONEncoder)
+
+
+def _desde_fila(crudo):
+    datos = json.loads(crudo)
+    datos['timestamp'] = parse_datetime(datos['timestamp'])
+    return AuditLog(**datos)
+
+
+def encolar(log):
+    """
+    Deja la fila en la cola de Redis y programa un volcado si no hay uno
+    pendiente. Sin Redis la escribe directamente.
+    """
+    r = get_redis()
+    if r is None:
+        log.save()
+        return log
+    
+    try:
+        r.rpush(CLAVE_COLA, _fila(log))
+        programar = r.set(CLAVE_PROGRAMADO, 1, nx=True, ex=ESPERA_LOTE + 30)
+    except Exception as e:
+        logger.warning(f'[AUDITORIA_COLA_ERROR] Escritura directa: {str(e)}')
+        log.save()
+        return log
+    
+    if programar:
+        from api.tasks import volcar_auditoria
+        volcar_auditoria.apply_async(countdown=ESPERA_LOTE)
+    return log
+
+
+def _devolver(r, crudos):
+    """Vacía `auditoria:procesando` dejando `crudos` en la cabeza de la cola (mismo orden)"""
+    pipe = r.pipeline()
+    if crudos:
+        pipe.lpush(CLAVE_COLA, *reversed(crudos))
+    pipe.delete(CLAVE_PROCESANDO)
+    pipe.execute()
+
+
+def volcar(lote=None):
+    """
+    Inserta la cola de Redis en audit_logs con bulk_create por lotes.
+    
+    Un solo volcado a la vez (cerrojo `auditoria:volcando`). Cada lote se
+    mueve con LMOVE a `auditoria:procesando` y se borra de ahí tras el
+    INSERT. Lo que haya en `auditoria:procesando` al empezar es de un
+    volcado que murió y vuelve a la cola. Si una inserción falla, el lote
+    vuelve a la cabeza de la cola (mismo orden) y se propaga la excepción.
+    
+    Returns:
+        int: Filas insertadas (0 si ya hay otro volcado en curso)
+    """
+    r = get_redis()
+    if r is None:
+        return 0
+    
+    lote = lote or settings.AUDITORIA_LOTE
+    if not r.set(CLAVE_VOLCANDO, 1, nx=True, ex=TTL_VOLCANDO):
+        return 0
+    
+    try:
+        # Lo que llegue a partir de ahora programa su propio volcado
+        r.delete(CLAVE_PROGRAMADO)
+        _devolver(r, r.lrange(CLAVE_PROCESANDO, 0, -1))
+        
+        total = 0
+        while True:
+            pipe = r.pipeline()
+            for _ in range(lote):
+                pipe.lmove(CLAVE_COLA, CLAVE_PROCESANDO, 'LEFT', 'RIGHT')
+            crudos = [c for c in pipe.execute() if c is not None]
+            if not crudos:
+                break
+            r.expire(CLAVE_VOLCANDO, TTL_VOLCANDO)
             try:
-                json.dumps(value)  # Verificar si es serializable
-                datos[key] = value
-            except (TypeError, ValueError):
-                datos[key] = str(value)
+                AuditLog.objects.bulk_create([_desde_fila(c) for c in crudos])
+            except Exception:
+                _devolver(r, crudos)
+                raise
+            r.delete(CLAVE_PROCESANDO)
+            total += len(crudos)
+        return total
+    finally:
+        r.delete(CLAVE_VOLCANDO)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Vaciado por lotes
+# ═══════════════════════════════════════════════════════════════════════════
+
+def estado_purga():
+    """Progreso de la última purga (None si no hubo ninguna reciente)"""
+    return cache.get(CLAVE_PURGA)
+
+
+def _abandonada(progreso):
+    """True si una purga 'en_curso' lleva PURGA_SIN_PROGRESO segundos sin avanzar"""
+    ultimo = parse_datetime(progreso.get('actualizado_at') or progreso['iniciado_at'])
+    return (timezone.now() - ultimo).total_seconds() > PURGA_SIN_PROGRESO
+
+
+def iniciar_purga(usuario=None):
+    """
+    Encola el vaciado del historial hasta el id actual.
     
-    return datos
+    Returns:
+        tuple: (progreso, iniciada) - iniciada=False si ya había una en curso
+    """
+    from .paginacion import contar_estimado
+    
+    actual = estado_purga()
+    if actual and actual['estado'] == 'en_curso':
+        if not _abandonada(actual):
+            return actual, False
+        logger.warning(f'[AUDITORIA_PURGA_ABANDONADA] Sin progreso desde {actual.get("actualizado_at")}')
+    
+    hasta_id = AuditLog.objects.aggregate(m=Max('id'))['m'] or 0
+    total, _ = contar_estimado(AuditLog.objects.all())
+    ahora = timezone.now().isoformat()
+    progreso = {
+        'estado': 'en_curso',
+        'hasta_id': hasta_id,
+        'total': total,
+        'eliminados': 0,
+        'solicitado_por': getattr(usuario, 'username', None),
+        'iniciado_at': ahora,
+        'actualizado_at': ahora,
+        'terminado_at': None,
+    }
+    cache.set(CLAVE_PURGA, progreso, TTL_PURGA)
+    
+    from api.tasks import purgar_auditoria
+    purgar_auditoria.delay(hasta_id)
+    return estado_purga() or progreso, True
 
 
+def purgar(hasta_id, lote=None):
+    """
+    Borra audit_logs con id <= hasta_id por rangos de `lote` ids,
+    actualizando el progreso en caché tras cada lote.
+    
+    Returns:
+        int: Filas eliminadas
+    """
+    lote = lote or settings.AUDITORIA_PURGA_LOTE
+    progreso = estado_purga() or {'hasta_id': hasta_id, 'total': None, 'eliminados': 0}
+    
+    # En un reintento se continúa sumando sobre lo ya eliminado
+    eliminados = progreso.get('eliminados', 0)
+    desde = AuditLog.objects.filter(id__lte=hasta_id).aggregate(m=Min('id'))['m']
+    while desde is not None and desde <= hasta_id:
+        hasta = min(desde + lote - 1, hasta_id)
+        # AuditLog no tiene dependientes ni señales: DELETE directo por rango
+        borradas = AuditLog.objects.filter(id__gte=desde, id__lte=hasta).delete()[0]
+        eliminados += borradas
+        if borradas:
+            desde = hasta + 1
+        else:
+            # Hueco de ids: saltar al siguiente id existente
+            desde = AuditLog.objects.filter(id__gt=hasta, id__lte=hasta_id).aggregate(m=Min('id'))['m']
+        
+        progreso['eliminados'] = eliminados
+        progreso['actualizado_at'] = timezone.now().isoformat()
+        cache.set(CLAVE_PURGA, {**progreso, 'estado': 'en_curso'}, TTL_PURGA)
+    
+    cache.set(CLAVE_PURGA, {
+        **progreso,
+        'estado': 'completada',
+        'eliminados': eliminados,
+        'terminado_at': timezone.now().isoformat(),
+    }, TTL_PURGA)
+    return eliminados
+
+
+def marcar_purga_fallida(error):
+    """Deja la purga en 'fallida' (la tarea agotó sus reintentos): clear_all puede reintentarla"""
+    progreso = estado_purga() or {}
+    cache.set(CLAVE_PURGA, {
+        **progreso,
+        'estado': 'fallida',
+        'error': error,
+        'terminado_at': timezone.now().isoformat(),
+    }, TTL_PURGA)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Registro de acciones
+# ═══════════════════════════════════════════════════════════════════════════
+
 def registrar_accion(request, accion, modulo, objeto_id, objeto_repr, detalles=None):
     """
     Registrar una acción en el log de auditoría.
@@ -66,7 +382,7 @@ def registrar_accion(request, accion, modulo, objeto_id, objeto_repr, detalles=N
         detalles: dict - Información adicional sobre el cambio
     
     Returns:
-        AuditLog instance
+        AuditLog instance (sin pk si quedó encolada)
     """
     if detalles is None:
         detalles = {}
@@ -75,39 +391,27 @@ def registrar_accion(request, accion, modulo, objeto_id, objeto_repr, detalles=N
     ip_address = get_client_ip(request)
     user_agent = request.META.get('HTTP_USER_AGENT', '')[:500]
     
-    # Crear registro de auditoría
-    audit_log = AuditLog.objects.create(
+    audit_log = AuditLog(
         usuario=request.user if request.user.is_authenticated else None,
         accion=accion,
         modulo=modulo,
         objeto_id=objeto_id,
-        objeto_repr=objeto_repr,
-        detalles=detalles,
+        objeto_repr=str(objeto_repr)[:500],
+        detalles=_limitar(detalles),
         ip_address=ip_address,
-        user_agent=user_agent
+        user_agent=user_agent,
+        timestamp=timezone.now()
     )
     
-    return audit_log
+    return encolar(audit_log)
 
 
 def registrar_creacion(request, modulo, objeto):
     """
     Registrar creación de un objeto.
-    Muestra todos los datos del objeto creado (excepto imagen_url).
+    Muestra los campos del modelo con valor (excepto imagen_url y binarios).
     """
-    datos_serializados = serializar_objeto(objeto)
-    
-    # Convertir Decimals a strings
-    datos_formateados = {}
-    for key, value in datos_serializados.items():
-        if isinstance(value, Decimal):
-            datos_formateados[key] = str(value)
-        else:
-            datos_formateados[key] = value
-    
-    detalles = {
-        'datos_creados': datos_formateados
-    }
+    datos = {k: v for k, v in instantanea(objeto).items() if v is not None}
     
     return registrar_accion(
         request=request,
@@ -115,61 +419,50 @@ def registrar_creacion(request, modulo, objeto):
         modulo=modulo,
         objeto_id=objeto.id,
         objeto_repr=str(objeto),
-        detalles=detalles
+        detalles={'datos_creados': datos}
     )
 
 
-def registrar_edicion(request, modulo, objeto, cambios=None):
+def registrar_edicion(request, modulo, objeto, cambios=None, antes=None):
     """
     Registrar edición de un objeto.
     Captura SOLO los cambios realizados (antes → después).
+    
+    Args:
+        objeto: Instancia ya guardada
+        cambios: {campo: valor_nuevo} o {campo: {'anterior', 'nuevo'}}
+        antes: instantanea(objeto) tomada antes de guardar; se compara con
+            el estado actual campo a campo
     """
-    if cambios is None:
-        cambios = {}
+    cambios_filtrados = diferencias(antes, instantanea(objeto)) if antes is not None else {}
     
-    # Filtrar cambios: excluir imagen_url y campos vacíos
-    cambios_filtrados = {}
-    for key, valor_nuevo in cambios.items():
-        # Excluir imagen_url
-        if key == 'imagen_url':
+    for key, valor_nuevo in (cambios or {}).items():
+        # Excluir imagen_url/binarios y valores vacíos
+        if key in CAMPOS_EXCLUIDOS or valor_nuevo is None or valor_nuevo == '':
             continue
-        # Excluir valores vacíos
-        if valor_nuevo is None or valor_nuevo == '':
+        
+        # Cambio ya calculado por el llamador
+        if isinstance(valor_nuevo, dict) and set(valor_nuevo) == {'anterior', 'nuevo'}:
+            cambios_filtrados[key] = valor_auditable(valor_nuevo)
             continue
         
-        # Obtener valor anterior del objeto
-        valor_anterior = getattr(objeto, key, None)
+        valor_anterior = valor_auditable(getattr(objeto, key, None))
+        valor_nuevo = valor_auditable(valor_nuevo)
         
         # Solo incluir si hubo cambio
         if valor_anterior != valor_nuevo:
-            # Convertir Decimal a string
-            if isinstance(valor_anterior, Decimal):
-                valor_anterior = str(valor_anterior)
-            if isinstance(valor_nuevo, Decimal):
-                valor_nuevo = str(valor_nuevo)
-            
-            # Convertir objetos a string para serialización JSON
-            if valor_anterior is not None and not isinstance(valor_anterior, (str, int, float, bool)):
-                valor_anterior = str(valor_anterior)
-            if valor_nuevo is not None and not isinstance(valor_nuevo, (str, int, float, bool)):
-                valor_nuevo = str(valor_nuevo)
-            
             cambios_filtrados[key] = {
                 'anterior': valor_anterior,
                 'nuevo': valor_nuevo
             }
     
-    detalles = {
-        'cambios_realizados': cambios_filtrados
-    }
-    
     return registrar_accion(
         request=request,
         accion='editar',
         modulo=modulo,
         objeto_id=objeto.id,
         objeto_repr=str(objeto),
-        detalles=detalles
+        detalles={'cambios_realizados': cambios_filtrados}
     )
 
 
@@ -178,20 +471,10 @@ def registrar_eliminacion(request, modulo, objeto_id, objeto_repr, datos_elimina
     Registrar eliminación de un objeto.
     Captura todos los datos del objeto eliminado (excepto imagen_url).
     """
-    # Si no se proporcionan datos, usar diccionario vacío
-    if datos_eliminados is None:
-        datos_eliminados = {}
-    
-    # Convertir Decimals a strings
-    datos_formateados = {}
-    for key, value in datos_eliminados.items():
-        if isinstance(value, Decimal):
-            datos_formateados[key] = str(value)
-        else:
-            datos_formateados[key] = value
-    
-    detalles = {
-        'datos_eliminados': datos_formateados
+    datos_formateados = {
+        key: valor_auditable(value)
+        for key, value in (datos_eliminados or {}).items()
+        if key not in CAMPOS_EXCLUIDOS
     }
     
     return registrar_accion(
@@ -200,7 +483,7 @@ def registrar_eliminacion(request, modulo, objeto_id, objeto_repr, datos_elimina
         modulo=modulo,
         objeto_id=objeto_id,
         objeto_repr=objeto_repr,
-        detalles=detalles
+        detalles={'datos_eliminados': datos_formateados}
     )
 
 
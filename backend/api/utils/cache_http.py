@@ -0,0 +1,330 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🌐 CACHÉ HTTP - Cache-Control, GET condicional y purga por Surrogate-Key
+═══════════════════════════════════════════════════════════════════════════════
+
+Los GET públicos (productos, carrusel, catálogo) no enviaban Cache-Control,
+ETag ni Last-Modified: ni el navegador ni un proxy (Varnish/nginx/CDN)
+podían cachearlos y cada visita anónima llegaba a Django.
+
+Con @cache_publica(nombre, ambito):
+- Cache-Control: public, max-age, stale-while-revalidate (POLITICAS)
+- ETag/Last-Modified calculados ANTES de ejecutar la vista con un agregado
+  sobre los productos del ámbito (máximo de updated_at, número de filas,
+  stock reservado/vendido y favoritos). If-None-Match / If-Modified-Since
+  coincidentes → 304 sin serializar nada
+- Surrogate-Key: claves para purgar en el proxy (`producto:<id>`,
+  `categoria:<categoria>` y el listado: `productos`, `carrusel`,
+  `catalogo`, `tarjetas`)
+
+Invalidación: Producto.save/delete y los receivers de cache_manager llaman
+a purgar(claves). Las claves se acumulan y se envían al purgador de
+CACHE_HTTP_PURGADOR tras el commit (una sola purga por transacción):
+- PurgadorNulo: solo log (sin proxy delante)
+- PurgadorHTTP: PURGE a cada URL de CACHE_HTTP_PURGA_URLS con las claves
+  en la cabecera CACHE_HTTP_PURGA_CABECERA (Varnish xkey, nginx, Fastly)
+- ProxyLocal: proxy en memoria que cachea y purga como Varnish (tests)
+
+Los movimientos de stock (reservas, ventas) no purgan: son continuos y se
+cubren con un max-age corto; el ETag sí cambia con ellos.
+
+Uso:
+    @api_view(['GET'])
+    @permission_classes([permissions.AllowAny])
+    @solo_lectura
+    @cache_publica('carrusel', lambda request: Ambito(Producto.objects.filter(en_carrusel=True)))
+    def productos_carrusel(request): ...
+"""
+
+import asyncio
+import hashlib
+import inspect
+import logging
+import threading
+import time
+import urllib.request
+from dataclasses import dataclass, field
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils.cache import get_conditional_response, get_max_age, patch_cache_control
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+# (max-age, stale-while-revalidate) en segundos por vista
+POLITICAS = {
+    'productos': (30, 120),   # Listado paginado con stock: volátil
+    'producto': (60, 300),
+    'carrusel': (60, 300),
+    'catalogo': (60, 300),
+    'tarjetas': (60, 300),
+}
+
+# Claves de los listados que pueden contener cualquier producto
+LISTADOS = ('productos', 'carrusel', 'catalogo', 'tarjetas')
+
+
+@dataclass
+class Ambito:
+    """
+    Productos de los que depende una respuesta.
+    
+    Args:
+        productos: QuerySet de Producto (solo filtros, sin only/select_related)
+        claves: Surrogate-Keys de la respuesta
+        extra: Otros datos que cambian la respuesta (entran en el ETag)
+    """
+    productos: object
+    claves: list = field(default_factory=list)
+    extra: tuple = ()
+
+
+def _agregados(ambito):
+    from api.models import Favorito
+    
+    productos = ambito.productos.order_by()
+    return (
+        productos, dict(filas=Count('id'), ultimo=Max('updated_at'),
+                        reservado=Sum('stock_reservado'), vendido=Sum('stock_vendido')),
+        Favorito.objects.filter(producto__in=productos.values('id')),
+        dict(filas=Count('id'), ultimo=Max('created_at')),
+    )
+
+
+def validadores(ambito):
+    """
+    (ETag, Last-Modified) del ámbito: dos agregados, sin leer las filas.
+    
+    Stock y favoritos se modifican con UPDATE/INSERT que no tocan
+    updated_at: por eso entran en el ETag además del máximo.
+    """
+    productos, de_productos, favoritos, de_favoritos = _agregados(ambito)
+    return _firmar(ambito, productos.aggregate(**de_productos), favoritos.aggregate(**de_favoritos))
+
+
+async def avalidadores(ambito):
+    """validadores() con el ORM async"""
+    productos, de_productos, favoritos, de_favoritos = _agregados(ambito)
+    return _firmar(ambito, await productos.aaggregate(**de_productos), await favoritos.aaggregate(**de_favoritos))
+
+
+def _firmar(ambito, agregado, favoritos):
+    firma = repr((ambito.claves, ambito.extra, sorted(agregado.items()), sorted(favoritos.items())))
+    etag = '"%s"' % hashlib.blake2b(firma.encode(), digest_size=12).hexdigest()
+    
+    fechas = [fecha for fecha in (agregado['ultimo'], favoritos['ultimo']) if fecha is not None]
+    return etag, int(max(fechas).timestamp()) if fechas else None
+
+
+def _aplicar(respuesta, nombre, etag, last_modified, claves):
+    max_age, swr = POLITICAS[nombre]
+    patch_cache_control(respuesta, public=True, max_age=max_age, stale_while_revalidate=swr)
+    respuesta.headers['ETag'] = etag
+    if last_modified is not None:
+        respuesta.headers['Last-Modified'] = http_date(last_modified)
+    if claves:
+        respuesta.headers['Surrogate-Key'] = ' '.join(dict.fromkeys(claves))
+    return respuesta
+
+
+def _cacheable(request):
+    return settings.CACHE_HTTP_ACTIVO and request.method in ('GET', 'HEAD')
+
+
+def _no_modificada(request, nombre, datos, etag, last_modified):
+    respuesta = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if respuesta is not None:
+        return _aplicar(respuesta, nombre, etag, last_modified, datos.claves)
+    return None
+
+
+def _completar(respuesta, nombre, datos, etag, last_modified):
+    if respuesta.status_code != 200:
+        return respuesta
+    claves = datos.claves + respuesta.headers.get('Surrogate-Key', '').split()
+    return _aplicar(respuesta, nombre, etag, last_modified, claves)
+
+
+def cache_publica(nombre, ambito):
+    """
+    Política de caché HTTP para una vista GET pública (función o método de
+    ViewSet; debajo de @solo_lectura para calcular el ETag en la réplica).
+    
+    Args:
+        nombre: Clave de POLITICAS
+        ambito: Callable (request, **kwargs) → Ambito, o None para no
+            cachear esa petición (p. ej. un id inválido)
+    
+    La vista puede añadir Surrogate-Keys propias (p. ej. los productos
+    relacionados) en la cabecera de su respuesta.
+    
+    Con vistas async los agregados usan el ORM async y `ambito` puede ser
+    una corrutina.
+    """
+    def decorador(vista):
+        if asyncio.iscoroutinefunction(vista):
+            @wraps(vista)
+            async def aenvoltura(request, *args, **kwargs):
+                datos = ambito(request, **kwargs) if _cacheable(request) else None
+                if inspect.isawaitable(datos):
+                    datos = await datos
+                if datos is None:
+                    return await vista(request, *args, **kwargs)
+                
+                validado = await avalidadores(datos)
+                no_modificada = _no_modificada(request, nombre, datos, *validado)
+                if no_modificada is not None:
+                    return no_modificada
+                return _completar(await vista(request, *args, **kwargs), nombre, datos, *validado)
+            return aenvoltura
+        
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            request = args[1] if len(args) > 1 else args[0]  # (self, request) en ViewSets
+            datos = ambito(request, **kwargs) if _cacheable(request) else None
+            if datos is None:
+                return vista(*args, **kwargs)
+            
+            validado = validadores(datos)
+            no_modificada = _no_modificada(request, nombre, datos, *validado)
+            if no_modificada is not None:
+                return no_modificada
+            return _completar(vista(*args, **kwargs), nombre, datos, *validado)
+        return envoltura
+    return decorador
+
+
+def claves_producto(producto):
+    """Claves a purgar cuando cambia un producto (sus páginas y los listados)"""
+    return [f'producto:{producto.pk}', f'categoria:{producto.categoria}', *LISTADOS]
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🧹 PURGA
+# ═══════════════════════════════════════════════════════════════════════════════
+
+_pendientes = threading.local()
+_purgadores = {}
+_lock = threading.Lock()
+
+
+def obtener_purgador():
+    """Instancia (una por proceso) de la clase de CACHE_HTTP_PURGADOR"""
+    ruta = settings.CACHE_HTTP_PURGADOR
+    with _lock:
+        if ruta not in _purgadores:
+            _purgadores[ruta] = import_string(ruta)()
+        return _purgadores[ruta]
+
+
+def purgar(claves):
+    """
+    Programa la purga de `claves` para después del commit.
+    
+    Varias llamadas en la misma transacción (save + receivers) se envían
+    juntas y sin duplicados. Si la transacción se revierte, las claves
+    salen con la siguiente purga (purgar de más es inocuo).
+    """
+    if not hasattr(_pendientes, 'claves'):
+        _pendientes.claves = {}
+    _pendientes.claves.update(dict.fromkeys(claves))
+    transaction.on_commit(_enviar)
+
+
+def _enviar():
+    claves = list(getattr(_pendientes, 'claves', {}))
+    if not claves:
+        return  # Ya enviadas por otro callback de la misma transacción
+    _pendientes.claves = {}
+    try:
+        obtener_purgador().purgar(claves)
+    except Exception as e:
+        # La escritura ya está confirmada: un proxy caído no debe romperla
+        logger.error(f'[CACHE_HTTP] Error al purgar {claves}: {e}')
+
+
+def descartar_pendientes():
+    _pendientes.claves = {}
+
+
+class PurgadorNulo:
+    """Sin proxy delante: solo deja constancia"""
+    
+    def purgar(self, claves):
+        logger.info(f'[CACHE_HTTP_PURGA] {" ".join(claves)}')
+
+
+class PurgadorHTTP:
+    """
+    PURGE a cada proxy de CACHE_HTTP_PURGA_URLS con las claves en una
+    cabecera (Varnish con vmod xkey: `xkey-purge`; Fastly/nginx:
+    `Surrogate-Key`).
+    """
+    
+    def purgar(self, claves):
+        for url in settings.CACHE_HTTP_PURGA_URLS:
+            peticion = urllib.request.Request(
+                url, method='PURGE', headers={settings.CACHE_HTTP_PURGA_CABECERA: ' '.join(claves)}
+            )
+            try:
+                with urllib.request.urlopen(peticion, timeout=settings.CACHE_HTTP_PURGA_TIMEOUT):
+                    pass
+            except OSError as e:
+                logger.error(f'[CACHE_HTTP] PURGE a {url} falló: {e}')
+            else:
+                logger.info(f'[CACHE_HTTP_PURGA] {url} {" ".join(claves)}')
+
+
+@dataclass
+class _Entrada:
+    respuesta: object
+    claves: set
+    expira: float
+
+
+class ProxyLocal:
+    """
+    Proxy en memoria que se comporta como Varnish/nginx delante de la API:
+    guarda las respuestas `public` con 200 durante su max-age, las indexa
+    por Surrogate-Key y las descarta al purgar. Sustituto local para tests.
+    
+    Uso:
+        proxy = obtener_purgador()  # con CACHE_HTTP_PURGADOR = 'api.utils.cache_http.ProxyLocal'
+        proxy.get(APIClient(), '/api/carrusel/')
+    """
+    
+    def __init__(self):
+        self._entradas = {}
+        self._lock = threading.Lock()
+        self.purgas = []
+        self.aciertos = 0
+        self.fallos = 0
+    
+    def get(self, cliente, url, **extra):
+        with self._lock:
+            entrada = self._entradas.get(url)
+            if entrada is not None and entrada.expira > time.monotonic():
+                self.aciertos += 1
+                return entrada.respuesta
+            self.fallos += 1
+        
+        respuesta = cliente.get(url, **extra)
+        max_age = get_max_age(respuesta)
+        if respuesta.status_code == 200 and max_age and 'public' in respuesta.get('Cache-Control', ''):
+            with self._lock:
+                self._entradas[url] = _Entrada(
+                    respuesta, set(respuesta.get('Surrogate-Key', '').split()), time.monotonic() + max_age
+                )
+        return respuesta
+    
+    def purgar(self, claves):
+        claves = set(claves)
+        with self._lock:
+            self.purgas.append(sorted(claves))
+            self._entradas = {
+                url: entrada for url, entrada in self._entradas.items() if not entrada.claves & claves
+            }
@@ -137,6 +137,7 @@ class CacheManager:
 from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from ..models import Producto, Pedido, UserProfile
+from . import cache_http
 
 
 @receiver(post_save, sender=Producto)
@@ -147,6 +148,7 @@ def invalidate_producto_cache(sender, instance, created, **kwargs):
     Estrategia: Write-through
     - Escribir en BD (ya hecho por Django)
     - Invalidar caché relacionado
+    - Purgar sus respuestas en el proxy HTTP (se une a la de Producto.save)
     """
     cache_keys_to_invalidate = [
         'estadisticas_ventas',
@@ -156,6 +158,7 @@ def invalidate_producto_cache(sender, instance, created, **kwargs):
     ]
     
     CacheManager.invalidate(cache_keys_to_invalidate)
+    cache_http.purgar(cache_http.claves_producto(instance))
     
     action = "creado" if created else "actualizado"
     logger.info(f"📦 Producto {action}: {instance.nombre} - Caché invalidado")
@@ -171,6 +174,7 @@ def invalidate_producto_delete_cache(sender, instance, **kwargs):
     ]
     
     CacheManager.invalidate(cache_keys_to_invalidate)
+    cache_http.purgar(cache_http.claves_producto(instance))
     logger.info(f"📦 Producto eliminado: {instance.nombre} - Caché invalidado")
 
 
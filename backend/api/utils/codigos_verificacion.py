@@ -0,0 +1,241 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔢 CÓDIGOS DE VERIFICACIÓN - Almacén de Códigos de Vida Corta en Redis
+═══════════════════════════════════════════════════════════════════════════════
+
+Los códigos de 6 dígitos (registro y recuperación de contraseña) viven en un
+HASH de Redis con TTL = expiración del código:
+
+    codigo:<tipo>:<sha256(destino)>   HASH  codigo (HMAC), intentos, reenvios,
+                                            ultimo_reenvio, expira, + datos
+                                            del registro pendiente   (TTL)
+
+- El código nunca se guarda en claro: HMAC-SHA256(SECRET_KEY, destino:código)
+- Verificar = un script Lua (un round-trip): compara, incrementa intentos de
+  forma atómica si falla y borra la clave si acierta (uso único)
+- Los códigos expirados desaparecen solos (TTL), sin tarea de limpieza
+- La fila en BD (EmailVerification / PasswordRecoveryCode) se crea solo
+  cuando la verificación tiene éxito
+
+DESCONOCIDO (sin clave) → el llamador consulta la BD: cubre Redis ausente,
+códigos emitidos antes de activar Redis, el fallback si Redis falla al
+guardar y Redis caído al verificar, reenviar o consultar el estado
+(verificar/reenviar/estado registran el error y responden DESCONOCIDO/None).
+"""
+
+import hashlib
+import hmac
+import time
+
+from django.conf import settings
+from .redis_client import get_redis
+import logging
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:
+    RedisError = OSError
+
+logger = logging.getLogger('security')
+
+REGISTRO = 'registro'
+RECUPERACION = 'recuperacion'
+
+MAX_INTENTOS = 5
+MAX_REENVIOS = 3
+
+# Resultados de verificar() y reenviar()
+VERIFICADO = 1
+REENVIADO = 1
+DESCONOCIDO = 0
+INCORRECTO = -1
+BLOQUEADO = -2
+LIMITE_REENVIOS = -1
+ESPERA_REENVIO = -2
+
+CAMPOS_CONTROL = ('codigo', 'intentos', 'reenvios', 'ultimo_reenvio', 'expira')
+
+# KEYS: clave del código
+# ARGV: hash candidato, máximo de intentos
+_VERIFICAR = """
+local guardado = redis.call('HGET', KEYS[1], 'codigo')
+if not guardado then
+    return {0}
+end
+local maximo = tonumber(ARGV[2])
+local intentos = tonumber(redis.call('HGET', KEYS[1], 'intentos'))
+if intentos >= maximo then
+    return {-2, intentos}
+end
+if guardado ~= ARGV[1] then
+    intentos = redis.call('HINCRBY', KEYS[1], 'intentos', 1)
+    if intentos >= maximo then
+        return {-2, intentos}
+    end
+    return {-1, intentos}
+end
+local datos = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return {1, datos}
+"""
+
+# KEYS: clave del código
+# ARGV: hash nuevo, ahora (epoch), duración (s), espera entre reenvíos (s), máximo de reenvíos
+_REENVIAR = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return {0}
+end
+local ahora = tonumber(ARGV[2])
+if tonumber(redis.call('HGET', KEYS[1], 'reenvios')) >= tonumber(ARGV[5]) then
+    return {-1}
+end
+local restante = tonumber(redis.call('HGET', KEYS[1], 'ultimo_reenvio')) + tonumber(ARGV[4]) - ahora
+if restante > 0 then
+    return {-2, restante}
+end
+local duracion = tonumber(ARGV[3])
+redis.call('HINCRBY', KEYS[1], 'reenvios', 1)
+redis.call('HSET', KEYS[1], 'codigo', ARGV[1], 'intentos', 0, 'ultimo_reenvio', ahora, 'expira', ahora + duracion)
+redis.call('EXPIRE', KEYS[1], duracion)
+return {1, redis.call('HGETALL', KEYS[1])}
+"""
+
+
+def activo():
+    """True si los códigos se guardan en Redis"""
+    return getattr(settings, 'CODIGOS_VERIFICACION_EN_REDIS', True) and get_redis() is not None
+
+
+def clave(tipo, destino):
+    return f'codigo:{tipo}:{hashlib.sha256(str(destino).encode()).hexdigest()}'
+
+
+def hash_codigo(destino, codigo):
+    """HMAC del código ligado a su destino (un código de 6 dígitos en SHA-256 plano se invierte al instante)"""
+    return hmac.new(
+        settings.SECRET_KEY.encode(),
+        f'{destino}:{codigo}'.encode(),
+        hashlib.sha256
+    ).hexdigest()
+
+
+def _decodificar(plano):
+    """Lista [campo, valor, ...] de HGETALL (en Lua) → dict de str"""
+    valores = [v.decode() if isinstance(v, bytes) else v for v in plano]
+    return dict(zip(valores[::2], valores[1::2]))
+
+
+def _datos(mapa):
+    """Separa los datos del registro de los campos de control"""
+    return {k: v for k, v in mapa.items() if k not in CAMPOS_CONTROL}
+
+
+def guardar(tipo, destino, codigo, duracion_minutos, **datos):
+    """
+    Publica un código nuevo (reemplaza el anterior del mismo destino).
+    
+    Lanza la excepción de Redis si falla: el llamador usa la BD.
+    
+    Returns:
+        int: Epoch de expiración
+    """
+    r = get_redis()
+    ahora = int(time.time())
+    duracion = int(duracion_minutos * 60)
+    k = clave(tipo, destino)
+    
+    pipe = r.pipeline()
+    pipe.delete(k)
+    pipe.hset(k, mapping={
+        **{campo: '' if valor is None else valor for campo, valor in datos.items()},
+        'codigo': hash_codigo(destino, codigo),
+        'intentos': 0,
+        'reenvios': 0,
+        'ultimo_reenvio': 0,
+        'expira': ahora + duracion,
+    })
+    pipe.expire(k, duracion)
+    pipe.execute()
+    return ahora + duracion
+
+
+def verificar(tipo, destino, codigo):
+    """
+    Comprueba el código (atómico, script Lua). Si es correcto la clave se
+    borra y se devuelven los datos guardados con guardar().
+    
+    Returns:
+        tuple: (resultado, datos | intentos | None)
+    """
+    r = get_redis()
+    try:
+        respuesta = r.eval(_VERIFICAR, 1, clave(tipo, destino), hash_codigo(destino, codigo), MAX_INTENTOS)
+    except RedisError as e:
+        logger.error(f'[CODIGOS_ERROR] Verificación en Redis falló, se usa la BD: {str(e)}')
+        return DESCONOCIDO, None
+    resultado = int(respuesta[0])
+    if resultado == VERIFICADO:
+        return resultado, _datos(_decodificar(respuesta[1]))
+    if resultado in (INCORRECTO, BLOQUEADO):
+        return resultado, int(respuesta[1])
+    return resultado, None
+
+
+def reenviar(tipo, destino, codigo, duracion_minutos, espera_segundos=60):
+    """
+    Sustituye el código por uno nuevo respetando límite y espera de
+    reenvíos. Reinicia intentos y TTL.
+    
+    Returns:
+        tuple: (resultado, datos | segundos_restantes | None)
+    """
+    r = get_redis()
+    try:
+        respuesta = r.eval(
+            _REENVIAR, 1, clave(tipo, destino),
+            hash_codigo(destino, codigo), int(time.time()), int(duracion_minutos * 60),
+            int(espera_segundos), MAX_REENVIOS
+        )
+    except RedisError as e:
+        logger.error(f'[CODIGOS_ERROR] Reenvío en Redis falló, se usa la BD: {str(e)}')
+        return DESCONOCIDO, None
+    resultado = int(respuesta[0])
+    if resultado == REENVIADO:
+        mapa = _decodificar(respuesta[1])
+        return resultado, {**_datos(mapa), 'reenvios': int(mapa['reenvios'])}
+    if resultado == ESPERA_REENVIO:
+        return resultado, int(respuesta[1])
+    return resultado, None
+
+
+def estado(tipo, destino):
+    """
+    Estado de un código pendiente (sin el hash) o None si no existe.
+    
+    Returns:
+        dict: datos + intentos, reenvios, ultimo_reenvio, expira (int)
+    """
+    r = get_redis()
+    try:
+        mapa = r.hgetall(clave(tipo, destino))
+    except RedisError as e:
+        logger.error(f'[CODIGOS_ERROR] Estado en Redis falló, se usa la BD: {str(e)}')
+        return None
+    if not mapa:
+        return None
+    mapa = _decodificar([v for par in mapa.items() for v in par])
+    mapa.pop('codigo', None)
+    for campo in ('intentos', 'reenvios', 'ultimo_reenvio', 'expira'):
+        mapa[campo] = int(mapa[campo])
+    return mapa
+
+
+def descartar(tipo, destino):
+    """Invalida el código pendiente del destino. Errores de Redis se registran y se ignoran."""
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        r.delete(clave(tipo, destino))
+    except Exception as e:
+        logger.error(f'[CODIGOS_ERROR] No se pudo descartar código en Redis: {str(e)}')
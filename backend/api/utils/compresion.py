@@ -0,0 +1,210 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🗜️ COMPRESIÓN - Variantes precomprimidas (br / zstd / gzip)
+═══════════════════════════════════════════════════════════════════════════════
+
+GZipMiddleware comprimía cada respuesta en cada petición, aunque el
+catálogo devuelva el mismo JSON miles de veces por minuto.
+
+Con CompresionMiddleware (api/middleware.py):
+- Se negocia Accept-Encoding (q-values): br > zstd > gzip entre las
+  disponibles (brotli y zstandard son opcionales; gzip siempre)
+- Cuerpos de al menos COMPRESION_CACHE_MINIMO bytes: la variante
+  comprimida se guarda por hash del cuerpo, en un LRU del proceso y en la
+  caché compartida (Redis). Un cuerpo repetido se sirve precomprimido: solo
+  cuesta el hash. Al comprimirse una sola vez se usa un nivel alto
+- Cuerpos menores o respuestas privadas (Set-Cookie, Cache-Control
+  private/no-store): compresión al vuelo con nivel rápido; en gzip con los
+  bytes aleatorios de GZipMiddleware (mitigación de BREACH)
+- Nada por debajo de COMPRESION_MINIMO ni para media ya comprimida
+"""
+
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.text import compress_string
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+PREFIJO = 'compresion:'
+BYTES_ALEATORIOS_GZIP = 100  # Como GZipMiddleware.max_random_bytes
+
+# Nivel al vuelo (cada petición) y nivel de las variantes en caché (una vez)
+NIVELES = {
+    'br': {'al_vuelo': 4, 'cache': 9},
+    'zstd': {'al_vuelo': 3, 'cache': 12},
+    'gzip': {'al_vuelo': 6, 'cache': 9},  # Al vuelo: compress_string de Django (nivel 6)
+}
+
+# Tipos que ya vienen comprimidos: recomprimirlos solo gasta CPU
+MEDIA_COMPRIMIDA = (
+    'image/', 'video/', 'audio/', 'font/woff',
+    'application/zip', 'application/gzip', 'application/x-gzip', 'application/zstd',
+    'application/x-7z-compressed', 'application/x-rar', 'application/pdf', 'application/octet-stream',
+)
+
+
+def disponibles():
+    """Codificaciones soportadas, en orden de preferencia"""
+    return [
+        codificacion
+        for codificacion, modulo in (('br', brotli), ('zstd', zstandard), ('gzip', gzip))
+        if modulo is not None
+    ]
+
+
+def negociar(accept_encoding, opciones=None):
+    """
+    Mejor codificación aceptada por el cliente, o None.
+    
+    Respeta los q-values (q=0 rechaza) y el comodín `*`; a igual peso gana
+    el orden de `opciones` (por defecto disponibles()).
+    """
+    pesos = {}
+    for parte in accept_encoding.lower().split(','):
+        token, _, parametros = parte.partition(';')
+        token = token.strip()
+        if not token:
+            continue
+        q = 1.0
+        for parametro in parametros.split(';'):
+            nombre, _, valor = parametro.strip().partition('=')
+            if nombre == 'q':
+                try:
+                    q = float(valor)
+                except ValueError:
+                    q = 0.0
+        pesos[token] = q
+    
+    mejor, mejor_q = None, 0.0
+    for codificacion in opciones or disponibles():
+        q = pesos.get(codificacion, pesos.get('*', 0.0))
+        if q > mejor_q:
+            mejor, mejor_q = codificacion, q
+    return mejor
+
+
+def comprimible(content_type):
+    return not content_type.lower().startswith(MEDIA_COMPRIMIDA)
+
+
+def comprimir(contenido, codificacion, nivel):
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=nivel)
+    if codificacion == 'zstd':
+        return zstandard.ZstdCompressor(level=nivel).compress(contenido)
+    # mtime=0: mismo cuerpo → mismos bytes (cacheable)
+    return gzip.compress(contenido, compresslevel=nivel, mtime=0)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 💾 VARIANTES EN CACHÉ
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class _LRU:
+    """LRU del proceso acotado en bytes"""
+    
+    def __init__(self):
+        self._datos = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+    
+    def get(self, clave):
+        with self._lock:
+            valor = self._datos.get(clave)
+            if valor is not None:
+                self._datos.move_to_end(clave)
+            return valor
+    
+    def set(self, clave, valor, maximo):
+        if len(valor) > maximo:
+            return
+        with self._lock:
+            anterior = self._datos.pop(clave, None)
+            if anterior is not None:
+                self._bytes -= len(anterior)
+            self._datos[clave] = valor
+            self._bytes += len(valor)
+            while self._bytes > maximo:
+                _, expulsado = self._datos.popitem(last=False)
+                self._bytes -= len(expulsado)
+    
+    def clear(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+
+_local = _LRU()
+_lock_metricas = threading.Lock()
+_metricas = dict.fromkeys(('hits_local', 'hits_compartida', 'comprimidas', 'al_vuelo', 'ms_comprimiendo'), 0)
+
+
+def _contar(metrica, valor=1):
+    with _lock_metricas:
+        _metricas[metrica] += valor
+
+
+def _comprimir_medido(contenido, codificacion, nivel):
+    inicio = time.perf_counter()
+    comprimido = comprimir(contenido, codificacion, nivel)
+    _contar('ms_comprimiendo', (time.perf_counter() - inicio) * 1000)
+    return comprimido
+
+
+def variante(contenido, codificacion, compartible=True):
+    """
+    `contenido` comprimido con `codificacion`; desde caché si este mismo
+    cuerpo ya se comprimió antes (en este proceso o en otro worker).
+    
+    Args:
+        compartible: False para respuestas privadas (siempre al vuelo)
+    """
+    if not compartible or len(contenido) < settings.COMPRESION_CACHE_MINIMO:
+        _contar('al_vuelo')
+        if codificacion == 'gzip':
+            inicio = time.perf_counter()
+            comprimido = compress_string(contenido, max_random_bytes=BYTES_ALEATORIOS_GZIP)
+            _contar('ms_comprimiendo', (time.perf_counter() - inicio) * 1000)
+            return comprimido
+        return _comprimir_medido(contenido, codificacion, NIVELES[codificacion]['al_vuelo'])
+    
+    clave = f'{PREFIJO}{codificacion}:{hashlib.blake2b(contenido, digest_size=20).hexdigest()}'
+    comprimido = _local.get(clave)
+    if comprimido is not None:
+        _contar('hits_local')
+        return comprimido
+    
+    comprimido = cache.get(clave)
+    if comprimido is not None:
+        _contar('hits_compartida')
+    else:
+        _contar('comprimidas')
+        comprimido = _comprimir_medido(contenido, codificacion, NIVELES[codificacion]['cache'])
+        cache.set(clave, comprimido, settings.COMPRESION_CACHE_TTL)
+    
+    _local.set(clave, comprimido, settings.COMPRESION_CACHE_LOCAL_BYTES)
+    return comprimido
+
+
+def metricas():
+    """Contadores del proceso (aciertos, compresiones y CPU en ms)"""
+    with _lock_metricas:
+        return {**_metricas, 'ms_comprimiendo': round(_metricas['ms_comprimiendo'], 1)}
+
+
+def limpiar_local():
+    _local.clear()
@@ -0,0 +1,398 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+📮 CORREO - Pipeline de Envío de Emails
+═══════════════════════════════════════════════════════════════════════════════
+
+Antes: cada email abría su propia conexión SMTP (TCP + STARTTLS + AUTH),
+re-renderizaba la plantilla y reintentaba con 60s fijos. En campañas de
+registro la cola se atascaba detrás del establecimiento de conexiones.
+
+Ahora:
+- Conexión persistente por proveedor y proceso (worker): se abre una vez,
+  se comprueba con NOOP si estuvo inactiva y se reabre si el servidor la cerró
+- Cola en Redis (`correo:cola`): las tareas encolan el mensaje ya renderizado
+  y un único drenado (`enviar_lote_correos`) envía lotes por la misma conexión.
+  Cada lote pasa con LMOVE a `correo:procesando` y solo se borra de ahí tras
+  enviarse: si el worker muere a medias, el siguiente drenado lo devuelve a
+  la cola (entrega al menos una vez)
+- Errores permanentes de un mensaje (remitente/destinatarios rechazados,
+  DATA con 5xx) → lista `correo:fallidos` (últimos MAX_FALLIDOS); no se
+  reintentan ni bloquean la cola. Solo los errores de conexión reencolan
+- Plantillas compiladas en caché de proceso
+- Reintentos con backoff exponencial + jitter (`espera_reintento`)
+- Métricas por proveedor y minuto en caché: enviados, rechazados, ms,
+  conexiones abiertas (`metricas()` → /api/admin/correo/metricas/)
+
+Sin Redis los mensajes se envían directamente (misma conexión persistente).
+
+Proveedores: settings.CORREO_PROVEEDORES = {nombre: kwargs de get_connection}
+({} = EMAIL_HOST/EMAIL_PORT/... globales). Para tests y benchmarks:
+api/utils/smtp_sumidero.py.
+"""
+
+import json
+import random
+import threading
+import time
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import get_template
+from .redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLAVE_COLA = 'correo:cola'
+CLAVE_PROCESANDO = 'correo:procesando'
+CLAVE_FALLIDOS = 'correo:fallidos'
+CLAVE_DRENANDO = 'correo:drenando'
+CLAVE_PROGRAMADO = 'correo:drenado_programado'
+PREFIJO_METRICAS = 'correo:metricas:'
+
+ESPERA_LOTE = 2          # segundos para juntar mensajes antes de drenar
+TTL_DRENANDO = 300       # cerrojo del drenado (se renueva en cada lote)
+MAX_FALLIDOS = 1000
+BACKOFF_BASE = 10        # segundos
+BACKOFF_MAXIMO = 600
+TTL_METRICAS = 60 * 60 * 2
+CAMPOS_METRICAS = ('enviados', 'rechazados', 'ms', 'conexiones')
+
+_pool = {}
+_lock = threading.RLock()
+
+
+class EnvioInterrumpido(Exception):
+    """La conexión falló dos veces seguidas; `pendientes` = mensajes sin enviar"""
+    
+    def __init__(self, mensaje, pendientes):
+        super().__init__(mensaje)
+        self.pendientes = pendientes
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Plantillas y mensajes
+# ═══════════════════════════════════════════════════════════════════════════
+
+@lru_cache(maxsize=32)
+def plantilla(nombre):
+    """Plantilla compilada (una vez por proceso)"""
+    return get_template(nombre)
+
+
+def construir(asunto, texto, para, html=None, remitente=None):
+    """EmailMultiAlternatives con texto plano y HTML opcional"""
+    mensaje = EmailMultiAlternatives(
+        subject=asunto,
+        body=texto,
+        from_email=remitente or settings.DEFAULT_FROM_EMAIL,
+        to=list(para)
+    )
+    if html:
+        mensaje.attach_alternative(html, 'text/html')
+    return mensaje
+
+
+def construir_desde_plantilla(asunto, texto, para, nombre_plantilla, contexto):
+    return construir(asunto, texto, para, html=plantilla(nombre_plantilla).render(contexto))
+
+
+def _serializar(mensaje, **extra):
+    html = next((c for c, tipo in mensaje.alternatives if tipo == 'text/html'), None)
+    return json.dumps({
+        'asunto': mensaje.subject,
+        'texto': mensaje.body,
+        'html': html,
+        'para': mensaje.to,
+        'remitente': mensaje.from_email,
+        **extra,
+    })
+
+
+def _deserializar(crudo):
+    datos = json.loads(crudo)
+    return construir(datos['asunto'], datos['texto'], datos['para'], datos['html'], datos['remitente'])
+
+
+def espera_reintento(intento, base=BACKOFF_BASE, maximo=BACKOFF_MAXIMO):
+    """
+    Backoff exponencial con jitter ("equal jitter").
+    
+    tope = min(maximo, base · 2^intento) → espera uniforme en [tope/2, tope]
+    Los reintentos de muchos mensajes fallidos a la vez no llegan juntos.
+    """
+    tope = min(maximo, base * 2 ** intento)
+    return tope / 2 + random.uniform(0, tope / 2)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Conexiones persistentes
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _proveedor(proveedor):
+    return proveedor or settings.CORREO_PROVEEDOR
+
+
+def _viva(backend):
+    smtp = getattr(backend, 'connection', None)
+    if smtp is None:
+        # Backends sin socket (locmem, consola) o aún sin abrir
+        return not hasattr(backend, 'connection')
+    try:
+        return smtp.noop()[0] == 250
+    except Exception:
+        return False
+
+
+def conexion(proveedor=None):
+    """
+    Conexión abierta del proveedor en este proceso.
+    
+    Solo se comprueba con NOOP si lleva más de CORREO_MAX_INACTIVA
+    segundos sin usarse (los servidores cierran conexiones ociosas).
+    """
+    proveedor = _proveedor(proveedor)
+    with _lock:
+        entrada = _pool.get(proveedor)
+        ahora = time.monotonic()
+        if entrada and ahora - entrada['ultimo_uso'] > settings.CORREO_MAX_INACTIVA:
+            if not _viva(entrada['backend']):
+                descartar(proveedor)
+                entrada = None
+        
+        if entrada is None:
+            opciones = dict(settings.CORREO_PROVEEDORES.get(proveedor, {}))
+            backend = get_connection(fail_silently=False, **opciones)
+            backend.open()
+            entrada = {'backend': backend, 'ultimo_uso': ahora}
+            _pool[proveedor] = entrada
+            _sumar_metricas(proveedor, conexiones=1)
+        
+        entrada['ultimo_uso'] = ahora
+        return entrada['backend']
+
+
+def descartar(proveedor=None):
+    """Cierra y olvida la conexión del proveedor"""
+    with _lock:
+        entrada = _pool.pop(_proveedor(proveedor), None)
+    if entrada:
+        try:
+            entrada['backend'].close()
+        except Exception:
+            pass
+
+
+def cerrar_conexiones():
+    """Cierra todas las conexiones (fin del worker)"""
+    for proveedor in list(_pool):
+        descartar(proveedor)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Envío
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _permanente(error):
+    """Error propio del mensaje (no de la conexión): reintentarlo no sirve"""
+    import smtplib
+    
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return True
+    return isinstance(error, (smtplib.SMTPSenderRefused, smtplib.SMTPDataError)) and error.smtp_code >= 500
+
+
+def _rechazar(mensaje, proveedor, error):
+    """Registra el mensaje en `correo:fallidos` (si hay Redis) y lo descarta"""
+    logger.warning(f'[CORREO_RECHAZADO] {proveedor}: {mensaje.to} | {error}')
+    r = get_redis()
+    if r is None:
+        return
+    try:
+        crudo = _serializar(mensaje, proveedor=proveedor, error=str(error), fecha=int(time.time()))
+        r.pipeline().lpush(CLAVE_FALLIDOS, crudo).ltrim(CLAVE_FALLIDOS, 0, MAX_FALLIDOS - 1).execute()
+    except Exception as e:
+        logger.warning(f'[CORREO_COLA_ERROR] No se pudo guardar el fallido: {str(e)}')
+
+
+def enviar(mensajes, proveedor=None):
+    """
+    Envía los mensajes por la conexión persistente del proveedor.
+    
+    - Error permanente del mensaje (destinatarios o remitente rechazados,
+      DATA con 5xx) → a `correo:fallidos` y se sigue (no bloquea el lote)
+    - Conexión caída u otro error SMTP → se reabre; si vuelve a fallar sin
+      haber enviado nada se lanza EnvioInterrumpido con los mensajes pendientes
+    
+    Returns:
+        int: Mensajes enviados
+    """
+    proveedor = _proveedor(proveedor)
+    pendientes = list(mensajes)
+    enviados = 0
+    rechazados = 0
+    reconectado = False
+    inicio = time.perf_counter()
+    
+    try:
+        while pendientes:
+            try:
+                with _lock:
+                    conexion(proveedor).send_messages(pendientes[:1])
+                enviados += 1
+                pendientes.pop(0)
+                reconectado = False
+            except OSError as e:
+                # SMTPException hereda de OSError: desconexión, timeout, 4xx/5xx
+                if _permanente(e):
+                    _rechazar(pendientes.pop(0), proveedor, e)
+                    rechazados += 1
+                    continue
+                descartar(proveedor)
+                if reconectado:
+                    raise EnvioInterrumpido(f'[{proveedor}] {e}', pendientes) from e
+                reconectado = True
+    finally:
+        _sumar_metricas(
+            proveedor,
+            enviados=enviados,
+            rechazados=rechazados,
+            ms=int((time.perf_counter() - inicio) * 1000)
+        )
+    
+    return enviados
+
+
+def encolar(mensaje):
+    """
+    Deja el mensaje en la cola de Redis y programa un drenado si no hay uno
+    pendiente. Sin Redis lo envía directamente.
+    """
+    r = get_redis()
+    if r is None:
+        return enviar([mensaje])
+    
+    try:
+        r.rpush(CLAVE_COLA, _serializar(mensaje))
+        programar = r.set(CLAVE_PROGRAMADO, 1, nx=True, ex=ESPERA_LOTE + 30)
+    except Exception as e:
+        logger.warning(f'[CORREO_COLA_ERROR] Envío directo: {str(e)}')
+        return enviar([mensaje])
+    
+    if programar:
+        from api.tasks import enviar_lote_correos
+        enviar_lote_correos.apply_async(countdown=ESPERA_LOTE)
+    return 0
+
+
+def _devolver(r, crudos):
+    """Vacía `correo:procesando` dejando `crudos` en la cabeza de la cola (mismo orden)"""
+    pipe = r.pipeline()
+    if crudos:
+        pipe.lpush(CLAVE_COLA, *reversed(crudos))
+    pipe.delete(CLAVE_PROCESANDO)
+    pipe.execute()
+
+
+def drenar(lote=None, proveedor=None):
+    """
+    Envía la cola de Redis en lotes de `lote` mensajes por una conexión.
+    
+    Un solo drenado a la vez (cerrojo `correo:drenando`). Cada lote se mueve
+    con LMOVE a `correo:procesando` y se borra de ahí cuando está enviado.
+    Lo que haya en `correo:procesando` al empezar es de un drenado que murió
+    y vuelve a la cola. Si el envío se interrumpe, los mensajes no enviados
+    vuelven a la cabeza de la cola (mismo orden) y se propaga EnvioInterrumpido.
+    
+    Returns:
+        int: Mensajes enviados (0 si ya hay otro drenado en curso)
+    """
+    r = get_redis()
+    if r is None:
+        return 0
+    
+    lote = lote or settings.CORREO_LOTE
+    if not r.set(CLAVE_DRENANDO, 1, nx=True, ex=TTL_DRENANDO):
+        return 0
+    
+    try:
+        # Lo que llegue a partir de ahora programa su propio drenado
+        r.delete(CLAVE_PROGRAMADO)
+        _devolver(r, r.lrange(CLAVE_PROCESANDO, 0, -1))
+        
+        total = 0
+        while True:
+            pipe = r.pipeline()
+            for _ in range(lote):
+                pipe.lmove(CLAVE_COLA, CLAVE_PROCESANDO, 'LEFT', 'RIGHT')
+            crudos = [c for c in pipe.execute() if c is not None]
+            if not crudos:
+                break
+            r.expire(CLAVE_DRENANDO, TTL_DRENANDO)
+            try:
+                total += enviar([_deserializar(c) for c in crudos], proveedor)
+            except EnvioInterrumpido as e:
+                _devolver(r, crudos[len(crudos) - len(e.pendientes):])
+                raise
+            r.delete(CLAVE_PROCESANDO)
+        return total
+    finally:
+        r.delete(CLAVE_DRENANDO)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Métricas
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _clave_metrica(proveedor, minuto, campo):
+    return f'{PREFIJO_METRICAS}{proveedor}:{minuto}:{campo}'
+
+
+def _sumar_metricas(proveedor, **valores):
+    minuto = int(time.time() // 60)
+    for campo, valor in valores.items():
+        if not valor:
+            continue
+        clave = _clave_metrica(proveedor, minuto, campo)
+        cache.add(clave, 0, TTL_METRICAS)
+        try:
+            cache.incr(clave, valor)
+        except ValueError:
+            cache.set(clave, valor, TTL_METRICAS)
+
+
+def metricas(minutos=15):
+    """
+    Throughput por proveedor en los últimos `minutos` (un get_many).
+    
+    Returns:
+        dict: {proveedor: {'enviados', 'rechazados', 'conexiones',
+               'mensajes_por_minuto', 'ms_por_mensaje', 'por_minuto': [...]}}
+    """
+    actual = int(time.time() // 60)
+    ventana = range(actual - minutos + 1, actual + 1)
+    proveedores = list(settings.CORREO_PROVEEDORES)
+    valores = cache.get_many([
+        _clave_metrica(p, m, c) for p in proveedores for m in ventana for c in CAMPOS_METRICAS
+    ])
+    
+    resultado = {}
+    for proveedor in proveedores:
+        por_minuto = []
+        for minuto in ventana:
+            fila = {c: valores.get(_clave_metrica(proveedor, minuto, c), 0) for c in CAMPOS_METRICAS}
+            if any(fila.values()):
+                por_minuto.append({'minuto': minuto * 60, **fila})
+        
+        totales = {c: sum(f[c] for f in por_minuto) for c in CAMPOS_METRICAS}
+        resultado[proveedor] = {
+            'enviados': totales['enviados'],
+            'rechazados': totales['rechazados'],
+            'conexiones': totales['conexiones'],
+            'mensajes_por_minuto': round(totales['enviados'] / minutos, 2),
+            'ms_por_mensaje': round(totales['ms'] / totales['enviados'], 1) if totales['enviados'] else None,
+            'por_minuto': por_minuto,
+        }
+    return resultado
@@ -0,0 +1,125 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+⏱️ EXPIRACIÓN DE RESERVAS - Temporizador en un Sorted Set de Redis
+═══════════════════════════════════════════════════════════════════════════════
+
+Antes: beat barría StockReservation cada 20 minutos; con un TTL de 15 el
+stock de una reserva abandonada podía quedar bloqueado hasta 35 minutos.
+
+Ahora:
+- Al crear una reserva se añade su id al ZSET `reservas:expiracion` con
+  score = expires_at (epoch)
+- `expirar_reservas_vencidas` (beat, cada 5 segundos) extrae de forma
+  atómica (Lua: ZRANGEBYSCORE + ZREM) hasta RESERVAS_EXPIRACION_LOTE ids
+  vencidos y los libera con StockReservation.expirar(): un UPDATE de las
+  reservas y una liberación por producto, no por reserva
+- Si no hay nada vencido el poller hace una sola llamada a Redis y no toca
+  la BD
+- Los ids de reservas ya confirmadas o canceladas se descartan solos (el
+  UPDATE filtra status='pending')
+- Si la liberación falla, los ids vuelven al ZSET con su score original
+- Las reservas que otra transacción tenía bloqueadas (SKIP LOCKED) y siguen
+  pendientes también vuelven al ZSET: las recoge el siguiente poll, no el
+  barrido
+
+El barrido periódico (liberar_reservas_expiradas) queda como red de
+seguridad: reservas creadas sin Redis, con Redis caído o perdidas del ZSET.
+"""
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from .redis_client import get_redis
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLAVE = 'reservas:expiracion'
+
+# KEYS[1]: zset | ARGV: ahora (epoch), lote
+# Retorna [id, score, id, score, ...] de los vencidos y los quita del zset
+_EXTRAER = """
+local vencidas = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'WITHSCORES', 'LIMIT', 0, ARGV[2])
+for i = 1, #vencidas, 2 do
+    redis.call('ZREM', KEYS[1], vencidas[i])
+end
+return vencidas
+"""
+
+
+def activo():
+    """Cliente Redis si el temporizador está habilitado, si no None"""
+    if not settings.RESERVAS_EXPIRACION_EN_REDIS:
+        return None
+    return get_redis()
+
+
+def programar(reservas):
+    """
+    Añade las reservas al temporizador tras el commit de la transacción
+    actual (una reserva revertida nunca llega al ZSET).
+    """
+    r = activo()
+    if r is None:
+        return
+    
+    programadas = {str(reserva.pk): reserva.expires_at.timestamp() for reserva in reservas}
+    if not programadas:
+        return
+    
+    def _zadd():
+        try:
+            r.zadd(CLAVE, programadas)
+        except Exception as e:
+            # El barrido periódico las liberará
+            logger.warning(f'[EXPIRACION_RESERVAS_ERROR] ZADD: {str(e)}')
+    
+    transaction.on_commit(_zadd)
+
+
+def procesar_vencidas(lote=None, maximo_lotes=20):
+    """
+    Extrae y libera las reservas vencidas en lotes.
+    
+    Returns:
+        int: Reservas liberadas
+    """
+    from api.models import StockReservation
+    
+    r = activo()
+    if r is None:
+        return 0
+    lote = lote or settings.RESERVAS_EXPIRACION_LOTE
+    
+    liberadas = 0
+    bloqueadas = {}
+    try:
+        for _ in range(maximo_lotes):
+            ahora = timezone.now()
+            crudo = r.eval(_EXTRAER, 1, CLAVE, ahora.timestamp(), lote)
+            if not crudo:
+                break
+            
+            scores = {int(crudo[i]): float(crudo[i + 1]) for i in range(0, len(crudo), 2)}
+            try:
+                procesadas = set(StockReservation.expirar(list(scores), ahora))
+            except Exception:
+                r.zadd(CLAVE, scores)
+                raise
+            liberadas += len(procesadas)
+            
+            # Saltadas: bloqueadas por otra transacción, o ya confirmadas/canceladas
+            saltadas = [pk for pk in scores if pk not in procesadas]
+            if saltadas:
+                pendientes = StockReservation.objects.filter(pk__in=saltadas, status='pending')
+                for pk in pendientes.values_list('pk', flat=True):
+                    bloqueadas[pk] = scores[pk]
+            
+            if len(scores) < lote:
+                break
+    finally:
+        # Al final: dentro del bucle se volverían a extraer en el mismo poll
+        if bloqueadas:
+            r.zadd(CLAVE, bloqueadas)
+    
+    return liberadas
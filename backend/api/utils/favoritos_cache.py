@@ -0,0 +1,174 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+❤️ FAVORITOS CACHE - Conjunto de Favoritos por Usuario en Redis
+═══════════════════════════════════════════════════════════════════════════════
+
+Cada usuario tiene un SET `favoritos:u:<id>` con los IDs de sus productos
+favoritos. La grilla del catálogo pregunta ~50 flags por render: se responden
+con un solo SMISMEMBER (un round-trip, sin consulta a BD).
+
+- Carga perezosa: el SET se construye desde la BD en el primer acceso
+- Centinela 0: distingue "SET cargado y vacío" de "SET no cargado"
+- Escritura: agregar/remover actualizan el SET solo si ya está cargado
+  (script Lua atómico), para no crear conjuntos parciales
+- Versión `favoritos:v:<id>`: agregar/remover la incrementan. La carga solo
+  guarda el SET si la versión no cambió desde antes de leer la BD: una
+  escritura concurrente no deja un SET sin su favorito
+- TTL fijo desde la carga (las lecturas no lo renuevan): cualquier
+  desajuste dura como mucho TTL
+- Fallback: sin Redis se responde con una consulta `producto_id__in`
+"""
+
+from .redis_client import get_redis
+import logging
+
+logger = logging.getLogger('cache_manager')
+
+CENTINELA = 0
+
+# SADD solo si el SET ya existe (evita un SET parcial si expiró)
+_SADD_SI_EXISTE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    redis.call('SADD', KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# Guarda el SET cargado de BD si nadie lo creó ni escribió favoritos mientras
+# tanto. KEYS: SET, versión. ARGV: versión leída antes de la BD, TTL, IDs
+_GUARDAR_SI_VIGENTE = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+    return 0
+end
+redis.call('SADD', KEYS[1], unpack(ARGV, 3))
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+return 1
+"""
+
+
+class FavoritosCache:
+    """
+    SET de IDs de productos favoritos por usuario
+    """
+    
+    TTL = 60 * 60 * 24  # 24 horas desde la carga
+    
+    @staticmethod
+    def clave(usuario_id):
+        return f'favoritos:u:{usuario_id}'
+    
+    @staticmethod
+    def clave_version(usuario_id):
+        return f'favoritos:v:{usuario_id}'
+    
+    @staticmethod
+    def _ids_desde_bd(usuario_id, producto_ids=None):
+        from api.models import Favorito
+        
+        qs = Favorito.objects.filter(usuario_id=usuario_id)
+        if producto_ids is not None:
+            qs = qs.filter(producto_id__in=producto_ids)
+        return set(qs.values_list('producto_id', flat=True))
+    
+    @classmethod
+    def _cargar(cls, r, usuario_id):
+        """
+        Construye el SET desde la BD y retorna los IDs leídos.
+        
+        La versión se lee ANTES que la BD: si un agregar/remover la
+        incrementa entre medias, el SET no se guarda (lo cargará la
+        siguiente lectura).
+        """
+        version = r.get(cls.clave_version(usuario_id)) or b'0'
+        ids = cls._ids_desde_bd(usuario_id)
+        r.eval(
+            _GUARDAR_SI_VIGENTE, 2, cls.clave(usuario_id), cls.clave_version(usuario_id),
+            version, cls.TTL, CENTINELA, *ids
+        )
+        return ids
+    
+    @classmethod
+    def miembros(cls, usuario_id, producto_ids):
+        """
+        Indica cuáles de `producto_ids` son favoritos del usuario.
+        
+        Returns:
+            dict: {producto_id: bool}
+        """
+        producto_ids = list(producto_ids)
+        if not producto_ids:
+            return {}
+        
+        r = get_redis()
+        if r is not None:
+            try:
+                clave = cls.clave(usuario_id)
+                pipe = r.pipeline(transaction=False)
+                pipe.exists(clave)
+                pipe.smismember(clave, producto_ids)
+                existe, flags = pipe.execute()
+                
+                if existe:
+                    return {pid: bool(flag) for pid, flag in zip(producto_ids, flags)}
+                
+                favoritos = cls._cargar(r, usuario_id)
+                return {pid: pid in favoritos for pid in producto_ids}
+            except Exception as e:
+                logger.warning(f'⚠️  Favoritos sin Redis (fallback a BD): {str(e)}')
+        
+        favoritos = cls._ids_desde_bd(usuario_id, producto_ids)
+        return {pid: pid in favoritos for pid in producto_ids}
+    
+    @classmethod
+    def es_miembro(cls, usuario_id, producto_id):
+        return cls.miembros(usuario_id, [producto_id])[producto_id]
+    
+    @classmethod
+    def _nueva_version(cls, pipe, usuario_id):
+        """Invalida las cargas desde BD en curso (ver _cargar)"""
+        pipe.incr(cls.clave_version(usuario_id))
+        pipe.expire(cls.clave_version(usuario_id), cls.TTL)
+    
+    @classmethod
+    def agregar(cls, usuario_id, producto_id):
+        """Llamar tras guardar el Favorito en BD"""
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            pipe = r.pipeline()
+            cls._nueva_version(pipe, usuario_id)
+            pipe.eval(_SADD_SI_EXISTE, 1, cls.clave(usuario_id), producto_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f'⚠️  No se pudo actualizar favoritos en Redis: {str(e)}')
+            cls.invalidar(usuario_id)
+    
+    @classmethod
+    def remover(cls, usuario_id, producto_id):
+        """Llamar tras eliminar el Favorito de la BD"""
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            pipe = r.pipeline()
+            cls._nueva_version(pipe, usuario_id)
+            pipe.srem(cls.clave(usuario_id), producto_id)
+            pipe.execute()
+        except Exception as e:
+            logger.warning(f'⚠️  No se pudo actualizar favoritos en Redis: {str(e)}')
+            cls.invalidar(usuario_id)
+    
+    @classmethod
+    def invalidar(cls, usuario_id):
+        r = get_redis()
+        if r is None:
+            return
+        try:
+            r.delete(cls.clave(usuario_id))
+        except Exception:
+            pass
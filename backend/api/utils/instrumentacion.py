@@ -0,0 +1,255 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔬 INSTRUMENTACIÓN - SQL, caché y serialización por petición
+═══════════════════════════════════════════════════════════════════════════════
+
+Los N+1 (favoritos.count() por producto, CartSerializer sin prefetch,
+Cart.__str__ leyendo user.email) solo se veían revisando código. Con
+medir() cada petición acumula:
+- Consultas SQL y tiempo total en BD (execute_wrapper en cada alias)
+- Huellas de las consultas: el SQL con los literales y las listas IN
+  colapsados. La misma huella N veces en una petición = N+1
+- Aciertos y fallos de la caché (backends de api/cache_backends.py)
+- Tiempo de serialización DRF (Serializer.data / ListSerializer.data, solo
+  la llamada externa)
+
+InstrumentacionMiddleware lo publica en Server-Timing, en el log
+'instrumentacion' (una línea JSON por petición) y guarda las peticiones
+lentas o con N+1 en un buffer circular (MuestrasLentas) que se consulta en
+GET /api/admin/instrumentacion/lentas/.
+
+En tests, presupuesto_consultas() falla si un bloque supera su número de
+consultas o repite una huella:
+    with presupuesto_consultas(4, repeticiones=1):
+        client.get('/api/catalogo/productos/')
+"""
+
+import json
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from functools import partial, wraps
+
+from django.conf import settings
+from django.db import connections
+
+from .redis_client import get_redis
+
+try:
+    from redis.exceptions import RedisError
+except ImportError:
+    RedisError = OSError
+
+logger = logging.getLogger('instrumentacion')
+
+# Mediciones abiertas en el contexto actual (anidables: middleware + test)
+_activas = ContextVar('instrumentacion', default=())
+_serializando = ContextVar('instrumentacion_serializando', default=False)
+
+_LISTA_IN = re.compile(r'\bIN\s*\((?:\s*%s\s*,)*\s*%s\s*\)', re.IGNORECASE)
+_LITERAL = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_ESPACIOS = re.compile(r'\s+')
+
+
+def huella(sql):
+    """SQL normalizado: misma consulta con otros parámetros → misma huella"""
+    sql = _LISTA_IN.sub('IN (...)', _LITERAL.sub('%s', sql))
+    return _ESPACIOS.sub(' ', sql).strip()
+
+
+@dataclass
+class Medicion:
+    """Acumulador de una petición (o de un bloque en tests)"""
+    consultas: int = 0
+    ms_bd: float = 0.0
+    huellas: Counter = field(default_factory=Counter)
+    cache_aciertos: int = 0
+    cache_fallos: int = 0
+    ms_serializacion: float = 0.0
+    
+    def repetidas(self, minimo=2):
+        """{huella: veces} de las consultas lanzadas al menos `minimo` veces"""
+        return {sql: veces for sql, veces in self.huellas.most_common() if veces >= minimo}
+    
+    def server_timing(self, ms_total=None):
+        valores = [
+            f'db;dur={self.ms_bd:.1f};desc="{self.consultas} consultas"',
+            f'cache;desc="{self.cache_aciertos} aciertos {self.cache_fallos} fallos"',
+            f'ser;dur={self.ms_serializacion:.1f}',
+        ]
+        if ms_total is not None:
+            valores.append(f'total;dur={ms_total:.1f}')
+        return ', '.join(valores)
+    
+    def resumen(self):
+        return {
+            'consultas': self.consultas,
+            'ms_bd': round(self.ms_bd, 1),
+            'repetidas': sum(veces - 1 for veces in self.huellas.values() if veces > 1),
+            'cache_aciertos': self.cache_aciertos,
+            'cache_fallos': self.cache_fallos,
+            'ms_serializacion': round(self.ms_serializacion, 1),
+        }
+
+
+def _registrar_consulta(medicion, execute, sql, params, many, context):
+    inicio = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        medicion.ms_bd += (time.perf_counter() - inicio) * 1000
+        medicion.consultas += 1
+        medicion.huellas[huella(sql)] += 1
+
+
+@contextmanager
+def medir():
+    """
+    Abre una Medicion para el bloque.
+    
+    Las consultas se capturan en las conexiones del hilo actual (como
+    CaptureQueriesContext, sin necesitar DEBUG=True).
+    """
+    medicion = Medicion()
+    token = _activas.set(_activas.get() + (medicion,))
+    envoltura = partial(_registrar_consulta, medicion)
+    conexiones = [connections[alias] for alias in connections]
+    for conexion in conexiones:
+        conexion.execute_wrappers.append(envoltura)
+    try:
+        yield medicion
+    finally:
+        for conexion in conexiones:
+            conexion.execute_wrappers.remove(envoltura)
+        _activas.reset(token)
+
+
+def midiendo():
+    return bool(_activas.get())
+
+
+def contar_cache(aciertos, fallos):
+    for medicion in _activas.get():
+        medicion.cache_aciertos += aciertos
+        medicion.cache_fallos += fallos
+
+
+def _cronometrar_data(fget):
+    @wraps(fget)
+    def data(self):
+        mediciones = _activas.get()
+        if not mediciones or _serializando.get():
+            return fget(self)
+        
+        marca = _serializando.set(True)
+        inicio = time.perf_counter()
+        try:
+            return fget(self)
+        finally:
+            ms = (time.perf_counter() - inicio) * 1000
+            for medicion in mediciones:
+                medicion.ms_serializacion += ms
+            _serializando.reset(marca)
+    data.instrumentado = True
+    return data
+
+
+def instalar():
+    """
+    Mide Serializer.data y ListSerializer.data de DRF (idempotente).
+    
+    Solo se cuenta la serialización externa: los serializers anidados
+    forman parte de ella. Se llama desde ApiConfig.ready().
+    """
+    from rest_framework import serializers
+    
+    for clase in (serializers.Serializer, serializers.ListSerializer):
+        fget = clase.data.fget
+        if not getattr(fget, 'instrumentado', False):
+            clase.data = property(_cronometrar_data(fget))
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🐢 MUESTRAS DE PETICIONES LENTAS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class MuestrasLentas:
+    """
+    Buffer circular de las últimas INSTRUMENTACION_BUFFER peticiones lentas.
+    
+    En Redis (LPUSH + LTRIM) para verlas desde cualquier worker; sin Redis,
+    o si falla, en memoria del proceso.
+    """
+    
+    CLAVE = 'instrumentacion:lentas'
+    _locales = deque()
+    
+    @classmethod
+    def guardar(cls, muestra):
+        tamano = settings.INSTRUMENTACION_BUFFER
+        r = get_redis()
+        if r is not None:
+            try:
+                r.pipeline().lpush(cls.CLAVE, json.dumps(muestra)).ltrim(cls.CLAVE, 0, tamano - 1).execute()
+                return
+            except RedisError as e:
+                logger.warning(f'⚠️  Redis no disponible, muestra en memoria: {str(e)}')
+        
+        cls._locales.appendleft(muestra)
+        while len(cls._locales) > tamano:
+            cls._locales.pop()
+    
+    @classmethod
+    def listar(cls, limite=50):
+        """Las `limite` muestras más recientes primero"""
+        r = get_redis()
+        if r is not None:
+            try:
+                return [json.loads(muestra) for muestra in r.lrange(cls.CLAVE, 0, limite - 1)]
+            except RedisError as e:
+                logger.warning(f'⚠️  Redis no disponible, muestras en memoria: {str(e)}')
+        return list(cls._locales)[:limite]
+    
+    @classmethod
+    def limpiar(cls):
+        cls._locales.clear()
+        r = get_redis()
+        if r is not None:
+            try:
+                r.delete(cls.CLAVE)
+            except RedisError:
+                pass
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🧪 PRESUPUESTOS DE CONSULTAS (tests)
+# ═══════════════════════════════════════════════════════════════════════════════
+
+class PresupuestoExcedido(AssertionError):
+    pass
+
+
+@contextmanager
+def presupuesto_consultas(consultas, repeticiones=None):
+    """
+    Falla si el bloque lanza más de `consultas` consultas o si alguna huella
+    se ejecuta más de `repeticiones` veces (por defecto no se comprueba).
+    
+    El mensaje incluye las huellas repetidas para localizar el N+1.
+    """
+    with medir() as medicion:
+        yield medicion
+    
+    duplicadas = medicion.repetidas()
+    errores = []
+    if medicion.consultas > consultas:
+        errores.append(f'{medicion.consultas} consultas (presupuesto: {consultas})')
+    if repeticiones is not None and any(veces > repeticiones for veces in duplicadas.values()):
+        errores.append(f'consultas ejecutadas más de {repeticiones} veces (N+1)')
+    if errores:
+        detalle = '\n'.join(f'  {veces}x {sql}' for sql, veces in duplicadas.items())
+        raise PresupuestoExcedido(f'{"; ".join(errores)}\n{detalle}')
@@ -0,0 +1,231 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔐 INTENTOS LOGIN - Pipeline de Login sin Efectos Secundarios Síncronos
+═══════════════════════════════════════════════════════════════════════════════
+
+El login solo hace en la petición lo imprescindible:
+1. Bloqueo por IP/usuario → UN get_many en caché (contadores de fallos)
+2. Resolver usuario       → UNA consulta Q(email)|Q(username)
+3. Contraseña             → authenticate() con el username resuelto: UN hash
+                            (también si el usuario no existe), señal
+                            user_login_failed y AUTHENTICATION_BACKENDS
+4. Refresh token          → INSERT de la familia (RefreshToken.crear_token)
+
+La fila LoginAttempt y el log de seguridad/auth se encolan en Celery
+(`registrar_intento_login`). Si el broker no responde se escriben en línea.
+
+Contadores de fallos:
+    login_fallos:ip:<ip>        → fallos recientes de la IP
+    login_fallos:u:<usuario>    → fallos recientes del usuario/email
+    <clave>:ultimo              → epoch del último fallo
+
+Cada fallo renueva la ventana: el bloqueo termina VENTANA segundos después
+del último fallo, igual que LoginAttempt.tiempo_restante_bloqueo. Si la
+caché falla (Redis caído) el bloqueo se calcula con las filas LoginAttempt
+(esta_bloqueado / usuario_esta_bloqueado) y los fallos se escriben en línea
+para que cuenten desde el siguiente intento.
+"""
+
+import time
+from django.conf import settings
+from django.contrib.auth import authenticate
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import Q
+import logging
+
+try:
+    from django_redis.exceptions import ConnectionInterrupted
+    from redis.exceptions import RedisError
+    # El cliente de django_redis envuelve los errores de conexión en ConnectionInterrupted
+    ERRORES_CACHE = (RedisError, ConnectionInterrupted)
+except ImportError:
+    ERRORES_CACHE = (OSError,)
+
+logger = logging.getLogger('security')
+
+
+def _cache_estricta():
+    """
+    La caché 'default' sin IGNORE_EXCEPTIONS.
+    
+    Con django_redis es su cliente (mismas claves y serialización, pero
+    los errores de Redis se propagan); cualquier otro backend, tal cual.
+    """
+    return getattr(cache, 'client', cache)
+
+
+class IntentosLogin:
+    """
+    Contadores de fallos de login en caché + registro diferido de intentos
+    """
+    
+    PREFIJO = 'login_fallos:'
+    MAX_INTENTOS = 5
+    VENTANA = 60  # segundos
+    
+    @classmethod
+    def _claves(cls, ip_address, username):
+        claves = [f'{cls.PREFIJO}ip:{ip_address}']
+        if username:
+            claves.append(f'{cls.PREFIJO}u:{username.lower()}')
+        return claves
+    
+    @classmethod
+    def tiempo_restante_bloqueo(cls, ip_address, username=None):
+        """
+        Segundos de bloqueo restantes para la IP o el usuario (0 = libre).
+        
+        Un solo round-trip a la caché; si falla, desde LoginAttempt.
+        """
+        claves = cls._claves(ip_address, username)
+        try:
+            valores = _cache_estricta().get_many(claves + [f'{c}:ultimo' for c in claves])
+        except ERRORES_CACHE as e:
+            logger.warning(f'[LOGIN_CACHE_ERROR] Bloqueo calculado desde LoginAttempt: {str(e)}')
+            return cls.tiempo_restante_bloqueo_bd(ip_address, username)
+        
+        ahora = time.time()
+        restante = 0
+        for clave in claves:
+            if (valores.get(clave) or 0) >= cls.MAX_INTENTOS:
+                ultimo = valores.get(f'{clave}:ultimo') or ahora
+                restante = max(restante, int(cls.VENTANA - (ahora - ultimo)))
+        return max(0, restante)
+    
+    @classmethod
+    def tiempo_restante_bloqueo_bd(cls, ip_address, username=None):
+        """Mismo bloqueo con las filas LoginAttempt (caché no disponible)"""
+        from api.models import LoginAttempt
+        
+        minutos = cls.VENTANA // 60
+        restante = 0
+        if LoginAttempt.esta_bloqueado(ip_address, attempt_type='login',
+                                       max_intentos=cls.MAX_INTENTOS, minutos=minutos):
+            restante = LoginAttempt.tiempo_restante_bloqueo(ip_address, attempt_type='login', minutos=minutos)
+        if username and LoginAttempt.usuario_esta_bloqueado(username, attempt_type='login',
+                                                            max_intentos=cls.MAX_INTENTOS, minutos=minutos):
+            restante = max(restante, LoginAttempt.tiempo_restante_bloqueo_usuario(
+                username, attempt_type='login', minutos=minutos
+            ))
+        return restante
+    
+    @classmethod
+    def registrar_fallo(cls, ip_address, username=None):
+        """
+        Incrementa los contadores de la IP y del usuario.
+        
+        Returns:
+            False si la caché falló: el bloqueo sale entonces de LoginAttempt
+        """
+        cliente = _cache_estricta()
+        claves = cls._claves(ip_address, username)
+        try:
+            for clave in claves:
+                cliente.add(clave, 0, cls.VENTANA)
+                try:
+                    cliente.incr(clave)
+                except ValueError:
+                    cliente.set(clave, 1, cls.VENTANA)
+                cliente.touch(clave, cls.VENTANA)
+            cliente.set_many({f'{c}:ultimo': time.time() for c in claves}, cls.VENTANA)
+        except ERRORES_CACHE as e:
+            logger.warning(f'[LOGIN_CACHE_ERROR] Fallo no contado en caché: {str(e)}')
+            return False
+        return True
+    
+    @staticmethod
+    def resolver_usernames(username_or_email):
+        """
+        Usernames que corresponden al valor enviado, en UNA consulta.
+        
+        Primero el del usuario cuyo email coincide y después el del username
+        (mismo orden que el login anterior).
+        """
+        candidatos = list(
+            User.objects.filter(Q(email=username_or_email) | Q(username=username_or_email))
+            .values_list('username', 'email')[:2]
+        )
+        candidatos.sort(key=lambda candidato: candidato[1] != username_or_email)
+        return [username for username, _ in candidatos]
+    
+    @classmethod
+    def autenticar(cls, username_or_email, password, request=None):
+        """
+        Autentica con authenticate() sobre el username resuelto.
+        
+        Pasa por AUTHENTICATION_BACKENDS y emite user_login_failed. Un solo
+        hash salvo que el valor sea el email de un usuario y el username de
+        otro; si no existe, ModelBackend calcula igualmente un hash para no
+        revelarlo por tiempo de respuesta.
+        
+        Returns:
+            User o None
+        """
+        for username in cls.resolver_usernames(username_or_email) or [username_or_email]:
+            usuario = authenticate(request, username=username, password=password)
+            if usuario is not None:
+                return usuario
+        return None
+    
+    @classmethod
+    def registrar(cls, ip_address, username, user_agent=None, usuario=None):
+        """
+        Registra el intento (fila LoginAttempt + log) fuera de la petición.
+        
+        Args:
+            username: Usuario/email tal como se envió
+            usuario: User autenticado (None = intento fallido)
+        
+        Los fallos actualizan los contadores de bloqueo en línea: son los
+        que protegen contra fuerza bruta y no pueden esperar a la cola. Si
+        la caché falla la fila LoginAttempt también se escribe en línea,
+        porque el bloqueo se calcula con ella.
+        """
+        from api.tasks import registrar_intento_login
+        
+        datos = {
+            'ip_address': ip_address,
+            'username': username,
+            'success': usuario is not None,
+            'user_agent': user_agent,
+        }
+        contado = True
+        if usuario is None:
+            contado = cls.registrar_fallo(ip_address, username)
+        else:
+            datos.update({
+                'cuenta': usuario.username,
+                'email': usuario.email,
+                'rol': usuario.profile.rol if hasattr(usuario, 'profile') else 'cliente',
+            })
+        
+        if contado and getattr(settings, 'LOGIN_INTENTOS_ASINCRONOS', True):
+            try:
+                registrar_intento_login.delay(**datos)
+                return
+            except Exception as e:
+                logger.warning(f'[LOGIN_QUEUE_ERROR] Registrando intento en línea: {str(e)}')
+        cls.procesar(**datos)
+    
+    @staticmethod
+    def procesar(ip_address, username, success, user_agent=None, cuenta=None, email=None, rol=None):
+        """Escribe la fila LoginAttempt y el log de auth/seguridad"""
+        from api.models import LoginAttempt
+        
+        LoginAttempt.registrar_intento(
+            ip_address=ip_address,
+            username=username,
+            attempt_type='login',
+            success=success,
+            user_agent=user_agent
+        )
+        
+        if success:
+            logging.getLogger('auth').info(
+                f'[LOGIN_SUCCESS] Usuario: {cuenta} | Email: {email} | IP: {ip_address} | Rol: {rol}'
+            )
+        else:
+            logger.warning(
+                f'[LOGIN_FAILED] Usuario: {username} | IP: {ip_address} | Razón: Credenciales inválidas'
+            )
@@ -0,0 +1,196 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+📑 PAGINACIÓN - Keyset + Conteo Estimado para Tablas Grandes
+═══════════════════════════════════════════════════════════════════════════════
+
+PageNumberPagination hace OFFSET (la página 20.000 lee y descarta 1M filas)
+y un COUNT(*) exacto en cada petición. En listados de administración sobre
+tablas grandes se usa en su lugar:
+
+- KeysetPagination: cursor opaco sobre una columna única e indexada
+  (WHERE id < último_id ORDER BY id DESC LIMIT n). Coste constante por página.
+- KeysetFechaPagination: cursor sobre (fecha, id) para tablas de eventos
+  ordenadas por fecha: WHERE (fecha, id) < (%s, %s) ORDER BY fecha DESC,
+  id DESC LIMIT n. La comparación de filas usa el índice (fecha, id)
+  directamente (un OR equivalente obliga a recorrer el índice desde el
+  principio).
+- contar_estimado(): total para la UI sin recorrer la tabla
+    · sin filtros → pg_class.reltuples (estadísticas de ANALYZE)
+    · con filtros → filas estimadas por el planner (EXPLAIN), que usa
+      pg_class + pg_statistic y respeta los filtros
+    · si la estimación queda por debajo de UMBRAL_CONTEO_EXACTO se hace el
+      COUNT(*) exacto (es barato y la UI muestra el número real)
+  Fuera de PostgreSQL (tests con SQLite) siempre es exacto.
+"""
+
+import base64
+
+from django.db import connections
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param, remove_query_param
+import logging
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_CONTEO_EXACTO = 10_000
+
+
+def _estimacion_postgres(queryset):
+    """Filas estimadas por PostgreSQL (sin ejecutar la consulta)"""
+    with connections[queryset.db].cursor() as cursor:
+        if not queryset.query.where:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table]
+            )
+            fila = cursor.fetchone()
+            return max(0, fila[0]) if fila else 0
+        
+        sql, params = queryset.order_by().values('pk').query.sql_with_params()
+        cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+        plan = cursor.fetchone()[0]
+        return int(plan[0]['Plan']['Plan Rows'])
+
+
+def contar_estimado(queryset, umbral=UMBRAL_CONTEO_EXACTO):
+    """
+    Total de filas del queryset, exacto si es pequeño o estimado si no.
+    
+    Returns:
+        tuple: (total, es_estimado)
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.count(), False
+    
+    try:
+        estimado = _estimacion_postgres(queryset)
+    except Exception as e:
+        logger.warning(f'[CONTEO_ESTIMADO_ERROR] Se usa COUNT exacto: {str(e)}')
+        return queryset.count(), False
+    
+    # reltuples = -1 (tabla sin ANALYZE) o pocas filas → exacto
+    if estimado < umbral:
+        return queryset.count(), False
+    return estimado, True
+
+
+class KeysetPagination(CursorPagination):
+    """
+    Paginación por cursor (keyset) con total estimado.
+    
+    Respuesta: {next, previous, count, count_estimado, results}
+    `ordering` debe ser una columna única e indexada (por defecto -id).
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-id'
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.total, self.total_estimado = contar_estimado(queryset)
+        return super().paginate_queryset(queryset, request, view)
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'count': self.total,
+            'count_estimado': self.total_estimado,
+            'results': data,
+        })
+
+
+class KeysetFechaPagination(BasePagination):
+    """
+    Paginación keyset por (campo_fecha, id) descendente con total estimado.
+    
+    Respuesta: {next, previous, count, count_estimado, results}
+    El cursor codifica la dirección y la última (fecha, id) vista.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    campo_fecha = 'timestamp'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Cursor inválido'
+    
+    def _tamano(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+    
+    def _decodificar(self, cursor):
+        """'cursor' → (hacia_atras, fecha, id) o None"""
+        if not cursor:
+            return None
+        try:
+            direccion, fecha, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+            fecha = parse_datetime(fecha)
+            if direccion not in ('n', 'p') or fecha is None:
+                raise ValueError(cursor)
+            return direccion == 'p', fecha, int(pk)
+        except (TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+    
+    def _enlace(self, fila, hacia_atras):
+        if fila is None:
+            return None
+        valor = f'{"p" if hacia_atras else "n"}|{getattr(fila, self.campo_fecha).isoformat()}|{fila.pk}'
+        return replace_query_param(
+            self.base_url, self.cursor_query_param,
+            base64.urlsafe_b64encode(valor.encode()).decode()
+        )
+    
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        tamano = self._tamano(request)
+        self.total, self.total_estimado = contar_estimado(queryset)
+        cursor = self._decodificar(request.query_params.get(self.cursor_query_param))
+        
+        hacia_atras = bool(cursor and cursor[0])
+        if cursor:
+            conexion = connections[queryset.db]
+            opts = queryset.model._meta
+            tabla = conexion.ops.quote_name(opts.db_table)
+            fecha = f'{tabla}.{conexion.ops.quote_name(opts.get_field(self.campo_fecha).column)}'
+            pk = f'{tabla}.{conexion.ops.quote_name(opts.pk.column)}'
+            queryset = queryset.filter(RawSQL(
+                f'({fecha}, {pk}) {">" if hacia_atras else "<"} (%s, %s)',
+                [conexion.ops.adapt_datetimefield_value(cursor[1]), cursor[2]],
+                output_field=BooleanField()
+            ))
+        
+        if hacia_atras:
+            orden = (self.campo_fecha, 'pk')
+        else:
+            orden = (f'-{self.campo_fecha}', '-pk')
+        filas = list(queryset.order_by(*orden)[:tamano + 1])
+        hay_mas = len(filas) > tamano
+        filas = filas[:tamano]
+        if hacia_atras:
+            filas.reverse()
+        
+        primera = filas[0] if filas else None
+        ultima = filas[-1] if filas else None
+        self.siguiente = ultima if (hay_mas or hacia_atras) else None
+        self.anterior = primera if ((cursor and not hacia_atras) or (hacia_atras and hay_mas)) else None
+        return filas
+    
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self._enlace(self.siguiente, False),
+            'previous': self._enlace(self.anterior, True),
+            'count': self.total,
+            'count_estimado': self.total_estimado,
+            'results': data,
+        })
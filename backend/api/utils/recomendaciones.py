@@ -0,0 +1,226 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🧮 RECOMENDACIONES - Índice de Co-compra con Matrices Dispersas
+═══════════════════════════════════════════════════════════════════════════════
+
+Construye la matriz producto×producto de pedidos en común a partir de
+DetallePedido y calcula el top-K de similares por producto (coseno).
+
+Matemática (sin bucles anidados en Python):
+- X: matriz pedidos×productos binaria (CSR)      → 1 si el pedido contiene el producto
+- C = Xᵀ·X                                       → C[i, j] = pedidos con i y j
+- diag(C) = n_i                                  → pedidos que contienen i
+- sim(i, j) = C[i, j] / sqrt(n_i · n_j)          → coseno
+- top-K por fila con np.argpartition sobre los datos CSR de la fila
+
+Incremental:
+- IndiceCoCompra guarda C (npz) y la marca de agua `ultimo_pedido_id`
+- Cada ejecución solo lee pedidos nuevos, en bloques de pedidos (memoria
+  acotada), suma su ΔC y recalcula el top-K de las filas tocadas
+- Los pedidos cancelados después de procesarse y la deriva de normalización
+  de filas no tocadas se corrigen con la reconstrucción completa (--completo)
+
+Dependencias: numpy, scipy (solo el job; la API lee la tabla ya calculada).
+"""
+
+import io
+import time
+from datetime import timedelta
+
+import numpy as np
+from scipy import sparse
+from django.db import transaction
+from django.db.models import Max, Min
+from django.utils import timezone
+import logging
+
+logger = logging.getLogger('cache_manager')
+
+TOP_K = 12
+PEDIDOS_POR_BLOQUE = 20000
+# Pedidos más recientes que esto pueden estar creándose todavía
+MARGEN_PEDIDOS_EN_CURSO = timedelta(minutes=5)
+
+
+def matriz_coocurrencia(pedido_ids, producto_ids, dimension):
+    """
+    C = Xᵀ·X a partir de líneas (pedido_id, producto_id).
+    
+    Args:
+        pedido_ids: np.ndarray de IDs de pedido (uno por línea)
+        producto_ids: np.ndarray de IDs de producto (uno por línea)
+        dimension: Tamaño de la matriz (máx. producto_id + 1)
+    
+    Returns:
+        scipy.sparse.csr_matrix (dimension × dimension, int32)
+    """
+    if len(pedido_ids) == 0:
+        return sparse.csr_matrix((dimension, dimension), dtype=np.int32)
+    
+    _, filas = np.unique(pedido_ids, return_inverse=True)
+    X = sparse.csr_matrix(
+        (np.ones(len(filas), dtype=np.int32), (filas, producto_ids)),
+        shape=(int(filas.max()) + 1, dimension)
+    )
+    # Mismo producto dos veces en un pedido cuenta una sola vez
+    X.sum_duplicates()
+    X.data[:] = 1
+    return (X.T @ X).tocsr()
+
+
+def top_k_similares(C, filas, k=TOP_K):
+    """
+    Top-K por coseno para las filas indicadas.
+    
+    Returns:
+        dict: {producto_id: (ids np.ndarray, puntuaciones np.ndarray)}
+    """
+    filas = np.asarray(filas, dtype=np.int64)
+    if len(filas) == 0:
+        return {}
+    
+    norma = np.sqrt(C.diagonal().astype(np.float64))
+    inversa = np.divide(1.0, norma, out=np.zeros_like(norma), where=norma > 0)
+    
+    # S = D⁻¹ᐟ² · C[filas] · D⁻¹ᐟ²
+    S = (sparse.diags(inversa[filas]) @ C[filas] @ sparse.diags(inversa)).tocsr()
+    
+    resultado = {}
+    for pos, producto_id in enumerate(filas):
+        ini, fin = S.indptr[pos], S.indptr[pos + 1]
+        columnas = S.indices[ini:fin]
+        valores = S.data[ini:fin]
+        
+        otros = columnas != producto_id
+        columnas, valores = columnas[otros], valores[otros]
+        
+        if len(valores) > k:
+            seleccion = np.argpartition(-valores, k)[:k]
+            columnas, valores = columnas[seleccion], valores[seleccion]
+        orden = np.argsort(-valores, kind='stable')
+        resultado[int(producto_id)] = (columnas[orden], valores[orden])
+    
+    return resultado
+
+
+def _serializar(C):
+    buffer = io.BytesIO()
+    sparse.save_npz(buffer, C, compressed=True)
+    return buffer.getvalue()
+
+
+def _deserializar(datos):
+    return sparse.load_npz(io.BytesIO(bytes(datos))).tocsr()
+
+
+def _lineas(desde_pedido, hasta_pedido):
+    """Líneas (pedido_id, producto_id) de un rango de pedidos como arrays"""
+    from api.models import DetallePedido
+    
+    filas = np.array(
+        DetallePedido.objects.filter(
+            pedido_id__gt=desde_pedido,
+            pedido_id__lte=hasta_pedido
+        ).exclude(
+            pedido__estado='cancelado'
+        ).values_list('pedido_id', 'producto_id'),
+        dtype=np.int64
+    ).reshape(-1, 2)
+    return filas[:, 0], filas[:, 1]
+
+
+def actualizar_indice(completo=False):
+    """
+    Incorpora los pedidos nuevos a la matriz y recalcula el top-K afectado.
+    
+    Args:
+        completo: Reconstruir desde cero (corrige cancelaciones posteriores)
+    
+    Returns:
+        dict: Resumen de la ejecución
+    """
+    from api.models import Pedido, Producto, IndiceCoCompra, RecomendacionProducto
+    
+    inicio = time.perf_counter()
+    indice = IndiceCoCompra.obtener()
+    completo = completo or not indice.matriz
+    dimension = (Producto.objects.aggregate(m=Max('id'))['m'] or 0) + 1
+    
+    desde = 0 if completo else indice.ultimo_pedido_id
+    rango = Pedido.objects.filter(
+        id__gt=desde,
+        created_at__lt=timezone.now() - MARGEN_PEDIDOS_EN_CURSO
+    ).aggregate(minimo=Min('id'), maximo=Max('id'))
+    
+    if rango['maximo'] is None and not completo:
+        return {'lineas': 0, 'productos_actualizados': 0, 'segundos': 0.0}
+    
+    if completo:
+        C = sparse.csr_matrix((dimension, dimension), dtype=np.int32)
+        lineas_previas = 0
+    else:
+        C = _deserializar(indice.matriz)
+        dimension = max(dimension, C.shape[0])
+        C.resize((dimension, dimension))
+        lineas_previas = indice.lineas_procesadas
+    
+    # Acumular ΔC por bloques de pedidos (memoria acotada)
+    delta = sparse.csr_matrix((dimension, dimension), dtype=np.int32)
+    lineas = 0
+    actual = (rango['minimo'] or 1) - 1
+    while actual < (rango['maximo'] or 0):
+        hasta = min(actual + PEDIDOS_POR_BLOQUE, rango['maximo'])
+        pedidos, productos = _lineas(actual, hasta)
+        if len(pedidos):
+            delta = delta + matriz_coocurrencia(pedidos, productos, dimension)
+            lineas += len(pedidos)
+        actual = hasta
+    
+    C = (C + delta).tocsr()
+    if completo:
+        afectados = np.flatnonzero(C.diagonal())
+    else:
+        afectados = np.flatnonzero(np.diff(delta.indptr))
+    similares = top_k_similares(C, afectados)
+    
+    with transaction.atomic():
+        if completo:
+            RecomendacionProducto.objects.all().delete()
+        _guardar_recomendaciones(similares)
+        
+        indice.matriz = _serializar(C)
+        indice.ultimo_pedido_id = rango['maximo'] or indice.ultimo_pedido_id
+        indice.lineas_procesadas = lineas_previas + lineas
+        indice.save()
+    
+    segundos = time.perf_counter() - inicio
+    logger.info(
+        f'🧮 Índice co-compra: {lineas} líneas, {len(similares)} productos, {segundos:.2f}s'
+    )
+    return {
+        'lineas': lineas,
+        'productos_actualizados': len(similares),
+        'segundos': round(segundos, 3),
+    }
+
+
+def _guardar_recomendaciones(similares, lote=1000):
+    from api.models import Producto, RecomendacionProducto
+    
+    existentes = set(Producto.objects.values_list('id', flat=True))
+    filas = [
+        RecomendacionProducto(
+            producto_id=producto_id,
+            recomendados=[int(i) for i in ids],
+            puntuaciones=[round(float(p), 4) for p in puntuaciones],
+        )
+        for producto_id, (ids, puntuaciones) in similares.items()
+        if producto_id in existentes
+    ]
+    RecomendacionProducto.objects.bulk_create(
+        filas,
+        batch_size=lote,
+        update_conflicts=True,
+        unique_fields=['producto'],
+        update_fields=['recomendados', 'puntuaciones', 'updated_at'],
+    )
@@ -0,0 +1,89 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔌 REDIS ASYNC - Lecturas de caché sin bloquear el event loop
+═══════════════════════════════════════════════════════════════════════════════
+
+Las vistas async (api/views_async.py) leen la caché de Django (stock,
+relacionados) con redis.asyncio en vez de con el cliente síncrono de
+django_redis, que bloquearía el event loop en cada round-trip.
+
+- Misma clave y mismo formato que django_redis: cache.client.make_key() y
+  cache.client.decode() (enteros en claro, el resto pickle)
+- Un cliente por event loop (sus conexiones no se pueden compartir entre loops)
+- Redis caído → se trata como fallo de caché (igual que IGNORE_EXCEPTIONS)
+- Backend que no es django_redis (tests con LocMemCache) → cache.aget_many()
+
+Solo lecturas: las escrituras siguen usando la caché de Django.
+"""
+
+import asyncio
+import logging
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache, caches
+
+try:
+    from django_redis.cache import RedisCache
+    from redis import asyncio as redis_asyncio
+    from redis.exceptions import RedisError
+except ImportError:
+    redis_asyncio = None
+
+logger = logging.getLogger('cache_manager')
+
+TIMEOUT = 0.5  # Segundos: un Redis lento no debe retener la petición
+
+_clientes = weakref.WeakKeyDictionary()
+
+
+def obtener_cliente():
+    """Cliente redis.asyncio del loop actual, o None si la caché no es Redis"""
+    if redis_asyncio is None or not isinstance(caches['default'], RedisCache):
+        return None
+    
+    configuracion = settings.CACHES['default']
+    
+    loop = asyncio.get_running_loop()
+    cliente = _clientes.get(loop)
+    if cliente is None:
+        location = configuracion['LOCATION']
+        if not isinstance(location, str):
+            location = location[0]
+        cliente = redis_asyncio.Redis.from_url(
+            location.split(',')[0], socket_timeout=TIMEOUT, socket_connect_timeout=TIMEOUT
+        )
+        _clientes[loop] = cliente
+    return cliente
+
+
+async def aget_many(claves):
+    """
+    Equivalente async de cache.get_many(claves).
+    
+    Returns:
+        dict: {clave: valor} solo con las claves presentes
+    """
+    claves = list(claves)
+    if not claves:
+        return {}
+    
+    cliente = obtener_cliente()
+    if cliente is None:
+        return await cache.aget_many(claves)
+    
+    try:
+        valores = await cliente.mget([cache.client.make_key(clave) for clave in claves])
+    except (RedisError, OSError) as e:
+        logger.warning(f'⚠️  Redis async no disponible, usando fallback a BD: {str(e)}')
+        return {}
+    
+    return {
+        clave: cache.client.decode(valor)
+        for clave, valor in zip(claves, valores)
+        if valor is not None
+    }
+
+
+async def aget(clave, default=None):
+    return (await aget_many([clave])).get(clave, default)
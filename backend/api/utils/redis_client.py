@@ -0,0 +1,34 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔌 REDIS CLIENT - Acceso Directo a Redis (estructuras nativas)
+═══════════════════════════════════════════════════════════════════════════════
+
+La API de caché de Django solo expone clave → valor. Para SET, ZSET, HASH y
+scripts Lua se usa la conexión cruda del alias 'default' de django_redis.
+
+Si el backend de caché no es Redis (tests con LocMemCache) get_redis() retorna
+None. Si Redis cae, los comandos lanzan redis.exceptions.RedisError: el
+llamador debe capturarla y usar su fallback a BD (igual que IGNORE_EXCEPTIONS).
+"""
+
+import logging
+
+logger = logging.getLogger('cache_manager')
+
+
+def get_redis():
+    """
+    Retorna el cliente redis-py del caché 'default' o None si no hay Redis.
+    
+    No hace PING: la conexión se valida con el primer comando real para no
+    añadir un round-trip a cada petición.
+    """
+    try:
+        from django_redis import get_redis_connection
+        return get_redis_connection('default')
+    except NotImplementedError:
+        # Backend de caché que no es django_redis (LocMemCache, DummyCache)
+        return None
+    except Exception as e:
+        logger.warning(f'⚠️  Redis no disponible, usando fallback a BD: {str(e)}')
+        return None
@@ -0,0 +1,221 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔗 PRODUCTOS RELACIONADOS - Vecinos Precalculados por Producto
+═══════════════════════════════════════════════════════════════════════════════
+
+El detalle de producto es la segunda ruta pública más visitada. En lugar de
+consultar "misma categoría, últimos 10" y serializar productos completos en
+cada visita, un job periódico precalcula la lista de vecinos de cada producto
+y la guarda en caché como un array compacto de IDs.
+
+Puntuación de un vecino:
+- Comprados juntos (DetallePedido, pedidos no cancelados) → peso 3 por pedido
+- Favoritos en común (Favorito, mismo usuario)             → peso 2 por usuario
+- Misma categoría                                          → peso 1
+Empates → el más reciente primero.
+
+El precálculo va por lotes de LOTE productos: los conteos de pares se
+agregan en SQL solo para los productos del lote, así la memoria no crece
+con el número total de pares del catálogo.
+
+Lectura: cache.get(ids) → UNA consulta `id__in` con la proyección de tarjeta.
+Si la clave no existe se usa "misma categoría, más recientes" (solo IDs) y se
+guarda con TTL corto hasta el próximo job.
+"""
+
+from collections import defaultdict
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connection
+from . import redis_async
+import logging
+
+logger = logging.getLogger('cache_manager')
+
+
+class ProductosRelacionados:
+    """
+    Motor de productos relacionados (precálculo + lectura)
+    """
+    
+    PREFIJO = 'relacionados:'
+    LIMITE = 10
+    TTL = 60 * 60 * 3       # 3 horas - el job corre cada hora
+    TTL_FALLBACK = 60 * 10  # 10 minutos
+    LOTE = 200              # Productos por lote de precálculo
+    
+    PESO_COMPRA = 3
+    PESO_FAVORITO = 2
+    PESO_CATEGORIA = 1
+    
+    @classmethod
+    def clave(cls, producto_id):
+        return f'{cls.PREFIJO}{producto_id}'
+    
+    @staticmethod
+    def _pares(sql, params=()):
+        """Ejecuta un self-join agregado y retorna {a: {b: conteo}}"""
+        pares = defaultdict(dict)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for a, b, conteo in cursor:
+                pares[a][b] = conteo
+        return pares
+    
+    @classmethod
+    def _co_compras(cls, producto_ids):
+        """{a: {b: pedidos}} solo para los productos `a` de producto_ids"""
+        from api.models import Pedido, DetallePedido
+        
+        detalles = DetallePedido._meta.db_table
+        pedidos = Pedido._meta.db_table
+        return cls._pares(
+            f"""
+            SELECT a.producto_id, b.producto_id, COUNT(DISTINCT a.pedido_id)
+            FROM {detalles} a
+            JOIN {detalles} b ON b.pedido_id = a.pedido_id AND b.producto_id <> a.producto_id
+            JOIN {pedidos} p ON p.id = a.pedido_id
+            WHERE p.estado <> %s AND a.producto_id IN ({', '.join(['%s'] * len(producto_ids))})
+            GROUP BY a.producto_id, b.producto_id
+            """,
+            ['cancelado', *producto_ids]
+        )
+    
+    @classmethod
+    def _co_favoritos(cls, producto_ids):
+        """{a: {b: usuarios}} solo para los productos `a` de producto_ids"""
+        from api.models import Favorito
+        
+        favoritos = Favorito._meta.db_table
+        return cls._pares(
+            f"""
+            SELECT a.producto_id, b.producto_id, COUNT(*)
+            FROM {favoritos} a
+            JOIN {favoritos} b ON b.usuario_id = a.usuario_id AND b.producto_id <> a.producto_id
+            WHERE a.producto_id IN ({', '.join(['%s'] * len(producto_ids))})
+            GROUP BY a.producto_id, b.producto_id
+            """,
+            producto_ids
+        )
+    
+    @classmethod
+    def precalcular(cls):
+        """
+        Recalcula y publica los vecinos de todos los productos activos.
+        
+        Returns:
+            int: Número de productos procesados
+        """
+        from api.models import Producto
+        
+        # (id, categoria) ordenados por recencia: el orden sirve de desempate
+        productos = list(
+            Producto.objects.filter(activo=True)
+            .order_by('-created_at', '-id')
+            .values_list('id', 'categoria')
+        )
+        recencia = {pid: i for i, (pid, _) in enumerate(productos)}
+        categoria_de = dict(productos)
+        
+        por_categoria = defaultdict(list)
+        for pid, categoria in productos:
+            por_categoria[categoria].append(pid)
+        
+        total = 0
+        for inicio in range(0, len(productos), cls.LOTE):
+            lote = productos[inicio:inicio + cls.LOTE]
+            valores = cls._vecinos(lote, recencia, categoria_de, por_categoria)
+            cache.set_many(valores, cls.TTL)
+            total += len(valores)
+        
+        logger.info(f'💾 Relacionados precalculados: {total} productos')
+        return total
+    
+    @classmethod
+    def _vecinos(cls, lote, recencia, categoria_de, por_categoria):
+        """{clave: [ids]} de los productos del lote"""
+        ids = [pid for pid, _ in lote]
+        co_compras = cls._co_compras(ids)
+        co_favoritos = cls._co_favoritos(ids)
+        
+        valores = {}
+        for pid, categoria in lote:
+            puntos = defaultdict(int)
+            for vecino, n in co_compras.get(pid, {}).items():
+                puntos[vecino] += cls.PESO_COMPRA * n
+            for vecino, n in co_favoritos.get(pid, {}).items():
+                puntos[vecino] += cls.PESO_FAVORITO * n
+            
+            # Categoría: basta con los LIMITE más recientes como candidatos extra
+            for vecino in por_categoria[categoria][:cls.LIMITE + 1]:
+                if vecino != pid:
+                    puntos.setdefault(vecino, 0)
+            for vecino in puntos:
+                if categoria_de.get(vecino) == categoria:
+                    puntos[vecino] += cls.PESO_CATEGORIA
+            
+            candidatos = [v for v in puntos if v in recencia]
+            candidatos.sort(key=lambda v: (-puntos[v], recencia[v]))
+            valores[cls.clave(pid)] = candidatos[:cls.LIMITE]
+        return valores
+    
+    @classmethod
+    def ids(cls, producto):
+        """IDs de productos relacionados (caché o fallback por categoría)"""
+        from api.models import Producto
+        
+        ids = cache.get(cls.clave(producto.id))
+        if ids is not None:
+            return ids
+        
+        ids = list(
+            Producto.objects.filter(categoria=producto.categoria, activo=True)
+            .exclude(id=producto.id)
+            .order_by('-created_at')
+            .values_list('id', flat=True)[:cls.LIMITE]
+        )
+        cache.set(cls.clave(producto.id), ids, cls.TTL_FALLBACK)
+        return ids
+    
+    @classmethod
+    def tarjetas(cls, producto):
+        """
+        Productos relacionados hidratados con la proyección de tarjeta.
+        
+        Una sola consulta `id__in`; se respeta el orden precalculado y se
+        descartan los que ya no estén activos.
+        """
+        return cls.hidratar(cls.ids(producto))
+    
+    @classmethod
+    async def atarjetas(cls, producto):
+        """tarjetas() para vistas async: IDs con el cliente Redis async y aiterator()"""
+        from api.models import Producto
+        from api.serializers import ProductoCardSerializer
+        
+        ids = await redis_async.aget(cls.clave(producto.id))
+        if ids is None:
+            ids = await sync_to_async(cls.ids)(producto)  # Fallback por categoría (y lo guarda)
+        if not ids:
+            return []
+        
+        por_id = {
+            p.id: p async for p in Producto.objects.filter(id__in=ids, activo=True)
+            .only(*ProductoCardSerializer.CAMPOS).aiterator()
+        }
+        return [por_id[pid] for pid in ids if pid in por_id]
+    
+    @staticmethod
+    def hidratar(ids):
+        """Productos activos de `ids` (proyección de tarjeta), en el mismo orden"""
+        from api.models import Producto
+        from api.serializers import ProductoCardSerializer
+        
+        if not ids:
+            return []
+        
+        por_id = {
+            p.id: p for p in Producto.objects.filter(id__in=ids, activo=True)
+            .only(*ProductoCardSerializer.CAMPOS)
+        }
+        return [por_id[pid] for pid in ids if pid in por_id]
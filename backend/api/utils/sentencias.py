@@ -0,0 +1,115 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+⚡ SENTENCIAS PREPARADAS - Consultas calientes con PREPARE/EXECUTE
+═══════════════════════════════════════════════════════════════════════════════
+
+Las consultas que más se repiten (producto por id, carrito del usuario,
+token en blacklist) se preparan una vez por conexión física y después
+solo se ejecutan: PostgreSQL se ahorra el parseo y la planificación.
+
+Se usan solo donde es seguro:
+- Conexiones del pool de api/db_pool: la sesión (y sus sentencias) es
+  nuestra y sobrevive entre peticiones
+- DB_SENTENCIAS_PREPARADAS=True (desactivar detrás de PgBouncer en modo
+  transaction: la sesión del servidor cambia entre transacciones)
+- psycopg2; psycopg 3 ya prepara solo (OPTIONS['prepare_threshold'])
+En cualquier otro caso se ejecuta el mismo SQL sin preparar.
+
+Se seleccionan columnas explícitas: si una migración cambia la tabla,
+basta reiniciar (o esperar a vida_maxima del pool) para volver a preparar.
+"""
+
+from django.apps import apps
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, router
+from django.db.backends.postgresql.psycopg_any import is_psycopg3
+
+
+class SentenciaPreparada:
+    """
+    SELECT sobre un modelo con parámetros posicionales.
+    
+    Uso:
+        PRODUCTO_POR_ID = SentenciaPreparada('producto_por_id', 'api.Producto', 'id = %s')
+        producto = PRODUCTO_POR_ID.primero(5)
+    """
+    
+    def __init__(self, nombre, modelo, where, columnas=None, limite=None):
+        self.nombre = nombre
+        self.etiqueta_modelo = modelo
+        self.where = where
+        self.columnas = columnas  # None = todos los campos concretos (instancias)
+        self.limite = limite
+        self.parametros = where.count('%s')
+        self._sql = {}  # vendor → SQL con %s
+    
+    @property
+    def modelo(self):
+        return apps.get_model(self.etiqueta_modelo)
+    
+    def filas(self, *params, using=None):
+        """Tuplas de resultado"""
+        alias = using or router.db_for_read(self.modelo) or DEFAULT_DB_ALIAS
+        conexion = connections[alias]
+        
+        with conexion.cursor() as cursor:
+            preparadas = self._preparadas(conexion)
+            if preparadas is None:
+                cursor.execute(self.sql(conexion), params)
+            else:
+                if self.nombre not in preparadas:
+                    cursor.execute(f'PREPARE {self.nombre} AS {self._sql_posicional(conexion)}')
+                    preparadas.add(self.nombre)
+                marcadores = ', '.join(['%s'] * self.parametros)
+                cursor.execute(f'EXECUTE {self.nombre} ({marcadores})', params)
+            return cursor.fetchall()
+    
+    def objetos(self, *params, using=None):
+        """Instancias del modelo (todos los campos concretos)"""
+        modelo = self.modelo
+        alias = using or router.db_for_read(modelo) or DEFAULT_DB_ALIAS
+        campos = [campo.attname for campo in modelo._meta.concrete_fields]
+        return [modelo.from_db(alias, campos, fila) for fila in self.filas(*params, using=alias)]
+    
+    def primero(self, *params, using=None):
+        """Primera instancia o None"""
+        objetos = self.objetos(*params, using=using)
+        return objetos[0] if objetos else None
+    
+    def sql(self, conexion):
+        sql = self._sql.get(conexion.vendor)
+        if sql is None:
+            opts = self.modelo._meta
+            quote = conexion.ops.quote_name
+            columnas = self.columnas or [campo.column for campo in opts.concrete_fields]
+            sql = f'SELECT {", ".join(quote(c) if c.isidentifier() else c for c in columnas)} ' \
+                  f'FROM {quote(opts.db_table)} WHERE {self.where}'
+            if self.limite:
+                sql += f' LIMIT {int(self.limite)}'
+            self._sql[conexion.vendor] = sql
+        return sql
+    
+    def _sql_posicional(self, conexion):
+        """%s → $1, $2... (sintaxis de PREPARE)"""
+        partes = self.sql(conexion).split('%s')
+        return ''.join(f'{parte}${i}' for i, parte in enumerate(partes[:-1], 1)) + partes[-1]
+    
+    @staticmethod
+    def _preparadas(conexion):
+        """Sentencias ya preparadas en la conexión física, o None si no se debe preparar"""
+        if not settings.DB_SENTENCIAS_PREPARADAS or is_psycopg3:
+            return None
+        pool = getattr(conexion, 'pool', None)
+        if pool is None:
+            return None
+        return pool.preparadas(conexion.connection)
+
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🔥 CONSULTAS CALIENTES
+# ═══════════════════════════════════════════════════════════════════════════════
+
+PRODUCTO_POR_ID = SentenciaPreparada('producto_por_id', 'api.Producto', 'id = %s')
+CARRITO_DE_USUARIO = SentenciaPreparada('carrito_de_usuario', 'api.Cart', 'user_id = %s')
+TOKEN_EN_BLACKLIST = SentenciaPreparada('token_en_blacklist', 'api.TokenBlacklist', 'token = %s',
+                                        columnas=['1'], limite=1)
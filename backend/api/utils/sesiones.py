@@ -0,0 +1,319 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🔑 SESIONES - Familias de Refresh Tokens en Redis
+═══════════════════════════════════════════════════════════════════════════════
+
+Cada login crea una FAMILIA de refresh tokens (jti de la fila RefreshToken).
+Cada refresh rota el token dentro de su familia sin tocar Postgres:
+
+    sesion:u:<usuario_id>:f:<jti>   HASH  usuario_id, actual, rotacion, expira,
+                                          ultimo_uso                (TTL = vida)
+    sesion:u:<usuario_id>:familias  SET   claves de familia del usuario
+                                          (TTL = la vida más larga)
+    sesion:t:<sha256(token)>        HASH  familia, estado (activo|rotado),
+                                          rotado_en
+    sesion:p:<sha256(token)>        STRING token vigente en claro
+                                          (TTL = REFRESH_GRACIA_SEGUNDOS)
+    sesion:pendientes               SET   familias con cambios sin volcar a BD
+
+Detección de reutilización: presentar un token ya rotado (estado=rotado)
+revoca la familia completa (robo de token → ambos, atacante y víctima,
+deben volver a iniciar sesión). Excepción: durante REFRESH_GRACIA_SEGUNDOS
+tras su rotación el token se sigue aceptando (dos pestañas que refrescan a
+la vez, o una respuesta perdida por la red) y devuelve el token vigente de
+la familia sin rotarlo: las dos pestañas acaban con el mismo token activo.
+Solo hay un token activo por familia.
+
+Postgres solo se escribe en login, logout y en el volcado periódico
+(write-behind) de `sesion:pendientes`, que actualiza token_hash, expires_at
+y last_used_at de la fila de la familia.
+
+revocar_todos(usuario_id) = borrar las familias de `sesion:u:<id>:familias`
+(sin recorrer el keyspace).
+
+Si Redis no está disponible el llamador usa el flujo clásico en BD.
+"""
+
+import time
+from django.conf import settings
+from .redis_client import get_redis
+import logging
+
+logger = logging.getLogger('security')
+
+CLAVE_PENDIENTES = 'sesion:pendientes'
+
+# Resultados de rotar()
+ROTADO = 1
+DESCONOCIDO = 0
+FAMILIA_REVOCADA = -1
+REUTILIZADO = -2
+EXPIRADO = -3
+SIN_VIGENTE = -4  # En gracia, pero el token vigente ya no está disponible en claro
+
+# El SET de familias del usuario vive tanto como su familia más duradera
+_ALARGAR_FAMILIAS = """
+local function alargar(clave, duracion)
+    if redis.call('TTL', clave) < duracion then
+        redis.call('EXPIRE', clave, duracion)
+    end
+end
+"""
+
+# KEYS: familia, token, familias del usuario
+# ARGV: usuario_id, hash, ahora (epoch), duración (s)
+_CREAR_FAMILIA = """
+local ahora = tonumber(ARGV[3])
+local duracion = tonumber(ARGV[4])
+redis.call('HSET', KEYS[1], 'usuario_id', ARGV[1], 'actual', ARGV[2], 'rotacion', 0,
+           'expira', ahora + duracion, 'ultimo_uso', ahora)
+redis.call('EXPIRE', KEYS[1], duracion)
+redis.call('HSET', KEYS[2], 'familia', KEYS[1], 'estado', 'activo')
+redis.call('EXPIRE', KEYS[2], duracion)
+redis.call('SADD', KEYS[3], KEYS[1])
+alargar(KEYS[3], duracion)
+"""
+
+_REGISTRAR = _ALARGAR_FAMILIAS + _CREAR_FAMILIA
+
+# Igual que _REGISTRAR, pero sin pisar una familia que sigue viva en Redis
+# (su `actual` es más reciente que el token_hash de BD hasta el volcado)
+_REHIDRATAR = _ALARGAR_FAMILIAS + """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return 0
+end
+""" + _CREAR_FAMILIA + """
+return 1
+"""
+
+# KEYS: token presentado, token nuevo, pendientes
+# ARGV: hash nuevo, ahora (epoch), duración (s), gracia (s), token nuevo en claro
+# El token vigente y el SET de familias se derivan de la familia (un solo
+# nodo Redis: no hace falta declararlas en KEYS)
+_ROTAR = _ALARGAR_FAMILIAS + """
+local familia = redis.call('HGET', KEYS[1], 'familia')
+if not familia then
+    return {0}
+end
+if redis.call('EXISTS', familia) == 0 then
+    return {-1}
+end
+local ahora = tonumber(ARGV[2])
+local gracia = tonumber(ARGV[4])
+local en_gracia = false
+if redis.call('HGET', KEYS[1], 'estado') ~= 'activo' then
+    local rotado_en = tonumber(redis.call('HGET', KEYS[1], 'rotado_en') or 0)
+    if ahora - rotado_en > gracia then
+        redis.call('DEL', familia)
+        redis.call('SADD', KEYS[3], familia)
+        return {-2, familia}
+    end
+    en_gracia = true
+end
+if tonumber(redis.call('HGET', familia, 'expira')) < ahora then
+    redis.call('DEL', familia)
+    return {-3}
+end
+if en_gracia then
+    -- Otra petición ya rotó este token: se entrega el vigente sin degradarlo
+    local vigente = redis.call('GET', 'sesion:p:' .. redis.call('HGET', familia, 'actual'))
+    if not vigente then
+        return {-4}
+    end
+    return {1, redis.call('HGET', familia, 'usuario_id'), familia, vigente}
+end
+local duracion = tonumber(ARGV[3])
+local vigente = 'sesion:t:' .. redis.call('HGET', familia, 'actual')
+if redis.call('HGET', vigente, 'estado') == 'activo' then
+    redis.call('HSET', vigente, 'estado', 'rotado', 'rotado_en', ahora)
+end
+redis.call('HSET', KEYS[2], 'familia', familia, 'estado', 'activo')
+redis.call('EXPIRE', KEYS[2], duracion)
+if gracia > 0 then
+    redis.call('SET', 'sesion:p:' .. ARGV[1], ARGV[5], 'EX', gracia)
+end
+redis.call('HINCRBY', familia, 'rotacion', 1)
+redis.call('HSET', familia, 'actual', ARGV[1], 'ultimo_uso', ARGV[2], 'expira', ahora + duracion)
+redis.call('EXPIRE', familia, duracion)
+local usuario_id = redis.call('HGET', familia, 'usuario_id')
+alargar('sesion:u:' .. usuario_id .. ':familias', duracion)
+redis.call('SADD', KEYS[3], familia)
+return {1, usuario_id, familia, ARGV[5]}
+"""
+
+# KEYS: familias del usuario
+_REVOCAR_TODOS = """
+local familias = redis.call('SMEMBERS', KEYS[1])
+local borradas = 0
+for _, familia in ipairs(familias) do
+    borradas = borradas + redis.call('DEL', familia)
+end
+redis.call('DEL', KEYS[1])
+return borradas
+"""
+
+
+def activo():
+    """True si las familias se gestionan en Redis"""
+    return getattr(settings, 'REFRESH_TOKENS_EN_REDIS', True) and get_redis() is not None
+
+
+def clave_familia(usuario_id, jti):
+    return f'sesion:u:{usuario_id}:f:{jti}'
+
+
+def clave_token(token_hash):
+    return f'sesion:t:{token_hash}'
+
+
+def clave_familias(usuario_id):
+    return f'sesion:u:{usuario_id}:familias'
+
+
+def jti_de_familia(familia):
+    return familia.rsplit(':f:', 1)[1]
+
+
+def registrar_familia(usuario_id, jti, token_hash, expires_at):
+    """Publica una familia nueva (login). Errores de Redis se registran y se ignoran."""
+    r = get_redis()
+    if r is None:
+        return
+    ahora = int(time.time())
+    duracion = max(1, int(expires_at.timestamp()) - ahora)
+    try:
+        r.eval(
+            _REGISTRAR, 3,
+            clave_familia(usuario_id, jti), clave_token(token_hash), clave_familias(usuario_id),
+            usuario_id, token_hash, ahora, duracion
+        )
+    except Exception as e:
+        logger.error(f'[SESIONES_ERROR] No se pudo registrar familia en Redis: {str(e)}')
+
+
+def rotar(token_hash, nuevo_hash, nuevo_plano, duracion_segundos):
+    """
+    Rota un token dentro de su familia (atómico, script Lua).
+    
+    Un token rotado hace menos de REFRESH_GRACIA_SEGUNDOS no rota otra vez:
+    retorna el token vigente de la familia (el emitido por la otra petición).
+    
+    Returns:
+        tuple: (resultado, usuario_id, familia, token en claro a entregar)
+    """
+    r = get_redis()
+    respuesta = r.eval(
+        _ROTAR, 3,
+        clave_token(token_hash), clave_token(nuevo_hash), CLAVE_PENDIENTES,
+        nuevo_hash, int(time.time()), int(duracion_segundos),
+        int(getattr(settings, 'REFRESH_GRACIA_SEGUNDOS', 10)), nuevo_plano
+    )
+    resultado = int(respuesta[0])
+    if resultado == ROTADO:
+        return resultado, int(respuesta[1]), respuesta[2].decode(), respuesta[3].decode()
+    if resultado == REUTILIZADO:
+        return resultado, None, respuesta[1].decode(), None
+    return resultado, None, None, None
+
+
+def usuario_de_token(token_hash):
+    """
+    usuario_id dueño de un token activo (sin rotarlo), o None.
+    """
+    r = get_redis()
+    familia = r.hget(clave_token(token_hash), 'familia')
+    if not familia:
+        return None
+    usuario_id = r.hget(familia, 'usuario_id')
+    return int(usuario_id) if usuario_id else None
+
+
+def revocar_todos(usuario_id):
+    """Borra todas las familias del usuario (las de sesion:u:<id>:familias)"""
+    r = get_redis()
+    if r is None:
+        return 0
+    try:
+        return r.eval(_REVOCAR_TODOS, 1, clave_familias(usuario_id))
+    except Exception as e:
+        logger.error(f'[SESIONES_ERROR] No se pudo revocar familias en Redis: {str(e)}')
+        return 0
+
+
+def volcar_pendientes(lote=500):
+    """
+    Write-behind: vuelca a Postgres el estado de las familias modificadas.
+    
+    - Familia viva    → token_hash, expires_at y last_used_at actualizados
+    - Familia borrada → fila revocada (logout, reutilización o expiración)
+    
+    Returns:
+        dict: {'actualizadas': int, 'revocadas': int}
+    """
+    from datetime import datetime, timezone as dt_timezone
+    from django.utils import timezone
+    from api.models import RefreshToken
+    
+    r = get_redis()
+    if r is None:
+        return {'actualizadas': 0, 'revocadas': 0}
+    
+    actualizadas = 0
+    revocadas = 0
+    while True:
+        familias = [f.decode() for f in (r.spop(CLAVE_PENDIENTES, lote) or [])]
+        if not familias:
+            break
+        
+        pipe = r.pipeline(transaction=False)
+        for familia in familias:
+            pipe.hgetall(familia)
+        estados = dict(zip((jti_de_familia(f) for f in familias), pipe.execute()))
+        
+        filas = list(RefreshToken.objects.filter(jti__in=list(estados.keys())))
+        a_actualizar = []
+        a_revocar = []
+        for fila in filas:
+            estado = estados[fila.jti]
+            if not estado:
+                a_revocar.append(fila.pk)
+                continue
+            fila.token_hash = estado[b'actual'].decode()
+            fila.expires_at = datetime.fromtimestamp(int(estado[b'expira']), tz=dt_timezone.utc)
+            fila.last_used_at = datetime.fromtimestamp(int(estado[b'ultimo_uso']), tz=dt_timezone.utc)
+            a_actualizar.append(fila)
+        
+        if a_actualizar:
+            RefreshToken.objects.bulk_update(a_actualizar, ['token_hash', 'expires_at', 'last_used_at'])
+        if a_revocar:
+            RefreshToken.objects.filter(pk__in=a_revocar, revocado=False).update(
+                revocado=True,
+                revocado_at=timezone.now()
+            )
+        actualizadas += len(a_actualizar)
+        revocadas += len(a_revocar)
+    
+    return {'actualizadas': actualizadas, 'revocadas': revocadas}
+
+
+def rehidratar(refresh_token):
+    """
+    Reconstruye en Redis la familia de una fila válida de BD (Redis perdió
+    los datos o la familia es anterior a este sistema).
+    
+    Solo si la clave de la familia no existe: si sigue viva, el token_hash
+    de la fila puede ser anterior al último volcado y no debe pisar `actual`.
+    
+    Returns:
+        bool: True si la familia se reconstruyó
+    """
+    r = get_redis()
+    ahora = int(time.time())
+    duracion = max(1, int(refresh_token.expires_at.timestamp()) - ahora)
+    return bool(r.eval(
+        _REHIDRATAR, 3,
+        clave_familia(refresh_token.usuario_id, refresh_token.jti),
+        clave_token(refresh_token.token_hash),
+        clave_familias(refresh_token.usuario_id),
+        refresh_token.usuario_id, refresh_token.token_hash, ahora, duracion
+    ))
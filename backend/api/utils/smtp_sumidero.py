@@ -0,0 +1,143 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+🕳️ SMTP SUMIDERO - Servidor SMTP Local para Tests y Benchmarks
+═══════════════════════════════════════════════════════════════════════════════
+
+Servidor SMTP mínimo (EHLO/HELO, MAIL, RCPT, DATA, RSET, NOOP, QUIT) que
+acepta todo y guarda los mensajes en memoria. No envía nada a Internet.
+
+`latencia_conexion` simula el coste de abrir una conexión con el proveedor
+real (DNS + TCP + TLS + saludo), que es lo que el pool de api/utils/correo.py
+evita pagar por mensaje. `rechazar` = destinatarios cuyo DATA recibe un 554
+(error permanente de ese mensaje, la conexión sigue sirviendo).
+
+Uso en tests:
+    with SumideroSMTP() as sumidero:
+        settings.CORREO_PROVEEDORES = {'local': sumidero.configuracion()}
+        ...
+        assert len(sumidero.mensajes) == 3
+        assert sumidero.conexiones == 1
+
+Uso manual: `python manage.py smtp_sumidero --puerto 1025`
+"""
+
+import socketserver
+import threading
+import time
+
+
+class _ManejadorSMTP(socketserver.StreamRequestHandler):
+    """Una sesión SMTP (una conexión)"""
+    
+    def responder(self, linea):
+        self.wfile.write(f'{linea}\r\n'.encode())
+    
+    def handle(self):
+        sumidero = self.server.sumidero
+        if sumidero.latencia_conexion:
+            time.sleep(sumidero.latencia_conexion)
+        with sumidero.lock:
+            sumidero.conexiones += 1
+        
+        self.responder('220 sumidero ESMTP')
+        remitente, destinatarios = None, []
+        
+        for crudo in self.rfile:
+            linea = crudo.decode('utf-8', 'replace').rstrip('\r\n')
+            comando = linea[:4].upper()
+            
+            if comando == 'EHLO':
+                self.responder('250-sumidero')
+                self.responder('250 8BITMIME')
+            elif comando == 'HELO':
+                self.responder('250 sumidero')
+            elif comando == 'MAIL':
+                remitente, destinatarios = linea.split(':', 1)[1].strip(), []
+                self.responder('250 OK')
+            elif comando == 'RCPT':
+                destinatarios.append(linea.split(':', 1)[1].strip())
+                self.responder('250 OK')
+            elif comando == 'DATA':
+                self.responder('354 Fin con <CRLF>.<CRLF>')
+                partes = []
+                for dato in self.rfile:
+                    if dato in (b'.\r\n', b'.\n'):
+                        break
+                    partes.append(dato[1:] if dato.startswith(b'..') else dato)
+                if any(d.strip('<>') in sumidero.rechazar for d in destinatarios):
+                    self.responder('554 Mensaje rechazado')
+                else:
+                    with sumidero.lock:
+                        sumidero.mensajes.append((remitente, destinatarios, b''.join(partes)))
+                    self.responder('250 OK')
+                remitente, destinatarios = None, []
+            elif comando == 'RSET':
+                remitente, destinatarios = None, []
+                self.responder('250 OK')
+            elif comando == 'NOOP':
+                self.responder('250 OK')
+            elif comando == 'QUIT':
+                self.responder('221 Adiós')
+                return
+            else:
+                self.responder('502 Comando no implementado')
+
+
+class _ServidorSMTP(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SumideroSMTP:
+    """
+    Servidor SMTP en un hilo de fondo
+    
+    Args:
+        host: Interfaz de escucha
+        puerto: 0 = puerto libre elegido por el sistema
+        latencia_conexion: Segundos de espera antes del saludo 220
+        rechazar: Destinatarios cuyos mensajes se rechazan con 554
+    """
+    
+    def __init__(self, host='127.0.0.1', puerto=0, latencia_conexion=0.0, rechazar=()):
+        self.host = host
+        self.puerto = puerto
+        self.latencia_conexion = latencia_conexion
+        self.rechazar = set(rechazar)
+        self.mensajes = []
+        self.conexiones = 0
+        self.lock = threading.Lock()
+        self._servidor = None
+        self._hilo = None
+    
+    def iniciar(self):
+        self._servidor = _ServidorSMTP((self.host, self.puerto), _ManejadorSMTP)
+        self._servidor.sumidero = self
+        self.puerto = self._servidor.server_address[1]
+        self._hilo = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._hilo.start()
+        return self
+    
+    def detener(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+    
+    def configuracion(self):
+        """kwargs de get_connection() para apuntar el backend SMTP aquí"""
+        return {
+            'backend': 'django.core.mail.backends.smtp.EmailBackend',
+            'host': self.host,
+            'port': self.puerto,
+            'username': '',
+            'password': '',
+            'use_tls': False,
+            'use_ssl': False,
+        }
+    
+    def __enter__(self):
+        return self.iniciar()
+    
+    def __exit__(self, *exc):
+        self.detener()
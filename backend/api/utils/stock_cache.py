@@ -0,0 +1,211 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+📦 STOCK CACHE - Proyección de Stock Disponible en Redis
+═══════════════════════════════════════════════════════════════════════════════
+
+Mantiene en Redis una proyección `stock_disponible` por producto para que las
+páginas de producto (que hacen polling) y el carrito no lean Postgres en cada
+consulta.
+
+Estrategia:
+- Escritura: cada mutación de stock (reservar, liberar, edición admin)
+  publica el valor nuevo (o aplica un delta atómico en modo shards)
+- Lectura: get_many en Redis → los que falten se calculan en UNA consulta a BD
+  y se vuelven a publicar (fallback automático si Redis no está disponible)
+- Deriva: la tarea periódica `reconciliar_stock_cache` compara contra la BD y
+  corrige las claves desviadas; el TTL acota cualquier valor huérfano
+
+⚠️ La proyección es informativa: la reserva real siempre la decide el UPDATE
+condicional de Producto.reservar_stock.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db.models import Sum
+from . import redis_async
+import logging
+
+logger = logging.getLogger('cache_manager')
+
+
+class StockCache:
+    """
+    Proyección de stock disponible por producto (clave → entero)
+    """
+    
+    PREFIJO = 'stock_disponible:'
+    TTL = 600  # 10 minutos - la reconciliación corre cada 5
+    
+    @classmethod
+    def clave(cls, producto_id):
+        return f'{cls.PREFIJO}{producto_id}'
+    
+    @classmethod
+    def publicar(cls, producto_id, disponible):
+        """Escribe el stock disponible exacto de un producto"""
+        cache.set(cls.clave(producto_id), max(0, int(disponible)), cls.TTL)
+    
+    @classmethod
+    def publicar_muchos(cls, valores):
+        """Escribe {producto_id: disponible} en un solo round-trip"""
+        if valores:
+            cache.set_many(
+                {cls.clave(pid): max(0, int(v)) for pid, v in valores.items()},
+                cls.TTL
+            )
+    
+    @classmethod
+    def ajustar(cls, producto_id, delta):
+        """
+        Aplica un delta atómico (INCRBY/DECRBY) sin leer la BD.
+        
+        Si la clave no existe no se crea: la próxima lectura la recalcula.
+        """
+        try:
+            if delta >= 0:
+                cache.incr(cls.clave(producto_id), delta)
+            else:
+                cache.decr(cls.clave(producto_id), -delta)
+        except ValueError:
+            pass
+    
+    @classmethod
+    def invalidar(cls, producto_id):
+        cache.delete(cls.clave(producto_id))
+    
+    @classmethod
+    def obtener(cls, producto_ids):
+        """
+        Stock disponible de varios productos.
+        
+        Args:
+            producto_ids: Iterable de IDs
+        
+        Returns:
+            dict: {producto_id: disponible} (los IDs inexistentes no aparecen)
+        """
+        ids = list(dict.fromkeys(int(pid) for pid in producto_ids))
+        if not ids:
+            return {}
+        
+        en_cache = cache.get_many([cls.clave(pid) for pid in ids])
+        resultado = {}
+        faltantes = []
+        for pid in ids:
+            valor = en_cache.get(cls.clave(pid))
+            if valor is None:
+                faltantes.append(pid)
+            else:
+                resultado[pid] = max(0, int(valor))
+        
+        if faltantes:
+            desde_bd = cls.calcular_desde_bd(faltantes)
+            cls.publicar_muchos(desde_bd)
+            resultado.update(desde_bd)
+        
+        return resultado
+    
+    @classmethod
+    async def aobtener(cls, producto_ids):
+        """
+        obtener() para vistas async: los aciertos se leen con el cliente
+        Redis async; los que falten se calculan en BD (hilo del ORM).
+        """
+        ids = list(dict.fromkeys(int(pid) for pid in producto_ids))
+        if not ids:
+            return {}
+        
+        en_cache = await redis_async.aget_many([cls.clave(pid) for pid in ids])
+        resultado = {}
+        faltantes = []
+        for pid in ids:
+            valor = en_cache.get(cls.clave(pid))
+            if valor is None:
+                faltantes.append(pid)
+            else:
+                resultado[pid] = max(0, int(valor))
+        
+        if faltantes:
+            desde_bd = await sync_to_async(cls.calcular_desde_bd)(faltantes)
+            await sync_to_async(cls.publicar_muchos, thread_sensitive=False)(desde_bd)
+            resultado.update(desde_bd)
+        
+        return resultado
+    
+    @classmethod
+    def obtener_uno(cls, producto_id):
+        """Stock disponible de un producto (None si no existe)"""
+        return cls.obtener([producto_id]).get(int(producto_id))
+    
+    @staticmethod
+    def calcular_desde_bd(producto_ids):
+        """
+        Calcula el stock disponible exacto desde la BD.
+        
+        Una consulta para los productos + una agregada para los shardeados.
+        """
+        from api.models import Producto, StockShard
+        
+        filas = list(Producto.objects.filter(id__in=producto_ids).values_list(
+            'id', 'stock_total', 'stock_reservado', 'stock_vendido', 'num_shards'
+        ))
+        
+        shardeados = [f[0] for f in filas if f[4]]
+        reservado_shards = {}
+        if shardeados:
+            reservado_shards = dict(
+                StockShard.objects.filter(producto_id__in=shardeados)
+                .values('producto_id')
+                .annotate(total=Sum('reservado'))
+                .values_list('producto_id', 'total')
+            )
+        
+        resultado = {}
+        for pid, total, reservado, vendido, num_shards in filas:
+            if num_shards:
+                reservado = reservado_shards.get(pid) or 0
+            resultado[pid] = max(0, total - reservado - vendido)
+        return resultado
+    
+    @classmethod
+    def reconciliar(cls, lote=500):
+        """
+        Corrige la deriva entre Redis y la BD.
+        
+        Solo se reescriben las claves que existen y difieren (las ausentes
+        se rellenan bajo demanda en la próxima lectura).
+        
+        Returns:
+            dict: {'revisados': int, 'corregidos': int}
+        """
+        from api.models import Producto
+        
+        revisados = 0
+        corregidos = 0
+        ids = list(Producto.objects.order_by('id').values_list('id', flat=True))
+        
+        for i in range(0, len(ids), lote):
+            bloque = ids[i:i + lote]
+            en_cache = cache.get_many([cls.clave(pid) for pid in bloque])
+            if not en_cache:
+                continue
+            
+            reales = cls.calcular_desde_bd(bloque)
+            desviados = {}
+            for pid in bloque:
+                valor = en_cache.get(cls.clave(pid))
+                if valor is None:
+                    continue
+                revisados += 1
+                if pid not in reales:
+                    cls.invalidar(pid)
+                    corregidos += 1
+                elif int(valor) != reales[pid]:
+                    desviados[pid] = reales[pid]
+            
+            if desviados:
+                logger.warning(f'⚠️  Deriva de stock corregida en {len(desviados)} productos')
+                cls.publicar_muchos(desviados)
+                corregidos += len(desviados)
+        
+        return {'revisados': revisados, 'corregidos': corregidos}
@@ -2,22 +2,30 @@ from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.exceptions import ValidationError
-from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django.middleware.csrf import get_token
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
+from django.utils import timezone
 from django.core.cache import cache
-from django.db.models import Q
+from django.db.models import Q, Count, prefetch_related_objects
 from django.db import transaction
-from .models import Producto, RefreshToken, LoginAttempt, Cart, CartItem, Favorito
-from .serializers import UserSerializer, ProductoSerializer, CartSerializer, CartItemSerializer
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .models import Producto, RefreshToken, LoginAttempt, Cart, CartItem, Favorito, RecomendacionProducto
+from .serializers import UserSerializer, ProductoSerializer, ProductoCardSerializer, CartSerializer, CartItemSerializer
 from .utils import (
     generar_access_token,
     verificar_access_token,
     obtener_info_request,
 )
+from .utils.stock_cache import StockCache
+from .utils.favoritos_cache import FavoritosCache
+from .utils.relacionados import ProductosRelacionados
+from .utils.cache_http import Ambito, cache_publica
+from .utils.intentos_login import IntentosLogin
 from .cart_utils import check_rate_limit, log_cart_action
+from .db_router import solo_lectura
 from .throttles import CartWriteRateThrottle, CheckoutRateThrottle, AnonLoginRateThrottle  # ✅ Importar throttles
 import logging
 
@@ -197,19 +205,9 @@ def login(request):
     info_request = obtener_info_request(request)
     ip_address = info_request['ip_address']
     
-    # Verificar rate limiting por IP (5 intentos en 1 minuto)
-    if LoginAttempt.esta_bloqueado(ip_address, attempt_type='login', max_intentos=5, minutos=1):
-        tiempo_restante = LoginAttempt.tiempo_restante_bloqueo(ip_address, attempt_type='login', minutos=1)
-        return Response({
-            'error': 'Demasiados intentos de inicio de sesión',
-            'bloqueado': True,
-            'tiempo_restante': tiempo_restante,
-            'mensaje': f'Has excedido el límite de intentos. Intenta de nuevo en {tiempo_restante} segundos.'
-        }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-    
-    # Verificar rate limiting por usuario (5 intentos en 1 minuto)
-    if username_or_email and LoginAttempt.usuario_esta_bloqueado(username_or_email, attempt_type='login', max_intentos=5, minutos=1):
-        tiempo_restante = LoginAttempt.tiempo_restante_bloqueo_usuario(username_or_email, attempt_type='login', minutos=1)
+    # Bloqueo por IP o usuario (5 fallos en 1 minuto) - contadores en caché
+    tiempo_restante = IntentosLogin.tiempo_restante_bloqueo(ip_address, username_or_email)
+    if tiempo_restante:
         return Response({
             'error': 'Demasiados intentos de inicio de sesión',
             'bloqueado': True,
@@ -223,33 +221,18 @@ def login(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Intentar autenticar por email primero (más común después del reset)
-    user = None
-    try:
-        user_obj = User.objects.get(email=username_or_email)
-        user = authenticate(username=user_obj.username, password=password)
-    except User.DoesNotExist:
-        pass
+    # Una consulta (email o username) y authenticate() con el username resuelto
+    user = IntentosLogin.autenticar(username_or_email, password, request=request)
     
-    # Si falla, intentar por username
-    if not user:
-        user = authenticate(username=username_or_email, password=password)
+    # Fila LoginAttempt y logging de auth/seguridad → cola de Celery
+    IntentosLogin.registrar(
+        ip_address=ip_address,
+        username=username_or_email,
+        user_agent=info_request['user_agent'],
+        usuario=user
+    )
     
     if user:
-        # Registrar intento exitoso
-        LoginAttempt.registrar_intento(
-            ip_address=ip_address,
-            username=username_or_email,
-            attempt_type='login',
-            success=True,
-            user_agent=info_request['user_agent']
-        )
-        
-        # Logging de autenticación exitosa
-        logger_auth.info(
-            f'[LOGIN_SUCCESS] Usuario: {user.username} | Email: {user.email} | IP: {ip_address} | Rol: {user.profile.rol if hasattr(user, "profile") else "cliente"}'
-        )
-        
         # Generar Access Token (JWT - 15 minutos)
         access_token = generar_access_token(user)
         
@@ -292,20 +275,6 @@ def login(request):
         
         return response
     
-    # Registrar intento fallido
-    LoginAttempt.registrar_intento(
-        ip_address=ip_address,
-        username=username_or_email,
-        attempt_type='login',
-        success=False,
-        user_agent=info_request['user_agent']
-    )
-    
-    # Logging de intento fallido
-    logger_security.warning(
-        f'[LOGIN_FAILED] Usuario: {username_or_email} | IP: {ip_address} | Razón: Credenciales inválidas'
-    )
-    
     return Response(
         {'error': 'Credenciales inválidas'},
         status=status.HTTP_401_UNAUTHORIZED
@@ -326,36 +295,35 @@ def refresh_token(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    # Verificar Refresh Token
-    refresh_token_obj = RefreshToken.verificar_token(refresh_token_plano)
+    # Obtener información del request
+    info_request = obtener_info_request(request)
+    
+    # Rotar Refresh Token (2 horas). Con Redis no escribe en BD.
+    usuario_id, nuevo_refresh_token_plano = RefreshToken.rotar_token(
+        refresh_token_plano,
+        duracion_horas=2,
+        user_agent=info_request['user_agent'],
+        ip_address=info_request['ip_address']
+    )
     
-    if not refresh_token_obj:
+    if not usuario_id:
         logger_security.warning('[REFRESH_FAILED] Refresh token inválido o expirado')
         return Response(
             {'error': 'Refresh token inválido o expirado'},
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    # Obtener usuario
-    user = refresh_token_obj.usuario
-    
-    # Obtener información del request
-    info_request = obtener_info_request(request)
+    # Obtener usuario (una query, perfil incluido)
+    user = User.objects.select_related('profile').filter(pk=usuario_id).first()
+    if not user:
+        return Response(
+            {'error': 'Refresh token inválido o expirado'},
+            status=status.HTTP_401_UNAUTHORIZED
+        )
     
     # Generar nuevo Access Token
     access_token = generar_access_token(user)
     
-    # Generar nuevo Refresh Token (rotación de tokens, 2 horas)
-    nuevo_refresh_token_plano, nuevo_refresh_token_obj = RefreshToken.crear_token(
-        usuario=user,
-        duracion_horas=2,
-        user_agent=info_request['user_agent'],
-        ip_address=info_request['ip_address']
-    )
-    
-    # Revocar el Refresh Token anterior
-    refresh_token_obj.revocar()
-    
     # Logging de refresh exitoso
     logger_auth.info(
         f'[TOKEN_REFRESH] Usuario: {user.username} | IP: {info_request["ip_address"]}'
@@ -454,13 +422,13 @@ def logout(request):
     refresh_token_plano = request.COOKIES.get('refreshToken')
     
     if refresh_token_plano:
-        # Verificar y revocar el token
-        refresh_token_obj = RefreshToken.verificar_token(refresh_token_plano)
-        if refresh_token_obj:
+        # Identificar al dueño del token (Redis o BD) y revocar
+        usuario_id = RefreshToken.usuario_id_de_token(refresh_token_plano)
+        if usuario_id:
             # Revocar todos los tokens del usuario (logout global)
-            RefreshToken.revocar_todos_usuario(refresh_token_obj.usuario)
+            RefreshToken.revocar_todos_usuario(User(pk=usuario_id))
             logger_auth.info(
-                f'[REFRESH_TOKENS_REVOKED] Usuario: {refresh_token_obj.usuario.username} | IP: {info_request["ip_address"]}'
+                f'[REFRESH_TOKENS_REVOKED] Usuario ID: {usuario_id} | IP: {info_request["ip_address"]}'
             )
     
     # Crear respuesta
@@ -472,6 +440,22 @@ def logout(request):
     return response
 
 
+def _ambito_carrusel(request):
+    return Ambito(Producto.objects.filter(en_carrusel=True, activo=True), ['carrusel'])
+
+
+def _ambito_productos(request, **kwargs):
+    return Ambito(Producto.objects.all(), ['productos'])
+
+
+def _ambito_producto(request, pk=None, **kwargs):
+    """El producto y sus relacionados (sus tarjetas van en la respuesta)"""
+    if not str(pk).isdigit():
+        return None
+    relacionados = cache.get(ProductosRelacionados.clave(pk)) or []
+    return Ambito(Producto.objects.filter(pk__in=[pk, *relacionados]), [f'producto:{pk}'], tuple(relacionados))
+
+
 class ProductoViewSet(viewsets.ModelViewSet):
     queryset = Producto.objects.all()
     serializer_class = ProductoSerializer
@@ -481,6 +465,16 @@ class ProductoViewSet(viewsets.ModelViewSet):
             return [permissions.IsAuthenticated()]
         return [permissions.AllowAny()]
     
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            # Evita N+1: creado_por.username y favoritos.count() por producto
+            # (con GROUP BY Django ignora Meta.ordering: se repite explícito)
+            queryset = queryset.select_related('creado_por').annotate(
+                favoritos_count_cached=Count('favoritos')
+            ).order_by(*Producto._meta.ordering)
+        return queryset
+    
     def get_serializer_context(self):
         """Agregar contexto para optimizar serialización"""
         context = super().get_serializer_context()
@@ -512,41 +506,82 @@ class ProductoViewSet(viewsets.ModelViewSet):
             headers=headers
         )
     
+    @solo_lectura
+    @cache_publica('productos', _ambito_productos)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    @solo_lectura
+    @cache_publica('producto', _ambito_producto)
     def retrieve(self, request, *args, **kwargs):
         """
         Obtener detalles completos de un producto con productos relacionados
         GET /api/productos/{id}/
+        
+        Relacionados: IDs precalculados en caché (ver utils/relacionados.py)
+        hidratados con la proyección de tarjeta en una sola consulta.
+        El producto se lee con sentencia preparada (Producto.por_id).
+        Caché HTTP: Surrogate-Key del producto y de cada relacionado.
         """
-        producto = self.get_object()
+        producto = Producto.por_id(kwargs[self.lookup_field])
+        if producto is None:
+            raise Http404
+        self.check_object_permissions(request, producto)
         serializer = self.get_serializer(producto)
         
-        # Obtener productos relacionados (misma categoría, máximo 10)
-        productos_relacionados = Producto.objects.filter(
-            categoria=producto.categoria,
-            activo=True
-        ).exclude(
-            id=producto.id
-        ).order_by('-created_at')[:10]
-        
-        # Optimización: No enviar imágenes base64 en productos relacionados
-        productos_relacionados_serializer = ProductoSerializer(
-            productos_relacionados,
+        relacionados = ProductosRelacionados.tarjetas(producto)
+        productos_relacionados_serializer = ProductoCardSerializer(
+            relacionados,
             many=True,
-            context={'is_list': True, 'request': request}
+            context={'request': request}
         )
         
         return Response({
             'producto': serializer.data,
             'productos_relacionados': productos_relacionados_serializer.data
+        }, headers={'Surrogate-Key': ' '.join(f'producto:{p.id}' for p in relacionados)})
+    
+    @action(detail=True, methods=['get'])
+    @solo_lectura
+    def recomendados(self, request, pk=None):
+        """
+        Productos que se compran junto con este (índice de co-compra)
+        GET /api/productos/{id}/recomendados/
+        
+        Lee el top-K precalculado (utils/recomendaciones.py). Si el producto
+        aún no tiene pedidos en común, usa los productos relacionados.
+        Productos inactivos → 404.
+        """
+        producto = get_object_or_404(Producto.objects.filter(activo=True).only('id', 'categoria'), pk=pk)
+        
+        ids = RecomendacionProducto.objects.filter(
+            producto_id=producto.id
+        ).values_list('recomendados', flat=True).first()
+        
+        fuente = 'co_compra'
+        if not ids:
+            ids = ProductosRelacionados.ids(producto)
+            fuente = 'relacionados'
+        
+        serializer = ProductoCardSerializer(
+            ProductosRelacionados.hidratar(ids),
+            many=True,
+            context={'request': request}
+        )
+        return Response({
+            'fuente': fuente,
+            'recomendados': serializer.data
         })
 
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@cache_publica('carrusel', _ambito_carrusel)
 def productos_carrusel(request):
     """
     Obtiene todos los productos marcados para mostrar en el carrusel.
-    SIN CACHÉ - Los productos aparecen inmediatamente después de crearlos.
+    SIN CACHÉ en servidor - Los productos aparecen inmediatamente después de
+    crearlos (caché HTTP con ETag y purga por Surrogate-Key 'carrusel').
     
     OPTIMIZACIONES:
     ✅ select_related('creado_por') - Evita N+1 en usuario
@@ -567,9 +602,11 @@ def productos_carrusel(request):
     ).only(
         # ✅ Solo campos necesarios (reduce tamaño de datos)
         # ⚠️ IMPORTANTE: Incluir 'imagen' para que el serializer pueda acceder a obj.imagen
+        # ⚠️ Y todos los campos del serializer: uno diferido es una consulta por producto
         'id', 'nombre', 'descripcion', 'precio', 'descuento', 'categoria',
         'imagen', 'imagen_url', 'stock_total', 'stock_reservado', 'stock_vendido',
-        'activo', 'en_carrusel', 'creado_por', 'created_at', 'updated_at'
+        'activo', 'en_all_products', 'en_carousel_card', 'en_carrusel',
+        'creado_por', 'created_at', 'updated_at'
     ).order_by('-created_at')
     
     # Pasar contexto para optimizar serialización (no enviar base64 pesados)
@@ -617,10 +654,9 @@ class CartViewSet(viewsets.ViewSet):
     
     def list(self, request):
         """GET /api/carrito/ - Obtener carrito del usuario"""
-        # Optimización: prefetch_related para evitar N+1 queries
-        cart, _ = Cart.objects.prefetch_related(
-            'items__product'
-        ).get_or_create(user=request.user)
+        # Carrito con sentencia preparada + prefetch para evitar N+1 queries
+        cart = Cart.del_usuario(request.user)
+        prefetch_related_objects([cart], 'items__product')
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     
@@ -707,12 +743,13 @@ class CartViewSet(viewsets.ViewSet):
             )
         
         # ✅ VALIDAR STOCK DISPONIBLE (pero NO reservar)
-        # Solo verificamos que haya stock, sin afectar el inventario
-        if product.stock_disponible < quantity:
+        # Solo verificamos que haya stock, sin afectar el inventario (proyección en Redis)
+        disponible = StockCache.obtener_uno(product.id) or 0
+        if disponible < quantity:
             return Response(
                 {
-                    'error': f'Stock insuficiente. Disponible: {product.stock_disponible}',
-                    'available': product.stock_disponible,
+                    'error': f'Stock insuficiente. Disponible: {disponible}',
+                    'available': disponible,
                     'requested': quantity
                 },
                 status=status.HTTP_400_BAD_REQUEST
@@ -736,11 +773,11 @@ class CartViewSet(viewsets.ViewSet):
             new_quantity = item.quantity + quantity
             
             # Validar stock nuevamente
-            if product.stock_disponible < new_quantity:
+            if disponible < new_quantity:
                 return Response(
                     {
-                        'error': f'Stock insuficiente. Disponible: {product.stock_disponible}',
-                        'available': product.stock_disponible,
+                        'error': f'Stock insuficiente. Disponible: {disponible}',
+                        'available': disponible,
                         'requested': new_quantity
                     },
                     status=status.HTTP_400_BAD_REQUEST
@@ -794,7 +831,7 @@ class CartViewSet(viewsets.ViewSet):
             )
         
         try:
-            item = CartItem.objects.get(id=item_id, cart__user=request.user)
+            item = CartItem.objects.select_related('product', 'cart').get(id=item_id, cart__user=request.user)
         except CartItem.DoesNotExist:
             return Response(
                 {'error': 'Item no encontrado'},
@@ -802,9 +839,10 @@ class CartViewSet(viewsets.ViewSet):
             )
         
         # Validar stock
-        if item.product.stock < quantity:
+        disponible = StockCache.obtener_uno(item.product_id) or 0
+        if disponible < quantity:
             return Response(
-                {'error': f'Stock insuficiente. Disponible: {item.product.stock}'},
+                {'error': f'Stock insuficiente. Disponible: {disponible}'},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
@@ -824,7 +862,9 @@ class CartViewSet(viewsets.ViewSet):
             request=request
         )
         
+        # Prefetch para evitar N+1 queries (como en list/agregar)
         cart = item.cart
+        prefetch_related_objects([cart], 'items__product')
         serializer = CartSerializer(cart)
         return Response(serializer.data)
     
@@ -839,8 +879,10 @@ class CartViewSet(viewsets.ViewSet):
         try:
             # RACE CONDITION FIX: Usar transacción atómica con lock
             with transaction.atomic():
-                # select_for_update() previene race conditions
-                item = CartItem.objects.select_for_update().get(id=item_id, cart__user=request.user)
+                # select_for_update() previene race conditions (bloquea solo el item)
+                item = CartItem.objects.select_related('product', 'cart').select_for_update(
+                    of=('self',)
+                ).get(id=item_id, cart__user=request.user)
                 logger.info(f"[Cart DELETE] Item encontrado: id={item.id}, producto={item.product.nombre}, usuario={request.user.username}")
                 
                 # Registrar en auditoría ANTES de eliminar
@@ -860,6 +902,7 @@ class CartViewSet(viewsets.ViewSet):
                 
                 logger.info(f"[Cart DELETE] Item eliminado exitosamente: id={item_id}, usuario={request.user.username}")
                 
+                prefetch_related_objects([cart], 'items__product')
                 serializer = CartSerializer(cart)
                 return Response(serializer.data)
                 
@@ -930,20 +973,22 @@ class CartViewSet(viewsets.ViewSet):
         # ✅ RESERVAR STOCK PARA CADA ITEM
         reservas = []
         errores = []
+        sin_reserva = None  # (producto, cantidad) reservado cuya StockReservation aún no existe
         
         try:
             for item in cart.items.all():
                 producto = item.product
                 cantidad = item.quantity
                 
-                # Verificar stock disponible
-                if producto.stock_disponible < cantidad:
+                # Reservar stock con un UPDATE condicional (fila única o shard)
+                if not producto.reservar_stock(cantidad):
                     errores.append({
                         'producto': producto.nombre,
                         'disponible': producto.stock_disponible,
                         'solicitado': cantidad
                     })
                     continue
+                sin_reserva = (producto, cantidad)
                 
                 # Crear reserva
                 reserva = StockReservation.crear_reserva(
@@ -955,18 +1000,16 @@ class CartViewSet(viewsets.ViewSet):
                     ttl_minutos=15
                 )
                 
-                # Actualizar stock del producto
-                producto.stock_reservado += cantidad
-                producto.save()
-                
                 reservas.append(reserva)
+                sin_reserva = None
         
         except Exception as e:
-            # Si hay error, liberar todas las reservas
+            # Si hay error, liberar todas las reservas (y el item que falló al crear la suya)
+            if sin_reserva is not None:
+                producto, cantidad = sin_reserva
+                producto.liberar_stock(cantidad)
             for reserva in reservas:
-                producto = reserva.producto
-                producto.stock_reservado -= reserva.cantidad
-                producto.save()
+                reserva.producto.liberar_stock(reserva.cantidad)
                 reserva.status = 'cancelled'
                 reserva.cancelled_at = timezone.now()
                 reserva.save()
@@ -979,9 +1022,7 @@ class CartViewSet(viewsets.ViewSet):
         # Si hay errores de stock, liberar todo
         if errores:
             for reserva in reservas:
-                producto = reserva.producto
-                producto.stock_reservado -= reserva.cantidad
-                producto.save()
+                reserva.producto.liberar_stock(reserva.cantidad)
                 reserva.status = 'cancelled'
                 reserva.cancelled_at = timezone.now()
                 reserva.save()
@@ -1050,6 +1091,11 @@ class CartViewSet(viewsets.ViewSet):
             # Obtener o crear carrito del usuario
             cart, _ = Cart.objects.get_or_create(user=request.user)
             
+            # Stock disponible de todos los productos en un solo round-trip
+            disponibles = StockCache.obtener(
+                pid for pid in updates.keys() if str(pid).isdigit()
+            )
+            
             # Procesar cada actualización
             for product_id_str, cantidad in updates.items():
                 try:
@@ -1075,7 +1121,7 @@ class CartViewSet(viewsets.ViewSet):
                         continue
                     
                     # Validar stock disponible
-                    if product.stock_disponible < cantidad:
+                    if disponibles.get(product_id, 0) < cantidad:
                         continue
                     
                     # Actualizar o crear item
@@ -1148,6 +1194,7 @@ def agregar_favorito(request, producto_id):
         usuario=request.user,
         producto=producto
     )
+    FavoritosCache.agregar(request.user.id, producto.id)
     
     if created:
         return Response(
@@ -1185,6 +1232,7 @@ def remover_favorito(request, producto_id):
     try:
         favorito = Favorito.objects.get(usuario=request.user, producto=producto)
         favorito.delete()
+        FavoritosCache.remover(request.user.id, producto.id)
         return Response(
             {
                 'message': 'Producto removido de favoritos',
@@ -1205,23 +1253,25 @@ def es_favorito(request, producto_id):
     """
     Verificar si un producto es favorito del usuario
     GET /api/favoritos/es-favorito/{producto_id}/
+    
+    Una consulta (existencia + conteo anotado) + membresía desde Redis.
     """
-    try:
-        producto = Producto.objects.get(id=producto_id, activo=True)
-    except Producto.DoesNotExist:
+    favoritos_count = Producto.objects.filter(
+        id=producto_id,
+        activo=True
+    ).annotate(
+        total_favoritos=Count('favoritos')
+    ).values_list('total_favoritos', flat=True).first()
+    
+    if favoritos_count is None:
         return Response(
             {'error': 'Producto no encontrado'},
             status=status.HTTP_404_NOT_FOUND
         )
     
-    es_favorito = Favorito.objects.filter(
-        usuario=request.user,
-        producto=producto
-    ).exists()
-    
     return Response({
-        'es_favorito': es_favorito,
-        'favoritos_count': producto.favoritos.count()
+        'es_favorito': FavoritosCache.es_miembro(request.user.id, producto_id),
+        'favoritos_count': favoritos_count
     })
 
 
@@ -1247,14 +1297,15 @@ def verificar_favoritos_batch(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
-    # Obtener todos los favoritos del usuario para estos productos en una sola query
-    favoritos = Favorito.objects.filter(
-        usuario=request.user,
-        producto_id__in=producto_ids
-    ).values_list('producto_id', flat=True)
+    if len(producto_ids) > 200:
+        return Response(
+            {'error': 'Máximo 200 productos por consulta'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
-    # Crear diccionario de respuesta
-    resultado = {str(pid): pid in favoritos for pid in producto_ids}
+    # Membresía de todos los IDs en un solo SMISMEMBER (fallback: una query)
+    flags = FavoritosCache.miembros(request.user.id, producto_ids)
+    resultado = {str(pid): flag for pid, flag in flags.items()}
     
     return Response({'favoritos': resultado})
 
@@ -1274,22 +1325,63 @@ def validar_stock_producto(request, producto_id):
     
     Retorna:
     - disponible: bool - Si el producto está disponible
-    - stock: int - Stock actual
+    - stock: int - Stock disponible (total - reservado - vendido)
     - mensaje: str - Mensaje descriptivo
     """
-    try:
-        producto = Producto.objects.get(id=producto_id)
-        disponible = producto.stock > 0
-        
-        return Response({
-            'disponible': disponible,
-            'stock': producto.stock,
-            'mensaje': 'Producto disponible' if disponible else 'Producto agotado'
-        }, status=status.HTTP_200_OK)
-    except Producto.DoesNotExist:
+    stock = StockCache.obtener_uno(producto_id)
+    if stock is None:
         return Response({
             'error': 'Producto no encontrado'
         }, status=status.HTTP_404_NOT_FOUND)
+    
+    disponible = stock > 0
+    return Response({
+        'disponible': disponible,
+        'stock': stock,
+        'mensaje': 'Producto disponible' if disponible else 'Producto agotado'
+    }, status=status.HTTP_200_OK)
+
+
+@api_view(['GET'])
+@permission_classes([permissions.AllowAny])
+def stock_productos_batch(request):
+    """
+    ═══════════════════════════════════════════════════════════════════════════════
+    📦 ENDPOINT - Stock Disponible en Lote (Polling)
+    ═══════════════════════════════════════════════════════════════════════════════
+    
+    Las páginas de producto hacen polling del stock. Se sirve desde la
+    proyección en Redis: sin lectura a BD salvo para las claves ausentes.
+    
+    GET /api/productos/stock/?ids=1,2,3
+    
+    Retorna:
+    - stock: dict - {id: stock disponible}
+    - no_encontrados: list - IDs que no existen
+    """
+    ids_raw = request.query_params.get('ids', '')
+    try:
+        ids = [int(i) for i in ids_raw.split(',') if i.strip()]
+    except ValueError:
+        return Response(
+            {'error': 'ids debe ser una lista de enteros separados por coma'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not ids:
+        return Response({'error': 'ids es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(ids) > 100:
+        return Response(
+            {'error': 'Máximo 100 productos por consulta'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    stock = StockCache.obtener(ids)
+    return Response({
+        'stock': {str(pid): valor for pid, valor in stock.items()},
+        'no_encontrados': [pid for pid in dict.fromkeys(ids) if pid not in stock],
+    }, status=status.HTTP_200_OK)
 
 
 @api_view(['GET'])
@@ -1346,29 +1438,42 @@ def mis_favoritos(request):
     ❤️ ENDPOINT - Mis Favoritos del Usuario
     ═══════════════════════════════════════════════════════════════════════════════
     
-    Obtiene todos los productos favoritos del usuario autenticado.
+    Obtiene los productos favoritos del usuario autenticado, paginados y con
+    la proyección de tarjeta (sin favoritos_count ni creado_por por fila).
     
-    GET /api/mis-favoritos/
+    GET /api/mis-favoritos/?page=1&page_size=20
     
     Query params:
-    - limit: int - Límite de resultados (default: 100)
+    - page: int - Página (default: 1)
+    - page_size: int - Resultados por página (default: 20, máx: 100)
     
     Retorna:
-    - Lista de productos favoritos con información completa
+    - count: int - Total de favoritos
+    - next / previous: URLs de paginación
+    - favoritos: Lista de tarjetas de producto
     """
-    limit = int(request.query_params.get('limit', 100))
+    from .views_pedidos import StandardPagination
     
-    # Obtener favoritos del usuario
+    # Una sola query: favorito + columnas de tarjeta del producto
     favoritos = Favorito.objects.filter(
         usuario=request.user
-    ).select_related('producto').order_by('-created_at')[:limit]
+    ).select_related('producto').only(
+        'id', 'producto_id', 'created_at',
+        *[f'producto__{campo}' for campo in ProductoCardSerializer.CAMPOS]
+    ).order_by('-created_at')
     
-    # Extraer productos
-    productos = [fav.producto for fav in favoritos]
+    paginator = StandardPagination()
+    pagina = paginator.paginate_queryset(favoritos, request)
     
-    serializer = ProductoSerializer(productos, many=True, context={'request': request})
+    serializer = ProductoCardSerializer(
+        [fav.producto for fav in pagina],
+        many=True,
+        context={'request': request}
+    )
     
     return Response({
-        'count': len(productos),
+        'count': paginator.page.paginator.count,
+        'next': paginator.get_next_link(),
+        'previous': paginator.get_previous_link(),
         'favoritos': serializer.data
     }, status=status.HTTP_200_OK)
@@ -6,14 +6,21 @@
 Vistas para el panel de administración con control de permisos
 """
 
+import re
+
 from rest_framework import viewsets, status, permissions, throttling
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from django.db.models import Count, Sum, Q
+from rest_framework.exceptions import ValidationError
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count, Sum, Q, F
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from datetime import timedelta
-from .models import UserProfile, Producto, AuditLog
+from .models import UserProfile, Producto, AuditLog, Pedido
 from .serializers_admin import (
     UserListSerializer,
     UserDetailSerializer,
@@ -21,8 +28,18 @@ from .serializers_admin import (
     ProductoAdminSerializer,
     AuditLogSerializer
 )
-from .utils.audit import registrar_edicion, registrar_eliminacion, registrar_creacion, registrar_cambio_rol
+from .utils.audit import (
+    registrar_edicion,
+    registrar_eliminacion,
+    registrar_creacion,
+    registrar_cambio_rol,
+    instantanea,
+    iniciar_purga,
+    estado_purga,
+)
+from .utils.paginacion import KeysetPagination, KeysetFechaPagination
 from .throttles import AdminRateThrottle  # ✅ Importar throttle centralizado
+from .db_router import solo_lectura
 
 
 class IsAdminOrStaff(permissions.BasePermission):
@@ -70,11 +87,18 @@ class UserManagementViewSet(viewsets.ModelViewSet):
     - Emails parcialmente ocultos en listado
     - No expone contraseñas
     - Logs de acciones sensibles
+    
+    ESCALA (listado):
+    - Paginación keyset por id (?cursor=...) con total estimado
+    - Búsqueda con índices trigram (migración 0036) en username, nombre,
+      apellido y email
+    - total_pedidos desde user_order_stats (LEFT JOIN por clave primaria)
     """
     
-    queryset = User.objects.all().select_related('profile').prefetch_related('pedidos')
+    queryset = User.objects.all().select_related('profile')
     permission_classes = [IsAdminOrStaff]
     throttle_classes = [AdminRateThrottle]
+    pagination_class = KeysetPagination
     
     def get_serializer_class(self):
         if self.action == 'list':
@@ -127,7 +151,13 @@ class UserManagementViewSet(viewsets.ModelViewSet):
         """
         Filtrar usuarios según el rol del usuario autenticado
         """
-        queryset = User.objects.all().select_related('profile').order_by('-date_joined')
+        queryset = User.objects.all().select_related('profile').order_by('-id')
+        
+        if self.action == 'list':
+            # Contador desnormalizado, sin cargar ni contar los pedidos
+            queryset = queryset.annotate(
+                total_pedidos=Coalesce(F('order_stats__total_pedidos'), 0)
+            )
         
         # Obtener parámetros
         search = self.request.query_params.get('search', '').strip()
@@ -142,12 +172,13 @@ class UserManagementViewSet(viewsets.ModelViewSet):
             queryset = queryset.filter(profile__rol=rol)
         
         if search:
+            # UPPER(col) LIKE UPPER('%x%'): cada rama usa su índice GIN trigram
             queryset = queryset.filter(
                 Q(username__icontains=search) |
                 Q(first_name__icontains=search) |
                 Q(last_name__icontains=search) |
                 Q(email__icontains=search)
-            )[:100]  # Limitar resultados
+            )
         
         return queryset
     
@@ -252,7 +283,6 @@ class UserManagementViewSet(viewsets.ModelViewSet):
                 )
         
         # Validar que no tenga pedidos activos
-        from .models import Pedido
         pedidos_activos = Pedido.objects.filter(
             usuario=instance,
             estado__in=['pendiente', 'confirmado', 'en_preparacion', 'en_camino']
@@ -286,20 +316,22 @@ class UserManagementViewSet(viewsets.ModelViewSet):
     def stats(self, request):
         """Estadísticas de usuarios"""
         
-        total_usuarios = User.objects.count()
-        usuarios_activos = User.objects.filter(is_active=True).count()
+        # Totales, activos y nuevos (últimos 30 días) en un solo recorrido
+        hace_30_dias = timezone.now() - timedelta(days=30)
+        conteos = User.objects.aggregate(
+            total=Count('id'),
+            activos=Count('id', filter=Q(is_active=True)),
+            nuevos=Count('id', filter=Q(date_joined__gte=hace_30_dias)),
+        )
+        total_usuarios = conteos['total']
+        usuarios_activos = conteos['activos']
+        nuevos_usuarios = conteos['nuevos']
         
         # Usuarios por rol
         roles_count = UserProfile.objects.values('rol').annotate(
             count=Count('id')
         )
         
-        # Nuevos usuarios (últimos 30 días)
-        hace_30_dias = timezone.now() - timedelta(days=30)
-        nuevos_usuarios = User.objects.filter(
-            date_joined__gte=hace_30_dias
-        ).count()
-        
         return Response({
             'total_usuarios': total_usuarios,
             'usuarios_activos': usuarios_activos,
@@ -376,6 +408,12 @@ class ProductoManagementViewSet(viewsets.ModelViewSet):
         # Registrar auditoría
         registrar_creacion(self.request, 'producto', producto)
     
+    def perform_update(self, serializer):
+        """Guardar y auditar solo los campos del modelo que cambiaron"""
+        antes = instantanea(serializer.instance)
+        producto = serializer.save()
+        registrar_edicion(self.request, 'producto', producto, antes=antes)
+    
     def create(self, request, *args, **kwargs):
         """Crear producto (solo admin y trabajador)"""
         if request.user.profile.rol not in ['admin', 'trabajador']:
@@ -403,15 +441,8 @@ class ProductoManagementViewSet(viewsets.ModelViewSet):
             )
         
         try:
-            instance = self.get_object()
-            response = super().update(request, *args, **kwargs)
-            
-            # Registrar auditoría
-            if response.status_code == 200:
-                cambios = {k: v for k, v in request.data.items()}
-                registrar_edicion(request, 'producto', instance, cambios)
-            
-            return response
+            # La auditoría se registra en perform_update
+            return super().update(request, *args, **kwargs)
         except Exception as e:
             import logging
             logger = logging.getLogger(__name__)
@@ -478,6 +509,7 @@ class ProductoManagementViewSet(viewsets.ModelViewSet):
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
+@solo_lectura
 def dashboard_stats(request):
     """
     Estadísticas generales del dashboard con filtros de fecha opcionales
@@ -560,6 +592,83 @@ def dashboard_stats(request):
     })
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def metricas_correo(request):
+    """
+    📮 Throughput de envío de emails por proveedor (últimos N minutos)
+    
+    Query params:
+    - minutos: Ventana (1-120, por defecto 15)
+    """
+    from .utils import correo
+    from .utils.redis_client import get_redis
+    
+    try:
+        minutos = min(max(int(request.query_params.get('minutos', 15)), 1), 120)
+    except ValueError:
+        return Response({'error': 'minutos debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    r = get_redis()
+    try:
+        en_cola = r.llen(correo.CLAVE_COLA) if r is not None else 0
+    except Exception:
+        en_cola = None
+    
+    return Response({
+        'minutos': minutos,
+        'en_cola': en_cola,
+        'proveedores': correo.metricas(minutos),
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def metricas_pool_bd(request):
+    """
+    🏊 Estado de los pools de conexiones del proceso que atiende la petición
+    
+    Vacío si DB_POOL está desactivado (ver api/db_pool/).
+    """
+    from . import db_pool
+    
+    return Response({
+        'activo': settings.DB_POOL,
+        'sentencias_preparadas': settings.DB_SENTENCIAS_PREPARADAS,
+        'pools': db_pool.metricas(),
+    })
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdminOrStaff])
+def peticiones_lentas(request):
+    """
+    🐢 Últimas peticiones lentas o con N+1 (buffer circular de la instrumentación)
+    
+    Query params:
+    - limite: Muestras a devolver (1-INSTRUMENTACION_BUFFER, por defecto 50)
+    
+    DELETE vacía el buffer.
+    """
+    from .utils.instrumentacion import MuestrasLentas
+    
+    if request.method == 'DELETE':
+        MuestrasLentas.limpiar()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    
+    try:
+        limite = min(max(int(request.query_params.get('limite', 50)), 1), settings.INSTRUMENTACION_BUFFER)
+    except ValueError:
+        return Response({'error': 'limite debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'activa': settings.INSTRUMENTACION_ACTIVA,
+        'umbral_ms': settings.INSTRUMENTACION_LENTA_MS,
+        'umbral_n_mas_1': settings.INSTRUMENTACION_N_MAS_1,
+        'muestras': MuestrasLentas.listar(limite),
+    })
+
+
 class IsAdmin(permissions.BasePermission):
     """Permiso solo para administradores"""
     
@@ -573,116 +682,130 @@ class IsAdmin(permissions.BasePermission):
         return request.user.is_superuser
 
 
+class AuditLogPagination(KeysetFechaPagination):
+    """Historial: keyset por (timestamp, id) descendente"""
+    campo_fecha = 'timestamp'
+
+
 class AuditLogViewSet(viewsets.ModelViewSet):
     """
     ViewSet para el historial de auditoría.
     Permite lectura y eliminación solo para administradores.
+    
+    Filtros (query params):
+    - fecha_desde / fecha_hasta: ISO 8601
+    - accion, modulo, usuario (id)
+    - search: objeto_repr o username (índices trigram)
+    - campo: ediciones que tocaron ese campo (cambios_realizados)
+    - detalle_clave + detalle_valor: clave de primer nivel de `detalles`
+    
+    Con PostgreSQL los filtros sobre `detalles` usan containment (@>) y el
+    índice GIN de la migración 0039.
     """
-    queryset = AuditLog.objects.select_related('usuario').order_by('-timestamp')
+    queryset = AuditLog.objects.select_related('usuario')
     serializer_class = AuditLogSerializer
     permission_classes = [IsAdmin]
     throttle_classes = [AdminRateThrottle]
+    pagination_class = AuditLogPagination
     http_method_names = ['get', 'delete', 'head', 'options']  # Solo GET y DELETE
     
+    def _fecha(self, parametro):
+        """Query param ISO 8601 → datetime aware (400 si no es válido)"""
+        valor = self.request.query_params.get(parametro)
+        if not valor:
+            return None
+        try:
+            fecha = parse_datetime(valor)
+        except ValueError:
+            fecha = None
+        if fecha is None:
+            raise ValidationError({parametro: 'Fecha ISO 8601 inválida'})
+        return fecha if timezone.is_aware(fecha) else timezone.make_aware(fecha)
+    
+    def _clave(self, parametro):
+        """Clave de `detalles` desde un query param (solo [A-Za-z0-9_])"""
+        clave = self.request.query_params.get(parametro)
+        if clave and not re.fullmatch(r'[A-Za-z0-9]+(_[A-Za-z0-9]+)*', clave):
+            raise ValidationError({parametro: 'Clave inválida'})
+        return clave
+    
     def get_queryset(self):
-        """Filtrar queryset con optimizaciones"""
-        from datetime import datetime
-        from django.utils import timezone
-        
+        """Filtrar queryset (cada filtro usa su índice)"""
         queryset = super().get_queryset()
+        params = self.request.query_params
         
-        # Filtro por fecha
-        fecha_desde = self.request.query_params.get('fecha_desde')
-        fecha_hasta = self.request.query_params.get('fecha_hasta')
-        
+        fecha_desde = self._fecha('fecha_desde')
         if fecha_desde:
-            try:
-                # Parsear fecha ISO 8601 manualmente
-                # Formato: 2025-11-09T22:03:23.130Z
-                fecha_desde_str = fecha_desde.replace('Z', '+00:00')
-                
-                # Intentar con fromisoformat (Python 3.7+)
-                try:
-                    fecha_desde_obj = datetime.fromisoformat(fecha_desde_str)
-                except:
-                    # Fallback: parsear manualmente
-                    # Remover milisegundos si existen
-                    if '.' in fecha_desde_str:
-                        fecha_desde_str = fecha_desde_str.split('.')[0] + '+00:00'
-                    fecha_desde_obj = datetime.fromisoformat(fecha_desde_str)
-                
-                # Asegurar que tiene zona horaria
-                if fecha_desde_obj.tzinfo is None:
-                    fecha_desde_obj = timezone.make_aware(fecha_desde_obj)
-                
-                queryset = queryset.filter(timestamp__gte=fecha_desde_obj)
-            except Exception as e:
-                # Log del error para debugging
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f'Error parsing fecha_desde: {fecha_desde} - {str(e)}')
-                pass
-        
+            queryset = queryset.filter(timestamp__gte=fecha_desde)
+        fecha_hasta = self._fecha('fecha_hasta')
         if fecha_hasta:
-            try:
-                # Parsear fecha ISO 8601 manualmente
-                fecha_hasta_str = fecha_hasta.replace('Z', '+00:00')
-                
-                # Intentar con fromisoformat (Python 3.7+)
-                try:
-                    fecha_hasta_obj = datetime.fromisoformat(fecha_hasta_str)
-                except:
-                    # Fallback: parsear manualmente
-                    if '.' in fecha_hasta_str:
-                        fecha_hasta_str = fecha_hasta_str.split('.')[0] + '+00:00'
-                    fecha_hasta_obj = datetime.fromisoformat(fecha_hasta_str)
-                
-                # Asegurar que tiene zona horaria
-                if fecha_hasta_obj.tzinfo is None:
-                    fecha_hasta_obj = timezone.make_aware(fecha_hasta_obj)
-                
-                queryset = queryset.filter(timestamp__lte=fecha_hasta_obj)
-            except Exception as e:
-                # Log del error para debugging
-                import logging
-                logger = logging.getLogger(__name__)
-                logger.warning(f'Error parsing fecha_hasta: {fecha_hasta} - {str(e)}')
-                pass
+            queryset = queryset.filter(timestamp__lte=fecha_hasta)
         
         # Filtros adicionales (sin django-filter)
-        accion = self.request.query_params.get('accion')
+        accion = params.get('accion')
         if accion:
             queryset = queryset.filter(accion=accion)
         
-        modulo = self.request.query_params.get('modulo')
+        modulo = params.get('modulo')
         if modulo:
             queryset = queryset.filter(modulo=modulo)
         
-        usuario = self.request.query_params.get('usuario')
+        usuario = params.get('usuario')
         if usuario:
             queryset = queryset.filter(usuario__id=usuario)
         
-        search = self.request.query_params.get('search')
+        search = params.get('search', '').strip()
         if search:
-            from django.db.models import Q
+            # Subconsulta en vez de JOIN: cada lado del OR usa su índice
+            # (trigram en objeto_repr y en auth_user.username)
+            usuarios = User.objects.filter(username__icontains=search).values('id')
             queryset = queryset.filter(
                 Q(objeto_repr__icontains=search) |
-                Q(usuario__username__icontains=search)
+                Q(usuario_id__in=usuarios)
             )
         
+        # @> (containment) usa el índice GIN de detalles; SQLite (tests) no
+        # lo soporta y usa las lookups de clave equivalentes
+        postgres = connection.vendor == 'postgresql'
+        
+        campo = self._clave('campo')
+        if campo and postgres:
+            queryset = queryset.filter(detalles__contains={'cambios_realizados': {campo: {}}})
+        elif campo:
+            queryset = queryset.filter(detalles__cambios_realizados__has_key=campo)
+        
+        detalle_clave = self._clave('detalle_clave')
+        if detalle_clave and 'detalle_valor' in params:
+            valor = params['detalle_valor']
+            if postgres:
+                queryset = queryset.filter(detalles__contains={detalle_clave: valor})
+            else:
+                queryset = queryset.filter(**{f'detalles__{detalle_clave}': valor})
+        
         return queryset
     
     @action(detail=False, methods=['delete'], url_path='clear_all')
     def clear_all(self, request):
         """
-        Elimina TODO el historial de auditoría.
+        Vacía el historial de auditoría en segundo plano.
         Solo para administradores.
         Acción destructiva que requiere confirmación en frontend.
+        
+        Borra por lotes hasta el último registro actual y responde 202; el
+        progreso se consulta en GET /api/admin/historial/purga/.
         """
-        count = AuditLog.objects.count()
-        AuditLog.objects.all().delete()
+        progreso, iniciada = iniciar_purga(request.user)
         
         return Response({
-            'message': f'Se eliminaron {count} registros del historial',
-            'count': count
-        }, status=status.HTTP_200_OK)
+            'message': (
+                f'Eliminando {progreso["total"]} registros del historial'
+                if iniciada else 'Ya hay un vaciado del historial en curso'
+            ),
+            'count': progreso['total'],
+            'purga': progreso,
+        }, status=status.HTTP_202_ACCEPTED)
+    
+    @action(detail=False, methods=['get'], url_path='purga')
+    def purga(self, request):
+        """Progreso del último vaciado del historial"""
+        return Response({'purga': estado_purga()})
@@ -0,0 +1,175 @@
+"""
+═══════════════════════════════════════════════════════════════════════════════
+⚡ VIEWS ASYNC - Lecturas Públicas del Catálogo (ASGI)
+═══════════════════════════════════════════════════════════════════════════════
+
+Versiones async de los GET públicos más visitados, con el mismo JSON y las
+mismas cabeceras de caché HTTP que las vistas DRF (síncronas):
+- GET /api/carrusel/
+- GET /api/catalogo/productos/
+- GET /api/catalogo/tarjetas-inferiores/
+- GET /api/productos/{id}/
+- GET /api/productos/stock/?ids=1,2,3
+
+Se sirven desde un proceso uvicorn aparte (config/asgi_lecturas.py) junto
+al despliegue WSGI, que sigue atendiendo todo lo demás.
+
+- ORM async (aiterator, aget, aaggregate). En Django 4.2 las consultas
+  siguen ejecutándose en el hilo del ORM: lo que se gana es no ocupar un
+  worker por conexión lenta y servir sin hilo los aciertos de caché
+- Stock y relacionados se leen con el cliente Redis async (utils/redis_async.py)
+- favoritos_count se anota (Count) en la consulta: el serializer no puede
+  lanzar consultas dentro del event loop
+- Listas desde JSON_STREAMING_MINIMO: serialización y render en un hilo
+"""
+
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count
+from django.http import HttpResponse, HttpResponseNotAllowed
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+from .db_router import solo_lectura
+from .models import Producto
+from .renderers import ORJSONRenderer
+from .serializers import ProductoSerializer, ProductoCardSerializer
+from .utils import redis_async
+from .utils.cache_http import Ambito, cache_publica
+from .utils.relacionados import ProductosRelacionados
+from .utils.stock_cache import StockCache
+from .views import _ambito_carrusel
+from .views_catalogo import _ambito_catalogo, _ambito_tarjetas, _filtrar_catalogo
+import logging
+
+logger = logging.getLogger(__name__)
+
+CAMPOS_LISTADO = (
+    'id', 'nombre', 'descripcion', 'precio', 'descuento', 'categoria',
+    'imagen', 'imagen_url', 'stock_total', 'stock_reservado', 'stock_vendido',
+    'activo', 'en_all_products', 'en_carousel_card', 'en_carrusel',
+    'creado_por', 'created_at', 'updated_at',
+)
+
+
+def _solo_get(vista):
+    """require_GET para vistas async (el de Django 4.2 no las soporta)"""
+    @wraps(vista)
+    async def envoltura(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+        return await vista(request, *args, **kwargs)
+    return envoltura
+
+
+def _json(datos, status=status.HTTP_200_OK, headers=None):
+    return HttpResponse(
+        ORJSONRenderer().render(datos), status=status, headers=headers, content_type='application/json'
+    )
+
+
+async def _respuesta_listado(request, queryset, etiqueta):
+    """{'count', 'data'} de un listado; las listas grandes se serializan en un hilo"""
+    productos = [
+        p async for p in queryset.select_related('creado_por').only(*CAMPOS_LISTADO)
+        .annotate(favoritos_count_cached=Count('favoritos')).order_by('-created_at').aiterator()
+    ]
+    contexto = {'is_list': True, 'request': request}
+    
+    def serializar():
+        datos = ProductoSerializer(productos, many=True, context=contexto).data
+        return _json({'count': len(datos), 'data': datos})
+    
+    logger.info(f'[{etiqueta}] {len(productos)} productos cargados (async)')
+    if len(productos) >= settings.JSON_STREAMING_MINIMO:
+        return await sync_to_async(serializar, thread_sensitive=False)()
+    return serializar()
+
+
+def _error_listado(etiqueta, e):
+    logger.error(f'[{etiqueta}] Error al obtener productos (async): {str(e)}')
+    return _json({'error': 'Error al obtener productos'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+
+@_solo_get
+@cache_publica('carrusel', _ambito_carrusel)
+async def productos_carrusel(request):
+    """Async de views.productos_carrusel"""
+    return await _respuesta_listado(
+        request, Producto.objects.filter(en_carrusel=True, activo=True), 'CARRUSEL_LOADED'
+    )
+
+
+@_solo_get
+@solo_lectura
+@cache_publica('catalogo', _ambito_catalogo)
+async def productos_catalogo_completo(request):
+    """Async de views_catalogo.productos_catalogo_completo"""
+    try:
+        queryset = _filtrar_catalogo(Producto.objects.filter(en_all_products=True, activo=True), request)
+        return await _respuesta_listado(request, queryset, 'CATALOGO_COMPLETO')
+    except Exception as e:
+        return _error_listado('CATALOGO_COMPLETO', e)
+
+
+@_solo_get
+@solo_lectura
+@cache_publica('tarjetas', _ambito_tarjetas)
+async def productos_tarjetas_inferiores(request):
+    """Async de views_catalogo.productos_tarjetas_inferiores"""
+    try:
+        queryset = Producto.objects.filter(en_carousel_card=True, activo=True)
+        return await _respuesta_listado(request, queryset, 'TARJETAS_INFERIORES')
+    except Exception as e:
+        return _error_listado('TARJETAS_INFERIORES', e)
+
+
+async def _ambito_producto(request, pk):
+    """Mismo ámbito (y ETag) que views._ambito_producto, con Redis async"""
+    relacionados = await redis_async.aget(ProductosRelacionados.clave(pk)) or []
+    return Ambito(Producto.objects.filter(pk__in=[pk, *relacionados]), [f'producto:{pk}'], tuple(relacionados))
+
+
+@_solo_get
+@solo_lectura
+@cache_publica('producto', _ambito_producto)
+async def producto_detalle(request, pk):
+    """Async de ProductoViewSet.retrieve (producto + relacionados)"""
+    try:
+        producto = await Producto.objects.select_related('creado_por').annotate(
+            favoritos_count_cached=Count('favoritos')
+        ).aget(pk=pk)
+    except Producto.DoesNotExist:
+        return _json({'detail': str(NotFound.default_detail)}, status=status.HTTP_404_NOT_FOUND)
+    
+    relacionados = await ProductosRelacionados.atarjetas(producto)
+    contexto = {'request': request}
+    return _json({
+        'producto': ProductoSerializer(producto, context=contexto).data,
+        'productos_relacionados': ProductoCardSerializer(relacionados, many=True, context=contexto).data,
+    }, headers={'Surrogate-Key': ' '.join(f'producto:{p.id}' for p in relacionados)})
+
+
+@_solo_get
+async def stock_productos_batch(request):
+    """Async de views.stock_productos_batch: aciertos de Redis sin hilo ni BD"""
+    try:
+        ids = [int(i) for i in request.GET.get('ids', '').split(',') if i.strip()]
+    except ValueError:
+        return _json(
+            {'error': 'ids debe ser una lista de enteros separados por coma'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
+    if not ids:
+        return _json({'error': 'ids es requerido'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    if len(ids) > 100:
+        return _json({'error': 'Máximo 100 productos por consulta'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    stock = await StockCache.aobtener(ids)
+    return _json({
+        'stock': {str(pid): valor for pid, valor in stock.items()},
+        'no_encontrados': [pid for pid in dict.fromkeys(ids) if pid not in stock],
+    })
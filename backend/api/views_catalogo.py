@@ -10,16 +10,51 @@ Separado de views.py para mantener código limpio y organizado.
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework import permissions
 from rest_framework.response import Response
-from django.db.models import Q
+from django.conf import settings
+from django.db.models import Count, Q
 from .models import Producto
 from .serializers import ProductoSerializer
+from .db_router import solo_lectura
+from .renderers import respuesta_json_streaming
+from .utils.cache_http import Ambito, cache_publica
 import logging
 
 logger = logging.getLogger(__name__)
 
 
+def _filtrar_catalogo(queryset, request):
+    """Filtros opcionales ?categoria= y ?search= del catálogo (request de DRF o de Django)"""
+    categoria = request.GET.get('categoria', None)
+    search = request.GET.get('search', None)
+    
+    if categoria:
+        queryset = queryset.filter(categoria=categoria)
+    
+    if search:
+        queryset = queryset.filter(
+            Q(nombre__icontains=search) |
+            Q(descripcion__icontains=search)
+        )
+    
+    return queryset
+
+
+def _ambito_catalogo(request):
+    categoria = request.GET.get('categoria', None)
+    return Ambito(
+        _filtrar_catalogo(Producto.objects.filter(en_all_products=True, activo=True), request),
+        ['catalogo'] + ([f'categoria:{categoria}'] if categoria else [])
+    )
+
+
+def _ambito_tarjetas(request):
+    return Ambito(Producto.objects.filter(en_carousel_card=True, activo=True), ['tarjetas'])
+
+
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@solo_lectura
+@cache_publica('catalogo', _ambito_catalogo)
 def productos_catalogo_completo(request):
     """
     ═══════════════════════════════════════════════════════════════════════════════
@@ -38,6 +73,12 @@ def productos_catalogo_completo(request):
     Retorna:
     - count: int - Número total de productos
     - data: array - Lista de productos con información completa
+    
+    Desde JSON_STREAMING_MINIMO productos la respuesta se serializa y envía
+    por lotes (mismo JSON).
+    
+    Caché HTTP: ETag/Last-Modified y Surrogate-Key 'catalogo' (y
+    'categoria:<categoria>' si se filtra), ver utils/cache_http.py.
     """
     try:
         # ✅ CORREGIDO: Obtener TODOS los productos con en_all_products=true (incluyendo carrusel)
@@ -51,26 +92,28 @@ def productos_catalogo_completo(request):
             'imagen', 'imagen_url', 'stock_total', 'stock_reservado', 'stock_vendido',
             'activo', 'en_all_products', 'en_carousel_card', 'en_carrusel',
             'creado_por', 'created_at', 'updated_at'
+        ).annotate(
+            favoritos_count_cached=Count('favoritos')  # Evita favoritos.count() por producto
         ).order_by('-created_at')
         
         # Filtros opcionales
-        categoria = request.query_params.get('categoria', None)
-        search = request.query_params.get('search', None)
+        queryset = _filtrar_catalogo(queryset, request)
         
-        if categoria:
-            queryset = queryset.filter(categoria=categoria)
+        contexto = {'is_list': True, 'request': request}
+        productos = list(queryset)
         
-        if search:
-            queryset = queryset.filter(
-                Q(nombre__icontains=search) |
-                Q(descripcion__icontains=search)
+        if len(productos) >= settings.JSON_STREAMING_MINIMO:
+            logger.info(f'[CATALOGO_COMPLETO] {len(productos)} productos en streaming')
+            return respuesta_json_streaming(
+                {'count': len(productos)}, 'data', productos,
+                lambda lote: ProductoSerializer(lote, many=True, context=contexto).data,
             )
         
         # Serializar
         serializer = ProductoSerializer(
-            queryset,
+            productos,
             many=True,
-            context={'is_list': True, 'request': request}
+            context=contexto
         )
         
         response_data = {
@@ -92,6 +135,8 @@ def productos_catalogo_completo(request):
 
 @api_view(['GET'])
 @permission_classes([permissions.AllowAny])
+@solo_lectura
+@cache_publica('tarjetas', _ambito_tarjetas)
 def productos_tarjetas_inferiores(request):
     """
     ═══════════════════════════════════════════════════════════════════════════════
@@ -119,6 +164,8 @@ def productos_tarjetas_inferiores(request):
             'imagen', 'imagen_url', 'stock_total', 'stock_reservado', 'stock_vendido',
             'activo', 'en_all_products', 'en_carousel_card', 'en_carrusel',
             'creado_por', 'created_at', 'updated_at'
+        ).annotate(
+            favoritos_count_cached=Count('favoritos')  # Evita favoritos.count() por producto
         ).order_by('-created_at')
         
         # Serializar
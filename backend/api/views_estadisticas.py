@@ -8,13 +8,16 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.pagination import PageNumberPagination
 from django.db.models import Count, Sum, Avg, Q, F
+from django.db.models.functions import TruncMonth
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.core.cache import cache
 from datetime import timedelta
-from .models import Pedido, Producto, UserProfile, DetallePedido
+from .models import Pedido, Producto, UserProfile, DetallePedido, UserOrderStats
 from .views_admin import IsAdminOrStaff
+from .db_router import solo_lectura
 from .utils.cache_manager import CacheManager
+from .utils import analitica
 
 
 class EstadisticasPagination(PageNumberPagination):
@@ -26,6 +29,7 @@ class EstadisticasPagination(PageNumberPagination):
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
+@solo_lectura
 def estadisticas_ventas(request):
     """
     Estadísticas detalladas de ventas
@@ -104,6 +108,7 @@ def estadisticas_ventas(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
+@solo_lectura
 def estadisticas_usuarios(request):
     """
     Estadísticas de usuarios
@@ -113,6 +118,10 @@ def estadisticas_usuarios(request):
     - Usuarios por rol
     - Usuarios más activos
     - Tasa de retención
+    - Cohortes de clientes por mes del primer pedido
+    
+    Actividad, retención y cohortes leen user_order_stats (una fila por
+    cliente con pedidos) en lugar de agrupar usuarios × pedidos.
     
     Caché: 10 minutos (datos menos volátiles)
     Invalidación: Automática cuando se crea/actualiza un UserProfile
@@ -142,31 +151,58 @@ def estadisticas_usuarios(request):
             count=Count('id')
         )
         
-        # Usuarios más activos (por pedidos)
-        usuarios_activos = User.objects.annotate(
-            pedidos_count=Count('pedidos')
-        ).filter(pedidos_count__gt=0).order_by('-pedidos_count')[:10].values(
-            'username',
-            'first_name',
-            'last_name',
-            'pedidos_count'
+        # Usuarios más activos (por pedidos): índice sobre -total_pedidos
+        usuarios_activos = UserOrderStats.objects.filter(
+            total_pedidos__gt=0
+        ).order_by('-total_pedidos')[:10].values(
+            'valor_total',
+            username=F('usuario__username'),
+            first_name=F('usuario__first_name'),
+            last_name=F('usuario__last_name'),
+            pedidos_count=F('total_pedidos'),
         )
         
-        # Tasa de retención (usuarios con más de 1 pedido)
-        total_usuarios = User.objects.filter(pedidos__isnull=False).distinct().count()
-        usuarios_recurrentes = User.objects.annotate(
-            pedidos_count=Count('pedidos')
-        ).filter(pedidos_count__gt=1).count()
+        # Tasa de retención (usuarios con más de 1 pedido) en una sola pasada
+        retencion = UserOrderStats.objects.filter(total_pedidos__gt=0).aggregate(
+            total=Count('usuario'),
+            recurrentes=Count('usuario', filter=Q(total_pedidos__gt=1)),
+        )
+        total_usuarios = retencion['total']
+        usuarios_recurrentes = retencion['recurrentes']
         
         tasa_retencion = (usuarios_recurrentes / total_usuarios * 100) if total_usuarios > 0 else 0
         
+        # Cohortes: clientes por mes de su primer pedido (últimos 12 meses)
+        hace_12_meses = timezone.now() - timedelta(days=365)
+        cohortes = UserOrderStats.objects.filter(
+            primer_pedido__gte=hace_12_meses
+        ).annotate(
+            mes=TruncMonth('primer_pedido')
+        ).values('mes').annotate(
+            clientes=Count('usuario'),
+            recurrentes=Count('usuario', filter=Q(total_pedidos__gt=1)),
+            valor=Sum('valor_total'),
+        ).order_by('mes')
+        
         return {
             'usuarios_por_mes': usuarios_por_mes,
             'usuarios_por_rol': list(usuarios_por_rol),
-            'usuarios_mas_activos': list(usuarios_activos),
+            'usuarios_mas_activos': [
+                {**usuario, 'valor_total': float(usuario['valor_total'])}
+                for usuario in usuarios_activos
+            ],
             'tasa_retencion': round(tasa_retencion, 2),
             'total_usuarios': total_usuarios,
             'usuarios_recurrentes': usuarios_recurrentes,
+            'cohortes_primer_pedido': [
+                {
+                    'mes': cohorte['mes'].strftime('%Y-%m'),
+                    'clientes': cohorte['clientes'],
+                    'recurrentes': cohorte['recurrentes'],
+                    'valor_total': float(cohorte['valor'] or 0),
+                }
+                for cohorte in cohortes
+            ],
         }
     
     # ✅ SIMPLIFICADO: Ejecutar directamente sin cache para evitar ralentización
@@ -177,6 +213,7 @@ def estadisticas_usuarios(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
+@solo_lectura
 def estadisticas_productos(request):
     """
     Estadísticas de productos
@@ -237,6 +274,7 @@ def estadisticas_productos(request):
 
 @api_view(['GET'])
 @permission_classes([IsAdminOrStaff])
+@solo_lectura
 def reporte_completo(request):
     """
     Reporte completo para exportación
@@ -281,3 +319,70 @@ def reporte_completo(request):
         },
         'fecha_generacion': timezone.now().isoformat(),
     })
+
+
+def _informe_analitica(request, informe):
+    """
+    Respuesta común de los informes de analítica (embudo, cohortes, abandono).
+    
+    Lee el resultado precalculado de la caché; si la ventana no está
+    calculada encola el cálculo y responde 202.
+    """
+    try:
+        dias = int(request.query_params.get('dias', 30))
+    except ValueError:
+        dias = None
+    if dias not in analitica.DIAS_PERMITIDOS:
+        return Response(
+            {'error': f'dias debe ser uno de {list(analitica.DIAS_PERMITIDOS)}'},
+            status=400
+        )
+    
+    resultado = analitica.obtener(dias)
+    if resultado is None:
+        return Response({'estado': 'calculando', 'dias': dias}, status=202)
+    
+    return Response({
+        'dias': dias,
+        'calculado_at': resultado['calculado_at'],
+        'eventos': resultado['eventos'],
+        informe: resultado[informe],
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def analitica_embudo(request):
+    """
+    Embudo carrito → checkout → pago → pedido
+    
+    Query params:
+    - dias: Ventana (7, 30, 90 o 365; por defecto 30)
+    
+    Caché: calculado por Celery cada hora (30 y 90 días) o bajo demanda
+    """
+    return _informe_analitica(request, 'embudo')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def analitica_cohortes(request):
+    """
+    Retención por cohorte mensual de primera actividad
+    
+    Query params:
+    - dias: Ventana (7, 30, 90 o 365; por defecto 30)
+    """
+    return _informe_analitica(request, 'cohortes')
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminOrStaff])
+def analitica_abandono(request):
+    """
+    Tasas de abandono de carrito y de checkout (con serie semanal)
+    
+    Query params:
+    - dias: Ventana (7, 30, 90 o 365; por defecto 30)
+    """
+    return _informe_analitica(request, 'abandono')
@@ -242,25 +242,18 @@ def reset_password_confirm(request):
                 'error': 'Usuario no encontrado'
             }, status=status.HTTP_401_UNAUTHORIZED)
         
-        # Verificar código
-        recovery_code = PasswordRecoveryCode.verificar_codigo(usuario, codigo)
+        # Verificar código (cuenta el intento fallido en la misma operación)
+        recovery_code, bloqueado = PasswordRecoveryCode.comprobar_codigo(usuario, codigo)
         
         if not recovery_code:
             # ✅ NUEVO: Registrar intento fallido en rate limiting
             LoginAttempt.registrar_intento(ip_address, attempt_type='reset_password', success=False)
             
-            # Incrementar intentos fallidos si el código existe pero es inválido
-            try:
-                invalid_code = PasswordRecoveryCode.objects.get(usuario=usuario, codigo=codigo)
-                invalid_code.incrementar_intentos()
-                
-                if invalid_code.intentos_fallidos >= 5:
-                    logger_security.warning(f'[RESET_PASSWORD_LIMITE_INTENTOS] Usuario: {usuario.username}')
-                    return Response({
-                        'error': 'Demasiados intentos fallidos. Solicita un nuevo código.'
-                    }, status=status.HTTP_429_TOO_MANY_REQUESTS)
-            except PasswordRecoveryCode.DoesNotExist:
-                pass
+            if bloqueado:
+                logger_security.warning(f'[RESET_PASSWORD_LIMITE_INTENTOS] Usuario: {usuario.username}')
+                return Response({
+                    'error': 'Demasiados intentos fallidos. Solicita un nuevo código.'
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
             
             logger_security.warning(f'[RESET_PASSWORD_CODIGO_INVALIDO] Usuario: {usuario.username}')
             return Response({
@@ -9,6 +9,10 @@ Endpoints:
 1. POST /api/auth/register-with-verification/ - Registro con verificación
 2. POST /api/auth/verify-email/ - Verificar código de email
 3. POST /api/auth/resend-verification/ - Reenviar código
+
+Con Redis el registro pendiente vive en api/utils/codigos_verificacion.py
+(TTL = expiración del código) y la fila EmailVerification se crea solo al
+verificar. Sin Redis, o para registros antiguos, se usa la tabla.
 """
 
 from rest_framework.decorators import api_view, throttle_classes, permission_classes
@@ -20,12 +24,14 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
 import logging
+import time
 
 from .models import EmailVerification, LoginAttempt, RefreshToken
 from .tasks import enviar_email_verificacion
 from .throttles import AnonLoginRateThrottle
+from .utils import codigos_verificacion as codigos
 from .utils.jwt_utils import generar_access_token, obtener_info_request
 
 logger = logging.getLogger('auth')
@@ -90,6 +96,32 @@ def registrar_intento_verificacion(username, ip_address, exitoso):
     )
 
 
+def crear_usuario_verificado(username, email, password_hash, first_name='', last_name=''):
+    """
+    Crea el usuario activo con la contraseña ya hasheada en el registro.
+    Debe llamarse dentro de transaction.atomic().
+    """
+    user = User.objects.create_user(
+        username=username,
+        email=email,
+        password=None,
+        first_name=first_name or '',
+        last_name=last_name or '',
+        is_active=True  # ✅ Usuario activo desde el inicio
+    )
+    
+    # Reemplazar la contraseña con la hasheada guardada
+    user.password = password_hash
+    user.save(update_fields=['password'])
+    
+    # Crear perfil (se crea automáticamente por señal)
+    if hasattr(user, 'profile'):
+        user.profile.rol = 'cliente'
+        user.profile.save()
+    
+    return user
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 @throttle_classes([AnonLoginRateThrottle])
@@ -159,39 +191,54 @@ def register_with_verification(request):
             }, status=status.HTTP_400_BAD_REQUEST)
         
         # ✅ OPCIÓN 1: NO crear usuario aún, solo guardar datos temporales
-        with transaction.atomic():
-            # Obtener IP del usuario
-            ip_address = request.META.get('REMOTE_ADDR')
-            
+        ip_address = request.META.get('REMOTE_ADDR')
+        from django.contrib.auth.hashers import make_password
+        password_hash = make_password(password)
+        codigo = EmailVerification.generar_codigo()
+        datos_registro = {
+            'username': username,
+            'email': email,
+            'password_hash': password_hash,
+            'first_name': first_name,
+            'last_name': last_name,
+            'ip_address': ip_address or '',
+        }
+        
+        guardado_en_redis = False
+        if codigos.activo():
+            try:
+                codigos.guardar(codigos.REGISTRO, email, codigo, 5, **datos_registro)
+                guardado_en_redis = True
+            except Exception as e:
+                logger.warning(f'[REGISTRO_REDIS_ERROR] Se usa la BD: {str(e)}')
+        
+        if not guardado_en_redis:
             # Crear registro de verificación CON DATOS TEMPORALES (sin User)
             # Esto permite que el usuario no sea creado hasta verificar
-            from django.contrib.auth.hashers import make_password
-            password_hash = make_password(password)
-            
-            verificacion = EmailVerification.objects.create(
+            EmailVerification.objects.create(
                 usuario=None,  # ✅ No crear User aún
                 email_temporal=email,
                 username_temporal=username,
                 password_hash=password_hash,
                 first_name_temporal=first_name,
                 last_name_temporal=last_name,
-                codigo=EmailVerification.generar_codigo(),
+                codigo=codigo,
                 expires_at=timezone.now() + timedelta(minutes=5),
                 ip_address=ip_address
             )
-            
-            # Enviar email de forma asíncrona
-            # Nota: Pasamos email_temporal en lugar de usuario_id
-            enviar_email_verificacion.delay(
-                email=email,
-                codigo=verificacion.codigo,
-                nombre=first_name or username
-            )
-            
-            logger.info(
-                f'[REGISTRO_VERIFICACION] Registro iniciado. '
-                f'Email: {email}. Código enviado. Usuario será creado tras verificación.'
-            )
+        
+        # Enviar email de forma asíncrona
+        # Nota: Pasamos email_temporal en lugar de usuario_id
+        enviar_email_verificacion.delay(
+            email=email,
+            codigo=codigo,
+            nombre=first_name or username
+        )
+        
+        logger.info(
+            f'[REGISTRO_VERIFICACION] Registro iniciado. '
+            f'Email: {email}. Código enviado. Usuario será creado tras verificación.'
+        )
         
         return Response({
             'message': 'Código de verificación enviado exitosamente',
@@ -252,6 +299,63 @@ def verify_email(request):
                 'error': 'El código debe ser de 6 dígitos'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # ⚡ Registro pendiente en Redis: comparar + contar intento en un round-trip
+        if codigos.activo():
+            resultado, datos = codigos.verificar(codigos.REGISTRO, email, codigo)
+            
+            if resultado == codigos.BLOQUEADO:
+                logger.warning(
+                    f'[CODIGO_BLOQUEADO] Código para {email} bloqueado por intentos fallidos'
+                )
+                return Response({
+                    'error': 'Código bloqueado por intentos fallidos',
+                    'detail': 'Solicita un nuevo código de verificación'
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            if resultado == codigos.INCORRECTO:
+                return Response({
+                    'error': 'Código inválido',
+                    'detail': f'Intentos restantes: {codigos.MAX_INTENTOS - datos}'
+                }, status=status.HTTP_400_BAD_REQUEST)
+            
+            if resultado == codigos.VERIFICADO:
+                with transaction.atomic():
+                    user = crear_usuario_verificado(
+                        datos['username'],
+                        datos['email'],
+                        datos['password_hash'],
+                        datos.get('first_name'),
+                        datos.get('last_name')
+                    )
+                    
+                    # Única fila en BD del registro: ya verificada
+                    ahora = timezone.now()
+                    EmailVerification.objects.create(
+                        usuario=user,
+                        email_temporal=user.email,
+                        username_temporal=user.username,
+                        codigo='',
+                        expires_at=ahora,
+                        verificado=True,
+                        verificado_at=ahora,
+                        ip_address=datos.get('ip_address') or None
+                    )
+                    
+                    registrar_intento_verificacion(user.username, ip_address, True)
+                    
+                    logger.info(
+                        f'[EMAIL_VERIFICADO] Usuario {user.username} creado y verificado exitosamente. IP: {ip_address}'
+                    )
+                
+                return Response({
+                    'message': 'Email verificado exitosamente',
+                    'detail': 'Tu cuenta ha sido activada. Por favor inicia sesión.',
+                    'email': user.email,
+                    'username': user.username
+                }, status=status.HTTP_200_OK)
+            
+            # DESCONOCIDO: registro expirado o creado en BD → continuar con la tabla
+        
         # ✅ OPCIÓN 1: Buscar registro de verificación por email (no User aún)
         # Usar filter().first() en lugar de get() para evitar MultipleObjectsReturned
         # Obtener el más reciente si hay múltiples
@@ -305,24 +409,14 @@ def verify_email(request):
         # ✅ CREAR USUARIO AHORA (después de verificar el código)
         with transaction.atomic():
             # Crear usuario con los datos temporales
-            user = User.objects.create_user(
-                username=verificacion.username_temporal,
-                email=verificacion.email_temporal,
-                password='temp_password_will_be_replaced',  # Temporal, será reemplazado
-                first_name=verificacion.first_name_temporal or '',
-                last_name=verificacion.last_name_temporal or '',
-                is_active=True  # ✅ Usuario activo desde el inicio
+            user = crear_usuario_verificado(
+                verificacion.username_temporal,
+                verificacion.email_temporal,
+                verificacion.password_hash,
+                verificacion.first_name_temporal,
+                verificacion.last_name_temporal
             )
             
-            # Reemplazar la contraseña con la hasheada guardada
-            user.password = verificacion.password_hash
-            user.save()
-            
-            # Crear perfil (se crea automáticamente por señal)
-            if hasattr(user, 'profile'):
-                user.profile.rol = 'cliente'
-                user.profile.save()
-            
             # Marcar verificación como completada
             verificacion.usuario = user  # Asociar el usuario creado
             verificacion.marcar_verificado()
@@ -395,6 +489,44 @@ def resend_verification(request):
                 'error': 'Email es requerido'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        # ⚡ Registro pendiente en Redis: límites + código nuevo en un round-trip
+        if codigos.activo():
+            codigo = EmailVerification.generar_codigo()
+            resultado, datos = codigos.reenviar(codigos.REGISTRO, email, codigo, 5, espera_segundos=60)
+            
+            if resultado == codigos.ESPERA_REENVIO:
+                logger.warning(
+                    f'[REENVIO_BLOQUEADO] Email {email} intentó reenviar '
+                    f'antes del tiempo de espera. Tiempo restante: {datos}s'
+                )
+                return Response({
+                    'error': 'Debes esperar antes de reenviar',
+                    'detail': f'Espera {datos} segundos',
+                    'tiempo_restante_segundos': datos
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            if resultado == codigos.LIMITE_REENVIOS:
+                logger.warning(
+                    f'[REENVIO_LIMITE] Email {email} alcanzó el límite de reenvíos'
+                )
+                return Response({
+                    'error': 'Límite de reenvíos alcanzado',
+                    'detail': 'Máximo 3 reenvíos permitidos. Contacta con soporte si necesitas ayuda.'
+                }, status=status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            if resultado == codigos.REENVIADO:
+                enviar_email_verificacion.delay(
+                    email=email,
+                    codigo=codigo,
+                    nombre=datos.get('first_name') or datos['username']
+                )
+                logger.info(f'[CODIGO_REENVIADO] Email {email}. Reenvío #{datos["reenvios"]}')
+                return Response({
+                    'message': 'Código de verificación reenviado',
+                    'email': email,
+                    'expires_in_minutes': 5
+                }, status=status.HTTP_200_OK)
+        
         # ✅ OPCIÓN 1: Buscar registro de verificación con datos temporales
         try:
             ultima_verificacion = EmailVerification.objects.filter(
@@ -509,6 +641,25 @@ def check_verification_status(request):
                 'error': 'Email es requerido'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        pendiente = codigos.estado(codigos.REGISTRO, email) if codigos.activo() else None
+        if pendiente:
+            restante_reenvio = max(0, pendiente['ultimo_reenvio'] + 60 - int(time.time()))
+            logger.info(f'[ESTADO_VERIFICACION] Email {email}. Verificado: False')
+            return Response({
+                'email': email,
+                'is_verified': False,
+                'username': pendiente['username'],
+                'has_pending_verification': True,
+                'verification_expires_at': datetime.fromtimestamp(pendiente['expira'], tz=dt_timezone.utc).isoformat(),
+                'is_expired': False,  # Los expirados desaparecen con el TTL
+                'can_resend': restante_reenvio == 0 and pendiente['reenvios'] < codigos.MAX_REENVIOS,
+                'resend_count': pendiente['reenvios'],
+                'max_resends': codigos.MAX_REENVIOS,
+                'failed_attempts': pendiente['intentos'],
+                'max_attempts': codigos.MAX_INTENTOS,
+                'resend_available_in_seconds': restante_reenvio,
+            }, status=status.HTTP_200_OK)
+        
         # ✅ OPCIÓN 1: Buscar en EmailVerification con datos temporales
         verificacion_pendiente = EmailVerification.objects.filter(
             email_temporal=email,
@@ -0,0 +1,27 @@
+"""
+ASGI de las lecturas públicas async (api/views_async.py).
+
+Proceso aparte del despliegue WSGI: solo sirve carrusel, catálogo,
+tarjetas, detalle de producto y stock en lote (config/urls_async.py), con
+MIDDLEWARE_LECTURAS.
+
+    uvicorn config.asgi_lecturas:application --workers 4 --port 8001
+
+nginx, delante de ambos:
+
+    location ~ ^/api/(carrusel|catalogo|productos/stock|productos/[0-9]+)/$ {
+        proxy_pass http://127.0.0.1:8001;   # uvicorn
+    }
+    location /api/ {
+        proxy_pass http://127.0.0.1:8000;   # gunicorn (WSGI)
+    }
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ['ASGI_LECTURAS'] = 'True'
+
+application = get_asgi_application()
@@ -12,7 +12,9 @@ Flujo:
 4. Result backend (Redis) guarda resultados
 
 Uso:
-- Desarrollo: celery -A config worker -l info --pool=solo
+- Desarrollo: celery -A config worker -l info --pool=solo (consume todas las colas)
+- Producción: un worker por cola (inventory, email, maintenance, analytics);
+  los comandos salen de `python manage.py workers_celery`
 - Beat: celery -A config beat -l info --scheduler django_celery_beat.schedulers:DatabaseScheduler
 
 ⚠️ IMPORTANTE EN WINDOWS:
@@ -21,8 +23,10 @@ Uso:
 """
 
 import os
+from datetime import timedelta
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import worker_shutdown
 
 # Configurar módulo de settings
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
@@ -38,10 +42,68 @@ app.autodiscover_tasks()
 
 # Configuración de Beat (tareas programadas)
 app.conf.beat_schedule = {
-    # Liberar reservas expiradas cada 20 minutos
+    # Expirar reservas al vencer (sorted set de Redis) cada 5 segundos
+    'expirar-reservas-vencidas': {
+        'task': 'api.tasks.expirar_reservas_vencidas',
+        'schedule': timedelta(seconds=5),
+        'options': {'expires': 5},  # No acumular ejecuciones si el worker va atrasado
+    },
+    # Red de seguridad: reservas que no llegaron al sorted set, cada 5 minutos
     'liberar-reservas-expiradas': {
         'task': 'api.tasks.liberar_reservas_expiradas',
-        'schedule': crontab(minute='*/20'),  # Cada 20 minutos
+        'schedule': crontab(minute='*/5'),  # Cada 5 minutos
+    },
+    # Retraso de las réplicas de lectura para el router de BD
+    'medir-lag-replicas': {
+        'task': 'api.tasks.medir_lag_replicas',
+        'schedule': timedelta(seconds=15),
+        'options': {'expires': 15},
+    },
+    # Rebalancear shards de stock (productos en flash sale) cada minuto
+    'rebalancear-stock-shards': {
+        'task': 'api.tasks.rebalancear_stock_shards',
+        'schedule': crontab(),  # Cada minuto
+    },
+    # Reconciliar stock disponible en Redis con la BD cada 5 minutos
+    'reconciliar-stock-cache': {
+        'task': 'api.tasks.reconciliar_stock_cache',
+        'schedule': crontab(minute='*/5'),  # Cada 5 minutos
+    },
+    # Precalcular productos relacionados cada hora
+    'precalcular-productos-relacionados': {
+        'task': 'api.tasks.precalcular_productos_relacionados',
+        'schedule': crontab(minute=30),  # Cada hora (al minuto 30)
+    },
+    # Índice de co-compra: pedidos nuevos cada 15 minutos
+    'actualizar-recomendaciones': {
+        'task': 'api.tasks.actualizar_recomendaciones',
+        'schedule': crontab(minute='*/15'),  # Cada 15 minutos
+    },
+    # Índice de co-compra: reconstrucción completa cada noche
+    'reconstruir-recomendaciones': {
+        'task': 'api.tasks.actualizar_recomendaciones',
+        'schedule': crontab(hour=3, minute=0),  # 3:00 AM
+        'kwargs': {'completo': True},
+    },
+    # Volcar familias de refresh tokens (Redis → BD) cada minuto
+    'volcar-sesiones': {
+        'task': 'api.tasks.volcar_sesiones',
+        'schedule': crontab(),  # Cada minuto
+    },
+    # Insertar auditoría encolada (respaldo: cada acción programa su volcado)
+    'volcar-auditoria': {
+        'task': 'api.tasks.volcar_auditoria',
+        'schedule': crontab(),  # Cada minuto
+    },
+    # Analítica de embudo/cohortes/abandono para el admin cada hora
+    'calcular-analitica': {
+        'task': 'api.tasks.calcular_analitica',
+        'schedule': crontab(minute=45),  # Cada hora (al minuto 45)
+    },
+    # Drenar la cola de emails (respaldo: cada encolado programa su drenado)
+    'enviar-lote-correos': {
+        'task': 'api.tasks.enviar_lote_correos',
+        'schedule': crontab(),  # Cada minuto
     },
     # Limpiar tokens expirados cada hora
     'limpiar-tokens-expirados': {
@@ -49,19 +111,17 @@ app.conf.beat_schedule = {
         'schedule': crontab(minute=0),  # Cada hora
     },
     # Limpiar códigos de verificación expirados cada 6 horas
+    # (solo filas del fallback en BD: en Redis expiran con su TTL)
     'limpiar-codigos-verificacion': {
         'task': 'api.tasks.limpiar_codigos_verificacion',
         'schedule': crontab(hour='*/6'),  # Cada 6 horas
     },
 }
 
-# ✅ Configuración para Windows - CRÍTICA
-# El pool 'prefork' no funciona en Windows, usar 'solo' o 'threads'
+# ✅ Configuración de workers
+# El pool por defecto (solo en Windows, prefork en el resto) y las colas con
+# su enrutado, prioridades y rate limits están en settings.py (CELERY_*)
 app.conf.update(
-    # Pool: 'solo' = single process (más estable en Windows)
-    # Pool: 'threads' = multithreading (alternativa)
-    worker_pool='solo',
-    
     # Desabilitar prefetch multiplier (causa problemas en Windows)
     worker_prefetch_multiplier=1,
     
@@ -71,9 +131,6 @@ app.conf.update(
     # Acks late (garantiza que la tarea se ejecute)
     task_acks_late=True,
     
-    # Disable rate limits (evita problemas en Windows)
-    worker_disable_rate_limits=True,
-    
     # Timeout para tareas
     task_soft_time_limit=300,  # 5 minutos
     task_time_limit=600,  # 10 minutos (hard limit)
@@ -107,3 +164,10 @@ app.conf.update(
 def debug_task(self):
     """Tarea de debug para verificar que Celery funciona"""
     print(f'Request: {self.request!r}')
+
+
+@worker_shutdown.connect
+def cerrar_conexiones_correo(**kwargs):
+    """Cierra las conexiones SMTP persistentes del worker (QUIT limpio)"""
+    from api.utils import correo
+    correo.cerrar_conexiones()
@@ -11,7 +11,9 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
 from pathlib import Path
+from kombu import Queue
 import os
+import sys
 from dotenv import load_dotenv
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,7 +54,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'django.middleware.gzip.GZipMiddleware',  # Compresión GZIP
+    'api.middleware.CompresionMiddleware',  # br/zstd/gzip con variantes precomprimidas
+    'api.middleware.InstrumentacionMiddleware',  # SQL, caché y serialización por petición
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -63,10 +66,33 @@ MIDDLEWARE = [
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'api.middleware.JWTAuthenticationMiddleware',  # Autenticación JWT
     'api.middleware.TokenBlacklistMiddleware',  # Validar tokens en blacklist
+    'api.middleware.MetricasHashMiddleware',  # Tiempo de hashing por petición
+    'api.middleware.LecturaPrimariaMiddleware',  # Read-your-writes con réplicas
 ]
 
-# GZIP Configuration
-GZIP_LEVEL = 6  # Balance entre velocidad y compresión (1-9)
+# Compresión de respuestas (ver api/utils/compresion.py)
+# Brotli y zstd se usan si están instalados (pip install brotli zstandard)
+COMPRESION_MINIMO = int(os.getenv('COMPRESION_MINIMO', '512'))  # Bytes; menos no compensa
+COMPRESION_CACHE_MINIMO = int(os.getenv('COMPRESION_CACHE_MINIMO', '8192'))  # Desde aquí, variante en caché
+COMPRESION_CACHE_TTL = int(os.getenv('COMPRESION_CACHE_TTL', '3600'))  # Segundos en la caché compartida
+COMPRESION_CACHE_LOCAL_BYTES = int(os.getenv('COMPRESION_CACHE_LOCAL_BYTES', str(32 * 1024 * 1024)))  # LRU por proceso
+
+# Caché HTTP de los GET públicos y purga por Surrogate-Key (ver api/utils/cache_http.py)
+# PurgadorHTTP: CACHE_HTTP_PURGA_URLS=http://varnish:6081/ y, con vmod xkey, CACHE_HTTP_PURGA_CABECERA=xkey-purge
+CACHE_HTTP_ACTIVO = os.getenv('CACHE_HTTP_ACTIVO', 'True') == 'True'
+CACHE_HTTP_PURGADOR = os.getenv('CACHE_HTTP_PURGADOR', 'api.utils.cache_http.PurgadorNulo')
+CACHE_HTTP_PURGA_URLS = [url for url in os.getenv('CACHE_HTTP_PURGA_URLS', '').split(',') if url]
+CACHE_HTTP_PURGA_CABECERA = os.getenv('CACHE_HTTP_PURGA_CABECERA', 'Surrogate-Key')
+CACHE_HTTP_PURGA_TIMEOUT = int(os.getenv('CACHE_HTTP_PURGA_TIMEOUT', '2'))  # Segundos por proxy
+
+# Instrumentación por petición: SQL, caché, serialización y N+1 (ver api/utils/instrumentacion.py)
+# Lentas y N+1 en GET /api/admin/instrumentacion/lentas/; log JSON en logs/instrumentacion.log
+INSTRUMENTACION_ACTIVA = os.getenv('INSTRUMENTACION_ACTIVA', 'True') == 'True'
+INSTRUMENTACION_SERVER_TIMING = os.getenv('INSTRUMENTACION_SERVER_TIMING', 'True') == 'True'
+INSTRUMENTACION_N_MAS_1 = int(os.getenv('INSTRUMENTACION_N_MAS_1', '5'))  # Misma consulta N veces = N+1
+INSTRUMENTACION_LENTA_MS = int(os.getenv('INSTRUMENTACION_LENTA_MS', '500'))
+INSTRUMENTACION_MUESTREO = float(os.getenv('INSTRUMENTACION_MUESTREO', '1.0'))  # Fracción de lentas guardadas
+INSTRUMENTACION_BUFFER = int(os.getenv('INSTRUMENTACION_BUFFER', '200'))  # Muestras en el buffer circular
 
 ROOT_URLCONF = 'config.urls'
 
@@ -88,6 +114,20 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'config.wsgi.application'
 
+# Lecturas públicas async bajo uvicorn (ver config/asgi_lecturas.py y api/views_async.py)
+# El proceso ASGI solo sirve esas rutas, con un MIDDLEWARE sin saltos de hilo
+MIDDLEWARE_LECTURAS = [
+    'api.middleware.CompresionMiddleware',
+    'api.middleware.SeguridadAsyncMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'api.middleware.ComunAsyncMiddleware',
+    'api.middleware.LecturaPrimariaMiddleware',  # Solo cookie: sin JWT en este proceso
+]
+ASGI_LECTURAS = os.getenv('ASGI_LECTURAS', 'False') == 'True'  # Lo activa config/asgi_lecturas.py
+if ASGI_LECTURAS:
+    ROOT_URLCONF = 'config.urls_async'
+    MIDDLEWARE = MIDDLEWARE_LECTURAS
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -100,13 +140,56 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', 'localhost'),
         'PORT': os.getenv('DB_PORT', '5432'),
-        'CONN_MAX_AGE': 600,  # Pool de conexiones (10 minutos)
+        'CONN_MAX_AGE': 600,  # Conexión persistente por hilo (10 minutos)
+        'CONN_HEALTH_CHECKS': True,  # Comprobar la conexión persistente antes de reutilizarla
         'OPTIONS': {
             'connect_timeout': 10,
         },
     }
 }
 
+# Pool de conexiones compartido entre hilos (ver api/db_pool/)
+# Opt-in: con DB_POOL=True cada petición toma una conexión del pool y la
+# devuelve al terminar (CONN_MAX_AGE=0). Aplica también a las réplicas.
+DB_POOL = os.getenv('DB_POOL', 'False') == 'True'
+if DB_POOL:
+    DATABASES['default'].update({
+        'ENGINE': 'api.db_pool',
+        'CONN_MAX_AGE': 0,
+        'CONN_HEALTH_CHECKS': False,  # El pool ya comprueba las conexiones ociosas
+    })
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'minimo': int(os.getenv('DB_POOL_MINIMO', '2')),
+        'maximo': int(os.getenv('DB_POOL_MAXIMO', '20')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '5')),  # Espera máxima por una conexión libre
+        'vida_maxima': int(os.getenv('DB_POOL_VIDA_MAXIMA', '1800')),  # Reciclar conexiones (segundos)
+        'inactividad_maxima': int(os.getenv('DB_POOL_INACTIVIDAD_MAXIMA', '300')),
+        'comprobar_tras': int(os.getenv('DB_POOL_COMPROBAR_TRAS', '30')),  # SELECT 1 si lleva más tiempo ociosa
+    }
+
+# Sentencias preparadas (PREPARE/EXECUTE) para las consultas calientes (ver
+# api/utils/sentencias.py). Solo sobre conexiones del pool; desactivar si
+# hay un PgBouncer en modo transaction delante de PostgreSQL.
+DB_SENTENCIAS_PREPARADAS = os.getenv('DB_SENTENCIAS_PREPARADAS', 'True') == 'True'
+
+# Réplicas de lectura (ver api/db_router.py)
+# DB_REPLICAS="host1:5432,host2" → DATABASES['replica_1'], ['replica_2'] con las
+# credenciales de 'default'. En local basta definir DATABASES['replica_N']
+# (p. ej. otra base SQLite) y añadir su alias a DB_REPLICAS.
+for _i, _destino in enumerate(filter(None, os.getenv('DB_REPLICAS', '').split(',')), 1):
+    _host, _, _puerto = _destino.strip().partition(':')
+    DATABASES[f'replica_{_i}'] = {
+        **DATABASES['default'],
+        'HOST': _host,
+        'PORT': _puerto or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},  # En tests la réplica es la propia BD de test
+    }
+DB_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica_')]
+DB_REPLICA_SELECCION = os.getenv('DB_REPLICA_SELECCION', 'round_robin')  # round_robin | menor_lag
+DB_REPLICA_LAG_MAXIMO = float(os.getenv('DB_REPLICA_LAG_MAXIMO', '5'))  # Segundos; más retraso → primaria
+DB_PRIMARIA_TRAS_ESCRIBIR = int(os.getenv('DB_PRIMARIA_TRAS_ESCRIBIR', '10'))  # Read-your-writes
+DATABASE_ROUTERS = ['api.db_router.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -126,6 +209,30 @@ AUTH_PASSWORD_VALIDATORS = [
     },
 ]
 
+# Política de hashing de contraseñas (ver api/hashers.py)
+# Calibrar en el host con: python manage.py benchmark_hashers --objetivo-ms 250
+# Cambiar algoritmo o parámetros rehashea cada contraseña en su próximo login.
+PASSWORD_HASH_ALGORITMO = os.getenv('PASSWORD_HASH_ALGORITMO', 'pbkdf2')  # pbkdf2 | argon2 | bcrypt
+PASSWORD_HASH_POLITICA = {
+    'pbkdf2_iteraciones': int(os.getenv('PASSWORD_PBKDF2_ITERACIONES', '600000')),
+    'argon2_time_cost': int(os.getenv('PASSWORD_ARGON2_TIME_COST', '2')),
+    'argon2_memory_cost': int(os.getenv('PASSWORD_ARGON2_MEMORY_COST', '102400')),  # KiB
+    'argon2_parallelism': int(os.getenv('PASSWORD_ARGON2_PARALLELISM', '8')),
+    'bcrypt_rounds': int(os.getenv('PASSWORD_BCRYPT_ROUNDS', '12')),
+}
+_HASHERS_POLITICA = {
+    'pbkdf2': 'api.hashers.PoliticaPBKDF2PasswordHasher',
+    'argon2': 'api.hashers.PoliticaArgon2PasswordHasher',
+    'bcrypt': 'api.hashers.PoliticaBCryptSHA256PasswordHasher',
+}
+# El primero es el preferido; el resto solo verifica hashes antiguos
+PASSWORD_HASHERS = [_HASHERS_POLITICA[PASSWORD_HASH_ALGORITMO]] + [
+    hasher for algoritmo, hasher in _HASHERS_POLITICA.items()
+    if algoritmo != PASSWORD_HASH_ALGORITMO
+] + [
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+]
+
 
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
@@ -161,6 +268,25 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')  # Your Gmail address
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')  # App password
 DEFAULT_FROM_EMAIL = os.getenv('EMAIL_HOST_USER')
 
+# Pipeline de envío (ver api/utils/correo.py)
+# Proveedores: nombre → kwargs de get_connection ({} = EMAIL_* de arriba)
+CORREO_PROVEEDORES = {
+    'gmail': {},
+}
+CORREO_PROVEEDOR = os.getenv('CORREO_PROVEEDOR', 'gmail')
+CORREO_LOTE = int(os.getenv('CORREO_LOTE', '50'))  # Mensajes por lote en una conexión
+CORREO_MAX_INACTIVA = 30  # Segundos sin uso antes de comprobar la conexión con NOOP
+
+# Auditoría del admin: filas encoladas en Redis e insertadas en lote
+# Ver api/utils/audit.py. Sin Redis se escriben directamente.
+AUDITORIA_LOTE = int(os.getenv('AUDITORIA_LOTE', '500'))  # Filas por bulk_create
+AUDITORIA_PURGA_LOTE = int(os.getenv('AUDITORIA_PURGA_LOTE', '5000'))  # Ids por DELETE al vaciar
+
+# Expiración de reservas de stock: temporizador en un sorted set de Redis
+# Ver api/utils/expiracion_reservas.py. Sin Redis solo queda el barrido periódico.
+RESERVAS_EXPIRACION_EN_REDIS = os.getenv('RESERVAS_EXPIRACION_EN_REDIS', 'True') == 'True'
+RESERVAS_EXPIRACION_LOTE = int(os.getenv('RESERVAS_EXPIRACION_LOTE', '500'))  # Reservas por UPDATE
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -190,6 +316,11 @@ CSRF_COOKIE_SAMESITE = 'Lax'  # Protección contra CSRF
 CSRF_COOKIE_AGE = 31449600  # 1 año (en segundos)
 
 # REST Framework Settings
+# Renderer/parser JSON sobre orjson con fallback a la stdlib (ver api/renderers.py)
+# JSON_ORJSON=False vuelve a los de DRF
+JSON_ORJSON = os.getenv('JSON_ORJSON', 'True') == 'True'
+JSON_STREAMING_MINIMO = int(os.getenv('JSON_STREAMING_MINIMO', '500'))  # Listas desde este tamaño se envían por lotes
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
@@ -199,7 +330,12 @@ REST_FRAMEWORK = {
         'rest_framework.authentication.TokenAuthentication',  # Fallback para compatibilidad
     ],
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'api.renderers.ORJSONRenderer' if JSON_ORJSON else 'rest_framework.renderers.JSONRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.ORJSONParser' if JSON_ORJSON else 'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 50,
@@ -247,6 +383,11 @@ LOGGING = {
             'style': '{',
             'datefmt': '%Y-%m-%d %H:%M:%S',
         },
+        'json': {
+            'format': '{{"nivel": "{levelname}", "fecha": "{asctime}", "peticion": {message}}}',
+            'style': '{',
+            'datefmt': '%Y-%m-%dT%H:%M:%S',
+        },
     },
     'handlers': {
         'console': {
@@ -267,6 +408,13 @@ LOGGING = {
             'backupCount': 10,
             'formatter': 'verbose',
         },
+        'instrumentacion_file': {
+            'class': 'logging.handlers.RotatingFileHandler',
+            'filename': os.path.join(BASE_DIR, 'logs', 'instrumentacion.log'),
+            'maxBytes': 1024 * 1024 * 50,  # 50MB: una línea por petición
+            'backupCount': 5,
+            'formatter': 'json',
+        },
     },
     'loggers': {
         'security': {
@@ -279,6 +427,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'instrumentacion': {
+            'handlers': ['instrumentacion_file'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'django.request': {
             'handlers': ['console', 'security_file'],
             'level': 'WARNING',
@@ -302,10 +455,11 @@ SECURE_HSTS_PRELOAD = not DEBUG
 # Cache Configuration
 # Redis para datos públicos (catálogo, categorías, etc.)
 # Memoria local para sesiones activas
+# api.cache_backends: los de django_redis/Django contando aciertos y fallos (instrumentación)
 CACHES = {
     # Redis para datos públicos (catálogo, categorías, etc.)
     'default': {
-        'BACKEND': 'django_redis.cache.RedisCache',
+        'BACKEND': 'api.cache_backends.RedisCache',  # django_redis + aciertos/fallos por petición
         'LOCATION': 'redis://127.0.0.1:6379/1',
         'OPTIONS': {
             'CLIENT_CLASS': 'django_redis.client.DefaultClient',
@@ -314,7 +468,7 @@ CACHES = {
     },
     # Memoria local para sesiones activas
     'sessions': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'BACKEND': 'api.cache_backends.LocMemCache',
         'LOCATION': 'session-cache',
     }
 }
@@ -322,6 +476,20 @@ CACHES = {
 SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
 SESSION_CACHE_ALIAS = 'sessions'
 
+# Familias de refresh tokens en Redis (rotación sin escrituras en BD)
+# Ver api/utils/sesiones.py. Sin Redis se usa automáticamente la BD.
+REFRESH_TOKENS_EN_REDIS = os.getenv('REFRESH_TOKENS_EN_REDIS', 'True') == 'True'
+# Segundos en los que un token recién rotado aún se acepta (peticiones concurrentes)
+REFRESH_GRACIA_SEGUNDOS = int(os.getenv('REFRESH_GRACIA_SEGUNDOS', '10'))
+
+# Registro de intentos de login (LoginAttempt + logs) en Celery
+# Ver api/utils/intentos_login.py. Si el broker falla se escribe en línea.
+LOGIN_INTENTOS_ASINCRONOS = os.getenv('LOGIN_INTENTOS_ASINCRONOS', 'True') == 'True'
+
+# Códigos de verificación y recuperación en Redis (hash + TTL, sin barrido)
+# Ver api/utils/codigos_verificacion.py. Sin Redis se usa automáticamente la BD.
+CODIGOS_VERIFICACION_EN_REDIS = os.getenv('CODIGOS_VERIFICACION_EN_REDIS', 'True') == 'True'
+
 # File Upload Settings - Permitir imágenes base64 grandes
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB en bytes
 FILE_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB en bytes
@@ -359,10 +527,78 @@ CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60  # 30 minutos (hard limit)
 CELERY_TASK_SOFT_TIME_LIMIT = 25 * 60  # 25 minutos (soft limit)
 
-# ✅ CONFIGURACIÓN PARA WINDOWS - POOL SOLO
-# Forzar que use 'solo' pool en lugar de 'prefork' (que no funciona en Windows)
-CELERY_WORKER_POOL = 'solo'
+# ✅ POOL POR PLATAFORMA
+# 'prefork' no funciona en Windows: allí el pool por defecto es 'solo'.
+# Cada worker dedicado elige su pool con WORKERS_CELERY (más abajo).
+ES_WINDOWS = sys.platform == 'win32'
+CELERY_WORKER_POOL = os.getenv('CELERY_WORKER_POOL', 'solo' if ES_WINDOWS else 'prefork')
 CELERY_WORKER_PREFETCH_MULTIPLIER = 1
 CELERY_WORKER_MAX_TASKS_PER_CHILD = 1000
 CELERY_TASK_ACKS_LATE = True
-CELERY_WORKER_DISABLE_RATE_LIMITS = True
+CELERY_WORKER_DISABLE_RATE_LIMITS = False  # Necesario para los rate_limit de CELERY_TASK_ANNOTATIONS
+
+# ═══════════════════════════════════════════════════════════════════════════════
+# 🚦 COLAS DE CELERY - Un worker por tipo de trabajo
+# ═══════════════════════════════════════════════════════════════════════════════
+# Un envío SMTP lento ya no retrasa la expiración de reservas: cada cola la
+# consume su propio worker (`python manage.py workers_celery`). Un worker
+# arrancado sin -Q sigue consumiendo todas las colas.
+# routing_key propia: sin ella todas usan 'celery' y cada mensaje llega a todas
+CELERY_TASK_DEFAULT_QUEUE = 'celery'
+CELERY_TASK_QUEUES = [
+    Queue(nombre, routing_key=nombre)
+    for nombre in ('inventory', 'email', 'maintenance', 'analytics', 'celery')
+]
+
+# Prioridad dentro de cada cola (Redis: 0 = más urgente, 9 = menos)
+CELERY_BROKER_TRANSPORT_OPTIONS = {
+    'priority_steps': list(range(10)),
+    'sep': ':',
+    'queue_order_strategy': 'priority',
+}
+CELERY_TASK_ROUTES = {
+    # Inventario: stock bloqueado mientras esperan
+    'api.tasks.expirar_reservas_vencidas': {'queue': 'inventory', 'priority': 0},
+    'api.tasks.liberar_reservas_expiradas': {'queue': 'inventory', 'priority': 1},
+    'api.tasks.rebalancear_stock_shards': {'queue': 'inventory', 'priority': 1},
+    'api.tasks.reconciliar_stock_cache': {'queue': 'inventory', 'priority': 3},
+    # Email: I/O contra SMTP; los códigos los espera un usuario
+    'api.tasks.enviar_email_verificacion': {'queue': 'email', 'priority': 0},
+    'api.tasks.enviar_email_recuperacion': {'queue': 'email', 'priority': 0},
+    'api.tasks.enviar_lote_correos': {'queue': 'email', 'priority': 3},
+    # Mantenimiento: escrituras diferidas y limpiezas
+    'api.tasks.medir_lag_replicas': {'queue': 'maintenance', 'priority': 0},
+    'api.tasks.registrar_intento_login': {'queue': 'maintenance', 'priority': 2},
+    'api.tasks.volcar_sesiones': {'queue': 'maintenance', 'priority': 3},
+    'api.tasks.volcar_auditoria': {'queue': 'maintenance', 'priority': 3},
+    'api.tasks.limpiar_tokens_expirados': {'queue': 'maintenance', 'priority': 6},
+    'api.tasks.limpiar_codigos_verificacion': {'queue': 'maintenance', 'priority': 6},
+    'api.tasks.purgar_auditoria': {'queue': 'maintenance', 'priority': 9},
+    # Analítica: CPU (NumPy, co-compra)
+    'api.tasks.precalcular_productos_relacionados': {'queue': 'analytics'},
+    'api.tasks.actualizar_recomendaciones': {'queue': 'analytics'},
+    'api.tasks.calcular_analitica': {'queue': 'analytics'},
+}
+
+# Límite por worker; protege la cuota del proveedor SMTP
+CELERY_TASK_ANNOTATIONS = {
+    'api.tasks.enviar_email_verificacion': {'rate_limit': os.getenv('CELERY_RATE_EMAIL', '60/m')},
+    'api.tasks.enviar_email_recuperacion': {'rate_limit': os.getenv('CELERY_RATE_EMAIL', '60/m')},
+}
+
+# Pool y concurrencia de cada worker dedicado (ver workers_celery)
+# - threads/gevent para I/O (email, BD), prefork para CPU (analítica)
+# - En Windows prefork no funciona: analítica usa 'solo'
+# Variables: CELERY_POOL_<COLA> / CELERY_CONCURRENCIA_<COLA>
+WORKERS_CELERY = {
+    cola: {
+        'pool': os.getenv(f'CELERY_POOL_{cola.upper()}', pool),
+        'concurrencia': int(os.getenv(f'CELERY_CONCURRENCIA_{cola.upper()}', concurrencia)),
+    }
+    for cola, pool, concurrencia in (
+        ('inventory', 'threads', '4'),
+        ('email', 'threads', '8'),
+        ('maintenance', 'threads', '2'),
+        ('analytics', 'solo' if ES_WINDOWS else 'prefork', '1' if ES_WINDOWS else '2'),
+    )
+}
@@ -0,0 +1,16 @@
+"""
+URLs del proceso ASGI de lecturas (config/asgi_lecturas.py).
+
+Mismas rutas y nombres que api/urls.py para las vistas de api/views_async.py;
+el proxy (nginx) envía estas rutas a uvicorn y el resto al despliegue WSGI.
+"""
+from django.urls import path
+from api import views_async
+
+urlpatterns = [
+    path('api/carrusel/', views_async.productos_carrusel, name='productos-carrusel'),
+    path('api/catalogo/productos/', views_async.productos_catalogo_completo, name='catalogo-productos'),
+    path('api/catalogo/tarjetas-inferiores/', views_async.productos_tarjetas_inferiores, name='tarjetas-inferiores'),
+    path('api/productos/stock/', views_async.stock_productos_batch, name='stock-productos-batch'),
+    path('api/productos/<int:pk>/', views_async.producto_detalle, name='producto-detail'),
+]
@@ -12,14 +12,26 @@ Ejecutar:
 """
 
 import pytest
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
+from api.tests.caches import LOCAL
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    """Historial de throttles vacío por test, con o sin Redis en la máquina"""
+    with override_settings(CACHES=LOCAL, LOGIN_INTENTOS_ASINCRONOS=False):
+        cache.clear()
+        yield
+        cache.clear()
+
+
 @pytest.mark.django_db
 class TestCartWriteThrottle:
     """Tests para CartWriteThrottle (100/hora)"""
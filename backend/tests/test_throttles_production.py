@@ -16,16 +16,28 @@ NOTA: Estos tests validan la sincronización entre:
 """
 
 import pytest
+from django.core.cache import cache
+from django.test import override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from datetime import timedelta
+from api.tests.caches import LOCAL
 
 User = get_user_model()
 
 
+@pytest.fixture(autouse=True)
+def limpiar_cache():
+    """Historial de throttles vacío por test, con o sin Redis en la máquina"""
+    with override_settings(CACHES=LOCAL, LOGIN_INTENTOS_ASINCRONOS=False):
+        cache.clear()
+        yield
+        cache.clear()
+
+
 @pytest.mark.django_db
 class TestAnonLoginThrottle:
     """Tests para AnonLoginRateThrottle (5/minuto)"""
@@ -36,6 +48,10 @@ class TestAnonLoginThrottle:
         from api.models import LoginAttempt
         LoginAttempt.objects.all().delete()
         
+        # ✅ Limpiar contadores de bloqueo del login (viven en caché)
+        from django.core.cache import cache
+        cache.clear()
+        
         self.client = APIClient()
     
     def test_anon_login_throttle_allows_requests_under_limit(self):